@@ -55,6 +55,7 @@ import type {
   StockValueTrend,
   DailyStatistics,
   CsvImportResult,
+  ProductImportJob,
   ExpenseCategory,
   Wallet,
   Expense,
@@ -542,10 +543,28 @@ export const productApi = {
   delete: (id: string) =>
     apiClient.delete(`products/${id}/`),
 
-  importCsv: (file: File) => {
+  importCsv: async (file: File): Promise<CsvImportResult> => {
     const fd = new FormData();
     fd.append('file', file);
-    return apiClient.post<CsvImportResult>('products/import-csv/', fd).then((r) => r.data);
+    const res = await apiClient.post<CsvImportResult | ProductImportJob>('products/import-csv/', fd);
+    if (res.status !== 202) return res.data as CsvImportResult;
+
+    // Large files are imported by a background job: wait for it.
+    let job = res.data as ProductImportJob;
+    while (job.status === 'PENDING' || job.status === 'RUNNING') {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      job = await apiClient.get<ProductImportJob>(`products/import-jobs/${job.id}/`).then((r) => r.data);
+    }
+    if (job.status === 'FAILED') throw new Error(job.error || 'Import CSV impossible.');
+    return {
+      detail: 'Import CSV termine.',
+      total_rows: job.total_rows,
+      created: job.created,
+      updated: job.updated,
+      skipped: job.skipped,
+      error_count: job.error_count,
+      errors: job.errors,
+    };
   },
 
   uploadImage: (productId: string, file: File, isPrimary = false) => {
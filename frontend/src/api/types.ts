@@ -1167,6 +1167,8 @@ export interface ForecastSummary {
     predicted_revenue: string;
     predicted_profit: string;
   };
+  /** Number of products forecast by each model (MA_7, CROSTON, ...). */
+  methods: Record<string, number>;
 }
 
 // ---------------------------------------------------------------------------
@@ -1567,6 +1569,24 @@ export interface CsvImportResult {
   errors: CsvImportError[];
 }
 
+/** Product import too large for the request, run in the background. */
+export interface ProductImportJob {
+  id: string;
+  format: 'csv' | 'xlsx';
+  status: 'PENDING' | 'RUNNING' | 'DONE' | 'FAILED';
+  total_rows: number;
+  processed_rows: number;
+  progress: number;
+  created: number;
+  updated: number;
+  skipped: number;
+  error_count: number;
+  errors: CsvImportError[];
+  status_url: string;
+  error_report_url: string | null;
+  error: string;
+}
+
 // ---------------------------------------------------------------------------
 // Expenses
 // ---------------------------------------------------------------------------
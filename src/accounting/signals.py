@@ -4,6 +4,10 @@ Each receiver checks:
 1. Feature flag "accounting" is enabled for the enterprise
 2. AccountingSettings exist
 3. No duplicate entry (handled inside service functions)
+
+Sale and payment entries sit on the checkout path: unless the store opted
+for synchronous side effects, they are recorded in the transactional outbox
+and posted by the dispatcher (see :mod:`core.outbox`).
 """
 
 import logging
@@ -11,6 +15,8 @@ import logging
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from core.outbox import outbox_enabled_for_store, outbox_handler, publish_event
+
 logger = logging.getLogger(__name__)
 
 
@@ -33,6 +39,15 @@ def on_sale_saved(sender, instance, **kwargs):
         return
     if not _is_accounting_enabled(instance.store):
         return
+    if outbox_enabled_for_store(instance.store):
+        publish_event(
+            "accounting.sale_paid",
+            aggregate_key=f"sales.Sale:{instance.pk}",
+            payload={"sale_id": str(instance.pk)},
+            store=instance.store,
+            dedupe_key=f"accounting.sale_paid:{instance.pk}",
+        )
+        return
     try:
         from accounting.services import post_sale_entry
         post_sale_entry(instance)
@@ -40,6 +55,16 @@ def on_sale_saved(sender, instance, **kwargs):
         logger.exception("Erreur generation ecriture vente %s", instance.pk)
 
 
+@outbox_handler("accounting.sale_paid")
+def handle_sale_paid(payload):
+    from accounting.services import post_sale_entry
+    from sales.models import Sale
+
+    sale = Sale.objects.select_related("store").filter(pk=payload["sale_id"]).first()
+    if sale is not None and sale.status == "PAID":
+        post_sale_entry(sale)
+
+
 # ---------------------------------------------------------------------------
 # Payment → created
 # ---------------------------------------------------------------------------
@@ -52,6 +77,15 @@ def on_payment_saved(sender, instance, created, **kwargs):
     sale = instance.sale
     if not sale or not _is_accounting_enabled(sale.store):
         return
+    if outbox_enabled_for_store(sale.store):
+        # Same aggregate as the sale entry so both are posted in order.
+        publish_event(
+            "accounting.payment_created",
+            aggregate_key=f"sales.Sale:{sale.pk}",
+            payload={"payment_id": str(instance.pk)},
+            store=sale.store,
+        )
+        return
     try:
         from accounting.services import post_payment_entry
         post_payment_entry(instance)
@@ -59,6 +93,20 @@ def on_payment_saved(sender, instance, created, **kwargs):
         logger.exception("Erreur generation ecriture paiement %s", instance.pk)
 
 
+@outbox_handler("accounting.payment_created")
+def handle_payment_created(payload):
+    from accounting.services import post_payment_entry
+    from cashier.models import Payment
+
+    payment = (
+        Payment.objects.select_related("sale", "sale__store", "store")
+        .filter(pk=payload["payment_id"])
+        .first()
+    )
+    if payment is not None:
+        post_payment_entry(payment)
+
+
 # ---------------------------------------------------------------------------
 # Refund → created
 # ---------------------------------------------------------------------------
@@ -2,6 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 
+from .auth_cache import invalidate_cached_user
 from .models import User
 
 
@@ -88,10 +89,12 @@ class UserAdmin(BaseUserAdmin):
 
     @admin.action(description="Activer les utilisateurs selectionnes")
     def activate_users(self, request, queryset):
+        invalidate_cached_user(*queryset.values_list("pk", flat=True))
         queryset.update(is_active=True)
 
     @admin.action(description="Desactiver les utilisateurs selectionnes")
     def deactivate_users(self, request, queryset):
+        invalidate_cached_user(*queryset.values_list("pk", flat=True))
         queryset.update(is_active=False)
 
     @admin.action(description="Donner acces staff (admin Django)")
@@ -0,0 +1,10 @@
+"""App config for the accounts module."""
+from django.apps import AppConfig
+
+
+class AccountsConfig(AppConfig):
+    name = "accounts"
+
+    def ready(self):
+        # Keep the cached auth users (see accounts.auth_cache) in sync.
+        import accounts.signals  # noqa: F401
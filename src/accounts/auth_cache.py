@@ -0,0 +1,87 @@
+"""Short-lived shared cache of authenticated ``User`` rows.
+
+Every JWT-authenticated request loads its user by primary key.  Terminals
+polling small endpoints every few seconds made that lookup one of the most
+frequent queries, so :func:`get_cached_user` keeps the row in the shared
+cache for ``AUTH_USER_CACHE_TTL`` seconds.  Only the column values are
+cached, without the password hash: the rebuilt user loads it on access.
+
+Cached rows are keyed by the user id and a per-user version token.
+``accounts.signals`` replaces the token when the user is saved (password,
+activation, role...) or deleted; bulk updates must call
+:func:`invalidate_cached_user` themselves.
+"""
+from __future__ import annotations
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger("boutique")
+
+
+def _version_key(user_id) -> str:
+    return f"accounts:auth_user:ver:{user_id}"
+
+
+def invalidate_cached_user(*user_ids) -> None:
+    """Drop cached rows of *user_ids* (now and again after commit)."""
+    keys = [_version_key(user_id) for user_id in user_ids if user_id]
+    if not keys:
+        return
+
+    def _bump():
+        try:
+            cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        except Exception:
+            logger.warning("Auth user cache invalidation failed", exc_info=True)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _current_version(user_id) -> str:
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+# Never cached; deferred on the rebuilt user.
+_UNCACHED_FIELDS = ("password",)
+
+
+def _cached_field_names(user_model) -> list[str]:
+    return [
+        field.attname for field in user_model._meta.concrete_fields
+        if field.attname not in _UNCACHED_FIELDS
+    ]
+
+
+def get_cached_user(user_id):
+    """Return the user with primary key *user_id*, or None if missing.
+
+    Inactive users are returned as well; callers decide what to do with them.
+    """
+    user_model = get_user_model()
+    names = _cached_field_names(user_model)
+    try:
+        cache_key = f"accounts:auth_user:{user_id}:{_current_version(user_id)}"
+        values = cache.get(cache_key)
+    except Exception:
+        logger.warning("Auth user cache unavailable", exc_info=True)
+        return user_model.objects.filter(pk=user_id).first()
+
+    if values is None:
+        values = user_model.objects.filter(pk=user_id).values_list(*names).first()
+        if values is None:
+            return None
+        cache.set(cache_key, values, timeout=getattr(settings, "AUTH_USER_CACHE_TTL", 60))
+    return user_model.from_db(user_model.objects.db, names, values)
@@ -0,0 +1,20 @@
+"""Signals: invalidate the cached auth users of :mod:`accounts.auth_cache`."""
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.auth_cache import invalidate_cached_user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # ``last_login`` alone does not make the cached auth row stale.
+    if not created and (update_fields is None or set(update_fields) - {"last_login"}):
+        invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
@@ -247,6 +247,41 @@ def create_stock_level_alert_for_product_stock(product_stock, existing_today_key
     return alert
 
 
+def _stock_level_alert_keys_for_today(store):
+    """Return ``(alert_type, product_id)`` keys of today's stock-level alerts."""
+    return set(
+        Alert.objects.filter(
+            store=store,
+            alert_type__in=[Alert.Type.LOW_STOCK, Alert.Type.OUT_OF_STOCK],
+            created_at__date=date.today(),
+        ).values_list("alert_type", "payload__product_id")
+    )
+
+
+def refresh_stock_level_alerts(product_stocks):
+    """Create low/out-of-stock alerts for several ProductStock rows.
+
+    Today's existing alerts are loaded once per store (and only for stores
+    that have at least one row at or below its threshold) instead of once
+    per row.  Returns the number of created alerts.
+    """
+    low_by_store = {}
+    for product_stock in product_stocks:
+        if int(product_stock.available_qty) <= int(product_stock.min_qty):
+            low_by_store.setdefault(product_stock.store_id, []).append(product_stock)
+
+    created_count = 0
+    for rows in low_by_store.values():
+        existing_today_keys = _stock_level_alert_keys_for_today(rows[0].store)
+        for product_stock in rows:
+            if create_stock_level_alert_for_product_stock(
+                product_stock,
+                existing_today_keys=existing_today_keys,
+            ):
+                created_count += 1
+    return created_count
+
+
 def sync_low_stock_alerts_for_store(store):
     """Generate low/out-of-stock alerts for a single store.
 
@@ -260,14 +295,7 @@ def sync_low_stock_alerts_for_store(store):
         .select_related("product")
     )
 
-    today = date.today()
-    existing_today_keys = set(
-        Alert.objects.filter(
-            store=store,
-            alert_type__in=[Alert.Type.LOW_STOCK, Alert.Type.OUT_OF_STOCK],
-            created_at__date=today,
-        ).values_list("alert_type", "payload__product_id")
-    )
+    existing_today_keys = _stock_level_alert_keys_for_today(store)
 
     created_count = 0
     for product_stock in low_stocks:
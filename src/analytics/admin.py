@@ -4,6 +4,8 @@ from django.utils import timezone
 
 from analytics.models import (
     ABCAnalysis,
+    AnalyticsPipelineRun,
+    AnalyticsPipelineStep,
     CustomerCreditScore,
     FraudEvent,
     ReorderRecommendation,
@@ -119,3 +121,30 @@ class FraudEventAdmin(admin.ModelAdmin):
             resolved_by=None,
             resolved_at=None,
         )
+
+
+class AnalyticsPipelineStepInline(admin.TabularInline):
+    model = AnalyticsPipelineStep
+    extra = 0
+    can_delete = False
+    fields = ("store", "stage", "status", "rows", "duration_ms", "error")
+    readonly_fields = fields
+
+
+@admin.register(AnalyticsPipelineRun)
+class AnalyticsPipelineRunAdmin(admin.ModelAdmin):
+    list_display = ("as_of", "status", "store_count", "completed_steps", "failed_steps", "total_steps", "finished_at")
+    list_filter = ("status", "as_of")
+    date_hierarchy = "as_of"
+    readonly_fields = (
+        "as_of",
+        "status",
+        "stages",
+        "store_count",
+        "total_steps",
+        "completed_steps",
+        "failed_steps",
+        "summary",
+        "finished_at",
+    )
+    inlines = (AnalyticsPipelineStepInline,)
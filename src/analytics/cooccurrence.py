@@ -0,0 +1,303 @@
+"""Per-store product co-occurrence index for recommendations.
+
+For each store the index keeps decayed order counts of paid sales:
+
+- ``ProductOccurrence``: sales containing a product;
+- ``ProductCooccurrence``: sales containing both products of a pair (one
+  row per unordered pair, ``product_a_id < product_b_id``);
+- ``CooccurrenceIndex``: all indexed sales and the update watermark.
+
+Counts use forward exponential decay: a sale paid on local day *d* adds
+``2 ** ((d - DECAY_EPOCH) / half_life)``, so older sales weigh less without
+rewriting rows; dividing by the same factor at *as_of* gives the decayed
+count.  Lift (``n_ab * n / (n_a * n_b)``) does not depend on the scale.
+
+:func:`update_cooccurrence_index` folds in newly paid sales (after each
+paid sale and every few minutes).  :func:`related_products` and
+:func:`popular_products` are plain index lookups, cheap enough for POS
+upsell and campaign targeting.
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import combinations
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from analytics.models import CooccurrenceIndex, ProductCooccurrence, ProductOccurrence
+from core.dates import local_today, store_timezone
+from core.outbox import outbox_enabled_for_store, outbox_handler, publish_event
+
+logger = logging.getLogger("boutique")
+
+DECAY_EPOCH = date(2024, 1, 1)
+# Sales whose payment commits late may carry a moment slightly before the
+# watermark; those within this margin are still picked up, exactly once.
+WATERMARK_OVERLAP = timedelta(minutes=10)
+# Larger baskets (wholesale orders) feed product counts but not pairs.
+MAX_BASKET_PRODUCTS = 40
+INDEXED_STATUSES = ("PAID", "REFUNDED")
+
+
+def decay_factor(day: date, half_life_days: int) -> float:
+    return 2.0 ** ((day - DECAY_EPOCH).days / half_life_days)
+
+
+def _half_life() -> int:
+    return max(1, int(getattr(settings, "ANALYTICS_COOCCURRENCE_HALF_LIFE_DAYS", 90)))
+
+
+# ---------------------------------------------------------------------------
+# Maintenance
+# ---------------------------------------------------------------------------
+
+def _bump(counts: dict, key, weight: float, day: date) -> None:
+    entry = counts.get(key)
+    if entry is None:
+        counts[key] = [weight, 1, day]
+    else:
+        entry[0] += weight
+        entry[1] += 1
+        entry[2] = max(entry[2], day)
+
+
+def _merge(model, store, deltas: dict, key_fields: tuple) -> None:
+    """Add *deltas* (key tuple -> [weight, orders, day]) to the rows of *model*."""
+    if not deltas:
+        return
+    lookup = {
+        f"{field}__in": list({key[position] for key in deltas})
+        for position, field in enumerate(key_fields)
+    }
+    to_update = []
+    for row in model.objects.filter(store=store, **lookup):
+        delta = deltas.pop(tuple(getattr(row, field) for field in key_fields), None)
+        if delta is not None:
+            row.weight += delta[0]
+            row.order_count += delta[1]
+            row.last_seen_on = max(row.last_seen_on, delta[2])
+            to_update.append(row)
+    model.objects.bulk_update(to_update, ["weight", "order_count", "last_seen_on"], batch_size=500)
+    model.objects.bulk_create(
+        [
+            model(store=store, weight=weight, order_count=orders, last_seen_on=day, **dict(zip(key_fields, key)))
+            for key, (weight, orders, day) in deltas.items()
+        ],
+        batch_size=500,
+    )
+
+
+def _fold_next_batch(store, index: CooccurrenceIndex, batch_size: int) -> int:
+    from sales.models import Sale, SaleItem
+
+    recent = dict(index.recent_sale_ids)
+    sales = Sale.objects.filter(store=store, status__in=INDEXED_STATUSES).annotate(
+        paid_moment=Coalesce("paid_at", "created_at"),
+    )
+    if index.watermark is not None:
+        sales = sales.filter(paid_moment__gt=index.watermark - WATERMARK_OVERLAP).exclude(pk__in=list(recent))
+    batch = list(sales.order_by("paid_moment", "pk").values_list("pk", "paid_moment")[:batch_size])
+    if not batch:
+        return 0
+
+    baskets = defaultdict(set)
+    for sale_id, product_id in SaleItem.objects.filter(sale_id__in=[pk for pk, _ in batch]).values_list(
+        "sale_id", "product_id",
+    ):
+        baskets[sale_id].add(product_id)
+
+    tz = store_timezone(store)
+    products, pairs = {}, {}
+    for sale_id, moment in batch:
+        basket = sorted(baskets.get(sale_id, ()))
+        if not basket:
+            continue
+        day = timezone.localtime(moment, tz).date()
+        weight = decay_factor(day, index.half_life_days)
+        index.order_weight += weight
+        index.order_count += 1
+        for product_id in basket:
+            _bump(products, product_id, weight, day)
+        if len(basket) <= MAX_BASKET_PRODUCTS:
+            for pair in combinations(basket, 2):
+                _bump(pairs, pair, weight, day)
+
+    _merge(ProductOccurrence, store, {(pid,): delta for pid, delta in products.items()}, ("product_id",))
+    _merge(ProductCooccurrence, store, pairs, ("product_a_id", "product_b_id"))
+
+    index.watermark = max(index.watermark or batch[-1][1], batch[-1][1])
+    recent.update((str(pk), moment.isoformat()) for pk, moment in batch)
+    horizon = index.watermark - WATERMARK_OVERLAP
+    index.recent_sale_ids = [[pk, iso] for pk, iso in recent.items() if parse_datetime(iso) > horizon]
+    index.save(update_fields=["order_weight", "order_count", "watermark", "recent_sale_ids", "updated_at"])
+    return len(batch)
+
+
+def update_cooccurrence_index(store, *, batch_size: int = 1000) -> int:
+    """Fold the sales of *store* paid since the last update into its index.
+
+    Runs under a lock on the store's index row; returns the sales indexed.
+    """
+    CooccurrenceIndex.objects.get_or_create(store=store, defaults={"half_life_days": _half_life()})
+    indexed = 0
+    while True:
+        with transaction.atomic():
+            index = CooccurrenceIndex.objects.select_for_update().get(store=store)
+            count = _fold_next_batch(store, index, batch_size)
+        indexed += count
+        if count < batch_size:
+            return indexed
+
+
+def rebuild_cooccurrence_index(store) -> int:
+    """Drop the index of *store* and rebuild it from all its paid sales."""
+    with transaction.atomic():
+        ProductCooccurrence.objects.filter(store=store).delete()
+        ProductOccurrence.objects.filter(store=store).delete()
+        CooccurrenceIndex.objects.filter(store=store).delete()
+    return update_cooccurrence_index(store)
+
+
+@outbox_handler("analytics.update_cooccurrence_index")
+def handle_update_cooccurrence_index(payload):
+    from stores.models import Store
+
+    store = Store.objects.filter(pk=payload["store_id"]).first()
+    if store is not None:
+        update_cooccurrence_index(store)
+
+
+def schedule_index_update(store) -> None:
+    """Fold the newly paid sales of *store* in once the transaction commits."""
+    if store is None:
+        return
+    if outbox_enabled_for_store(store):
+        publish_event(
+            "analytics.update_cooccurrence_index",
+            aggregate_key=f"analytics.cooccurrence:{store.pk}",
+            payload={"store_id": str(store.pk)},
+            store=store,
+            dedupe_key=f"analytics.update_cooccurrence_index:{store.pk}",
+        )
+        return
+
+    def _update():
+        try:
+            update_cooccurrence_index(store)
+        except Exception:
+            # The periodic task catches up from the watermark.
+            logger.warning("Co-occurrence index update failed for %s", store.pk, exc_info=True)
+
+    transaction.on_commit(_update)
+
+
+# ---------------------------------------------------------------------------
+# Lookups
+# ---------------------------------------------------------------------------
+
+def _scale(store, index: CooccurrenceIndex, as_of: date | None) -> float:
+    return decay_factor(as_of or local_today(store_timezone(store)), index.half_life_days)
+
+
+def related_products(
+    store,
+    product_ids,
+    *,
+    as_of: date | None = None,
+    exclude=(),
+    limit: int = 20,
+) -> list[dict]:
+    """Products most often bought with any of *product_ids*, best first.
+
+    Each row has ``product_id``, ``orders`` (raw co-purchases), ``count``
+    (decayed co-purchases at *as_of*), ``lift`` (best over the anchors) and
+    ``score`` (``count * lift``).
+    """
+    index = CooccurrenceIndex.objects.filter(store=store).first()
+    anchors = set(product_ids)
+    if index is None or not index.order_weight or not anchors:
+        return []
+    excluded = anchors | set(exclude)
+
+    merged = {}
+    rows = ProductCooccurrence.objects.filter(store=store).filter(
+        Q(product_a_id__in=anchors) | Q(product_b_id__in=anchors),
+    )
+    for a, b, weight, orders in rows.values_list("product_a_id", "product_b_id", "weight", "order_count"):
+        for anchor, other in ((a, b), (b, a)):
+            if anchor in anchors and other not in excluded:
+                merged.setdefault(other, []).append((anchor, weight, orders))
+    if not merged:
+        return []
+
+    occurrences = dict(
+        ProductOccurrence.objects.filter(store=store, product_id__in=anchors | set(merged)).values_list(
+            "product_id", "weight",
+        )
+    )
+    scale = _scale(store, index, as_of)
+    results = []
+    for other, links in merged.items():
+        weight = sum(w for _, w, _ in links)
+        lift = max(
+            (
+                w * index.order_weight / (occurrences[anchor] * occurrences[other])
+                for anchor, w, _ in links
+                if occurrences.get(anchor) and occurrences.get(other)
+            ),
+            default=0.0,
+        )
+        count = weight / scale
+        results.append(
+            {
+                "product_id": other,
+                "orders": sum(n for _, _, n in links),
+                "count": round(count, 4),
+                "lift": round(lift, 4),
+                "score": round(count * lift, 4),
+            }
+        )
+    results.sort(key=lambda row: (row["score"], row["orders"]), reverse=True)
+    return results[:limit]
+
+
+def popular_products(
+    store,
+    *,
+    category_ids=None,
+    as_of: date | None = None,
+    exclude=(),
+    limit: int = 20,
+) -> list[dict]:
+    """Most bought products of *store* (optionally within *category_ids*).
+
+    Rows have ``product_id``, ``category_name``, ``orders`` and ``count``
+    (decayed orders at *as_of*).
+    """
+    index = CooccurrenceIndex.objects.filter(store=store).first()
+    if index is None:
+        return []
+    rows = ProductOccurrence.objects.filter(store=store)
+    if category_ids is not None:
+        rows = rows.filter(product__category_id__in=category_ids)
+    if exclude:
+        rows = rows.exclude(product_id__in=list(exclude))
+    scale = _scale(store, index, as_of)
+    return [
+        {
+            "product_id": product_id,
+            "category_name": category_name,
+            "orders": orders,
+            "count": round(weight / scale, 4),
+        }
+        for product_id, category_name, weight, orders in rows.order_by("-weight").values_list(
+            "product_id", "product__category__name", "weight", "order_count",
+        )[:limit]
+    ]
@@ -27,6 +27,7 @@ from django.db.models import (
 from django.db.models.functions import Coalesce, TruncWeek
 from django.utils import timezone
 
+from analytics.cooccurrence import popular_products, related_products, update_cooccurrence_index
 from analytics.models import (
     CustomerAnalyticsRuleSet,
     CustomerIntelligenceAlert,
@@ -196,11 +197,15 @@ def _credit_discipline_for_customer(store, customer_id, end_date: date) -> dict:
             ),
         )
     )
-    total_due = _d(sched["total_due"])
-    total_paid = _d(sched["total_paid"])
+    return _credit_discipline_from_totals(**sched)
+
+
+def _credit_discipline_from_totals(*, total_due, total_paid, overdue_amount, overdue_count) -> dict:
+    total_due = _d(total_due)
+    total_paid = _d(total_paid)
     recovery_ratio = (total_paid / total_due) if total_due > 0 else Decimal("1.0")
-    overdue_amount = _d(sched["overdue_amount"])
-    overdue_count = int(sched["overdue_count"] or 0)
+    overdue_amount = _d(overdue_amount)
+    overdue_count = int(overdue_count or 0)
     return {
         "total_due": total_due,
         "total_paid": total_paid,
@@ -503,69 +508,35 @@ def refresh_top_clients_month(
     return payload
 
 
-def compute_customer_score(*, store, customer, as_of: date | None = None, actor=None) -> dict:
-    """Compute and persist customer score snapshot (rolling 90d)."""
-    as_of_date = as_of or timezone.localdate()
-    ruleset = get_or_create_active_ruleset(store, actor=actor, as_of=as_of_date)
-    thresholds = _thresholds(ruleset)
-    weights = _weights(ruleset)["score"]
-
-    window_start = as_of_date - timedelta(days=89)
-
-    pay_agg = (
-        Payment.objects
-        .filter(
-            store=store,
-            sale__customer=customer,
-            created_at__date__gte=window_start,
-            created_at__date__lte=as_of_date,
-        )
-        .aggregate(
-            paid_amount=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
-            paid_orders=Count("sale_id", distinct=True),
-            last_payment_at=Max("created_at"),
-        )
-    )
-    refund_amount = (
-        Refund.objects
-        .filter(
-            store=store,
-            sale__customer=customer,
-            created_at__date__gte=window_start,
-            created_at__date__lte=as_of_date,
-        )
-        .aggregate(v=Coalesce(Sum("amount"), Value(Decimal("0.00"))))
-        .get("v")
-        or Decimal("0.00")
-    )
-    sale_agg = (
-        Sale.objects
-        .filter(
-            store=store,
-            customer=customer,
-            status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID, Sale.Status.REFUNDED],
-            created_at__date__gte=window_start,
-            created_at__date__lte=as_of_date,
-        )
-        .aggregate(
-            gross_sales=Coalesce(Sum("total"), Value(Decimal("0.00"))),
-            discount_amount=Coalesce(Sum("discount_amount"), Value(Decimal("0.00"))),
-        )
-    )
+def _score_from_metrics(
+    *,
+    as_of_date: date,
+    thresholds: dict,
+    weights: dict,
+    paid_amount,
+    paid_orders,
+    last_payment_at,
+    refund_amount,
+    gross_sales,
+    discount_amount,
+    credit: dict,
+) -> dict:
+    """Score, segment, tags and explanation from rolling-90d aggregates.
 
-    monetary = _d(pay_agg["paid_amount"]) - _d(refund_amount)
-    paid_orders = int(pay_agg["paid_orders"] or 0)
-    last_payment_at = pay_agg["last_payment_at"]
+    Pure function shared by :func:`compute_customer_score` and the store-wide
+    batch engine (``analytics.customer_intelligence_batch``).
+    """
+    monetary = _d(paid_amount) - _d(refund_amount)
+    paid_orders = int(paid_orders or 0)
     if last_payment_at:
         recency_days = max(0, (as_of_date - last_payment_at.date()).days)
     else:
         recency_days = thresholds["recency_max_days"] * 2
 
-    gross_sales = _d(sale_agg["gross_sales"])
-    discount_amount = _d(sale_agg["discount_amount"])
+    gross_sales = _d(gross_sales)
+    discount_amount = _d(discount_amount)
     discount_ratio = (discount_amount / gross_sales) if gross_sales > 0 else Decimal("0")
 
-    credit = _credit_discipline_for_customer(store, customer.id, as_of_date)
     overdue_ratio = Decimal("0")
     if credit["total_due"] > 0:
         overdue_ratio = credit["overdue_amount"] / credit["total_due"]
@@ -636,6 +607,101 @@ def compute_customer_score(*, store, customer, as_of: date | None = None, actor=
         "credit_recovery_ratio": str(credit["recovery_ratio"].quantize(Decimal("0.0001"))),
     }
 
+    tags = []
+    if discount_ratio >= Decimal("0.20"):
+        tags.append("CHASSEUR_PROMO")
+    if sub_scores["credit"] < 45:
+        tags.append("CREDIT_RISQUE")
+    if sub_scores["monetary"] >= 70 and sub_scores["discount_behavior"] < 55:
+        tags.append("GROS_VOLUME_FAIBLE_MARGE")
+
+    strategy = []
+    if segment == CustomerScoreSnapshot.Segment.VIP:
+        strategy.append("Prioriser suivi proactif et offre premium.")
+    if segment == CustomerScoreSnapshot.Segment.DORMANT:
+        strategy.append("Relance immediate avec proposition ciblee.")
+    if "CREDIT_RISQUE" in tags:
+        strategy.append("Demander acompte avant nouvelle vente a credit.")
+
+    return {
+        "score_total": score_total,
+        "subscores": sub_scores,
+        "segment": segment,
+        "features": features,
+        "explain": explain,
+        "tags": tags,
+        "strategy": strategy,
+    }
+
+
+def compute_customer_score(*, store, customer, as_of: date | None = None, actor=None) -> dict:
+    """Compute and persist customer score snapshot (rolling 90d)."""
+    as_of_date = as_of or timezone.localdate()
+    ruleset = get_or_create_active_ruleset(store, actor=actor, as_of=as_of_date)
+    thresholds = _thresholds(ruleset)
+    weights = _weights(ruleset)["score"]
+
+    window_start = as_of_date - timedelta(days=89)
+
+    pay_agg = (
+        Payment.objects
+        .filter(
+            store=store,
+            sale__customer=customer,
+            created_at__date__gte=window_start,
+            created_at__date__lte=as_of_date,
+        )
+        .aggregate(
+            paid_amount=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
+            paid_orders=Count("sale_id", distinct=True),
+            last_payment_at=Max("created_at"),
+        )
+    )
+    refund_amount = (
+        Refund.objects
+        .filter(
+            store=store,
+            sale__customer=customer,
+            created_at__date__gte=window_start,
+            created_at__date__lte=as_of_date,
+        )
+        .aggregate(v=Coalesce(Sum("amount"), Value(Decimal("0.00"))))
+        .get("v")
+        or Decimal("0.00")
+    )
+    sale_agg = (
+        Sale.objects
+        .filter(
+            store=store,
+            customer=customer,
+            status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID, Sale.Status.REFUNDED],
+            created_at__date__gte=window_start,
+            created_at__date__lte=as_of_date,
+        )
+        .aggregate(
+            gross_sales=Coalesce(Sum("total"), Value(Decimal("0.00"))),
+            discount_amount=Coalesce(Sum("discount_amount"), Value(Decimal("0.00"))),
+        )
+    )
+
+    credit = _credit_discipline_for_customer(store, customer.id, as_of_date)
+    scored = _score_from_metrics(
+        as_of_date=as_of_date,
+        thresholds=thresholds,
+        weights=weights,
+        paid_amount=pay_agg["paid_amount"],
+        paid_orders=pay_agg["paid_orders"],
+        last_payment_at=pay_agg["last_payment_at"],
+        refund_amount=refund_amount,
+        gross_sales=sale_agg["gross_sales"],
+        discount_amount=sale_agg["discount_amount"],
+        credit=credit,
+    )
+    sub_scores = scored["subscores"]
+    segment = scored["segment"]
+    features = scored["features"]
+    explain = scored["explain"]
+
     snapshot, _ = CustomerScoreSnapshot.objects.update_or_create(
         store=store,
         customer=customer,
@@ -643,7 +709,7 @@ def compute_customer_score(*, store, customer, as_of: date | None = None, actor=
         period_type=CustomerScoreSnapshot.PeriodType.ROLLING_90D,
         ruleset=ruleset,
         defaults={
-            "score_total": score_total,
+            "score_total": scored["score_total"],
             "recency_score": sub_scores["recency"],
             "frequency_score": sub_scores["frequency"],
             "monetary_score": sub_scores["monetary"],
@@ -655,22 +721,6 @@ def compute_customer_score(*, store, customer, as_of: date | None = None, actor=
         },
     )
 
-    tags = []
-    if discount_ratio >= Decimal("0.20"):
-        tags.append("CHASSEUR_PROMO")
-    if sub_scores["credit"] < 45:
-        tags.append("CREDIT_RISQUE")
-    if sub_scores["monetary"] >= 70 and sub_scores["discount_behavior"] < 55:
-        tags.append("GROS_VOLUME_FAIBLE_MARGE")
-
-    strategy = []
-    if segment == CustomerScoreSnapshot.Segment.VIP:
-        strategy.append("Prioriser suivi proactif et offre premium.")
-    if segment == CustomerScoreSnapshot.Segment.DORMANT:
-        strategy.append("Relance immediate avec proposition ciblee.")
-    if "CREDIT_RISQUE" in tags:
-        strategy.append("Demander acompte avant nouvelle vente a credit.")
-
     CustomerSegmentSnapshot.objects.update_or_create(
         store=store,
         customer=customer,
@@ -678,8 +728,8 @@ def compute_customer_score(*, store, customer, as_of: date | None = None, actor=
         ruleset=ruleset,
         defaults={
             "segment": segment,
-            "tags": tags,
-            "strategy": strategy,
+            "tags": scored["tags"],
+            "strategy": scored["strategy"],
         },
     )
 
@@ -697,6 +747,26 @@ def compute_customer_score(*, store, customer, as_of: date | None = None, actor=
     }
 
 
+def _dormant_alert(customer, days_without: int, dormant_days: int, cutoff: date) -> tuple[str, dict]:
+    """Severity and context of the DORMANT alert of *customer*."""
+    whatsapp_preview = (
+        f"Bonjour {customer.full_name}, nous n'avons pas eu de commande recente "
+        f"depuis {days_without} jours. Nous avons des offres adaptees a vos besoins. "
+        "Puis-je vous appeler aujourd'hui ?"
+    )
+    severity = (
+        CustomerIntelligenceAlert.Severity.HIGH
+        if days_without >= dormant_days * 2
+        else CustomerIntelligenceAlert.Severity.MEDIUM
+    )
+    return severity, {
+        "days_without_payment": days_without,
+        "cutoff": str(cutoff),
+        "suggested_channel": "WHATSAPP",
+        "message_preview": whatsapp_preview,
+    }
+
+
 def list_dormant_customers(
     *,
     store,
@@ -741,27 +811,15 @@ def list_dormant_customers(
         score_payload = compute_customer_score(store=store, customer=customer, as_of=as_of_date, actor=actor)
         priority_score = score_payload["score_total"] + min(20, int(days_without / 3))
         reason = f"Aucun paiement valide depuis {days_without} jours."
-        whatsapp_preview = (
-            f"Bonjour {customer.full_name}, nous n'avons pas eu de commande recente "
-            f"depuis {days_without} jours. Nous avons des offres adaptees a vos besoins. "
-            "Puis-je vous appeler aujourd'hui ?"
-        )
+        severity, context = _dormant_alert(customer, days_without, dormant_days, cutoff)
+        whatsapp_preview = context["message_preview"]
 
         _upsert_open_alert(
             store=store,
             customer=customer,
             alert_type=CustomerIntelligenceAlert.AlertType.DORMANT,
-            severity=(
-                CustomerIntelligenceAlert.Severity.HIGH
-                if days_without >= dormant_days * 2
-                else CustomerIntelligenceAlert.Severity.MEDIUM
-            ),
-            context={
-                "days_without_payment": days_without,
-                "cutoff": str(cutoff),
-                "suggested_channel": "WHATSAPP",
-                "message_preview": whatsapp_preview,
-            },
+            severity=severity,
+            context=context,
         )
 
         result.append(
@@ -819,6 +877,93 @@ def _credit_recommendation_from_risk(*, risk_score: int, account: CustomerAccoun
     }
 
 
+def _credit_risk_from_metrics(
+    *,
+    account: CustomerAccount,
+    as_of_date: date,
+    total_due,
+    total_paid,
+    total_count,
+    overdue_count,
+    overdue_amount,
+    oldest_due: date | None,
+    balance_30d,
+) -> dict:
+    """Risk score, level, explanation and recommendation for one account.
+
+    *balance_30d* is the ledger balance 30 days before *as_of_date*
+    (``None`` when the account has no entry that old).
+    """
+    overdue_age_days = (as_of_date - oldest_due).days if oldest_due else 0
+
+    total_due = _d(total_due)
+    total_paid = _d(total_paid)
+    total_count = int(total_count or 0)
+    overdue_count = int(overdue_count or 0)
+    overdue_amount = _d(overdue_amount)
+    recovery_ratio = (total_paid / total_due) if total_due > 0 else Decimal("1")
+    overdue_ratio = (Decimal(str(overdue_count)) / Decimal(str(total_count))) if total_count > 0 else Decimal("0")
+
+    balance_now = _d(account.balance)
+    balance_30d = _d(balance_30d, default=str(balance_now))
+    debt_growth = balance_now - balance_30d
+    debt_growth_ratio = (debt_growth / max(balance_30d, Decimal("1"))) if debt_growth > 0 else Decimal("0")
+
+    overdue_amount_target = max(_d(account.credit_limit), Decimal("500000"))
+    overdue_amount_norm = _clamp(overdue_amount / overdue_amount_target, Decimal("0"), Decimal("1"))
+    overdue_age_norm = _clamp(Decimal(str(overdue_age_days)) / Decimal("120"), Decimal("0"), Decimal("1"))
+    overdue_ratio_norm = _clamp(overdue_ratio, Decimal("0"), Decimal("1"))
+    recovery_penalty_norm = _clamp(Decimal("1") - recovery_ratio, Decimal("0"), Decimal("1"))
+    growth_norm = _clamp(debt_growth_ratio, Decimal("0"), Decimal("1"))
+
+    points = {
+        "overdue_amount": overdue_amount_norm * Decimal("35"),
+        "overdue_age": overdue_age_norm * Decimal("25"),
+        "overdue_ratio": overdue_ratio_norm * Decimal("20"),
+        "recovery_gap": recovery_penalty_norm * Decimal("15"),
+        "debt_growth": growth_norm * Decimal("5"),
+    }
+    risk_decimal = sum(points.values(), Decimal("0"))
+    risk_score = int(_clamp(risk_decimal, Decimal("0"), Decimal("100")).quantize(Decimal("1")))
+
+    if risk_score >= 80:
+        risk_level = "CRITICAL"
+        severity = CustomerIntelligenceAlert.Severity.CRITICAL
+    elif risk_score >= 65:
+        risk_level = "HIGH"
+        severity = CustomerIntelligenceAlert.Severity.HIGH
+    elif risk_score >= 45:
+        risk_level = "MEDIUM"
+        severity = CustomerIntelligenceAlert.Severity.MEDIUM
+    else:
+        risk_level = "LOW"
+        severity = CustomerIntelligenceAlert.Severity.LOW
+
+    explain = []
+    for key, value in sorted(points.items(), key=lambda x: x[1], reverse=True)[:3]:
+        explain.append({"feature": key, "impact_points": str(value.quantize(Decimal("0.1")))})
+
+    recommendation = _credit_recommendation_from_risk(risk_score=risk_score, account=account)
+    features = {
+        "overdue_amount": str(overdue_amount.quantize(Decimal("0.01"))),
+        "overdue_count": overdue_count,
+        "overdue_age_days": overdue_age_days,
+        "recovery_ratio": str(recovery_ratio.quantize(Decimal("0.0001"))),
+        "debt_growth_ratio_30d": str(debt_growth_ratio.quantize(Decimal("0.0001"))),
+        "balance": str(balance_now.quantize(Decimal("0.01"))),
+        "credit_limit": str(_d(account.credit_limit).quantize(Decimal("0.01"))),
+    }
+
+    return {
+        "risk_score": risk_score,
+        "risk_level": risk_level,
+        "severity": severity,
+        "features": features,
+        "explain": explain,
+        "recommendation": recommendation,
+    }
+
+
 def compute_credit_risk_for_customer(*, store, customer, as_of: date | None = None, actor=None) -> dict:
     """Compute explainable credit risk score (0..100, higher is riskier)."""
     as_of_date = as_of or timezone.localdate()
@@ -888,17 +1033,6 @@ def compute_credit_risk_for_customer(*, store, customer, as_of: date | None = No
         .values_list("due_date", flat=True)
         .first()
     )
-    overdue_age_days = (as_of_date - oldest_due).days if oldest_due else 0
-
-    total_due = _d(sched_agg["total_due"])
-    total_paid = _d(sched_agg["total_paid"])
-    total_count = int(sched_agg["total_count"] or 0)
-    overdue_count = int(sched_agg["overdue_count"] or 0)
-    overdue_amount = _d(sched_agg["overdue_amount"])
-    recovery_ratio = (total_paid / total_due) if total_due > 0 else Decimal("1")
-    overdue_ratio = (Decimal(str(overdue_count)) / Decimal(str(total_count))) if total_count > 0 else Decimal("0")
-
-    balance_now = _d(account.balance)
     balance_30d = (
         account.ledger_entries
         .filter(created_at__date__lte=as_of_date - timedelta(days=30))
@@ -906,54 +1040,19 @@ def compute_credit_risk_for_customer(*, store, customer, as_of: date | None = No
         .values_list("balance_after", flat=True)
         .first()
     )
-    balance_30d = _d(balance_30d, default=str(balance_now))
-    debt_growth = balance_now - balance_30d
-    debt_growth_ratio = (debt_growth / max(balance_30d, Decimal("1"))) if debt_growth > 0 else Decimal("0")
-
-    overdue_amount_target = max(_d(account.credit_limit), Decimal("500000"))
-    overdue_amount_norm = _clamp(overdue_amount / overdue_amount_target, Decimal("0"), Decimal("1"))
-    overdue_age_norm = _clamp(Decimal(str(overdue_age_days)) / Decimal("120"), Decimal("0"), Decimal("1"))
-    overdue_ratio_norm = _clamp(overdue_ratio, Decimal("0"), Decimal("1"))
-    recovery_penalty_norm = _clamp(Decimal("1") - recovery_ratio, Decimal("0"), Decimal("1"))
-    growth_norm = _clamp(debt_growth_ratio, Decimal("0"), Decimal("1"))
-
-    points = {
-        "overdue_amount": overdue_amount_norm * Decimal("35"),
-        "overdue_age": overdue_age_norm * Decimal("25"),
-        "overdue_ratio": overdue_ratio_norm * Decimal("20"),
-        "recovery_gap": recovery_penalty_norm * Decimal("15"),
-        "debt_growth": growth_norm * Decimal("5"),
-    }
-    risk_decimal = sum(points.values(), Decimal("0"))
-    risk_score = int(_clamp(risk_decimal, Decimal("0"), Decimal("100")).quantize(Decimal("1")))
-
-    if risk_score >= 80:
-        risk_level = "CRITICAL"
-        severity = CustomerIntelligenceAlert.Severity.CRITICAL
-    elif risk_score >= 65:
-        risk_level = "HIGH"
-        severity = CustomerIntelligenceAlert.Severity.HIGH
-    elif risk_score >= 45:
-        risk_level = "MEDIUM"
-        severity = CustomerIntelligenceAlert.Severity.MEDIUM
-    else:
-        risk_level = "LOW"
-        severity = CustomerIntelligenceAlert.Severity.LOW
-
-    explain = []
-    for key, value in sorted(points.items(), key=lambda x: x[1], reverse=True)[:3]:
-        explain.append({"feature": key, "impact_points": str(value.quantize(Decimal("0.1")))})
-
-    recommendation = _credit_recommendation_from_risk(risk_score=risk_score, account=account)
-    features = {
-        "overdue_amount": str(overdue_amount.quantize(Decimal("0.01"))),
-        "overdue_count": overdue_count,
-        "overdue_age_days": overdue_age_days,
-        "recovery_ratio": str(recovery_ratio.quantize(Decimal("0.0001"))),
-        "debt_growth_ratio_30d": str(debt_growth_ratio.quantize(Decimal("0.0001"))),
-        "balance": str(balance_now.quantize(Decimal("0.01"))),
-        "credit_limit": str(_d(account.credit_limit).quantize(Decimal("0.01"))),
-    }
+    risk = _credit_risk_from_metrics(
+        account=account,
+        as_of_date=as_of_date,
+        oldest_due=oldest_due,
+        balance_30d=balance_30d,
+        **sched_agg,
+    )
+    risk_score = risk["risk_score"]
+    risk_level = risk["risk_level"]
+    severity = risk["severity"]
+    features = risk["features"]
+    explain = risk["explain"]
+    recommendation = risk["recommendation"]
 
     if risk_score >= 45:
         _upsert_open_alert(
@@ -1044,7 +1143,12 @@ def get_customer_product_recommendations(
     force_refresh: bool = False,
     actor=None,
 ) -> dict:
-    """Heuristic recommendations: co-occurrence + next best category + refill."""
+    """Heuristic recommendations: co-occurrence + next best category + refill.
+
+    Co-occurrence and category candidates are read from the store's
+    co-occurrence index (``analytics.cooccurrence``); *window_days* only
+    selects the customer's recent products used as anchors.
+    """
     as_of_date = as_of or timezone.localdate()
     window_days = max(7, min(int(window_days), 365))
     limit = max(1, min(int(limit), 20))
@@ -1122,44 +1226,25 @@ def get_customer_product_recommendations(
         if reason not in entry["reasons"]:
             entry["reasons"].append(reason)
 
-    if recent_anchor_ids:
-        anchor_sale_ids = list(
-            SaleItem.objects.filter(
-                sale__store=store,
-                sale__status__in=paid_statuses,
-                sale__created_at__date__gte=analysis_start,
-                sale__created_at__date__lte=as_of_date,
-                product_id__in=recent_anchor_ids,
-            )
-            .values_list("sale_id", flat=True)
-            .distinct()
-        )
-        co_rows = (
-            SaleItem.objects.filter(
-                sale_id__in=anchor_sale_ids,
-                sale__store=store,
-                sale__status__in=paid_statuses,
-            )
-            .exclude(product_id__in=purchased_product_ids)
-            .values("product_id")
-            .annotate(
-                co_orders=Count("sale_id", distinct=True),
-                qty=Coalesce(Sum("quantity"), Value(0)),
-            )
-            .order_by("-co_orders", "-qty")
+    # Store-wide co-purchases come from the precomputed co-occurrence index;
+    # a forced refresh first folds in the sales paid since its last update.
+    if force_refresh:
+        update_cooccurrence_index(store)
+    lookup_limit = limit * 4
+
+    for row in related_products(
+        store,
+        recent_anchor_ids,
+        as_of=as_of_date,
+        exclude=purchased_product_ids,
+        limit=lookup_limit,
+    ):
+        _add_candidate(
+            row["product_id"],
+            score=Decimal(str(round(row["score"] * 20, 2))),
+            source="FREQUENTLY_BOUGHT_TOGETHER",
+            reason=f"Souvent achete avec vos produits recents ({row['orders']} commandes).",
         )
-        for row in co_rows:
-            co_orders = int(row["co_orders"] or 0)
-            qty = int(row["qty"] or 0)
-            if co_orders <= 0:
-                continue
-            score = Decimal(str(co_orders * 20 + qty * 2))
-            _add_candidate(
-                row["product_id"],
-                score=score,
-                source="FREQUENTLY_BOUGHT_TOGETHER",
-                reason=f"Souvent achete avec vos produits recents ({co_orders} commandes).",
-            )
 
     top_category_ids = list(
         SaleItem.objects.filter(
@@ -1172,30 +1257,18 @@ def get_customer_product_recommendations(
         .values_list("product__category_id", flat=True)[:3]
     )
     if top_category_ids:
-        category_rows = (
-            SaleItem.objects.filter(
-                sale__store=store,
-                sale__status__in=paid_statuses,
-                sale__created_at__date__gte=analysis_start,
-                sale__created_at__date__lte=as_of_date,
-                product__category_id__in=top_category_ids,
-            )
-            .exclude(product_id__in=purchased_product_ids)
-            .values("product_id", "product__category__name")
-            .annotate(orders=Count("sale_id", distinct=True), qty=Coalesce(Sum("quantity"), Value(0)))
-            .order_by("-orders", "-qty")
-        )
-        for row in category_rows:
-            orders = int(row["orders"] or 0)
-            qty = int(row["qty"] or 0)
-            if orders <= 0:
-                continue
-            score = Decimal(str(orders * 12 + qty))
+        for row in popular_products(
+            store,
+            category_ids=top_category_ids,
+            as_of=as_of_date,
+            exclude=purchased_product_ids,
+            limit=lookup_limit,
+        ):
             _add_candidate(
                 row["product_id"],
-                score=score,
+                score=Decimal(str(round(row["count"] * 12, 2))),
                 source="NEXT_BEST_CATEGORY",
-                reason=f"Categorie porteuse pour ce client: {row['product__category__name'] or 'N/A'}.",
+                reason=f"Categorie porteuse pour ce client: {row['category_name'] or 'N/A'}.",
             )
 
     history_rows = list(
@@ -1282,8 +1355,8 @@ def get_customer_product_recommendations(
         "include_only_in_stock": include_only_in_stock,
         "items": items,
         "explain": [
-            "Source FBT: co-occurrence des produits sur ventes payees.",
-            "Source categorie: extrapolation sur categories frequentes du client.",
+            "Source FBT: index de co-occurrence des ventes payees (lift, decroissance temporelle).",
+            "Source categorie: produits les plus vendus des categories frequentes du client.",
             "Source refill: cycle de rachat estime depuis l'historique.",
         ],
     }
@@ -1300,26 +1373,16 @@ def get_customer_product_recommendations(
     return response_payload
 
 
-def predict_next_order_for_customer(*, store, customer, as_of: date | None = None, actor=None) -> dict:
-    """Heuristic next-order prediction based on historical purchase intervals."""
-    as_of_date = as_of or timezone.localdate()
-    paid_rows = list(
-        Payment.objects.filter(
-            store=store,
-            sale__customer=customer,
-            created_at__date__lte=as_of_date,
-        )
-        .values("sale_id")
-        .annotate(paid_at=Max("created_at"))
-        .order_by("paid_at")
-    )
-    purchase_dates = [row["paid_at"].date() for row in paid_rows if row.get("paid_at")]
+def _next_order_from_dates(purchase_dates: list[date], as_of_date: date) -> dict:
+    """Predict the next purchase date from sorted past purchase dates.
 
+    ``alert`` tells whether a NEXT_ORDER alert with ``severity`` and
+    ``context`` should be open.
+    """
     predicted_date = None
     probability = "LOW"
     avg_interval_days = None
     interval_std = None
-    intervals = []
     if len(purchase_dates) == 1:
         predicted_date = purchase_dates[-1] + timedelta(days=30)
     elif len(purchase_dates) >= 2:
@@ -1343,23 +1406,61 @@ def predict_next_order_for_customer(*, store, customer, as_of: date | None = Non
     if predicted_date:
         days_until = (predicted_date - as_of_date).days
 
-    if predicted_date and days_until is not None and -2 <= days_until <= 7 and probability in {"HIGH", "MEDIUM"}:
+    return {
+        "predicted_date": predicted_date,
+        "days_until": days_until,
+        "probability": probability,
+        "avg_interval_days": avg_interval_days,
+        "interval_std": interval_std,
+        "alert": bool(
+            predicted_date
+            and days_until is not None
+            and -2 <= days_until <= 7
+            and probability in {"HIGH", "MEDIUM"}
+        ),
+        "severity": (
+            CustomerIntelligenceAlert.Severity.HIGH
+            if probability == "HIGH"
+            else CustomerIntelligenceAlert.Severity.MEDIUM
+        ),
+        "context": {
+            "predicted_next_purchase_date": str(predicted_date),
+            "days_until_prediction": days_until,
+            "probability": probability,
+            "avg_interval_days": round(avg_interval_days or 0.0, 2),
+            "purchase_count": len(purchase_dates),
+        },
+    }
+
+
+def predict_next_order_for_customer(*, store, customer, as_of: date | None = None, actor=None) -> dict:
+    """Heuristic next-order prediction based on historical purchase intervals."""
+    as_of_date = as_of or timezone.localdate()
+    paid_rows = list(
+        Payment.objects.filter(
+            store=store,
+            sale__customer=customer,
+            created_at__date__lte=as_of_date,
+        )
+        .values("sale_id")
+        .annotate(paid_at=Max("created_at"))
+        .order_by("paid_at")
+    )
+    purchase_dates = [row["paid_at"].date() for row in paid_rows if row.get("paid_at")]
+    prediction = _next_order_from_dates(purchase_dates, as_of_date)
+    predicted_date = prediction["predicted_date"]
+    days_until = prediction["days_until"]
+    probability = prediction["probability"]
+    avg_interval_days = prediction["avg_interval_days"]
+    interval_std = prediction["interval_std"]
+
+    if prediction["alert"]:
         _upsert_open_alert(
             store=store,
             customer=customer,
             alert_type=CustomerIntelligenceAlert.AlertType.NEXT_ORDER,
-            severity=(
-                CustomerIntelligenceAlert.Severity.HIGH
-                if probability == "HIGH"
-                else CustomerIntelligenceAlert.Severity.MEDIUM
-            ),
-            context={
-                "predicted_next_purchase_date": str(predicted_date),
-                "days_until_prediction": days_until,
-                "probability": probability,
-                "avg_interval_days": round(avg_interval_days or 0.0, 2),
-                "purchase_count": len(purchase_dates),
-            },
+            severity=prediction["severity"],
+            context=prediction["context"],
         )
     else:
         _close_open_alert(
@@ -1390,6 +1491,80 @@ def predict_next_order_for_customer(*, store, customer, as_of: date | None = Non
     }
 
 
+def _churn_windows(as_of_date: date, window_days: int) -> tuple[date, date, date]:
+    """Return ``(prev_start, prev_end, curr_start)``; the current window ends on *as_of_date*."""
+    curr_start = as_of_date - timedelta(days=window_days - 1)
+    prev_end = curr_start - timedelta(days=1)
+    prev_start = prev_end - timedelta(days=window_days - 1)
+    return prev_start, prev_end, curr_start
+
+
+def _churn_from_windows(
+    *,
+    as_of_date: date,
+    window_days: int,
+    curr_amount: Decimal,
+    prev_amount: Decimal,
+    curr_orders: int,
+    prev_orders: int,
+    drop_threshold_pct: Decimal,
+) -> dict | None:
+    """Churn severity and alert context, ``None`` below the threshold.
+
+    The context lacks the customer and store keys, added by the caller.
+    """
+    if prev_amount <= 0 and prev_orders <= 0:
+        return None
+
+    revenue_drop_pct = Decimal("0")
+    if prev_amount > 0:
+        revenue_drop_pct = _clamp(((prev_amount - curr_amount) / prev_amount) * Decimal("100"), Decimal("0"), Decimal("100"))
+
+    frequency_drop_pct = Decimal("0")
+    if prev_orders > 0:
+        frequency_drop_pct = _clamp(
+            (Decimal(str(prev_orders - curr_orders)) / Decimal(str(prev_orders))) * Decimal("100"),
+            Decimal("0"),
+            Decimal("100"),
+        )
+
+    if revenue_drop_pct < drop_threshold_pct and frequency_drop_pct < drop_threshold_pct:
+        return None
+
+    risk_decimal = (revenue_drop_pct * Decimal("0.70")) + (frequency_drop_pct * Decimal("0.30"))
+    risk_score = int(_clamp(risk_decimal, Decimal("0"), Decimal("100")).quantize(Decimal("1")))
+    if risk_score >= 75:
+        severity = CustomerIntelligenceAlert.Severity.HIGH
+    elif risk_score >= 55:
+        severity = CustomerIntelligenceAlert.Severity.MEDIUM
+    else:
+        severity = CustomerIntelligenceAlert.Severity.LOW
+
+    actions = ["Relance proactive avec argumentaire personnalise."]
+    if revenue_drop_pct >= Decimal("40"):
+        actions.append("Proposer une offre ciblee pour relancer le panier.")
+    if frequency_drop_pct >= Decimal("40"):
+        actions.append("Planifier un appel de suivi hebdomadaire.")
+
+    prev_start, prev_end, curr_start = _churn_windows(as_of_date, window_days)
+    return {
+        "severity": severity,
+        "context": {
+            "window_days": window_days,
+            "current_period": {"start": str(curr_start), "end": str(as_of_date)},
+            "previous_period": {"start": str(prev_start), "end": str(prev_end)},
+            "current_paid_amount": str(curr_amount.quantize(Decimal("0.01"))),
+            "previous_paid_amount": str(prev_amount.quantize(Decimal("0.01"))),
+            "current_orders": curr_orders,
+            "previous_orders": prev_orders,
+            "revenue_drop_pct": str(revenue_drop_pct.quantize(Decimal("0.01"))),
+            "frequency_drop_pct": str(frequency_drop_pct.quantize(Decimal("0.01"))),
+            "churn_risk_score": risk_score,
+            "actions": actions,
+        },
+    }
+
+
 def _churn_payload_for_customer(
     *,
     store,
@@ -1398,9 +1573,7 @@ def _churn_payload_for_customer(
     window_days: int,
     drop_threshold_pct: Decimal,
 ) -> dict | None:
-    curr_start = as_of_date - timedelta(days=window_days - 1)
-    prev_end = curr_start - timedelta(days=1)
-    prev_start = prev_end - timedelta(days=window_days - 1)
+    prev_start, prev_end, curr_start = _churn_windows(as_of_date, window_days)
 
     curr = (
         Payment.objects.filter(
@@ -1431,27 +1604,16 @@ def _churn_payload_for_customer(
     curr_orders = int(curr["orders"] or 0)
     prev_orders = int(prev["orders"] or 0)
 
-    if prev_amount <= 0 and prev_orders <= 0:
-        _close_open_alert(
-            store=store,
-            customer=customer,
-            alert_type=CustomerIntelligenceAlert.AlertType.CHURN,
-        )
-        return None
-
-    revenue_drop_pct = Decimal("0")
-    if prev_amount > 0:
-        revenue_drop_pct = _clamp(((prev_amount - curr_amount) / prev_amount) * Decimal("100"), Decimal("0"), Decimal("100"))
-
-    frequency_drop_pct = Decimal("0")
-    if prev_orders > 0:
-        frequency_drop_pct = _clamp(
-            (Decimal(str(prev_orders - curr_orders)) / Decimal(str(prev_orders))) * Decimal("100"),
-            Decimal("0"),
-            Decimal("100"),
-        )
-
-    if revenue_drop_pct < drop_threshold_pct and frequency_drop_pct < drop_threshold_pct:
+    churn = _churn_from_windows(
+        as_of_date=as_of_date,
+        window_days=window_days,
+        curr_amount=curr_amount,
+        prev_amount=prev_amount,
+        curr_orders=curr_orders,
+        prev_orders=prev_orders,
+        drop_threshold_pct=drop_threshold_pct,
+    )
+    if churn is None:
         _close_open_alert(
             store=store,
             customer=customer,
@@ -1459,44 +1621,19 @@ def _churn_payload_for_customer(
         )
         return None
 
-    risk_decimal = (revenue_drop_pct * Decimal("0.70")) + (frequency_drop_pct * Decimal("0.30"))
-    risk_score = int(_clamp(risk_decimal, Decimal("0"), Decimal("100")).quantize(Decimal("1")))
-    if risk_score >= 75:
-        severity = CustomerIntelligenceAlert.Severity.HIGH
-    elif risk_score >= 55:
-        severity = CustomerIntelligenceAlert.Severity.MEDIUM
-    else:
-        severity = CustomerIntelligenceAlert.Severity.LOW
-
-    actions = ["Relance proactive avec argumentaire personnalise."]
-    if revenue_drop_pct >= Decimal("40"):
-        actions.append("Proposer une offre ciblee pour relancer le panier.")
-    if frequency_drop_pct >= Decimal("40"):
-        actions.append("Planifier un appel de suivi hebdomadaire.")
-
     payload = {
         "customer_id": str(customer.id),
         "customer_name": customer.full_name,
         "customer_phone": customer.phone,
         "store_id": str(store.id),
-        "window_days": window_days,
-        "current_period": {"start": str(curr_start), "end": str(as_of_date)},
-        "previous_period": {"start": str(prev_start), "end": str(prev_end)},
-        "current_paid_amount": str(curr_amount.quantize(Decimal("0.01"))),
-        "previous_paid_amount": str(prev_amount.quantize(Decimal("0.01"))),
-        "current_orders": curr_orders,
-        "previous_orders": prev_orders,
-        "revenue_drop_pct": str(revenue_drop_pct.quantize(Decimal("0.01"))),
-        "frequency_drop_pct": str(frequency_drop_pct.quantize(Decimal("0.01"))),
-        "churn_risk_score": risk_score,
-        "actions": actions,
+        **churn["context"],
     }
 
     _upsert_open_alert(
         store=store,
         customer=customer,
         alert_type=CustomerIntelligenceAlert.AlertType.CHURN,
-        severity=severity,
+        severity=churn["severity"],
         context=payload,
     )
     return payload
@@ -0,0 +1,568 @@
+"""Store-wide customer intelligence from a handful of grouped queries.
+
+:func:`refresh_store_customer_intelligence` computes, for every customer of
+a store, what ``analytics.customer_intelligence`` computes one customer at a
+time: the rolling-90d score (RFM, credit discipline, discount behaviour) and
+segment, credit risk, next-order prediction, churn and dormancy.
+
+Each input is one query grouped by customer, loaded into dicts; the formulas
+are the same pure helpers as the per-customer path, so both agree.  Score,
+segment and daily metric snapshots are written with
+:func:`analytics.snapshots.write_snapshot`, alerts with a few bulk
+statements.  The per-customer functions remain the on-demand path (API
+views, post-payment signals).
+"""
+from __future__ import annotations
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from analytics.customer_intelligence import (
+    _churn_from_windows,
+    _churn_windows,
+    _credit_discipline_from_totals,
+    _credit_risk_from_metrics,
+    _d,
+    _dormant_alert,
+    _next_order_from_dates,
+    _score_from_metrics,
+    _strategic_field_exists,
+    _thresholds,
+    _weights,
+    get_or_create_active_ruleset,
+)
+from analytics.models import (
+    CustomerIntelligenceAlert,
+    CustomerMetricDaily,
+    CustomerScoreSnapshot,
+    CustomerSegmentSnapshot,
+)
+from analytics.snapshots import write_snapshot
+from cashier.models import Payment
+from core.dates import date_range_filter, day_start, store_timezone
+from credits.models import CreditLedgerEntry, CustomerAccount, PaymentSchedule
+from customers.models import Customer
+from sales.models import Refund, Sale, SaleItem
+
+logger = logging.getLogger("boutique")
+
+SCORE_WINDOW_DAYS = 90
+CHURN_WINDOW_DAYS = 30
+CHURN_DROP_THRESHOLD_PCT = Decimal("30")
+CREDIT_RISK_ALERT_SCORE = 45
+ZERO = Decimal("0.00")
+PAID_STATUSES = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID, Sale.Status.REFUNDED]
+
+SCORE_FIELDS = [
+    "score_total",
+    "recency_score",
+    "frequency_score",
+    "monetary_score",
+    "credit_score",
+    "discount_behavior_score",
+    "segment",
+    "features",
+    "explain",
+]
+METRIC_FIELDS = [
+    "paid_amount",
+    "paid_orders_count",
+    "refund_amount",
+    "discount_amount",
+    "credit_issued_amount",
+    "credit_collected_amount",
+    "credit_overdue_amount",
+    "strategic_amount",
+    "profit_estimated",
+    "last_payment_at",
+]
+
+
+@dataclass
+class StoreRefreshResult:
+    customers: int = 0
+    snapshot_rows_changed: int = 0
+    dormant: int = 0
+    credit_risk: int = 0
+    churn: int = 0
+    next_order: int = 0
+
+
+def _sum(field, *, filter=None):
+    return Coalesce(Sum(field, filter=filter), Value(ZERO))
+
+
+# ---------------------------------------------------------------------------
+# Grouped loaders: one query each, keyed by customer id
+# ---------------------------------------------------------------------------
+
+def _load_customers(store, as_of_date: date, lookback_days: int, tz) -> dict:
+    """Customers who bought within *lookback_days* or hold an active credit account."""
+    buyers = Sale.objects.filter(
+        store=store,
+        customer_id__isnull=False,
+        **date_range_filter("created_at", as_of_date - timedelta(days=lookback_days), as_of_date, tz=tz),
+    ).values("customer_id")
+    debtors = CustomerAccount.objects.filter(store=store, is_active=True).values("customer_id")
+    customers = Customer.objects.filter(is_default=False).filter(Q(pk__in=buyers) | Q(pk__in=debtors))
+    return {customer.pk: customer for customer in customers.only("pk", "first_name", "last_name", "phone")}
+
+
+def _load_payments(store, as_of_date: date, tz) -> dict:
+    """Rolling-90d, churn-window and as-of-day payment aggregates."""
+    score_start = as_of_date - timedelta(days=SCORE_WINDOW_DAYS - 1)
+    prev_start, prev_end, curr_start = _churn_windows(as_of_date, CHURN_WINDOW_DAYS)
+
+    def window(first, last):
+        return Q(**date_range_filter("created_at", first, last, tz=tz))
+
+    score_q, curr_q, prev_q = window(score_start, as_of_date), window(curr_start, as_of_date), window(prev_start, prev_end)
+    day_q = window(as_of_date, as_of_date)
+    rows = (
+        Payment.objects.filter(
+            store=store,
+            sale__customer_id__isnull=False,
+            **date_range_filter("created_at", min(score_start, prev_start), as_of_date, tz=tz),
+        )
+        .values("sale__customer_id")
+        .annotate(
+            paid_amount=_sum("amount", filter=score_q),
+            paid_orders=Count("sale_id", distinct=True, filter=score_q),
+            last_payment_at=Max("created_at", filter=score_q),
+            curr_amount=_sum("amount", filter=curr_q),
+            curr_orders=Count("sale_id", distinct=True, filter=curr_q),
+            prev_amount=_sum("amount", filter=prev_q),
+            prev_orders=Count("sale_id", distinct=True, filter=prev_q),
+            day_amount=_sum("amount", filter=day_q),
+            day_orders=Count("sale_id", distinct=True, filter=day_q),
+            day_last_payment_at=Max("created_at", filter=day_q),
+        )
+        .order_by()
+    )
+    return {row.pop("sale__customer_id"): row for row in rows}
+
+
+def _load_refunds(store, as_of_date: date, tz) -> dict:
+    score_start = as_of_date - timedelta(days=SCORE_WINDOW_DAYS - 1)
+    rows = (
+        Refund.objects.filter(
+            store=store,
+            sale__customer_id__isnull=False,
+            **date_range_filter("created_at", score_start, as_of_date, tz=tz),
+        )
+        .values("sale__customer_id")
+        .annotate(
+            refund_amount=_sum("amount"),
+            day_refund_amount=_sum("amount", filter=Q(**date_range_filter("created_at", as_of_date, as_of_date, tz=tz))),
+        )
+        .order_by()
+    )
+    return {row.pop("sale__customer_id"): row for row in rows}
+
+
+def _load_sales(store, as_of_date: date, tz) -> dict:
+    score_start = as_of_date - timedelta(days=SCORE_WINDOW_DAYS - 1)
+    rows = (
+        Sale.objects.filter(
+            store=store,
+            customer_id__isnull=False,
+            status__in=PAID_STATUSES,
+            **date_range_filter("created_at", score_start, as_of_date, tz=tz),
+        )
+        .values("customer_id")
+        .annotate(
+            gross_sales=_sum("total"),
+            discount=_sum("discount_amount"),
+            day_discount=_sum(
+                "discount_amount",
+                filter=Q(**date_range_filter("created_at", as_of_date, as_of_date, tz=tz)),
+            ),
+        )
+        .order_by()
+    )
+    return {row.pop("customer_id"): row for row in rows}
+
+
+def _load_schedules(store, as_of_date: date) -> dict:
+    """Schedule totals per customer, with both overdue definitions.
+
+    The score counts every unpaid past instalment; the credit risk only
+    those with an outstanding amount (see the per-customer functions).
+    """
+    unpaid = Q(due_date__lt=as_of_date) & ~Q(status=PaymentSchedule.Status.PAID)
+    outstanding = unpaid & Q(amount_due__gt=F("amount_paid"))
+    remaining = ExpressionWrapper(F("amount_due") - F("amount_paid"), output_field=DecimalField(max_digits=18, decimal_places=2))
+    rows = (
+        PaymentSchedule.objects.filter(account__store=store, due_date__lte=as_of_date)
+        .values("account__customer_id")
+        .annotate(
+            total_due=_sum("amount_due"),
+            total_paid=_sum("amount_paid"),
+            total_count=Count("id"),
+            unpaid_count=Count("id", filter=unpaid),
+            unpaid_amount=_sum(remaining, filter=unpaid),
+            overdue_count=Count("id", filter=outstanding),
+            overdue_amount=_sum(remaining, filter=outstanding),
+            oldest_due=Min("due_date", filter=outstanding),
+        )
+        .order_by()
+    )
+    return {row.pop("account__customer_id"): row for row in rows}
+
+
+def _load_accounts(store, as_of_date: date, tz) -> dict:
+    """Active credit accounts with their ledger balance 30 days ago."""
+    balance_30d = (
+        CreditLedgerEntry.objects.filter(
+            account=OuterRef("pk"),
+            created_at__lt=day_start(as_of_date - timedelta(days=29), tz),
+        )
+        .order_by("-created_at")
+        .values("balance_after")[:1]
+    )
+    accounts = CustomerAccount.objects.filter(store=store, is_active=True).annotate(balance_30d=Subquery(balance_30d))
+    return {account.customer_id: account for account in accounts}
+
+
+def _load_ledger_day(store, as_of_date: date, tz) -> dict:
+    rows = (
+        CreditLedgerEntry.objects.filter(
+            account__store=store,
+            **date_range_filter("created_at", as_of_date, as_of_date, tz=tz),
+        )
+        .values("account__customer_id")
+        .annotate(
+            issued=_sum("amount", filter=Q(entry_type=CreditLedgerEntry.EntryType.SALE_ON_CREDIT)),
+            collected=_sum("amount", filter=Q(entry_type=CreditLedgerEntry.EntryType.CREDIT_PAYMENT)),
+        )
+        .order_by()
+    )
+    return {row.pop("account__customer_id"): row for row in rows}
+
+
+def _load_items_day(store, as_of_date: date, tz) -> dict:
+    margin = ExpressionWrapper(
+        F("line_total") - (F("cost_price") * F("quantity")),
+        output_field=DecimalField(max_digits=18, decimal_places=2),
+    )
+    annotations = {"profit": _sum(margin)}
+    if _strategic_field_exists():
+        annotations["strategic"] = _sum("line_total", filter=Q(product__is_strategic=True))
+    rows = (
+        SaleItem.objects.filter(
+            sale__store=store,
+            sale__customer_id__isnull=False,
+            sale__status__in=PAID_STATUSES,
+            **date_range_filter("sale__created_at", as_of_date, as_of_date, tz=tz),
+        )
+        .values("sale__customer_id")
+        .annotate(**annotations)
+        .order_by()
+    )
+    return {row.pop("sale__customer_id"): row for row in rows}
+
+
+def _load_purchase_dates(store, as_of_date: date, tz) -> dict:
+    """Sorted purchase dates (last payment of each sale) per customer."""
+    rows = (
+        Payment.objects.filter(
+            store=store,
+            sale__customer_id__isnull=False,
+            **date_range_filter("created_at", None, as_of_date, tz=tz),
+        )
+        .values("sale__customer_id", "sale_id")
+        .annotate(paid_at=Max("created_at"))
+        .order_by("sale__customer_id", "paid_at")
+    )
+    dates = defaultdict(list)
+    for row in rows.iterator():
+        dates[row["sale__customer_id"]].append(row["paid_at"].date())
+    return dates
+
+
+# ---------------------------------------------------------------------------
+# Alerts
+# ---------------------------------------------------------------------------
+
+def _sync_alerts(store, alert_type: str, customer_ids, wanted: dict, *, close_missing: bool = True) -> None:
+    """Bulk equivalent of ``_upsert_open_alert`` / ``_close_open_alert``.
+
+    *wanted* maps customer id to ``(severity, context)``: each gets exactly
+    one OPEN alert.  Open alerts of the other *customer_ids* are closed when
+    *close_missing* is set.
+    """
+    now = timezone.now()
+    open_alerts = CustomerIntelligenceAlert.objects.filter(
+        store=store,
+        alert_type=alert_type,
+        status=CustomerIntelligenceAlert.Status.OPEN,
+        customer_id__in=customer_ids,
+    ).order_by("customer_id", "-triggered_at", "-created_at")
+
+    kept, to_close = {}, []
+    for alert in open_alerts:
+        if alert.customer_id not in wanted:
+            if close_missing:
+                to_close.append(alert.pk)
+        elif alert.customer_id in kept:
+            to_close.append(alert.pk)
+        else:
+            kept[alert.customer_id] = alert
+
+    to_update, to_create = [], []
+    for customer_id, (severity, context) in wanted.items():
+        alert = kept.get(customer_id)
+        if alert is None:
+            to_create.append(
+                CustomerIntelligenceAlert(
+                    store=store,
+                    customer_id=customer_id,
+                    alert_type=alert_type,
+                    severity=severity,
+                    status=CustomerIntelligenceAlert.Status.OPEN,
+                    triggered_at=now,
+                    context=context,
+                )
+            )
+        else:
+            alert.severity, alert.context, alert.triggered_at, alert.updated_at = severity, context, now, now
+            to_update.append(alert)
+
+    if to_update:
+        CustomerIntelligenceAlert.objects.bulk_update(
+            to_update, ["severity", "context", "triggered_at", "updated_at"], batch_size=500,
+        )
+    if to_create:
+        CustomerIntelligenceAlert.objects.bulk_create(to_create, batch_size=500)
+    for start in range(0, len(to_close), 500):
+        CustomerIntelligenceAlert.objects.filter(pk__in=to_close[start:start + 500]).update(
+            status=CustomerIntelligenceAlert.Status.CLOSED,
+            updated_at=now,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def refresh_store_customer_intelligence(
+    store,
+    *,
+    as_of: date | None = None,
+    lookback_days: int = 365,
+    actor=None,
+) -> StoreRefreshResult:
+    """Recompute scores, segments, daily metrics and alerts of a whole store."""
+    tz = store_timezone(store)
+    as_of_date = as_of or timezone.localdate(timezone=tz)
+    ruleset = get_or_create_active_ruleset(store, actor=actor, as_of=as_of_date)
+    thresholds = _thresholds(ruleset)
+    weights = _weights(ruleset)["score"]
+    dormant_days = thresholds["dormant_days"]
+
+    customers = _load_customers(store, as_of_date, max(30, int(lookback_days)), tz)
+    result = StoreRefreshResult(customers=len(customers))
+    if not customers:
+        return result
+
+    payments = _load_payments(store, as_of_date, tz)
+    refunds = _load_refunds(store, as_of_date, tz)
+    sales = _load_sales(store, as_of_date, tz)
+    schedules = _load_schedules(store, as_of_date)
+    accounts = _load_accounts(store, as_of_date, tz)
+    ledger_day = _load_ledger_day(store, as_of_date, tz)
+    items_day = _load_items_day(store, as_of_date, tz)
+    purchase_dates = _load_purchase_dates(store, as_of_date, tz)
+
+    scores, segments, metrics = [], [], []
+    credit_alerts, next_order_alerts, churn_alerts, dormant_alerts = {}, {}, {}, {}
+    cutoff = as_of_date - timedelta(days=dormant_days)
+
+    for customer_id, customer in customers.items():
+        pay = payments.get(customer_id, {})
+        refund = refunds.get(customer_id, {})
+        sale = sales.get(customer_id, {})
+        sched = schedules.get(customer_id, {})
+
+        # Score and segment.
+        credit = _credit_discipline_from_totals(
+            total_due=sched.get("total_due"),
+            total_paid=sched.get("total_paid"),
+            overdue_amount=sched.get("unpaid_amount"),
+            overdue_count=sched.get("unpaid_count"),
+        )
+        scored = _score_from_metrics(
+            as_of_date=as_of_date,
+            thresholds=thresholds,
+            weights=weights,
+            paid_amount=pay.get("paid_amount"),
+            paid_orders=pay.get("paid_orders"),
+            last_payment_at=pay.get("last_payment_at"),
+            refund_amount=refund.get("refund_amount"),
+            gross_sales=sale.get("gross_sales"),
+            discount_amount=sale.get("discount"),
+            credit=credit,
+        )
+        subscores = scored["subscores"]
+        scores.append(
+            CustomerScoreSnapshot(
+                store=store,
+                customer_id=customer_id,
+                as_of_date=as_of_date,
+                period_type=CustomerScoreSnapshot.PeriodType.ROLLING_90D,
+                ruleset=ruleset,
+                score_total=scored["score_total"],
+                recency_score=subscores["recency"],
+                frequency_score=subscores["frequency"],
+                monetary_score=subscores["monetary"],
+                credit_score=subscores["credit"],
+                discount_behavior_score=subscores["discount_behavior"],
+                segment=scored["segment"],
+                features=scored["features"],
+                explain=scored["explain"],
+            )
+        )
+        segments.append(
+            CustomerSegmentSnapshot(
+                store=store,
+                customer_id=customer_id,
+                as_of_date=as_of_date,
+                ruleset=ruleset,
+                segment=scored["segment"],
+                tags=scored["tags"],
+                strategy=scored["strategy"],
+            )
+        )
+
+        # Credit risk, for active accounts only.
+        account = accounts.get(customer_id)
+        if account is not None:
+            risk = _credit_risk_from_metrics(
+                account=account,
+                as_of_date=as_of_date,
+                total_due=sched.get("total_due"),
+                total_paid=sched.get("total_paid"),
+                total_count=sched.get("total_count"),
+                overdue_count=sched.get("overdue_count"),
+                overdue_amount=sched.get("overdue_amount"),
+                oldest_due=sched.get("oldest_due"),
+                balance_30d=account.balance_30d,
+            )
+            if risk["risk_score"] >= CREDIT_RISK_ALERT_SCORE:
+                credit_alerts[customer_id] = (
+                    risk["severity"],
+                    {
+                        "credit_risk_score": risk["risk_score"],
+                        "risk_level": risk["risk_level"],
+                        "features": risk["features"],
+                        "recommendation": risk["recommendation"],
+                    },
+                )
+
+        # Next order and dormancy.
+        dates = purchase_dates.get(customer_id, [])
+        prediction = _next_order_from_dates(dates, as_of_date)
+        if prediction["alert"]:
+            next_order_alerts[customer_id] = (prediction["severity"], prediction["context"])
+        days_without = (as_of_date - dates[-1]).days if dates else dormant_days + 1
+        if days_without >= dormant_days:
+            dormant_alerts[customer_id] = _dormant_alert(customer, days_without, dormant_days, cutoff)
+
+        # Churn.
+        churn = _churn_from_windows(
+            as_of_date=as_of_date,
+            window_days=CHURN_WINDOW_DAYS,
+            curr_amount=_d(pay.get("curr_amount")),
+            prev_amount=_d(pay.get("prev_amount")),
+            curr_orders=int(pay.get("curr_orders") or 0),
+            prev_orders=int(pay.get("prev_orders") or 0),
+            drop_threshold_pct=CHURN_DROP_THRESHOLD_PCT,
+        )
+        if churn is not None:
+            churn_alerts[customer_id] = (
+                churn["severity"],
+                {
+                    "customer_id": str(customer_id),
+                    "customer_name": customer.full_name,
+                    "customer_phone": customer.phone,
+                    "store_id": str(store.id),
+                    **churn["context"],
+                },
+            )
+
+        # Daily metrics of the as-of day.
+        ledger = ledger_day.get(customer_id, {})
+        items = items_day.get(customer_id, {})
+        metric = CustomerMetricDaily(
+            store=store,
+            customer_id=customer_id,
+            metric_date=as_of_date,
+            paid_amount=(_d(pay.get("day_amount")) - _d(refund.get("day_refund_amount"))).quantize(Decimal("0.01")),
+            paid_orders_count=int(pay.get("day_orders") or 0),
+            refund_amount=_d(refund.get("day_refund_amount")).quantize(Decimal("0.01")),
+            discount_amount=_d(sale.get("day_discount")).quantize(Decimal("0.01")),
+            credit_issued_amount=_d(ledger.get("issued")).quantize(Decimal("0.01")),
+            credit_collected_amount=(-_d(ledger.get("collected"))).quantize(Decimal("0.01")),
+            credit_overdue_amount=credit["overdue_amount"].quantize(Decimal("0.01")),
+            strategic_amount=_d(items.get("strategic")).quantize(Decimal("0.01")),
+            profit_estimated=_d(items.get("profit")).quantize(Decimal("0.01")),
+            last_payment_at=pay.get("day_last_payment_at"),
+        )
+        if metric.last_payment_at or any(getattr(metric, f) for f in METRIC_FIELDS[:-1]):
+            metrics.append(metric)
+
+    customer_ids = list(customers)
+    scope = {"store": store, "customer_id__in": customer_ids}
+    for queryset, rows, keys, values in (
+        (
+            CustomerScoreSnapshot.objects.filter(
+                as_of_date=as_of_date,
+                period_type=CustomerScoreSnapshot.PeriodType.ROLLING_90D,
+                ruleset=ruleset,
+                **scope,
+            ),
+            scores,
+            ["store_id", "customer_id", "as_of_date", "period_type", "ruleset_id"],
+            SCORE_FIELDS,
+        ),
+        (
+            CustomerSegmentSnapshot.objects.filter(as_of_date=as_of_date, ruleset=ruleset, **scope),
+            segments,
+            ["store_id", "customer_id", "as_of_date", "ruleset_id"],
+            ["segment", "tags", "strategy"],
+        ),
+        (
+            CustomerMetricDaily.objects.filter(metric_date=as_of_date, **scope),
+            metrics,
+            ["store_id", "customer_id", "metric_date"],
+            METRIC_FIELDS,
+        ),
+    ):
+        result.snapshot_rows_changed += write_snapshot(queryset, rows, keys, values).changed
+
+    alert_types = CustomerIntelligenceAlert.AlertType
+    _sync_alerts(store, alert_types.CREDIT_RISK, customer_ids, credit_alerts)
+    _sync_alerts(store, alert_types.NEXT_ORDER, customer_ids, next_order_alerts)
+    _sync_alerts(store, alert_types.CHURN, customer_ids, churn_alerts)
+    # Like list_dormant_customers, dormancy alerts are opened, never closed here.
+    _sync_alerts(store, alert_types.DORMANT, customer_ids, dormant_alerts, close_missing=False)
+
+    result.credit_risk = len(credit_alerts)
+    result.next_order = len(next_order_alerts)
+    result.churn = len(churn_alerts)
+    result.dormant = len(dormant_alerts)
+    logger.info(
+        "Customer intelligence refreshed for store %s on %s: %d customers, %d snapshot rows changed",
+        store,
+        as_of_date,
+        result.customers,
+        result.snapshot_rows_changed,
+    )
+    return result
@@ -0,0 +1,254 @@
+"""Set-based fraud-signal rules, for batch detection and real-time scoring.
+
+Each rule turns a queryset of candidates into unsaved ``FraudEvent`` rows
+with one query; events are written with ``bulk_create(ignore_conflicts=
+True)`` and deduplicated by the ``fraud_event_unique_signal`` constraint
+(store, day, rule, sale, payment), so any run is idempotent.
+
+- :func:`detect_fraud_signals` applies every rule to a date range (batch).
+- :func:`score_payment` / :func:`score_refund` apply the same rules to the
+  sale of one committed payment or refund (see ``analytics.signals``).
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, DecimalField, ExpressionWrapper, F, Max, StdDev, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from analytics.models import FraudEvent
+from core.dates import date_range_filter, store_timezone
+
+logger = logging.getLogger("boutique")
+
+PAID_STATUSES = ("PAID", "PARTIALLY_PAID")
+BASELINE_DAYS = 30
+BASELINE_MIN_SALES = 10
+SPLIT_PAYMENT_MIN_LINES = 3
+QUICK_REFUND_RATIO = Decimal("0.70")
+QUICK_REFUND_HOURS = 24
+# Lifetime of the cached outlier threshold used by the real-time scorer.
+BASELINE_CACHE_TTL = 3600
+
+
+def _enabled(store) -> bool:
+    checker = getattr(store, "is_analytics_feature_enabled", None)
+    return bool(checker("fraud_detection")) if callable(checker) else True
+
+
+def _local_day(moment, tz) -> date:
+    return timezone.localtime(moment, tz).date()
+
+
+# ---------------------------------------------------------------------------
+# Rules: candidates queryset -> unsaved FraudEvent rows
+# ---------------------------------------------------------------------------
+
+def _discount_events(store, sales, tz) -> list[FraudEvent]:
+    threshold = Decimal(str(getattr(settings, "MAX_DISCOUNT_PERCENT_MANAGER", 50)))
+    return [
+        FraudEvent(
+            store=store,
+            sale_id=sale.pk,
+            detected_on=_local_day(sale.created_at, tz),
+            rule_code="HIGH_DISCOUNT_THRESHOLD",
+            severity=FraudEvent.Severity.CRITICAL,
+            risk_score=90,
+            title=f"Remise elevee {sale.discount_percent}%",
+            description=f"Vente {sale.invoice_number or sale.pk} depasse le seuil manager.",
+            payload={
+                "discount_percent": str(sale.discount_percent),
+                "threshold": str(threshold),
+                "total": str(sale.total),
+            },
+        )
+        for sale in sales.filter(discount_percent__gt=threshold).only(
+            "pk", "created_at", "discount_percent", "invoice_number", "total",
+        )
+    ]
+
+
+def outlier_threshold(store, day: date, tz=None) -> Decimal | None:
+    """Return mean + 3 sigma of paid sale totals over the days before *day*.
+
+    Computed in SQL; ``None`` when the baseline is too small or flat.
+    """
+    from sales.models import Sale
+
+    tz = tz or store_timezone(store)
+    stats = Sale.objects.filter(
+        store=store,
+        status__in=PAID_STATUSES,
+        **date_range_filter("created_at", day - timedelta(days=BASELINE_DAYS), day - timedelta(days=1), tz=tz),
+    ).aggregate(n=Count("id"), avg=Avg("total"), std=StdDev("total"))
+    if stats["n"] < BASELINE_MIN_SALES or not stats["std"]:
+        return None
+    return Decimal(str(float(stats["avg"]) + 3 * float(stats["std"]))).quantize(Decimal("0.01"))
+
+
+def _cached_outlier_threshold(store, day: date, tz) -> Decimal | None:
+    key = f"analytics:fraud_baseline:{store.pk}:{day.isoformat()}"
+    cached = cache.get(key)
+    if cached is None:
+        threshold = outlier_threshold(store, day, tz)
+        cache.set(key, "" if threshold is None else str(threshold), BASELINE_CACHE_TTL)
+        return threshold
+    return Decimal(cached) if cached else None
+
+
+def _outlier_events(store, sales, threshold: Decimal | None, tz) -> list[FraudEvent]:
+    if threshold is None:
+        return []
+    return [
+        FraudEvent(
+            store=store,
+            sale_id=sale.pk,
+            detected_on=_local_day(sale.created_at, tz),
+            rule_code="SALE_AMOUNT_OUTLIER",
+            severity=FraudEvent.Severity.WARNING,
+            risk_score=75,
+            title="Montant de vente atypique",
+            description=f"Vente {sale.invoice_number or sale.pk} au-dessus du seuil statistique.",
+            payload={"sale_total": str(sale.total), "threshold": str(threshold)},
+        )
+        for sale in sales.filter(total__gt=threshold).only("pk", "created_at", "invoice_number", "total")
+    ]
+
+
+def _split_payment_events(store, payments, tz) -> list[FraudEvent]:
+    rows = (
+        payments.values("sale_id")
+        .annotate(
+            lines=Count("id"),
+            paid_total=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
+            sale_total=Max("sale__total"),
+            sale_created_at=Max("sale__created_at"),
+        )
+        .filter(lines__gte=SPLIT_PAYMENT_MIN_LINES, paid_total__gte=F("sale_total"))
+        .order_by()
+    )
+    return [
+        FraudEvent(
+            store=store,
+            sale_id=row["sale_id"],
+            detected_on=_local_day(row["sale_created_at"], tz),
+            rule_code="SPLIT_PAYMENT_PATTERN",
+            severity=FraudEvent.Severity.WARNING,
+            risk_score=65,
+            title="Pattern de paiement fragmente",
+            description=f"{row['lines']} paiements pour une meme vente.",
+            payload={"lines": row["lines"], "paid_total": str(row["paid_total"]), "sale_total": str(row["sale_total"])},
+        )
+        for row in rows
+    ]
+
+
+def _quick_refund_events(store, refunds, tz) -> list[FraudEvent]:
+    rows = refunds.filter(
+        sale__total__gt=0,
+        amount__gte=ExpressionWrapper(
+            F("sale__total") * Value(QUICK_REFUND_RATIO),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+        created_at__lte=F("sale__created_at") + timedelta(hours=QUICK_REFUND_HOURS),
+    ).values("sale_id", "amount", "created_at", "sale__total", "sale__created_at")
+    events = []
+    for row in rows:
+        age_hours = (row["created_at"] - row["sale__created_at"]).total_seconds() / 3600
+        events.append(
+            FraudEvent(
+                store=store,
+                sale_id=row["sale_id"],
+                detected_on=_local_day(row["created_at"], tz),
+                rule_code="QUICK_HIGH_REFUND",
+                severity=FraudEvent.Severity.CRITICAL,
+                risk_score=92,
+                title="Remboursement rapide eleve",
+                description=f"Remboursement {row['amount']} dans les 24h de la vente.",
+                payload={
+                    "refund_amount": str(row["amount"]),
+                    "sale_total": str(row["sale__total"]),
+                    "hours_since_sale": round(age_hours, 2),
+                },
+            )
+        )
+    return events
+
+
+def _save_events(store, events: list[FraudEvent]) -> int:
+    """Insert *events*, skipping those already recorded; return new count."""
+    if not events:
+        return 0
+    days = {event.detected_on for event in events}
+    existing = FraudEvent.objects.filter(store=store, detected_on__in=days)
+    before = existing.count()
+    FraudEvent.objects.bulk_create(events, batch_size=500, ignore_conflicts=True)
+    return existing.count() - before
+
+
+# ---------------------------------------------------------------------------
+# Entry points
+# ---------------------------------------------------------------------------
+
+def detect_fraud_signals(store, date_from: date, date_to: date) -> int:
+    """Detect fraud-like events over local dates *date_from*..*date_to*."""
+    if not _enabled(store):
+        logger.info("Fraud detection skipped for store %s: feature disabled.", store)
+        return 0
+    from cashier.models import Payment
+    from sales.models import Refund, Sale
+
+    tz = store_timezone(store)
+    in_range = date_range_filter("created_at", date_from, date_to, tz=tz)
+    sales = Sale.objects.filter(store=store, status__in=PAID_STATUSES, **in_range)
+
+    events = _discount_events(store, sales, tz)
+    events += _outlier_events(store, sales, outlier_threshold(store, date_from, tz), tz)
+    events += _split_payment_events(store, Payment.objects.filter(store=store, **in_range), tz)
+    events += _quick_refund_events(store, Refund.objects.filter(store=store, **in_range), tz)
+    created = _save_events(store, events)
+
+    logger.info(
+        "Fraud signals computed for store %s (%s -> %s): %d new events",
+        store,
+        date_from,
+        date_to,
+        created,
+    )
+    return created
+
+
+def score_payment(payment) -> int:
+    """Apply the sale rules to the sale of a committed *payment*."""
+    from cashier.models import Payment
+    from sales.models import Sale
+
+    store = payment.store
+    if not payment.sale_id or not _enabled(store):
+        return 0
+    tz = store_timezone(store)
+    sale = Sale.objects.filter(pk=payment.sale_id, status__in=PAID_STATUSES)
+    created_at = sale.values_list("created_at", flat=True).first()
+    if created_at is None:
+        return 0
+
+    events = _discount_events(store, sale, tz)
+    events += _outlier_events(store, sale, _cached_outlier_threshold(store, _local_day(created_at, tz), tz), tz)
+    events += _split_payment_events(store, Payment.objects.filter(store=store, sale_id=payment.sale_id), tz)
+    return _save_events(store, events)
+
+
+def score_refund(refund) -> int:
+    """Apply the refund rules to a committed *refund*."""
+    from sales.models import Refund
+
+    store = refund.store
+    if not refund.sale_id or not _enabled(store):
+        return 0
+    tz = store_timezone(store)
+    return _save_events(store, _quick_refund_events(store, Refund.objects.filter(pk=refund.pk), tz))
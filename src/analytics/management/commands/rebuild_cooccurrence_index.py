@@ -0,0 +1,31 @@
+"""Rebuild product co-occurrence indexes from all paid sales."""
+
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+from analytics.cooccurrence import rebuild_cooccurrence_index
+from stores.models import Store
+
+
+class Command(BaseCommand):
+    help = (
+        "Drop and rebuild the product co-occurrence index of each store. "
+        "Needed after changing ANALYTICS_COOCCURRENCE_HALF_LIFE_DAYS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", default="", help="Process only one store id (optional).")
+
+    def handle(self, *args, **options):
+        stores = Store.objects.order_by("name")
+        if options["store"]:
+            stores = stores.filter(pk=options["store"])
+
+        total_sales = 0
+        for store in stores:
+            indexed = rebuild_cooccurrence_index(store)
+            total_sales += indexed
+            self.stdout.write(f"{store.name}: {indexed} sale(s) indexed")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_sales} sale(s) indexed."))
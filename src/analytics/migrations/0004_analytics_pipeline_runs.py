@@ -0,0 +1,55 @@
+# Generated by Django 5.1.15 on 2026-10-16 22:41
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_customerrecommendationcache'),
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsPipelineRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('as_of', models.DateField(db_index=True)),
+                ('status', models.CharField(choices=[('RUNNING', 'En cours'), ('SUCCESS', 'Termine'), ('PARTIAL', 'Termine avec erreurs'), ('FAILED', 'Echec')], db_index=True, default='RUNNING', max_length=10)),
+                ('stages', models.JSONField(blank=True, default=list)),
+                ('store_count', models.PositiveIntegerField(default=0)),
+                ('total_steps', models.PositiveIntegerField(default=0)),
+                ('completed_steps', models.PositiveIntegerField(default=0)),
+                ('failed_steps', models.PositiveIntegerField(default=0)),
+                ('summary', models.JSONField(blank=True, default=dict)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsPipelineStep',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('stage', models.CharField(max_length=30)),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('SUCCESS', 'Termine'), ('FAILED', 'Echec'), ('TIMEOUT', 'Delai depasse'), ('SKIPPED', 'Ignore')], db_index=True, default='PENDING', max_length=10)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('duration_ms', models.PositiveIntegerField(default=0)),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='steps', to='analytics.analyticspipelinerun')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analytics_pipeline_steps', to='stores.store')),
+            ],
+            options={
+                'ordering': ['run', 'store', 'created_at'],
+                'unique_together': {('run', 'store', 'stage')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_analytics_pipeline_runs'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='salesforecast',
+            name='method',
+            field=models.CharField(choices=[('MOVING_AVG', 'Moyenne mobile'), ('MA_7', 'Moyenne mobile 7 jours'), ('MA_30', 'Moyenne mobile 30 jours'), ('EXP_SMOOTHING', 'Lissage exponentiel'), ('CROSTON', 'Croston (demande intermittente)'), ('SEASONAL', 'Saisonnalite hebdomadaire')], default='MOVING_AVG', max_length=20),
+        ),
+    ]
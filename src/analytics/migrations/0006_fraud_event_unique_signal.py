@@ -0,0 +1,38 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:08
+
+import django.db.models.functions.comparison
+import uuid
+from django.db import migrations, models
+
+
+def drop_duplicate_events(apps, schema_editor):
+    """Keep the oldest event of each (store, day, rule, sale, payment)."""
+    FraudEvent = apps.get_model("analytics", "FraudEvent")
+    seen = set()
+    duplicates = []
+    rows = FraudEvent.objects.order_by("created_at").values_list(
+        "pk", "store_id", "detected_on", "rule_code", "sale_id", "payment_id",
+    )
+    for pk, *key in rows.iterator():
+        key = tuple(key)
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+    for start in range(0, len(duplicates), 500):
+        FraudEvent.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_sales_forecast_methods'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_events, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='fraudevent',
+            constraint=models.UniqueConstraint(models.F('store'), models.F('detected_on'), models.F('rule_code'), django.db.models.functions.comparison.Coalesce('sale', models.Value(uuid.UUID('00000000-0000-0000-0000-000000000000'), output_field=models.UUIDField())), django.db.models.functions.comparison.Coalesce('payment', models.Value(uuid.UUID('00000000-0000-0000-0000-000000000000'), output_field=models.UUIDField())), name='fraud_event_unique_signal'),
+        ),
+    ]
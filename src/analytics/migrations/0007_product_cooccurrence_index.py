@@ -0,0 +1,66 @@
+# Generated by Django 5.1.15 on 2026-10-16 23:30
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_fraud_event_unique_signal'),
+        ('catalog', '0006_pricingpolicy_pricingrule_productvariant'),
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CooccurrenceIndex',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('half_life_days', models.PositiveSmallIntegerField(default=90)),
+                ('order_weight', models.FloatField(default=0.0, help_text='Poids decroissant cumule des ventes indexees.')),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('watermark', models.DateTimeField(blank=True, help_text='Paiement le plus recent indexe.', null=True)),
+                ('recent_sale_ids', models.JSONField(blank=True, default=list, help_text='Ventes indexees proches du watermark (anti double comptage).')),
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cooccurrence_index', to='stores.store')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductCooccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=0.0)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('last_seen_on', models.DateField()),
+                ('product_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('product_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_cooccurrences', to='stores.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', 'product_b'], name='analytics_p_store_i_a15266_idx')],
+                'unique_together': {('store', 'product_a', 'product_b')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductOccurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=0.0)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('last_seen_on', models.DateField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='catalog.product')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_occurrences', to='stores.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store', '-weight'], name='analytics_p_store_i_955d78_idx')],
+                'unique_together': {('store', 'product')},
+            },
+        ),
+    ]
@@ -1,9 +1,11 @@
 """Models for intelligent analytics across sales, stock, credit and fraud."""
+import uuid
 from decimal import Decimal
 
 from django.conf import settings
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 
 from core.models import TimeStampedModel
@@ -123,10 +125,15 @@ class CustomerCreditScore(TimeStampedModel):
 
 
 class SalesForecast(TimeStampedModel):
-    """Simple demand forecast per product using moving averages."""
+    """Daily demand forecast per product (see ``analytics.forecasting``)."""
 
     class Method(models.TextChoices):
         MOVING_AVG = "MOVING_AVG", "Moyenne mobile"
+        MA_7 = "MA_7", "Moyenne mobile 7 jours"
+        MA_30 = "MA_30", "Moyenne mobile 30 jours"
+        EXP_SMOOTHING = "EXP_SMOOTHING", "Lissage exponentiel"
+        CROSTON = "CROSTON", "Croston (demande intermittente)"
+        SEASONAL = "SEASONAL", "Saisonnalite hebdomadaire"
 
     store = models.ForeignKey(
         "stores.Store",
@@ -153,6 +160,10 @@ class SalesForecast(TimeStampedModel):
         return f"{self.store} {self.product} {self.forecast_date}"
 
 
+# Stands for "no sale/payment" in the FraudEvent unique constraint.
+NO_OBJECT_ID = uuid.UUID(int=0)
+
+
 class FraudEvent(TimeStampedModel):
     """Fraud or anomaly signal detected by rules/statistics."""
 
@@ -204,6 +215,17 @@ class FraudEvent(TimeStampedModel):
             models.Index(fields=["store", "is_resolved"]),
             models.Index(fields=["store", "severity"]),
         ]
+        constraints = [
+            # One event per signal; sale/payment may be NULL, hence COALESCE.
+            models.UniqueConstraint(
+                "store",
+                "detected_on",
+                "rule_code",
+                Coalesce("sale", Value(NO_OBJECT_ID, output_field=models.UUIDField())),
+                Coalesce("payment", Value(NO_OBJECT_ID, output_field=models.UUIDField())),
+                name="fraud_event_unique_signal",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.store} {self.rule_code} {self.severity}"
@@ -539,3 +561,152 @@ class CustomerRecommendationCache(TimeStampedModel):
             models.Index(fields=["store", "customer", "as_of_date"]),
             models.Index(fields=["store", "as_of_date", "generated_at"]),
         ]
+
+
+class CooccurrenceIndex(TimeStampedModel):
+    """Totals and progress of a store's product co-occurrence index.
+
+    Maintained by ``analytics.cooccurrence``; weights use forward decay with
+    ``half_life_days`` (see that module).
+    """
+
+    store = models.OneToOneField(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="cooccurrence_index",
+    )
+    half_life_days = models.PositiveSmallIntegerField(default=90)
+    order_weight = models.FloatField(default=0.0, help_text="Poids decroissant cumule des ventes indexees.")
+    order_count = models.PositiveIntegerField(default=0)
+    watermark = models.DateTimeField(null=True, blank=True, help_text="Paiement le plus recent indexe.")
+    recent_sale_ids = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Ventes indexees proches du watermark (anti double comptage).",
+    )
+
+    def __str__(self):
+        return f"Co-occurrence {self.store} ({self.order_count} ventes)"
+
+
+class ProductOccurrence(models.Model):
+    """Decayed count of indexed sales containing one product."""
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="product_occurrences",
+    )
+    product = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="occurrences",
+    )
+    weight = models.FloatField(default=0.0)
+    order_count = models.PositiveIntegerField(default=0)
+    last_seen_on = models.DateField()
+
+    class Meta:
+        unique_together = [["store", "product"]]
+        indexes = [
+            models.Index(fields=["store", "-weight"]),
+        ]
+
+
+class ProductCooccurrence(models.Model):
+    """Decayed count of indexed sales containing both products.
+
+    One row per unordered pair, with ``product_a_id < product_b_id``.
+    """
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="product_cooccurrences",
+    )
+    product_a = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    product_b = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    weight = models.FloatField(default=0.0)
+    order_count = models.PositiveIntegerField(default=0)
+    last_seen_on = models.DateField()
+
+    class Meta:
+        unique_together = [["store", "product_a", "product_b"]]
+        indexes = [
+            models.Index(fields=["store", "product_b"]),
+        ]
+
+
+class AnalyticsPipelineRun(TimeStampedModel):
+    """One fan-out of the analytics pipeline (see ``analytics.tasks``)."""
+
+    class Status(models.TextChoices):
+        RUNNING = "RUNNING", "En cours"
+        SUCCESS = "SUCCESS", "Termine"
+        PARTIAL = "PARTIAL", "Termine avec erreurs"
+        FAILED = "FAILED", "Echec"
+
+    as_of = models.DateField(db_index=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING, db_index=True)
+    stages = models.JSONField(default=list, blank=True)
+    store_count = models.PositiveIntegerField(default=0)
+    total_steps = models.PositiveIntegerField(default=0)
+    completed_steps = models.PositiveIntegerField(default=0)
+    failed_steps = models.PositiveIntegerField(default=0)
+    summary = models.JSONField(default=dict, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Pipeline {self.as_of} {self.status}"
+
+    @property
+    def progress(self) -> int:
+        """Percentage of finished (successful or failed) steps."""
+        if not self.total_steps:
+            return 100
+        return int(100 * (self.completed_steps + self.failed_steps) / self.total_steps)
+
+
+class AnalyticsPipelineStep(TimeStampedModel):
+    """One stage of one store within an :class:`AnalyticsPipelineRun`."""
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        SUCCESS = "SUCCESS", "Termine"
+        FAILED = "FAILED", "Echec"
+        TIMEOUT = "TIMEOUT", "Delai depasse"
+        SKIPPED = "SKIPPED", "Ignore"
+
+    run = models.ForeignKey(
+        AnalyticsPipelineRun,
+        on_delete=models.CASCADE,
+        related_name="steps",
+    )
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="analytics_pipeline_steps",
+    )
+    stage = models.CharField(max_length=30)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, db_index=True)
+    rows = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    duration_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["run", "store", "created_at"]
+        unique_together = [["run", "store", "stage"]]
+
+    def __str__(self):
+        return f"{self.run_id} {self.store} {self.stage} {self.status}"
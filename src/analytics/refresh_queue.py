@@ -0,0 +1,200 @@
+"""Debounced customer-intelligence refreshes.
+
+Payment, refund and credit signals call :func:`request_customer_refresh`
+once their transaction has committed.  Requests are grouped in time slots
+of ``ANALYTICS_CUSTOMER_REFRESH_DEBOUNCE_SECONDS``: a (store, customer)
+already waiting is not queued again, only its merge counter grows.  When a
+slot closes, :func:`flush_pending_refreshes` recomputes each waiting
+customer once, and the top-clients cache once per store.
+
+State lives in the default cache (Redis in production) and relies only on
+its atomic ``add`` / ``incr``:
+
+- ``pending:<store>:<customer>``: merged requests while the customer waits;
+- ``slot:<n>:size``: members queued in slot *n*, each at ``slot:<n>:<i>``;
+- ``slot:<n>:done``: members of slot *n* already flushed.
+
+If the cache is unreachable, requests fall back to one
+``refresh_customer_intelligence_customer`` task each.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger("boutique")
+
+KEY_PREFIX = "analytics:ci_refresh"
+# Slots kept in the cache (and rescanned by the periodic flush).
+KEEP_SLOTS = 40
+FLUSH_LOCK_SECONDS = 300
+
+
+@dataclass
+class FlushResult:
+    customers: int = 0
+    merged: int = 0
+    stores: int = 0
+
+
+def _delay() -> int:
+    return max(1, int(getattr(settings, "ANALYTICS_CUSTOMER_REFRESH_DEBOUNCE_SECONDS", 30)))
+
+
+def _pending_key(store_id, customer_id) -> str:
+    return f"{KEY_PREFIX}:pending:{store_id}:{customer_id}"
+
+
+def _slot_key(slot: int, suffix) -> str:
+    return f"{KEY_PREFIX}:slot:{slot}:{suffix}"
+
+
+def _schedule_flush(slot: int, countdown: float) -> None:
+    try:
+        from analytics.tasks import flush_customer_refreshes
+
+        flush_customer_refreshes.apply_async(kwargs={"slot": slot}, countdown=max(0, countdown))
+    except Exception:
+        # The periodic flush picks the slot up.
+        logger.warning("Customer refresh flush could not be queued for slot %s", slot, exc_info=True)
+
+
+def _refresh_without_queue(store_id, customer_id) -> None:
+    from analytics.tasks import refresh_customer_intelligence_customer
+
+    try:
+        refresh_customer_intelligence_customer.delay(str(store_id), str(customer_id))
+    except Exception:
+        # Fallback in case broker/worker is unavailable.
+        refresh_customer_intelligence_customer(str(store_id), str(customer_id))
+
+
+def request_customer_refresh(store_id, customer_id) -> bool:
+    """Queue a refresh of *customer_id* in *store_id*.
+
+    Returns False when the request was merged into one already waiting.
+    """
+    if not store_id or not customer_id:
+        return False
+    delay = _delay()
+    ttl = delay * KEEP_SLOTS
+    pending_key = _pending_key(store_id, customer_id)
+    try:
+        if not cache.add(pending_key, 0, timeout=ttl):
+            try:
+                cache.incr(pending_key)
+                return False
+            except ValueError:
+                # Flushed meanwhile: queue it again.
+                cache.add(pending_key, 0, timeout=ttl)
+
+        now = time.time()
+        slot = int(now // delay)
+        size_key = _slot_key(slot, "size")
+        cache.add(size_key, 0, timeout=ttl)
+        position = cache.incr(size_key)
+        cache.set(_slot_key(slot, position), f"{store_id}:{customer_id}", timeout=ttl)
+        if cache.add(_slot_key(slot, "scheduled"), 1, timeout=ttl):
+            _schedule_flush(slot, (slot + 1) * delay - now + 1)
+    except Exception:
+        logger.warning("Customer refresh queue unavailable, refreshing %s directly", customer_id, exc_info=True)
+        _refresh_without_queue(store_id, customer_id)
+    return True
+
+
+def _take_slot(slot: int) -> list[str]:
+    """Return the members of *slot* not flushed yet and mark them done."""
+    size = cache.get(_slot_key(slot, "size")) or 0
+    done = cache.get(_slot_key(slot, "done")) or 0
+    if done >= size:
+        return []
+    cache.delete(_slot_key(slot, "scheduled"))
+    positions = range(done + 1, size + 1)
+    found = cache.get_many([_slot_key(slot, position) for position in positions])
+    members = []
+    for position in positions:
+        member = found.get(_slot_key(slot, position))
+        if member is None:
+            # Still being written: left for the next flush.
+            break
+        members.append(member)
+        done = position
+    cache.set(_slot_key(slot, "done"), done, timeout=_delay() * KEEP_SLOTS)
+    return members
+
+
+def flush_pending_refreshes(slot: int | None = None) -> FlushResult:
+    """Recompute the customers queued in *slot* (default: recent closed slots)."""
+    from analytics.customer_intelligence import (
+        refresh_customer_intelligence_for_customer,
+        refresh_top_clients_month,
+    )
+    from customers.models import Customer
+    from stores.models import Store
+
+    current = int(time.time() // _delay())
+    slots = [slot] if slot is not None else range(current - KEEP_SLOTS, current)
+    members = []
+    for candidate in slots:
+        lock_key = _slot_key(candidate, "lock")
+        if not cache.add(lock_key, 1, timeout=FLUSH_LOCK_SECONDS):
+            continue
+        try:
+            members += _take_slot(candidate)
+        finally:
+            cache.delete(lock_key)
+
+    result = FlushResult()
+    if not members:
+        return result
+    by_store = defaultdict(set)
+    for member in members:
+        store_id, customer_id = member.split(":", 1)
+        by_store[store_id].add(customer_id)
+    pending_keys = [
+        _pending_key(store_id, customer_id)
+        for store_id, customer_ids in by_store.items()
+        for customer_id in customer_ids
+    ]
+    # Release the customers before refreshing them: requests arriving from
+    # now on are queued again instead of being merged into this run.
+    result.merged = sum(cache.get_many(pending_keys).values())
+    cache.delete_many(pending_keys)
+
+    today = timezone.localdate()
+    for store in Store.objects.filter(pk__in=list(by_store), is_active=True):
+        customers = Customer.objects.filter(
+            pk__in=by_store[str(store.pk)],
+            enterprise_id=store.enterprise_id,
+            is_default=False,
+        )
+        for customer in customers:
+            try:
+                refresh_customer_intelligence_for_customer(
+                    store=store,
+                    customer=customer,
+                    as_of=today,
+                    actor=None,
+                    force_recommendations_refresh=True,
+                )
+            except Exception:
+                # The daily store refresh catches up.
+                logger.warning("Customer intelligence refresh failed for %s", customer.pk, exc_info=True)
+                continue
+            result.customers += 1
+        refresh_top_clients_month(store=store, period_month=today.replace(day=1), limit=10, actor=None)
+        result.stores += 1
+
+    logger.info(
+        "Customer intelligence refresh flush: %d customers in %d stores, %d requests merged",
+        result.customers,
+        result.stores,
+        result.merged,
+    )
+    return result
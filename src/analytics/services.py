@@ -4,13 +4,13 @@ from __future__ import annotations
 import logging
 from datetime import date, timedelta
 from decimal import Decimal
-from statistics import mean, pstdev
 
 from django.conf import settings
-from django.db import transaction
 from django.db.models import Count, DecimalField, F, Q, Sum, Value
 from django.db.models.functions import Coalesce, TruncDate
 
+from core.dates import date_range_filter, store_timezone
+
 from analytics.models import (
     ABCAnalysis,
     CustomerCreditScore,
@@ -18,6 +18,8 @@ from analytics.models import (
     ReorderRecommendation,
     SalesForecast,
 )
+from analytics.fraud import detect_fraud_signals  # noqa: F401  (re-exported)
+from analytics.snapshots import write_snapshot
 
 logger = logging.getLogger("boutique")
 
@@ -49,7 +51,6 @@ def _feature_enabled(store, key: str) -> bool:
     return True
 
 
-@transaction.atomic
 def compute_abc_analysis(store, date_from: date, date_to: date) -> int:
     """Compute and persist ABC classification for one store and period."""
     if not _feature_enabled(store, "abc_analysis"):
@@ -57,13 +58,13 @@ def compute_abc_analysis(store, date_from: date, date_to: date) -> int:
         return 0
     from sales.models import Sale, SaleItem
 
+    tz = store_timezone(store)
     paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
     rows = list(
         SaleItem.objects.filter(
             sale__store=store,
             sale__status__in=paid_statuses,
-            sale__created_at__date__gte=date_from,
-            sale__created_at__date__lte=date_to,
+            **date_range_filter("sale__created_at", date_from, date_to, tz=tz),
         )
         .values("product_id")
         .annotate(
@@ -103,34 +104,33 @@ def compute_abc_analysis(store, date_from: date, date_to: date) -> int:
             )
         )
 
-    ABCAnalysis.objects.filter(
-        store=store,
-        period_start=date_from,
-        period_end=date_to,
-    ).delete()
-
-    if to_create:
-        ABCAnalysis.objects.bulk_create(to_create, batch_size=500)
+    written = write_snapshot(
+        ABCAnalysis.objects.filter(store=store, period_start=date_from, period_end=date_to),
+        to_create,
+        key_fields=("store_id", "product_id", "period_start", "period_end"),
+        value_fields=("quantity_sold", "revenue", "revenue_share", "cumulative_share", "abc_class"),
+    )
 
     logger.info(
-        "ABC analysis computed for store %s (%s -> %s): %d rows",
+        "ABC analysis computed for store %s (%s -> %s): %d rows, %d changed",
         store,
         date_from,
         date_to,
         len(to_create),
+        written.changed,
     )
     return len(to_create)
 
 
-@transaction.atomic
 def compute_dynamic_reorder(store, as_of: date, lookback_days: int = 30) -> int:
-    """Compute dynamic reorder recommendations from real sales velocity."""
+    """Compute dynamic reorder recommendations from forecast or past sales velocity."""
     if not _feature_enabled(store, "dynamic_reorder"):
         logger.info("Dynamic reorder skipped for store %s: feature disabled.", store)
         return 0
     from sales.models import Sale, SaleItem
     from stock.models import ProductStock
 
+    tz = store_timezone(store)
     start_date = as_of - timedelta(days=lookback_days - 1)
     paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
 
@@ -140,8 +140,7 @@ def compute_dynamic_reorder(store, as_of: date, lookback_days: int = 30) -> int:
             SaleItem.objects.filter(
                 sale__store=store,
                 sale__status__in=paid_statuses,
-                sale__created_at__date__gte=start_date,
-                sale__created_at__date__lte=as_of,
+                **date_range_filter("sale__created_at", start_date, as_of, tz=tz),
             )
             .values("product_id")
             .annotate(qty=Coalesce(Sum("quantity"), Value(0)))
@@ -152,10 +151,27 @@ def compute_dynamic_reorder(store, as_of: date, lookback_days: int = 30) -> int:
     safety_days = int(getattr(settings, "DYNAMIC_REORDER_SAFETY_DAYS", 3))
     coverage_multiplier = _safe_decimal(getattr(settings, "DYNAMIC_REORDER_TARGET_MULTIPLIER", "1.10"), default="1.10")
 
+    # Daily demand forecast over the replenishment window, when available
+    # (the forecast runs before reorder in the analytics pipeline).
+    forecast_map = {
+        row["product_id"]: row["qty"] / row["days"]
+        for row in (
+            SalesForecast.objects.filter(
+                store=store,
+                forecast_date__gt=as_of,
+                forecast_date__lte=as_of + timedelta(days=lead_time_days + safety_days),
+            )
+            .values("product_id")
+            .annotate(qty=Sum("predicted_qty"), days=Count("id"))
+        )
+    }
+
     to_create = []
     for stock in ProductStock.objects.filter(store=store).select_related("product"):
-        sold_qty = sales_map.get(stock.product_id, Decimal("0.00"))
-        avg_daily_sales = sold_qty / Decimal(str(lookback_days))
+        avg_daily_sales = forecast_map.get(stock.product_id)
+        if avg_daily_sales is None:
+            sold_qty = sales_map.get(stock.product_id, Decimal("0.00"))
+            avg_daily_sales = sold_qty / Decimal(str(lookback_days))
         reorder_point = avg_daily_sales * Decimal(str(lead_time_days + safety_days))
         current_available = _safe_decimal(stock.available_qty)
         target_stock = reorder_point * coverage_multiplier
@@ -189,20 +205,32 @@ def compute_dynamic_reorder(store, as_of: date, lookback_days: int = 30) -> int:
             )
         )
 
-    ReorderRecommendation.objects.filter(store=store, computed_for=as_of).delete()
-    if to_create:
-        ReorderRecommendation.objects.bulk_create(to_create, batch_size=500)
+    written = write_snapshot(
+        ReorderRecommendation.objects.filter(store=store, computed_for=as_of),
+        to_create,
+        key_fields=("store_id", "product_id", "computed_for"),
+        value_fields=(
+            "avg_daily_sales",
+            "lead_time_days",
+            "safety_days",
+            "reorder_point",
+            "current_available",
+            "suggested_order_qty",
+            "days_of_cover",
+            "urgency",
+        ),
+    )
 
     logger.info(
-        "Dynamic reorder computed for store %s @ %s: %d rows",
+        "Dynamic reorder computed for store %s @ %s: %d rows, %d changed",
         store,
         as_of,
         len(to_create),
+        written.changed,
     )
     return len(to_create)
 
 
-@transaction.atomic
 def compute_credit_scores(store, as_of: date) -> int:
     """Compute customer credit scoring snapshots."""
     if not _feature_enabled(store, "credit_scoring"):
@@ -282,28 +310,47 @@ def compute_credit_scores(store, as_of: date) -> int:
             )
         )
 
-    CustomerCreditScore.objects.filter(store=store, computed_for=as_of).delete()
-    if to_create:
-        CustomerCreditScore.objects.bulk_create(to_create, batch_size=500)
+    written = write_snapshot(
+        CustomerCreditScore.objects.filter(store=store, computed_for=as_of),
+        to_create,
+        key_fields=("store_id", "account_id", "computed_for"),
+        value_fields=(
+            "customer_id",
+            "score",
+            "grade",
+            "utilization_rate",
+            "payment_ratio",
+            "overdue_ratio",
+            "overdue_amount",
+            "balance",
+            "recommended_limit",
+        ),
+    )
 
     logger.info(
-        "Credit scores computed for store %s @ %s: %d rows",
+        "Credit scores computed for store %s @ %s: %d rows, %d changed",
         store,
         as_of,
         len(to_create),
+        written.changed,
     )
     return len(to_create)
 
 
-@transaction.atomic
 def compute_sales_forecast(store, as_of: date, lookback_days: int = 60, horizon_days: int = 14) -> int:
-    """Compute simple product-level forecasts using moving averages."""
+    """Compute product-level daily forecasts (see ``analytics.forecasting``).
+
+    The model of each product is chosen by backtest among moving averages,
+    exponential smoothing, Croston and day-of-week seasonality.
+    """
     if not _feature_enabled(store, "sales_forecast"):
         logger.info("Sales forecast skipped for store %s: feature disabled.", store)
         return 0
+    from analytics.forecasting import forecast_demand, load_demand_matrix
     from sales.models import Sale, SaleItem
     from stock.models import ProductStock
 
+    tz = store_timezone(store)
     start_date = as_of - timedelta(days=lookback_days - 1)
     paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
 
@@ -311,255 +358,60 @@ def compute_sales_forecast(store, as_of: date, lookback_days: int = 60, horizon_
         SaleItem.objects.filter(
             sale__store=store,
             sale__status__in=paid_statuses,
-            sale__created_at__date__gte=start_date,
-            sale__created_at__date__lte=as_of,
+            **date_range_filter("sale__created_at", start_date, as_of, tz=tz),
         )
-        .annotate(sale_day=TruncDate("sale__created_at"))
+        .annotate(sale_day=TruncDate("sale__created_at", tzinfo=tz))
         .values("product_id", "sale_day")
         .annotate(qty=Coalesce(Sum("quantity"), Value(0)))
+        .values_list("product_id", "sale_day", "qty")
+        .order_by()
     )
-
-    product_daily = {}
-    for row in daily_rows:
-        pmap = product_daily.setdefault(row["product_id"], {})
-        pmap[row["sale_day"]] = _safe_decimal(row["qty"])
-
-    stock_product_ids = list(ProductStock.objects.filter(store=store).values_list("product_id", flat=True))
-    product_ids = set(stock_product_ids) | set(product_daily.keys())
+    stock_product_ids = ProductStock.objects.filter(store=store).values_list("product_id", flat=True)
+    product_ids, history = load_demand_matrix(daily_rows, stock_product_ids, start_date, lookback_days)
+    result = forecast_demand(product_ids, history, start_date, horizon_days)
 
     forecast_dates = [as_of + timedelta(days=i) for i in range(1, horizon_days + 1)]
-    SalesForecast.objects.filter(
-        store=store,
-        method=SalesForecast.Method.MOVING_AVG,
-        forecast_date__in=forecast_dates,
-    ).delete()
-
     to_create = []
-    day_list = [start_date + timedelta(days=i) for i in range(lookback_days)]
-    for product_id in product_ids:
-        day_qty = [product_daily.get(product_id, {}).get(d, Decimal("0.00")) for d in day_list]
-        ma7 = sum(day_qty[-7:]) / Decimal("7")
-        ma30 = sum(day_qty[-30:]) / Decimal("30")
-        non_zero_days = sum(1 for q in day_qty if q > 0)
-        confidence = min(Decimal("1.0000"), (Decimal(str(non_zero_days)) / Decimal(str(lookback_days))) + Decimal("0.20"))
-        base_prediction = max(ma7, ma30 * Decimal("0.80"))
-
-        for fd in forecast_dates:
+    for i, product_id in enumerate(result.product_ids):
+        method = str(result.methods[i])
+        ma7 = Decimal(f"{result.ma_7d[i]:.4f}")
+        ma30 = Decimal(f"{result.ma_30d[i]:.4f}")
+        confidence = Decimal(f"{result.confidence[i]:.4f}")
+        for fd, qty in zip(forecast_dates, result.predictions[i]):
             to_create.append(
                 SalesForecast(
                     store=store,
                     product_id=product_id,
                     forecast_date=fd,
-                    method=SalesForecast.Method.MOVING_AVG,
-                    predicted_qty=base_prediction.quantize(Decimal("0.01")),
-                    ma_7d=ma7.quantize(Decimal("0.0001")),
-                    ma_30d=ma30.quantize(Decimal("0.0001")),
-                    confidence=confidence.quantize(Decimal("0.0001")),
+                    method=method,
+                    predicted_qty=Decimal(f"{qty:.2f}"),
+                    ma_7d=ma7,
+                    ma_30d=ma30,
+                    confidence=confidence,
                 )
             )
 
-    if to_create:
-        SalesForecast.objects.bulk_create(to_create, batch_size=1000)
+    # Keyed by method too: rows of a product whose chosen model changed
+    # are replaced.
+    written = write_snapshot(
+        SalesForecast.objects.filter(store=store, forecast_date__in=forecast_dates),
+        to_create,
+        key_fields=("store_id", "product_id", "forecast_date", "method"),
+        value_fields=("predicted_qty", "ma_7d", "ma_30d", "confidence"),
+        batch_size=2000,
+    )
 
     logger.info(
-        "Sales forecast computed for store %s @ %s horizon=%d: %d rows",
+        "Sales forecast computed for store %s @ %s horizon=%d: %d rows, %d changed",
         store,
         as_of,
         horizon_days,
         len(to_create),
+        written.changed,
     )
     return len(to_create)
 
 
-def _create_fraud_event(
-    *,
-    store,
-    detected_on: date,
-    rule_code: str,
-    severity: str,
-    risk_score: int,
-    title: str,
-    description: str,
-    sale=None,
-    payment=None,
-    payload=None,
-) -> bool:
-    exists = FraudEvent.objects.filter(
-        store=store,
-        detected_on=detected_on,
-        rule_code=rule_code,
-        sale=sale,
-        payment=payment,
-    ).exists()
-    if exists:
-        return False
-
-    FraudEvent.objects.create(
-        store=store,
-        sale=sale,
-        payment=payment,
-        detected_on=detected_on,
-        rule_code=rule_code,
-        severity=severity,
-        risk_score=max(0, min(100, int(risk_score))),
-        title=title,
-        description=description,
-        payload=payload or {},
-    )
-    return True
-
-
-@transaction.atomic
-def detect_fraud_signals(store, date_from: date, date_to: date) -> int:
-    """Detect fraud-like events using deterministic rules and stats."""
-    if not _feature_enabled(store, "fraud_detection"):
-        logger.info("Fraud detection skipped for store %s: feature disabled.", store)
-        return 0
-    from cashier.models import Payment
-    from sales.models import Refund, Sale
-
-    created = 0
-    paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
-    manager_threshold = Decimal(str(getattr(settings, "MAX_DISCOUNT_PERCENT_MANAGER", 50)))
-
-    suspicious_discount_sales = Sale.objects.filter(
-        store=store,
-        status__in=paid_statuses,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-        discount_percent__gt=manager_threshold,
-    )
-    for sale in suspicious_discount_sales:
-        created += int(
-            _create_fraud_event(
-                store=store,
-                detected_on=sale.created_at.date(),
-                rule_code="HIGH_DISCOUNT_THRESHOLD",
-                severity=FraudEvent.Severity.CRITICAL,
-                risk_score=90,
-                title=f"Remise elevee {sale.discount_percent}%",
-                description=f"Vente {sale.invoice_number or sale.pk} depasse le seuil manager.",
-                sale=sale,
-                payload={
-                    "discount_percent": str(sale.discount_percent),
-                    "threshold": str(manager_threshold),
-                    "total": str(sale.total),
-                },
-            )
-        )
-
-    baseline_start = date_from - timedelta(days=30)
-    baseline_values = list(
-        Sale.objects.filter(
-            store=store,
-            status__in=paid_statuses,
-            created_at__date__gte=baseline_start,
-            created_at__date__lt=date_from,
-        ).values_list("total", flat=True)
-    )
-    if len(baseline_values) >= 10:
-        baseline_series = [float(v) for v in baseline_values]
-        base_mean = mean(baseline_series)
-        base_std = pstdev(baseline_series)
-        if base_std > 0:
-            high_total_threshold = Decimal(str(base_mean + (3 * base_std)))
-            outlier_sales = Sale.objects.filter(
-                store=store,
-                status__in=paid_statuses,
-                created_at__date__gte=date_from,
-                created_at__date__lte=date_to,
-                total__gt=high_total_threshold,
-            )
-            for sale in outlier_sales:
-                created += int(
-                    _create_fraud_event(
-                        store=store,
-                        detected_on=sale.created_at.date(),
-                        rule_code="SALE_AMOUNT_OUTLIER",
-                        severity=FraudEvent.Severity.WARNING,
-                        risk_score=75,
-                        title="Montant de vente atypique",
-                        description=f"Vente {sale.invoice_number or sale.pk} au-dessus du seuil statistique.",
-                        sale=sale,
-                        payload={
-                            "sale_total": str(sale.total),
-                            "threshold": str(high_total_threshold.quantize(Decimal("0.01"))),
-                        },
-                    )
-                )
-
-    split_rows = (
-        Payment.objects.filter(
-            store=store,
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to,
-        )
-        .values("sale_id")
-        .annotate(lines=Count("id"), total=Coalesce(Sum("amount"), Value(Decimal("0.00"))))
-        .filter(lines__gte=3)
-    )
-    split_map = {row["sale_id"]: row for row in split_rows}
-    if split_map:
-        sales = Sale.objects.filter(pk__in=list(split_map.keys()))
-        for sale in sales:
-            row = split_map.get(sale.pk)
-            if not row:
-                continue
-            if _safe_decimal(row["total"]) >= _safe_decimal(sale.total):
-                created += int(
-                    _create_fraud_event(
-                        store=store,
-                        detected_on=sale.created_at.date(),
-                        rule_code="SPLIT_PAYMENT_PATTERN",
-                        severity=FraudEvent.Severity.WARNING,
-                        risk_score=65,
-                        title="Pattern de paiement fragmente",
-                        description=f"{row['lines']} paiements pour une meme vente.",
-                        sale=sale,
-                        payload={"lines": row["lines"], "paid_total": str(row["total"]), "sale_total": str(sale.total)},
-                    )
-                )
-
-    refunds = Refund.objects.filter(
-        store=store,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    ).select_related("sale")
-    for refund in refunds:
-        sale = refund.sale
-        if not sale:
-            continue
-        if sale.total > 0 and refund.amount >= (sale.total * Decimal("0.70")):
-            age_hours = (refund.created_at - sale.created_at).total_seconds() / 3600
-            if age_hours <= 24:
-                created += int(
-                    _create_fraud_event(
-                        store=store,
-                        detected_on=refund.created_at.date(),
-                        rule_code="QUICK_HIGH_REFUND",
-                        severity=FraudEvent.Severity.CRITICAL,
-                        risk_score=92,
-                        title="Remboursement rapide eleve",
-                        description=f"Remboursement {refund.amount} dans les 24h de la vente.",
-                        sale=sale,
-                        payload={
-                            "refund_amount": str(refund.amount),
-                            "sale_total": str(sale.total),
-                            "hours_since_sale": round(age_hours, 2),
-                        },
-                    )
-                )
-
-    logger.info(
-        "Fraud signals computed for store %s (%s -> %s): %d new events",
-        store,
-        date_from,
-        date_to,
-        created,
-    )
-    return created
-
-
 def build_strategic_dashboard(store, date_from: date, date_to: date) -> dict:
     """Build advanced KPI payload for the executive dashboard."""
     from reports.services import get_sales_report
@@ -649,13 +501,13 @@ def build_strategic_dashboard(store, date_from: date, date_to: date) -> dict:
         )
         forecast_next_7d_qty = forecast_rows.aggregate(total=Coalesce(Sum("predicted_qty"), Value(Decimal("0.00"))))["total"]
 
+    tz = store_timezone(store)
     paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
     stock_out_count = ProductStock.objects.filter(store=store, quantity__lte=0).count()
     active_sales = Sale.objects.filter(
         store=store,
         status__in=paid_statuses,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
+        **date_range_filter("created_at", date_from, date_to, tz=tz),
     ).count()
 
     credit_grade_breakdown = {
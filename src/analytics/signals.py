@@ -1,42 +1,44 @@
-"""Signals for incremental customer intelligence refresh."""
+"""Signals for incremental customer intelligence refresh, fraud scoring and
+the product co-occurrence index."""
 from __future__ import annotations
 
+import logging
+
 from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from analytics.refresh_queue import request_customer_refresh
 from cashier.models import Payment
+from core.outbox import outbox_enabled_for_store, outbox_handler, publish_event
 from credits.models import CreditLedgerEntry, PaymentSchedule
-from sales.models import Refund
+from sales.models import Refund, Sale
 
+logger = logging.getLogger("boutique")
 
-def _refresh_customer_intelligence_async(store_id, customer_id):
-    if not store_id or not customer_id:
-        return
 
-    def _dispatch():
-        try:
-            from analytics.tasks import refresh_customer_intelligence_customer
+@outbox_handler("analytics.refresh_customer")
+def handle_refresh_customer(payload):
+    request_customer_refresh(payload["store_id"], payload["customer_id"])
 
-            refresh_customer_intelligence_customer.delay(str(store_id), str(customer_id))
-            return
-        except Exception:
-            # Fallback in case broker/worker is unavailable.
-            from analytics.customer_intelligence import refresh_customer_intelligence_for_customer
-            from customers.models import Customer
-            from stores.models import Store
 
-            store = Store.objects.filter(pk=store_id, is_active=True).first()
-            customer = Customer.objects.filter(pk=customer_id, is_default=False).first()
-            if store and customer:
-                refresh_customer_intelligence_for_customer(
-                    store=store,
-                    customer=customer,
-                    actor=None,
-                    force_recommendations_refresh=True,
-                )
+def _refresh_customer_intelligence_async(store_id, customer_id, store=None):
+    """Queue a debounced refresh of the customer once the change commits."""
+    if not store_id or not customer_id:
+        return
 
-    transaction.on_commit(_dispatch)
+    if store is not None and outbox_enabled_for_store(store):
+        key = f"{store_id}:{customer_id}"
+        publish_event(
+            "analytics.refresh_customer",
+            aggregate_key=f"customers.Customer:{customer_id}",
+            payload={"store_id": str(store_id), "customer_id": str(customer_id)},
+            store=store,
+            dedupe_key=f"analytics.refresh_customer:{key}",
+        )
+        return
+
+    transaction.on_commit(lambda: request_customer_refresh(store_id, customer_id))
 
 
 @receiver(post_save, sender=Payment)
@@ -46,7 +48,11 @@ def payment_saved_refresh_customer_intelligence(sender, instance: Payment, creat
     sale = getattr(instance, "sale", None)
     customer_id = getattr(sale, "customer_id", None)
     store_id = getattr(instance, "store_id", None)
-    _refresh_customer_intelligence_async(store_id=store_id, customer_id=customer_id)
+    _refresh_customer_intelligence_async(
+        store_id=store_id,
+        customer_id=customer_id,
+        store=getattr(sale, "store", None),
+    )
 
 
 @receiver(post_save, sender=Refund)
@@ -82,3 +88,41 @@ def payment_schedule_saved_refresh_customer_intelligence(sender, instance: Payme
         customer_id=getattr(account, "customer_id", None),
     )
 
+
+
+def _score_fraud_on_commit(scorer, instance):
+    def _score():
+        try:
+            scorer(instance)
+        except Exception:
+            # The nightly batch detection catches anything missed here.
+            logger.warning("Real-time fraud scoring failed for %r", instance, exc_info=True)
+
+    transaction.on_commit(_score)
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved_score_fraud(sender, instance: Payment, created, **kwargs):
+    if created:
+        from analytics.fraud import score_payment
+
+        _score_fraud_on_commit(score_payment, instance)
+
+
+@receiver(post_save, sender=Refund)
+def refund_saved_score_fraud(sender, instance: Refund, created, **kwargs):
+    if created:
+        from analytics.fraud import score_refund
+
+        _score_fraud_on_commit(score_refund, instance)
+
+
+@receiver(post_save, sender=Sale)
+def sale_saved_update_cooccurrence_index(sender, instance: Sale, created, update_fields=None, **kwargs):
+    from analytics.cooccurrence import INDEXED_STATUSES, schedule_index_update
+
+    if instance.status not in INDEXED_STATUSES:
+        return
+    if update_fields is not None and "status" not in update_fields:
+        return
+    schedule_index_update(instance.store)
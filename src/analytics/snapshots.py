@@ -0,0 +1,83 @@
+"""Diff-based persistence for analytics snapshot tables.
+
+ABC classes, reorder recommendations, credit scores and forecasts are
+recomputed in full, but between two runs most rows do not change.
+:func:`write_snapshot` compares the new rows with the stored ones and only
+inserts new keys, updates changed rows and deletes vanished ones, in one
+short transaction, so a refresh writes few rows and readers never see a
+half-written snapshot.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.utils import timezone
+
+
+@dataclass
+class SnapshotWriteResult:
+    created: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.created + self.updated + self.deleted
+
+    @property
+    def total(self) -> int:
+        """Rows in the snapshot after the write."""
+        return self.created + self.updated + self.unchanged
+
+
+def write_snapshot(queryset, rows, key_fields, value_fields, *, batch_size=500) -> SnapshotWriteResult:
+    """Make the rows selected by *queryset* equal to the unsaved *rows*.
+
+    *key_fields* (attribute names, e.g. ``"product_id"``) identify a row and
+    must form a unique constraint of the model; *value_fields* are compared
+    and updated.  Rows of *queryset* whose key is not in *rows* are deleted.
+    """
+    model = queryset.model
+    key_fields = list(key_fields)
+    value_fields = list(value_fields)
+    new_rows = {tuple(getattr(row, f) for f in key_fields): row for row in rows}
+    result = SnapshotWriteResult()
+
+    with transaction.atomic():
+        stored = {
+            tuple(values[f] for f in key_fields): values
+            for values in queryset.order_by().values("pk", *key_fields, *value_fields)
+        }
+
+        to_create, to_update = [], []
+        now = timezone.now()
+        for key, row in new_rows.items():
+            current = stored.pop(key, None)
+            if current is None:
+                to_create.append(row)
+            elif any(getattr(row, f) != current[f] for f in value_fields):
+                row.pk = current["pk"]
+                row.updated_at = now
+                to_update.append(row)
+            else:
+                result.unchanged += 1
+
+        stale = [values["pk"] for values in stored.values()]
+        for start in range(0, len(stale), batch_size):
+            result.deleted += model.objects.filter(pk__in=stale[start:start + batch_size]).delete()[0]
+        if to_update:
+            model.objects.bulk_update(to_update, value_fields + ["updated_at"], batch_size=batch_size)
+        if to_create:
+            # Upsert, in case a concurrent refresh inserted the same keys.
+            model.objects.bulk_create(
+                to_create,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=key_fields,
+                update_fields=value_fields + ["updated_at"],
+            )
+
+    result.created, result.updated = len(to_create), len(to_update)
+    return result
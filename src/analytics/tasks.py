@@ -1,16 +1,23 @@
 """Celery tasks for analytics computation pipeline."""
+import logging
+import time
 from datetime import date, timedelta
 
-from celery import shared_task
+from celery import chain, group, shared_task
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db.models import Count, F, Sum
+from django.utils import timezone
 
 from analytics import services
 from analytics.customer_intelligence import (
-    list_churn_risk_customers,
-    list_credit_risk_customers,
-    list_dormant_customers,
     refresh_customer_intelligence_for_customer,
     refresh_top_clients_month,
 )
+from analytics.customer_intelligence_batch import refresh_store_customer_intelligence
+from analytics.refresh_queue import flush_pending_refreshes
+
+logger = logging.getLogger("boutique")
 
 
 def _iter_stores(store_id=None):
@@ -74,23 +81,266 @@ def detect_fraud(store_id=None, lookback_days=1):
     return f"fraud events={total}"
 
 
+# ---------------------------------------------------------------------------
+# Full pipeline: one Celery subtask per store and stage
+# ---------------------------------------------------------------------------
+
+def _stage_abc(store, as_of):
+    return services.compute_abc_analysis(store, as_of - timedelta(days=29), as_of)
+
+
+def _stage_reorder(store, as_of):
+    return services.compute_dynamic_reorder(store, as_of=as_of, lookback_days=30)
+
+
+def _stage_credit_scores(store, as_of):
+    return services.compute_credit_scores(store, as_of=as_of)
+
+
+def _stage_forecast(store, as_of):
+    return services.compute_sales_forecast(store, as_of=as_of, lookback_days=60, horizon_days=14)
+
+
+def _stage_fraud(store, as_of):
+    return services.detect_fraud_signals(store, date_from=as_of, date_to=as_of)
+
+
+# Stages of one store run in this order; stores run in parallel.
+PIPELINE_STAGES = {
+    "abc": _stage_abc,
+    "forecast": _stage_forecast,
+    "reorder": _stage_reorder,  # reads the forecast
+    "credit_scores": _stage_credit_scores,
+    "fraud": _stage_fraud,
+}
+
+_STEP_SOFT_TIME_LIMIT = getattr(settings, "ANALYTICS_PIPELINE_STEP_TIME_LIMIT", 900)
+
+
+@shared_task(
+    name="analytics.tasks.run_pipeline_step",
+    soft_time_limit=_STEP_SOFT_TIME_LIMIT,
+    time_limit=_STEP_SOFT_TIME_LIMIT + 60,
+)
+def run_pipeline_step(step_id):
+    """Run one stage for one store and record its outcome.
+
+    Errors are recorded on the step instead of raised, so the rest of the
+    store's chain and the other stores carry on.
+    """
+    from analytics.models import AnalyticsPipelineRun, AnalyticsPipelineStep
+
+    Step = AnalyticsPipelineStep
+    step = Step.objects.select_related("run", "store").filter(pk=step_id, status=Step.Status.PENDING).first()
+    if step is None:
+        return "skipped"
+
+    started = time.monotonic()
+    rows, error = 0, ""
+    try:
+        rows = PIPELINE_STAGES[step.stage](step.store, step.run.as_of) or 0
+        status = Step.Status.SUCCESS
+    except SoftTimeLimitExceeded:
+        status, error = Step.Status.TIMEOUT, f"Time limit of {_STEP_SOFT_TIME_LIMIT}s exceeded."
+    except Exception as exc:
+        logger.exception("Analytics stage %s failed for store %s", step.stage, step.store_id)
+        status, error = Step.Status.FAILED, f"{type(exc).__name__}: {exc}"[:2000]
+
+    Step.objects.filter(pk=step.pk).update(
+        status=status,
+        rows=rows,
+        error=error,
+        duration_ms=int((time.monotonic() - started) * 1000),
+        updated_at=timezone.now(),
+    )
+    counter = "completed_steps" if status == Step.Status.SUCCESS else "failed_steps"
+    AnalyticsPipelineRun.objects.filter(pk=step.run_id).update(**{counter: F(counter) + 1})
+    _finalize_if_complete(step.run_id)
+    return f"{step.stage} {status} rows={rows}"
+
+
+@shared_task(name="analytics.tasks.pipeline_step_lost")
+def pipeline_step_lost(step_id):
+    """Errback of :func:`run_pipeline_step` when its task died.
+
+    A hard time limit or a lost worker kills the task before it records
+    its outcome, which also stops the store's chain.  The step is recorded
+    as TIMEOUT and the remaining stages of the store are chained again.
+    """
+    from analytics.models import AnalyticsPipelineRun, AnalyticsPipelineStep
+
+    Step = AnalyticsPipelineStep
+    step = Step.objects.filter(pk=step_id).first()
+    if step is None:
+        return "skipped"
+
+    lost = Step.objects.filter(pk=step.pk, status=Step.Status.PENDING).update(
+        status=Step.Status.TIMEOUT,
+        error="Step task died before reporting (hard time limit or lost worker).",
+        updated_at=timezone.now(),
+    )
+    if lost:
+        AnalyticsPipelineRun.objects.filter(pk=step.run_id).update(failed_steps=F("failed_steps") + 1)
+
+    order = list(PIPELINE_STAGES)
+    remaining = sorted(
+        (
+            other for other in Step.objects.filter(
+                run_id=step.run_id, store_id=step.store_id, status=Step.Status.PENDING,
+            )
+            if order.index(other.stage) > order.index(step.stage)
+        ),
+        key=lambda other: order.index(other.stage),
+    )
+    if remaining:
+        _store_chain([str(other.pk) for other in remaining]).apply_async()
+    _finalize_if_complete(step.run_id)
+    return f"{step.stage} lost, {len(remaining)} stage(s) requeued"
+
+
+def _store_chain(step_ids):
+    """Chain the steps of one store, each with :func:`pipeline_step_lost` as errback."""
+    signatures = []
+    for step_id in step_ids:
+        signature = run_pipeline_step.si(step_id)
+        signature.on_error(pipeline_step_lost.si(step_id))
+        signatures.append(signature)
+    return chain(*signatures)
+
+
+def _finalize_if_complete(run_id):
+    """Finalize the run once every step has reported."""
+    from analytics.models import AnalyticsPipelineRun
+
+    complete = (
+        AnalyticsPipelineRun.objects.filter(pk=run_id, status=AnalyticsPipelineRun.Status.RUNNING)
+        .filter(total_steps__lte=F("completed_steps") + F("failed_steps"))
+        .exists()
+    )
+    if complete:
+        finalize_pipeline_run(str(run_id))
+
+
+@shared_task(name="analytics.tasks.finalize_pipeline_run")
+def finalize_pipeline_run(run_id):
+    """Close a pipeline run and store its per-stage summary."""
+    from analytics.models import AnalyticsPipelineRun, AnalyticsPipelineStep
+
+    Run, Step = AnalyticsPipelineRun, AnalyticsPipelineStep
+    run = Run.objects.filter(pk=run_id).first()
+    if run is None:
+        return "skipped"
+
+    # Steps killed by the hard time limit never report back.
+    run.steps.filter(status=Step.Status.PENDING).update(
+        status=Step.Status.TIMEOUT, error="Step did not report back.", updated_at=timezone.now(),
+    )
+
+    stages = {}
+    for row in run.steps.values("stage", "status").annotate(n=Count("id"), rows=Sum("rows")):
+        stage = stages.setdefault(row["stage"], {"rows": 0, "success": 0, "failed": 0})
+        if row["status"] == Step.Status.SUCCESS:
+            stage["success"] += row["n"]
+            stage["rows"] += row["rows"] or 0
+        else:
+            stage["failed"] += row["n"]
+    failures = [
+        {"store": str(store_id), "stage": stage, "status": status, "error": error}
+        for store_id, stage, status, error in run.steps.exclude(status=Step.Status.SUCCESS)
+        .order_by("store_id", "stage")
+        .values_list("store_id", "stage", "status", "error")
+    ]
+
+    run.completed_steps = sum(stage["success"] for stage in stages.values())
+    run.failed_steps = sum(stage["failed"] for stage in stages.values())
+    if not run.failed_steps:
+        run.status = Run.Status.SUCCESS
+    elif run.completed_steps:
+        run.status = Run.Status.PARTIAL
+    else:
+        run.status = Run.Status.FAILED
+    run.summary = {"stages": stages, "failures": failures}
+    run.finished_at = timezone.now()
+    run.save(update_fields=[
+        "completed_steps", "failed_steps", "status", "summary", "finished_at", "updated_at",
+    ])
+    return f"pipeline {run.status} ok={run.completed_steps} failed={run.failed_steps}"
+
+
 @shared_task(name="analytics.tasks.run_full_pipeline")
-def run_full_pipeline(store_id=None):
-    """Run the complete daily analytics refresh for one/all stores."""
-    refresh_abc_analysis(store_id=store_id)
-    refresh_dynamic_reorder(store_id=store_id)
-    refresh_credit_scores(store_id=store_id)
-    refresh_sales_forecast(store_id=store_id)
-    detect_fraud(store_id=store_id)
-    return "ok"
+def run_full_pipeline(store_id=None, as_of=None):
+    """Run the complete daily analytics refresh for one/all stores.
+
+    Each store runs its ``PIPELINE_STAGES`` as a chain of
+    :func:`run_pipeline_step` subtasks and the chains of all stores run in
+    parallel.  The step that reports last calls
+    :func:`finalize_pipeline_run`, which writes the run summary; a step
+    whose task dies is reported by its errback instead, and runs that never
+    complete are closed by :func:`sweep_stale_pipeline_runs`.  Progress is
+    tracked on :class:`AnalyticsPipelineRun`.
+    """
+    from analytics.models import AnalyticsPipelineRun, AnalyticsPipelineStep
+
+    as_of_date = date.fromisoformat(as_of) if as_of else date.today()
+    store_ids = list(_iter_stores(store_id).values_list("pk", flat=True))
+    run = AnalyticsPipelineRun.objects.create(
+        as_of=as_of_date,
+        stages=list(PIPELINE_STAGES),
+        store_count=len(store_ids),
+        total_steps=len(store_ids) * len(PIPELINE_STAGES),
+    )
+    steps = AnalyticsPipelineStep.objects.bulk_create([
+        AnalyticsPipelineStep(run=run, store_id=pk, stage=stage)
+        for pk in store_ids
+        for stage in PIPELINE_STAGES
+    ])
+
+    if not steps:
+        finalize_pipeline_run(str(run.pk))
+        return str(run.pk)
+
+    chains = {}
+    for step in steps:
+        chains.setdefault(step.store_id, []).append(str(step.pk))
+    group(_store_chain(step_ids) for step_ids in chains.values()).apply_async()
+    return str(run.pk)
+
+
+@shared_task(name="analytics.tasks.sweep_stale_pipeline_runs")
+def sweep_stale_pipeline_runs():
+    """Finalize pipeline runs still RUNNING after ``ANALYTICS_PIPELINE_RUN_TIMEOUT`` seconds."""
+    from analytics.models import AnalyticsPipelineRun
+
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, "ANALYTICS_PIPELINE_RUN_TIMEOUT", 21600))
+    stale = list(
+        AnalyticsPipelineRun.objects.filter(
+            status=AnalyticsPipelineRun.Status.RUNNING, created_at__lt=cutoff,
+        ).values_list("pk", flat=True)
+    )
+    for run_id in stale:
+        logger.warning("Analytics pipeline run %s never completed, finalizing it", run_id)
+        finalize_pipeline_run(str(run_id))
+    return f"stale pipeline runs finalized={len(stale)}"
+
+
+@shared_task(name="analytics.tasks.update_cooccurrence_indexes")
+def update_cooccurrence_indexes(store_id=None):
+    """Fold recently paid sales into each store's co-occurrence index."""
+    from analytics.cooccurrence import update_cooccurrence_index
+
+    indexed = 0
+    for store in _iter_stores(store_id):
+        indexed += update_cooccurrence_index(store)
+    return f"cooccurrence index updated sales={indexed}"
 
 
 @shared_task(name="analytics.tasks.refresh_customer_intelligence_store")
 def refresh_customer_intelligence_store(store_id=None, lookback_days=365):
-    """Daily full recompute for customer intelligence snapshots."""
-    from customers.models import Customer
-    from sales.models import Sale
+    """Daily full recompute for customer intelligence snapshots.
 
+    Uses the store-wide batch engine; per-customer recomputes stay on
+    :func:`refresh_customer_intelligence_customer`.
+    """
     as_of = date.today()
     total_customers = 0
     total_dormant = 0
@@ -98,51 +348,12 @@ def refresh_customer_intelligence_store(store_id=None, lookback_days=365):
     total_churn_risk = 0
 
     for store in _iter_stores(store_id):
-        window_start = as_of - timedelta(days=max(30, int(lookback_days)))
-        customer_ids = list(
-            Sale.objects.filter(
-                store=store,
-                customer_id__isnull=False,
-                customer__is_default=False,
-                created_at__date__gte=window_start,
-                created_at__date__lte=as_of,
-            )
-            .values_list("customer_id", flat=True)
-            .distinct()
-        )
-        customers = Customer.objects.filter(id__in=customer_ids, is_default=False)
-
-        for customer in customers:
-            refresh_customer_intelligence_for_customer(
-                store=store,
-                customer=customer,
-                as_of=as_of,
-                actor=None,
-                force_recommendations_refresh=True,
-            )
-            total_customers += 1
-
+        result = refresh_store_customer_intelligence(store, as_of=as_of, lookback_days=int(lookback_days))
+        total_customers += result.customers
+        total_dormant += result.dormant
+        total_credit_risk += result.credit_risk
+        total_churn_risk += result.churn
         refresh_top_clients_month(store=store, period_month=as_of.replace(day=1), limit=10, actor=None)
-        total_dormant += len(list_dormant_customers(store=store, as_of=as_of, actor=None))
-        total_credit_risk += len(
-            list_credit_risk_customers(
-                store=store,
-                as_of=as_of,
-                min_risk_score=45,
-                limit=200,
-                actor=None,
-            )
-        )
-        total_churn_risk += len(
-            list_churn_risk_customers(
-                store=store,
-                as_of=as_of,
-                window_days=30,
-                drop_threshold_pct=30,
-                limit=200,
-                actor=None,
-            )
-        )
 
     return (
         "customer intelligence refreshed "
@@ -151,6 +362,20 @@ def refresh_customer_intelligence_store(store_id=None, lookback_days=365):
     )
 
 
+@shared_task(name="analytics.tasks.flush_customer_refreshes")
+def flush_customer_refreshes(slot=None):
+    """Run the debounced customer refreshes queued by ``analytics.signals``.
+
+    Queued for each slot when it closes; the periodic run (no *slot*)
+    catches slots whose flush was lost.
+    """
+    result = flush_pending_refreshes(slot)
+    return (
+        "customer refreshes flushed "
+        f"customers={result.customers} stores={result.stores} merged={result.merged}"
+    )
+
+
 @shared_task(name="analytics.tasks.refresh_customer_intelligence_customer")
 def refresh_customer_intelligence_customer(store_id, customer_id, as_of=None):
     """Incremental recompute for one customer after payment/refund/credit events."""
@@ -2,10 +2,18 @@
 
 from django.conf import settings
 from django.middleware.csrf import CsrfViewMiddleware
+from django.utils.translation import gettext_lazy as _
 from rest_framework import exceptions
 from rest_framework.request import Request
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts.auth_cache import get_cached_user
+
+# Attribute of the Django ``HttpRequest`` holding per-token results, so
+# ``core.middleware.JWTAuthMiddleware`` and DRF verify each token only once.
+_RESULTS_ATTR = "_jwt_auth_results"
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -19,6 +27,9 @@ class CookieJWTAuthentication(JWTAuthentication):
     ``None`` (unauthenticated) instead of raising ``AuthenticationFailed``.
     This allows ``AllowAny`` endpoints (like token refresh) to function
     even when the access cookie is stale.
+
+    Token validation results are memoised on the Django request and users
+    are loaded through ``accounts.auth_cache``.
     """
 
     def _enforce_csrf(self, request: Request) -> None:
@@ -29,6 +40,50 @@ class CookieJWTAuthentication(JWTAuthentication):
         if reason:
             raise exceptions.PermissionDenied(f"CSRF Failed: {reason}")
 
+    def authenticate_token(self, django_request, raw_token):
+        """Return ``(user, validated_token)`` for *raw_token* or raise.
+
+        The outcome (including failures) is kept on *django_request*, so a
+        token seen by the middleware is not verified again by DRF.
+        """
+        if isinstance(raw_token, bytes):
+            raw_token = raw_token.decode("latin-1")
+        results = django_request.__dict__.setdefault(_RESULTS_ATTR, {})
+        if raw_token not in results:
+            try:
+                validated_token = self.get_validated_token(raw_token)
+                results[raw_token] = (self.get_user(validated_token), validated_token, None)
+            except (InvalidToken, TokenError, AuthenticationFailed) as exc:
+                results[raw_token] = (None, None, exc)
+
+        user, validated_token, error = results[raw_token]
+        if error is not None:
+            raise error
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from exc
+
+        user = get_cached_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if getattr(api_settings, "CHECK_REVOKE_TOKEN", False):
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed",
+                )
+
+        return user
+
     def authenticate(self, request: Request):
         # 1) Standard Authorization header flow — raise on invalid token
         #    so API clients get a clear 401.
@@ -36,8 +91,7 @@ class CookieJWTAuthentication(JWTAuthentication):
         if header is not None:
             raw_token = self.get_raw_token(header)
             if raw_token is not None:
-                validated_token = self.get_validated_token(raw_token)
-                return self.get_user(validated_token), validated_token
+                return self.authenticate_token(request._request, raw_token)
 
         # 2) Cookie fallback flow — return None on invalid/expired token
         #    so the request can proceed as unauthenticated (needed for
@@ -48,9 +102,9 @@ class CookieJWTAuthentication(JWTAuthentication):
             return None
 
         try:
-            validated_token = self.get_validated_token(raw_cookie_token)
+            user, validated_token = self.authenticate_token(request._request, raw_cookie_token)
         except (InvalidToken, TokenError):
             return None
 
         self._enforce_csrf(request)
-        return self.get_user(validated_token), validated_token
+        return user, validated_token
@@ -0,0 +1,88 @@
+"""Columns of the API ``export-csv`` actions (see :mod:`core.export`).
+
+Registered by name, with the viewset serving them, so that background
+export jobs rebuild the same queryset and file in the worker.
+"""
+from core.export import register_export
+
+
+def _date(value, fmt="%d/%m/%Y"):
+    return value.strftime(fmt) if value else ""
+
+
+def _yes_no(value):
+    return "oui" if value else "non"
+
+
+register_export("categories", [
+    ("name", "Nom"),
+    (lambda o: o.parent.name if o.parent else "", "Categorie parente"),
+    ("description", "Description"),
+    (lambda o: _yes_no(o.is_active), "Actif"),
+], view="api.v1.views.CategoryViewSet", select_related=("parent",))
+
+register_export("marques", [
+    ("name", "Nom"),
+    (lambda o: _yes_no(o.is_active), "Actif"),
+], view="api.v1.views.BrandViewSet")
+
+register_export("produits", [
+    ("name", "Nom"),
+    ("sku", "SKU"),
+    ("barcode", "Code-barres"),
+    (lambda o: o.category.name if o.category else "", "Categorie"),
+    (lambda o: o.brand.name if o.brand else "", "Marque"),
+    ("cost_price", "Prix achat"),
+    ("selling_price", "Prix vente"),
+    ("description", "Description"),
+    (lambda o: _yes_no(o.is_active), "Actif"),
+], view="api.v1.views.ProductViewSet", select_related=("category", "brand"))
+
+register_export("mouvements_stock", [
+    (lambda o: _date(o.created_at, "%d/%m/%Y %H:%M"), "Date"),
+    ("movement_type", "Type"),
+    (lambda o: o.product.name if o.product else "", "Produit"),
+    ("quantity", "Quantite"),
+    ("reference", "Reference"),
+    (lambda o: o.actor.get_full_name() if o.actor else "", "Acteur"),
+], view="api.v1.views.InventoryMovementViewSet", select_related=("product", "actor"))
+
+register_export("clients", [
+    ("first_name", "Prenom"),
+    ("last_name", "Nom"),
+    ("email", "Email"),
+    ("phone", "Telephone"),
+    ("address", "Adresse"),
+    (lambda o: _date(o.created_at), "Date creation"),
+], view="api.v1.views.CustomerViewSet")
+
+register_export("ventes", [
+    ("invoice_number", "Reference"),
+    (lambda o: _date(o.created_at, "%d/%m/%Y %H:%M"), "Date"),
+    (lambda o: o.customer.full_name if o.customer else "", "Client"),
+    (lambda o: o.seller.get_full_name() if o.seller else "", "Vendeur"),
+    ("status", "Statut"),
+    ("total", "Total"),
+    ("discount_amount", "Remise"),
+    ("amount_due", "Net"),
+], view="api.v1.views.SaleViewSet", select_related=("customer", "seller"))
+
+register_export("credits", [
+    (lambda o: o.customer.full_name if o.customer else "", "Client"),
+    ("balance", "Solde"),
+    ("credit_limit", "Limite"),
+    (lambda o: _date(o.created_at), "Date creation"),
+], view="api.v1.views.CustomerAccountViewSet", select_related=("customer",))
+
+register_export("depenses", [
+    ("expense_number", "Numero"),
+    (lambda o: _date(o.expense_date), "Date"),
+    (lambda o: o.category.name if o.category else "", "Categorie"),
+    (lambda o: o.wallet.name if o.wallet else "", "Wallet"),
+    ("description", "Description"),
+    ("supplier_name", "Fournisseur"),
+    ("amount", "Montant"),
+    (lambda o: "Validee" if o.status == "POSTED" else "Annulee", "Statut"),
+    (lambda o: o.created_by.get_full_name() if o.created_by else "", "Cree par"),
+    (lambda o: _date(o.created_at, "%d/%m/%Y %H:%M"), "Date creation"),
+], view="api.v1.expense_views.ExpenseViewSet", select_related=("category", "wallet", "created_by"))
@@ -6,6 +6,8 @@ from api.v1 import views as v1_views
 from api.v1 import analytics_views as analytics_api_views
 from api.v1 import commercial_views as commercial_api_views
 from api.v1 import expense_views as expense_api_views
+from api.v1 import export_views as export_api_views
+from api.v1 import import_views as import_api_views
 from objectives import objective_views as objective_api_views
 from cashier import cashier_analytics_views as cashier_analytics_views
 from stock import stock_analytics_views as stock_analytics_views
@@ -152,6 +154,10 @@ urlpatterns = [
     path('push/unsubscribe/', v1_views.PushUnsubscribeView.as_view(), name='push-unsubscribe'),
     path('alerts/unread-count/', v1_views.UnreadAlertCountView.as_view(), name='alerts-unread-count'),
 
+    # Background product imports (before router to avoid products/ conflict)
+    path('products/import-jobs/<uuid:job_id>/', import_api_views.ProductImportJobDetailView.as_view(), name='product-import-job-detail'),
+    path('products/import-jobs/<uuid:job_id>/errors/', import_api_views.ProductImportJobErrorsView.as_view(), name='product-import-job-errors'),
+
     path('', include(router.urls)),
 
     # Auth endpoints
@@ -173,6 +179,10 @@ urlpatterns = [
     path('reports/stock-trend/', v1_views.StockValueTrendView.as_view(), name='stock-value-trend'),
     path('reports/daily-statistics/', v1_views.DailyStatisticsAPIView.as_view(), name='daily-statistics'),
 
+    # Background exports
+    path('exports/<uuid:job_id>/', export_api_views.ExportJobDetailView.as_view(), name='export-job-detail'),
+    path('exports/<uuid:job_id>/download/', export_api_views.ExportJobDownloadView.as_view(), name='export-job-download'),
+
     # Analytics
     path('analytics/strategic-kpis/', analytics_api_views.StrategicKPIAPIView.as_view(), name='analytics-strategic-kpis'),
     path('analytics/abc/', analytics_api_views.ABCAnalysisAPIView.as_view(), name='analytics-abc'),
@@ -191,6 +201,7 @@ urlpatterns = [
     path('analytics/customers/<uuid:customer_id>/score/', analytics_api_views.CustomerScoreAPIView.as_view(), name='analytics-customers-score'),
     path('analytics/customers/<uuid:customer_id>/recommendations/', analytics_api_views.CustomerRecommendationsAPIView.as_view(), name='analytics-customers-recommendations'),
     path('analytics/customers/<uuid:customer_id>/next-order/', analytics_api_views.CustomerNextOrderAPIView.as_view(), name='analytics-customers-next-order'),
+    path('analytics/products/related/', analytics_api_views.ProductRelatedAPIView.as_view(), name='analytics-products-related'),
     path('analytics/admin/customer-rules/', analytics_api_views.CustomerAnalyticsRulesAPIView.as_view(), name='analytics-customer-rules'),
 
     # Expenses analytics
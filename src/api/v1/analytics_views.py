@@ -1,4 +1,5 @@
 """REST API endpoints for advanced analytics module."""
+import uuid
 from datetime import date, timedelta
 from decimal import Decimal, InvalidOperation
 
@@ -21,6 +22,7 @@ from analytics.models import (
     ReorderRecommendation,
     SalesForecast,
 )
+from analytics.cooccurrence import related_products
 from analytics.customer_intelligence import (
     compute_customer_score,
     compute_credit_risk_for_customer,
@@ -50,8 +52,10 @@ from analytics.services import (
     detect_fraud_signals,
 )
 from api.v1.permissions import FeatureAnalyticsEnabled, IsManagerOrAdmin, IsStoreMember
+from catalog.models import Product
 from customers.models import Customer
 from stores.models import Store, StoreUser
+from stores.principal import get_principal_context
 
 
 def _parse_date(value, default):
@@ -160,20 +164,8 @@ def _serialize_top_from_cache(store, period_month, *, limit):
 
 
 def _resolve_user_enterprise_id(user):
-    first_link = (
-        StoreUser.objects.filter(user=user, store__is_active=True)
-        .select_related("store")
-        .order_by("-is_default", "store_id")
-        .first()
-    )
-    if first_link and first_link.store and first_link.store.enterprise_id:
-        return str(first_link.store.enterprise_id)
-
-    custom_role = getattr(user, "custom_role", None)
-    enterprise_id = getattr(custom_role, "enterprise_id", None)
-    if enterprise_id:
-        return str(enterprise_id)
-    return None
+    enterprise_id = get_principal_context(user).tenant_enterprise_id
+    return str(enterprise_id) if enterprise_id else None
 
 
 def _resolve_store(request):
@@ -840,7 +832,11 @@ class ForecastSummaryView(APIView):
         if not store:
             return Response({"detail": "Acces boutique refuse."}, status=status.HTTP_403_FORBIDDEN)
         if not store.is_analytics_feature_enabled("sales_forecast"):
-            return Response({"daily": [], "totals": {"predicted_qty": 0, "predicted_revenue": "0", "predicted_profit": "0"}})
+            return Response({
+                "daily": [],
+                "totals": {"predicted_qty": 0, "predicted_revenue": "0", "predicted_profit": "0"},
+                "methods": {},
+            })
 
         today = date.today()
         horizon_days = int(request.query_params.get("horizon_days", 30))
@@ -911,6 +907,12 @@ class ForecastSummaryView(APIView):
             ),
         )
 
+        # Number of products forecast by each model.
+        methods = {
+            entry["method"]: entry["products"]
+            for entry in base_qs.values("method").annotate(products=Count("product", distinct=True)).order_by()
+        }
+
         return Response({
             "daily": daily,
             "totals": {
@@ -918,6 +920,7 @@ class ForecastSummaryView(APIView):
                 "predicted_revenue": str(totals_qs["predicted_revenue"]),
                 "predicted_profit": str(totals_qs["predicted_profit"]),
             },
+            "methods": methods,
         })
 
 
@@ -1096,6 +1099,54 @@ class CustomerRecommendationsAPIView(APIView):
         return Response(payload)
 
 
+class ProductRelatedAPIView(APIView):
+    """Products frequently bought with the given ones (POS upsell)."""
+
+    required_module_code = "CLIENT_INTEL"
+    permission_classes = [IsAuthenticated, IsStoreMember, FeatureAnalyticsEnabled]
+
+    def get(self, request):
+        store = _resolve_store(request)
+        if not store:
+            return Response({"detail": "Acces boutique refuse."}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            product_ids = [
+                uuid.UUID(raw.strip())
+                for raw in (request.query_params.get("product_ids") or "").split(",")
+                if raw.strip()
+            ]
+        except ValueError:
+            return Response({"detail": "product_ids invalide."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = _parse_int(request.query_params.get("limit"), 5, minimum=1, maximum=20)
+
+        rows = related_products(store, product_ids, limit=limit * 2)
+        products = Product.objects.filter(
+            id__in=[row["product_id"] for row in rows],
+            enterprise_id=store.enterprise_id,
+            is_active=True,
+        ).in_bulk()
+        items = []
+        for row in rows:
+            product = products.get(row["product_id"])
+            if product is None:
+                continue
+            items.append(
+                {
+                    "product_id": str(product.id),
+                    "sku": product.sku,
+                    "name": product.name,
+                    "selling_price": str(product.selling_price),
+                    "orders": row["orders"],
+                    "lift": row["lift"],
+                    "score": row["score"],
+                }
+            )
+            if len(items) >= limit:
+                break
+        return Response({"product_ids": [str(pid) for pid in product_ids], "items": items})
+
+
 class CustomerNextOrderAPIView(APIView):
     """Predict next purchase date for one customer."""
 
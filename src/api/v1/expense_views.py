@@ -32,41 +32,26 @@ from api.v1.permissions import (
     CanViewExpenseReports,
     FeatureExpensesManagementEnabled,
 )
-from core.export import queryset_to_csv_response
+from core.export import export_response
 from expenses.models import Budget, Expense, ExpenseCategory, RecurringExpense, Wallet
 from expenses.services import create_expense, generate_due_recurring_expenses, update_expense, void_expense
 from sales.models import Sale
-from stores.models import Enterprise, Store, StoreUser
+from stores.models import Store
+from stores.principal import get_principal_context
 
 
 def _user_store_ids(user):
-    """Return a queryset/list of store ids the user can access."""
-    if getattr(user, "is_superuser", False):
-        return Store.objects.filter(is_active=True).values_list("id", flat=True)
-    return StoreUser.objects.filter(user=user, store__is_active=True).values_list("store_id", flat=True)
+    """Return a list of store ids the user can access."""
+    context = get_principal_context(user)
+    return list(context.store_ids if context.is_superuser else context.linked_store_ids)
 
 
 def _user_enterprise_id(user):
     """Return enterprise id from the user's default/first active store."""
-    store_user = (
-        StoreUser.objects
-        .filter(
-            user=user,
-            store__is_active=True,
-            store__enterprise__is_active=True,
-        )
-        .order_by("-is_default", "store_id")
-        .select_related("store__enterprise")
-        .first()
-    )
-    if store_user and store_user.store and store_user.store.enterprise_id:
-        return store_user.store.enterprise_id
-
-    if getattr(user, "is_superuser", False):
-        enterprise = Enterprise.objects.filter(is_active=True).order_by("created_at").first()
-        if enterprise:
-            return enterprise.id
-    return None
+    context = get_principal_context(user)
+    if context.link_enterprise_id is not None:
+        return context.link_enterprise_id
+    return context.enterprise_id if context.is_superuser else None
 
 
 def _require_user_enterprise_id(user):
@@ -269,21 +254,9 @@ class ExpenseViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=["get"], url_path="export-csv")
     def export_csv(self, request):
-        """Export filtered expenses to CSV."""
+        """Export filtered expenses to CSV (or XLSX)."""
         qs = self.filter_queryset(self.get_queryset()).select_related("category", "wallet", "created_by")
-        columns = [
-            ("expense_number", "Numero"),
-            (lambda o: o.expense_date.strftime("%d/%m/%Y") if o.expense_date else "", "Date"),
-            (lambda o: o.category.name if o.category else "", "Categorie"),
-            (lambda o: o.wallet.name if o.wallet else "", "Wallet"),
-            ("description", "Description"),
-            ("supplier_name", "Fournisseur"),
-            ("amount", "Montant"),
-            (lambda o: "Validee" if o.status == Expense.Status.POSTED else "Annulee", "Statut"),
-            (lambda o: o.created_by.get_full_name() if o.created_by else "", "Cree par"),
-            (lambda o: o.created_at.strftime("%d/%m/%Y %H:%M"), "Date creation"),
-        ]
-        return queryset_to_csv_response(qs, columns, "depenses")
+        return export_response(request, qs, "depenses")
 
 
 class BudgetViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,45 @@
+"""Status and download of background exports (see :mod:`core.export`)."""
+from __future__ import annotations
+
+from django.http import FileResponse, Http404
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from core.export import export_job_status
+from core.models import ExportJob
+
+
+def _get_job(request, job_id):
+    jobs = ExportJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(requested_by=request.user)
+    job = jobs.filter(pk=job_id).first()
+    if job is None:
+        raise Http404
+    return job
+
+
+class ExportJobDetailView(APIView):
+    """GET /api/v1/exports/<id>/ -- progress of a background export."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        return Response(export_job_status(_get_job(request, job_id)))
+
+
+class ExportJobDownloadView(APIView):
+    """GET /api/v1/exports/<id>/download/ -- file of a finished export."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = _get_job(request, job_id)
+        if job.status != ExportJob.Status.DONE or not job.file:
+            raise Http404
+        return FileResponse(
+            job.file.open("rb"),
+            as_attachment=True,
+            filename=f"{job.filename}.{job.file_format}",
+        )
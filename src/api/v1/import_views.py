@@ -0,0 +1,53 @@
+"""Status and error report of background product imports (see :mod:`catalog.importer`)."""
+from __future__ import annotations
+
+import json
+
+from django.http import Http404, StreamingHttpResponse
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from catalog.importer import import_job_status
+from catalog.models import ProductImportJob
+from core.export import stream_csv
+
+
+def _get_job(request, job_id):
+    jobs = ProductImportJob.objects.all()
+    if not request.user.is_superuser:
+        jobs = jobs.filter(started_by=request.user)
+    job = jobs.filter(pk=job_id).first()
+    if job is None:
+        raise Http404
+    return job
+
+
+class ProductImportJobDetailView(APIView):
+    """GET /api/v1/products/import-jobs/<id>/ -- progress and counts of an import."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        return Response(import_job_status(_get_job(request, job_id)))
+
+
+class ProductImportJobErrorsView(APIView):
+    """GET /api/v1/products/import-jobs/<id>/errors/ -- CSV of the rejected rows."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = _get_job(request, job_id)
+        rows = (
+            [row_number, error_message, json.dumps(raw_payload, ensure_ascii=False)]
+            for row_number, error_message, raw_payload in job.error_rows_detail.order_by(
+                "row_number"
+            ).values_list("row_number", "error_message", "raw_payload").iterator(chunk_size=2000)
+        )
+        response = StreamingHttpResponse(
+            stream_csv(["Ligne", "Erreur", "Valeurs"], rows),
+            content_type="text/csv; charset=utf-8",
+        )
+        response["Content-Disposition"] = f'attachment; filename="import_produits_erreurs_{job.pk}.csv"'
+        return response
@@ -112,22 +112,9 @@ def _resolve_object_store(obj):
 
 def _resolve_user_enterprise_id(user):
     """Best-effort enterprise resolution for tenant-scoped admin checks."""
-    store_link = (
-        user.store_users
-        .filter(store__is_active=True, store__enterprise__is_active=True)
-        .select_related("store__enterprise")
-        .order_by("-is_default", "store_id")
-        .first()
-    )
-    if store_link and store_link.store and store_link.store.enterprise_id:
-        return store_link.store.enterprise_id
+    from stores.principal import get_principal_context
 
-    custom_role = getattr(user, "custom_role", None)
-    custom_role_enterprise_id = getattr(custom_role, "enterprise_id", None)
-    if custom_role_enterprise_id:
-        return custom_role_enterprise_id
-
-    return None
+    return get_principal_context(user).tenant_enterprise_id
 
 
 def _user_has_store_access(user, store_id: str) -> bool:
@@ -135,18 +122,9 @@ def _user_has_store_access(user, store_id: str) -> bool:
     if getattr(user, "is_superuser", False):
         return True
 
-    if getattr(user, "role", None) == "ADMIN":
-        from stores.models import Store
-
-        enterprise_id = _resolve_user_enterprise_id(user)
-        if enterprise_id is not None:
-            return Store.objects.filter(
-                pk=store_id,
-                enterprise_id=enterprise_id,
-                is_active=True,
-            ).exists()
+    from stores.principal import get_principal_context
 
-    return user.store_users.filter(store_id=str(store_id), store__is_active=True).exists()
+    return get_principal_context(user).has_store(store_id)
 
 
 def _is_store_module_enabled(store, module_code: str) -> bool:
@@ -548,9 +526,11 @@ class _CapabilityPermission(BasePermission):
     def _has_capability_on_store(self, user, store):
         if not self.capability:
             return False
-        store_user = user.store_users.filter(store=store).first()
-        if store_user:
-            return store_user.has_capability(self.capability)
+        from stores.principal import get_principal_context
+
+        capabilities = get_principal_context(user).store_capabilities(store.pk)
+        if capabilities is not None:
+            return self.capability in capabilities
         if getattr(user, "role", None) in ("ADMIN", "MANAGER") and _user_has_store_access(user, str(store.id)):
             from stores.capabilities import ROLE_CAPABILITY_MAP
 
@@ -40,16 +40,9 @@ def _serializer_user_enterprise_id(user):
     """Best-effort enterprise resolution for serializer-level validation."""
     if not user or not getattr(user, "is_authenticated", False):
         return None
-    link = (
-        user.store_users
-        .filter(store__is_active=True, store__enterprise__is_active=True)
-        .order_by("-is_default", "store_id")
-        .select_related("store__enterprise")
-        .first()
-    )
-    if not link or not link.store:
-        return None
-    return link.store.enterprise_id
+    from stores.principal import get_principal_context
+
+    return get_principal_context(user).link_enterprise_id
 
 
 def _effective_target_role(*, role, custom_role, fallback_role=None):
@@ -614,7 +607,7 @@ class StoreSerializer(serializers.ModelSerializer):
             'offer_validity_days', 'invoice_terms', 'invoice_footer',
             'analytics_feature_overrides', 'effective_feature_flags',
             'stock_decrement_on', 'allow_negative_stock',
-            'receipt_promo_message', 'receipt_show_loyalty_points', 'receipt_custom_footer',
+            'receipt_promo_message', 'receipt_show_loyalty_points', 'receipt_custom_footer', 'receipt_renderer',
             'is_active',
         ]
         read_only_fields = ['id', 'enterprise']
@@ -1190,6 +1183,16 @@ class OfflineSaleSyncSerializer(serializers.Serializer):
     )
 
 
+class OfflineSaleBatchSyncSerializer(serializers.Serializer):
+    """Serializer for syncing a backlog of offline sales in one request."""
+
+    sales = serializers.ListField(
+        child=OfflineSaleSyncSerializer(),
+        min_length=1,
+        max_length=500,
+    )
+
+
 # ---------------------------------------------------------------------------
 # Payment Serializers
 # ---------------------------------------------------------------------------
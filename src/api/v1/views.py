@@ -5,6 +5,7 @@ import logging
 import secrets
 import string
 import unicodedata
+import uuid
 from datetime import date, timedelta
 from decimal import Decimal, InvalidOperation
 
@@ -12,16 +13,19 @@ from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from core.dates import date_range_filter, local_today, store_timezone
 from core.email import send_branded_email
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models.deletion import ProtectedError
 from django.db.models import (
     Sum, Avg, Count, F, Q, DecimalField, Exists, OuterRef,
     IntegerField, Subquery, Value,
 )
 from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncYear
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
+from django.utils.decorators import method_decorator
 from django.utils.text import slugify
 
 from rest_framework import viewsets, mixins, status, filters
@@ -47,8 +51,10 @@ from stores.models import (
     StoreModuleEntitlement,
     StoreUser,
 )
+from stores.principal import get_principal_context
 from stores.services import resolve_store_module_matrix
 from catalog.models import Brand, Category, PricingPolicy, Product, ProductImage, ProductVariant
+from catalog import importer as product_importer
 from stock.models import (
     InventoryMovement, ProductStock,
     StockTransfer, StockTransferLine,
@@ -60,11 +66,17 @@ from cashier.models import CashShift, CashShiftDenomination, Payment
 from credits.models import CustomerAccount, CreditLedgerEntry, PaymentSchedule
 from purchases.models import Supplier, PurchaseOrder, GoodsReceipt
 from alerts.models import Alert
-from reports.models import KPISnapshot
+from reports.models import (
+    KPISnapshot,
+    SalesDailyRollup,
+    SalesProductDailyRollup,
+    SalesSellerDailyRollup,
+)
 from core.pdf import (
     generate_cashier_operations_report_pdf,
     generate_credit_payment_receipt_pdf,
     generate_invoice_pdf,
+    generate_receipt_escpos,
     generate_receipt_pdf,
     generate_refund_receipt_pdf,
 )
@@ -95,6 +107,7 @@ from api.v1.serializers import (
     SaleAddItemSerializer,
     SaleSetItemQuantitySerializer,
     SaleSetItemUnitPriceSerializer,
+    OfflineSaleBatchSyncSerializer,
     OfflineSaleSyncSerializer,
     PaymentSerializer,
     PaymentCreateSerializer,
@@ -346,55 +359,19 @@ def _send_setup_credentials_email(
 
 def _user_store_ids(user):
     """Return a list of store IDs the user has access to."""
-    # Platform-level admins (Django superusers) can access all stores.
-    if getattr(user, "is_superuser", False):
-        return Store.objects.filter(is_active=True).values_list('id', flat=True)
-
-    # Tenant admins can access all stores within their enterprise.
-    if getattr(user, "role", None) == "ADMIN":
-        enterprise_id = _user_enterprise_id(user)
-        if enterprise_id is not None:
-            return Store.objects.filter(
-                enterprise_id=enterprise_id,
-                is_active=True,
-            ).values_list('id', flat=True)
-
-    return StoreUser.objects.filter(user=user, store__is_active=True).values_list('store_id', flat=True)
+    # Superusers: all active stores; tenant admins: all stores of their
+    # enterprise; everyone else: their StoreUser links.
+    return list(get_principal_context(user).store_ids)
 
 
 def _user_enterprise_id(user):
     """Return the enterprise ID for the user's stores (first match).
 
-    Superusers without explicit StoreUser records fall back to the first
-    active enterprise (best-effort) so that admin tools keep working.
+    Falls back to the custom role's enterprise, then (superusers without
+    explicit StoreUser records) to the first active enterprise so that
+    admin tools keep working.
     """
-    store_user = (
-        StoreUser.objects
-        .filter(
-            user=user,
-            store__is_active=True,
-            store__enterprise__is_active=True,
-        )
-        .order_by("-is_default", "store_id")
-        .select_related("store__enterprise")
-        .first()
-    )
-    if store_user and store_user.store and store_user.store.enterprise_id:
-        return store_user.store.enterprise_id
-
-    # Fallback for users linked to a custom role scoped to an enterprise.
-    custom_role = getattr(user, "custom_role", None)
-    custom_role_enterprise_id = getattr(custom_role, "enterprise_id", None)
-    if custom_role_enterprise_id:
-        return custom_role_enterprise_id
-
-    # Fallback for Django superusers who have no StoreUser records
-    if getattr(user, "is_superuser", False):
-        first_enterprise = Enterprise.objects.filter(is_active=True).first()
-        if first_enterprise:
-            return first_enterprise.id
-
-    return None
+    return get_principal_context(user).enterprise_id
 
 
 def _can_override_price_for_store(user, store) -> bool:
@@ -1591,16 +1568,10 @@ class CategoryViewSet(viewsets.ModelViewSet):
     # -- CSV export --------------------------------------------------------
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered categories to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered categories to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset()).select_related('parent')
-        columns = [
-            ('name', 'Nom'),
-            (lambda o: o.parent.name if o.parent else '', 'Categorie parente'),
-            ('description', 'Description'),
-            (lambda o: 'oui' if o.is_active else 'non', 'Actif'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'categories')
+        return export_response(request, qs, 'categories')
 
     # -- CSV import --------------------------------------------------------
     @action(detail=False, methods=['post'], url_path='import-csv',
@@ -1798,14 +1769,10 @@ class BrandViewSet(viewsets.ModelViewSet):
     # -- CSV export --------------------------------------------------------
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered brands to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered brands to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset())
-        columns = [
-            ('name', 'Nom'),
-            (lambda o: 'oui' if o.is_active else 'non', 'Actif'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'marques')
+        return export_response(request, qs, 'marques')
 
 
 # ---------------------------------------------------------------------------
@@ -1937,7 +1904,7 @@ class ProductViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['post'], url_path='import-csv')
     def import_csv(self, request):
-        """Bulk import products from CSV file.
+        """Bulk import products from a CSV (or .xlsx) file.
 
         Expected columns (aliases supported):
         - name/nom
@@ -1949,178 +1916,44 @@ class ProductViewSet(viewsets.ModelViewSet):
         - brand/marque (optional, auto-created)
         - description (optional)
         - is_active/actif (optional)
-        """
-        content = _decode_uploaded_csv(request.FILES.get('file'))
-        reader = _build_csv_dict_reader(content)
-        if not reader.fieldnames:
-            raise ValidationError({'file': 'En-tetes CSV introuvables.'})
 
-        header_map = {
-            _normalize_header(col): col
-            for col in reader.fieldnames
-            if col is not None and str(col).strip() != ""
-        }
-        if not header_map:
-            raise ValidationError({'file': 'Le CSV ne contient aucun en-tete exploitable.'})
+        Rows are written in batches (see :mod:`catalog.importer`).  Files of
+        more than ``PRODUCT_IMPORT_BACKGROUND_THRESHOLD`` rows, or sent with
+        ``?background=1``, are imported by a background job: the 202 answer
+        carries its status URL.
+        """
+        uploaded_file = request.FILES.get('file')
+        if not uploaded_file:
+            raise ValidationError({'file': 'Aucun fichier CSV fourni.'})
+        max_size = settings.PRODUCT_IMPORT_MAX_UPLOAD_MB * 1024 * 1024
+        if uploaded_file.size > max_size:
+            raise ValidationError(
+                {'file': f"Le fichier depasse {settings.PRODUCT_IMPORT_MAX_UPLOAD_MB} Mo."}
+            )
+        if not uploaded_file.size:
+            raise ValidationError({'file': 'Le fichier CSV est vide.'})
 
         enterprise_id = _require_user_enterprise_id(request.user)
-        categories = {
-            c.name.strip().lower(): c
-            for c in Category.objects.filter(enterprise_id=enterprise_id)
-        }
-        brands = {
-            b.name.strip().lower(): b
-            for b in Brand.objects.filter(enterprise_id=enterprise_id)
-        }
-
-        total_rows = 0
-        created = 0
-        updated = 0
-        skipped = 0
-        error_count = 0
-        errors = []
-
-        for line_no, row in enumerate(reader, start=2):
-            total_rows += 1
-            row_values = [
-                str(v).strip() if v is not None else ""
-                for v in row.values()
-            ]
-            if not any(row_values):
-                skipped += 1
-                continue
-
-            try:
-                name = _row_value(row, header_map, 'name', 'nom', 'produit', 'product_name')
-                sku = _row_value(row, header_map, 'sku', 'reference', 'ref', 'code')
-                if not name:
-                    raise ValueError('Nom produit manquant.')
-                if not sku:
-                    raise ValueError('SKU manquant.')
-
-                selling_price = _parse_decimal_field(
-                    _row_value(row, header_map, 'selling_price', 'prix_vente', 'price', 'prix'),
-                    field_label='prix_vente',
-                    allow_blank=False,
-                )
-                cost_price = _parse_decimal_field(
-                    _row_value(row, header_map, 'cost_price', 'prix_achat', 'purchase_price'),
-                    field_label='prix_achat',
-                    allow_blank=True,
-                    default=Decimal('0.00'),
-                )
-                if selling_price < 0:
-                    raise ValueError('prix_vente ne peut pas etre negatif.')
-                if cost_price < 0:
-                    raise ValueError('prix_achat ne peut pas etre negatif.')
-
-                barcode = _row_value(row, header_map, 'barcode', 'code_barres', 'codebarres', 'ean')
-                description = _row_value(row, header_map, 'description', 'desc')
-                is_active = _parse_bool_field(
-                    _row_value(row, header_map, 'is_active', 'actif', 'active'),
-                    default=True,
-                )
+        file_format = 'xlsx' if uploaded_file.name.lower().endswith('.xlsx') else 'csv'
 
-                category = None
-                category_name = _row_value(row, header_map, 'category', 'categorie')
-                if category_name:
-                    cat_key = category_name.lower()
-                    category = categories.get(cat_key)
-                    if category is None:
-                        category = Category.objects.create(
-                            enterprise_id=enterprise_id,
-                            name=category_name,
-                            slug=_unique_slug_for_enterprise(
-                                Category,
-                                enterprise_id=enterprise_id,
-                                base_value=category_name,
-                                fallback='categorie',
-                            ),
-                            is_active=True,
-                        )
-                        categories[cat_key] = category
-
-                brand = None
-                brand_name = _row_value(row, header_map, 'brand', 'marque')
-                if brand_name:
-                    brand_key = brand_name.lower()
-                    brand = brands.get(brand_key)
-                    if brand is None:
-                        brand = Brand.objects.create(
-                            enterprise_id=enterprise_id,
-                            name=brand_name,
-                            slug=_unique_slug_for_enterprise(
-                                Brand,
-                                enterprise_id=enterprise_id,
-                                base_value=brand_name,
-                                fallback='marque',
-                            ),
-                            is_active=True,
-                        )
-                        brands[brand_key] = brand
-
-                product = Product.objects.filter(
-                    enterprise_id=enterprise_id,
-                    sku=sku,
-                ).first()
-                if product:
-                    product.name = name
-                    product.slug = _unique_slug_for_enterprise(
-                        Product,
-                        enterprise_id=enterprise_id,
-                        base_value=sku,
-                        fallback='produit',
-                        exclude_pk=product.pk,
-                    )
-                    product.barcode = barcode
-                    product.description = description
-                    product.category = category
-                    product.brand = brand
-                    product.cost_price = cost_price
-                    product.selling_price = selling_price
-                    product.is_active = is_active
-                    product.save(
-                        update_fields=[
-                            'name', 'slug', 'barcode', 'description',
-                            'category', 'brand', 'cost_price', 'selling_price',
-                            'is_active', 'updated_at',
-                        ]
-                    )
-                    updated += 1
-                else:
-                    Product.objects.create(
-                        enterprise_id=enterprise_id,
-                        name=name,
-                        slug=_unique_slug_for_enterprise(
-                            Product,
-                            enterprise_id=enterprise_id,
-                            base_value=sku,
-                            fallback='produit',
-                        ),
-                        sku=sku,
-                        barcode=barcode,
-                        description=description,
-                        category=category,
-                        brand=brand,
-                        cost_price=cost_price,
-                        selling_price=selling_price,
-                        is_active=is_active,
-                    )
-                    created += 1
-            except Exception as exc:
-                error_count += 1
-                if len(errors) < 50:
-                    errors.append({'line': line_no, 'message': str(exc)})
+        background = request.query_params.get('background') in ('1', 'true')
+        if not background:
+            total = product_importer.count_rows(uploaded_file, file_format)
+            background = total > settings.PRODUCT_IMPORT_BACKGROUND_THRESHOLD
+        if background:
+            job = product_importer.start_import_job(
+                uploaded_file, enterprise_id, file_format, user=request.user,
+            )
+            return Response(
+                product_importer.import_job_status(job),
+                status=status.HTTP_202_ACCEPTED,
+            )
 
-        return Response({
-            'detail': "Import CSV termine.",
-            'total_rows': total_rows,
-            'created': created,
-            'updated': updated,
-            'skipped': skipped,
-            'error_count': error_count,
-            'errors': errors,
-        })
+        try:
+            result = product_importer.import_file(uploaded_file, enterprise_id, file_format)
+        except product_importer.ImportFileError as exc:
+            raise ValidationError({'file': str(exc)})
+        return Response(product_importer.result_payload(result))
 
     @action(detail=False, methods=['get'], url_path='available')
     def available(self, request):
@@ -2172,21 +2005,10 @@ class ProductViewSet(viewsets.ModelViewSet):
     # -- CSV export --------------------------------------------------------
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered products to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered products to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset()).select_related('category', 'brand')
-        columns = [
-            ('name', 'Nom'),
-            ('sku', 'SKU'),
-            ('barcode', 'Code-barres'),
-            (lambda o: o.category.name if o.category else '', 'Categorie'),
-            (lambda o: o.brand.name if o.brand else '', 'Marque'),
-            ('cost_price', 'Prix achat'),
-            ('selling_price', 'Prix vente'),
-            ('description', 'Description'),
-            (lambda o: 'oui' if o.is_active else 'non', 'Actif'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'produits')
+        return export_response(request, qs, 'produits')
 
 
 # ---------------------------------------------------------------------------
@@ -2470,18 +2292,10 @@ class InventoryMovementViewSet(
 
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered inventory movements to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered inventory movements to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset()).select_related('product', 'actor')
-        columns = [
-            (lambda o: o.created_at.strftime('%d/%m/%Y %H:%M'), 'Date'),
-            ('movement_type', 'Type'),
-            (lambda o: o.product.name if o.product else '', 'Produit'),
-            ('quantity', 'Quantite'),
-            ('reference', 'Reference'),
-            (lambda o: o.actor.get_full_name() if o.actor else '', 'Acteur'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'mouvements_stock')
+        return export_response(request, qs, 'mouvements_stock')
 
 
 # ---------------------------------------------------------------------------
@@ -2735,18 +2549,10 @@ class CustomerViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered customers to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered customers to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset())
-        columns = [
-            ('first_name', 'Prenom'),
-            ('last_name', 'Nom'),
-            ('email', 'Email'),
-            ('phone', 'Telephone'),
-            ('address', 'Adresse'),
-            (lambda o: o.created_at.strftime('%d/%m/%Y'), 'Date creation'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'clients')
+        return export_response(request, qs, 'clients')
 
     @action(detail=False, methods=['post'], url_path='import-csv')
     def import_csv(self, request):
@@ -2876,6 +2682,98 @@ class CustomerViewSet(viewsets.ModelViewSet):
 # Sale ViewSet
 # ---------------------------------------------------------------------------
 
+def _offline_products_by_id(product_ids, enterprise_id) -> dict:
+    """Fetch the products referenced by offline sales in one query."""
+    valid_ids = []
+    for pid in product_ids:
+        try:
+            valid_ids.append(uuid.UUID(str(pid)))
+        except ValueError:
+            continue
+    if not valid_ids:
+        return {}
+    return {
+        str(p.pk): p
+        for p in Product.objects.filter(pk__in=valid_ids, enterprise_id=enterprise_id)
+    }
+
+
+def _synced_offline_sales(offline_ids):
+    """Already-synced sales of *offline_ids*, keyed by ``offline_id``."""
+    return {
+        row["offline_id"]: row
+        for row in Sale.objects.filter(offline_id__in=offline_ids).values(
+            "offline_id", "id", "store_id", "invoice_number", "status",
+        )
+    }
+
+
+def _create_offline_sale(d, *, store, customer, products, actor):
+    """Create, fill and submit one offline sale; run inside ``atomic``.
+
+    Returns the submitted sale and the list of per-line warnings.  Raises
+    ``ValueError`` when the sale cannot be created.
+    """
+    from sales.services import add_items_to_sale_many, create_sale, submit_sale_to_cashier
+
+    # Resolve default customer inside transaction (select_for_update)
+    if customer is None:
+        try:
+            from customers.services import get_or_create_default_customer
+            customer = get_or_create_default_customer(enterprise=store.enterprise)
+        except Exception:
+            pass
+
+    sale = create_sale(store=store, seller=actor, customer=customer)
+    sale.offline_id = d["offline_id"]
+    update_fields = ["offline_id"]
+
+    # Preserve the original offline timestamp
+    if d.get("created_at"):
+        sale.created_at = d["created_at"]
+        update_fields.append("created_at")
+
+    if d.get("discount_percent"):
+        sale.discount_percent = d["discount_percent"]
+        update_fields.append("discount_percent")
+    if d.get("notes"):
+        sale.notes = d["notes"]
+        update_fields.append("notes")
+
+    sale.save(update_fields=update_fields + ["updated_at"])
+
+    errors = []
+    lines = []
+    line_numbers = []
+    for idx, item_data in enumerate(d["items"]):
+        product = products.get(str(item_data.get("product_id")))
+        if product is None:
+            errors.append(f"Article #{idx + 1}: produit introuvable.")
+            continue
+        try:
+            qty = int(item_data.get("quantity", 1))
+            discount_amount = Decimal(str(item_data.get("discount_amount", "0")))
+            unit_price_override_raw = item_data.get("unit_price_override")
+            unit_price = Decimal(str(unit_price_override_raw)) if unit_price_override_raw else None
+        except (TypeError, ValueError, InvalidOperation):
+            errors.append(f"Article #{idx + 1} ({product.name}): valeurs invalides.")
+            continue
+        lines.append({"product": product, "qty": qty, "discount": discount_amount, "unit_price": unit_price})
+        line_numbers.append(idx + 1)
+
+    items, line_errors = add_items_to_sale_many(sale, lines, actor=actor)
+    for line_idx, message in line_errors:
+        errors.append(f"Article #{line_numbers[line_idx]} ({lines[line_idx]['product'].name}): {message}")
+
+    if not items and not sale.items.exists():
+        raise ValueError("Aucun article valide dans la vente offline.")
+
+    # Refresh to pick up recalculated totals
+    sale.refresh_from_db()
+    sale = submit_sale_to_cashier(sale, actor=actor)
+    return sale, errors
+
+
 class SaleViewSet(viewsets.ModelViewSet):
     """
     ViewSet for sales with custom workflow actions.
@@ -2913,8 +2811,18 @@ class SaleViewSet(viewsets.ModelViewSet):
     ]
     pagination_class = StandardResultsSetPagination
 
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        # ATOMIC_REQUESTS only reads the view function: forward the marker
+        # of actions decorated with transaction.non_atomic_requests.
+        for name in (actions or {}).values():
+            if getattr(getattr(cls, name, None), "_non_atomic_requests", None):
+                view = transaction.non_atomic_requests(view)
+        return view
+
     def get_permissions(self):
-        if self.action in ('create', 'add_item', 'set_item_quantity', 'remove_item', 'submit', 'apply_coupon', 'remove_coupon', 'set_delivery', 'remove_delivery', 'offline_sync'):
+        if self.action in ('create', 'add_item', 'set_item_quantity', 'remove_item', 'submit', 'apply_coupon', 'remove_coupon', 'set_delivery', 'remove_delivery', 'offline_sync', 'offline_sync_batch'):
             return [IsSales(), FeatureSalesPOSEnabled()]
         if self.action == 'set_item_unit_price':
             return [IsSales(), FeatureSalesPOSEnabled()]
@@ -3305,6 +3213,7 @@ class SaleViewSet(viewsets.ModelViewSet):
         Query params:
         - template: ticket | compact | modern (also accepts invoice aliases).
         - download: 1/true/on to force attachment download.
+        - output: escpos to get the raw ESC/POS stream for a thermal printer.
         """
         sale = self.get_object()
         template_code = (request.query_params.get("template") or "").strip()
@@ -3315,6 +3224,18 @@ class SaleViewSet(viewsets.ModelViewSet):
             payments = sale.payments.all().order_by("created_at")
         except Exception:
             payments = None
+        if (request.query_params.get("output") or "").strip().lower() == "escpos":
+            content = generate_receipt_escpos(
+                sale=sale,
+                store=sale.store,
+                payments=payments,
+                cashier_name=request.user.get_full_name(),
+                template_code=template_code,
+            )
+            response = HttpResponse(content, content_type="application/octet-stream")
+            sale_ref = sale.invoice_number or str(sale.id).split("-")[0].upper()
+            response["Content-Disposition"] = f'attachment; filename="REC-{sale_ref}.bin"'
+            return response
         try:
             return generate_receipt_pdf(
                 sale=sale,
@@ -3562,69 +3483,15 @@ class SaleViewSet(viewsets.ModelViewSet):
             customer = None  # resolved inside atomic block
 
         # --- Atomic creation: sale + items + submit ---
-        from django.db import transaction as db_transaction
-        from sales.services import create_sale, add_item_to_sale, submit_sale_to_cashier
-
         enterprise_id = _user_enterprise_id(request.user)
+        product_ids = {str(item.get("product_id")) for item in d["items"] if item.get("product_id")}
+        products = _offline_products_by_id(product_ids, enterprise_id)
 
         try:
-            with db_transaction.atomic():
-                # Resolve default customer inside transaction (select_for_update)
-                if customer is None:
-                    try:
-                        from customers.services import get_or_create_default_customer
-                        customer = get_or_create_default_customer(enterprise=store.enterprise)
-                    except Exception:
-                        pass
-
-                sale = create_sale(store=store, seller=request.user, customer=customer)
-                sale.offline_id = d["offline_id"]
-                update_fields = ["offline_id"]
-
-                # Preserve the original offline timestamp
-                if d.get("created_at"):
-                    sale.created_at = d["created_at"]
-                    update_fields.append("created_at")
-
-                if d.get("discount_percent"):
-                    sale.discount_percent = d["discount_percent"]
-                    update_fields.append("discount_percent")
-                if d.get("notes"):
-                    sale.notes = d["notes"]
-                    update_fields.append("notes")
-
-                sale.save(update_fields=update_fields + ["updated_at"])
-
-                errors = []
-                for idx, item_data in enumerate(d["items"]):
-                    product_id = item_data.get("product_id")
-                    quantity = item_data.get("quantity", 1)
-                    discount_amount = Decimal(str(item_data.get("discount_amount", "0")))
-                    unit_price_override_raw = item_data.get("unit_price_override")
-                    unit_price = Decimal(str(unit_price_override_raw)) if unit_price_override_raw else None
-
-                    try:
-                        product = Product.objects.get(pk=product_id, enterprise_id=enterprise_id)
-                    except Product.DoesNotExist:
-                        errors.append(f"Article #{idx + 1}: produit introuvable.")
-                        continue
-
-                    try:
-                        add_item_to_sale(
-                            sale=sale, product=product, qty=quantity,
-                            discount=discount_amount, unit_price=unit_price,
-                            actor=request.user,
-                        )
-                    except ValueError as e:
-                        errors.append(f"Article #{idx + 1} ({product.name}): {e}")
-
-                if not sale.items.exists():
-                    raise ValueError("Aucun article valide dans la vente offline.")
-
-                # Refresh to pick up recalculated totals from add_item_to_sale
-                sale.refresh_from_db()
-                sale = submit_sale_to_cashier(sale, actor=request.user)
-
+            with transaction.atomic():
+                sale, errors = _create_offline_sale(
+                    d, store=store, customer=customer, products=products, actor=request.user,
+                )
         except ValueError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -3634,22 +3501,131 @@ class SaleViewSet(viewsets.ModelViewSet):
             response_data["_warnings"] = errors
         return Response(response_data, status=status.HTTP_201_CREATED)
 
+    @action(detail=False, methods=["post"], url_path="offline-sync-batch")
+    @method_decorator(transaction.non_atomic_requests)
+    def offline_sync_batch(self, request):
+        """Sync a backlog of sales created offline in one request.
+
+        Products, customers and already-synced ``offline_id`` values are
+        each resolved with a single query; every sale is then created in
+        its own transaction (the request is not atomic), so one invalid sale
+        does not block the others and stock locks are released sale by sale.
+        A sale synced meanwhile by a concurrent retry is reported as a
+        duplicate.  Returns one compact status entry per submitted sale, in
+        order.
+        """
+        serializer = OfflineSaleBatchSyncSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sales_data = serializer.validated_data["sales"]
+
+        store_ids = set(_user_store_ids(request.user))
+        enterprise_id = _user_enterprise_id(request.user)
+        stores = {
+            s.pk: s
+            for s in Store.objects.select_related("enterprise").filter(
+                pk__in={d["store_id"] for d in sales_data} & store_ids,
+                is_active=True,
+            )
+        }
+        existing = _synced_offline_sales([d["offline_id"] for d in sales_data])
+        products = _offline_products_by_id(
+            {
+                str(item.get("product_id"))
+                for d in sales_data
+                for item in d["items"]
+                if item.get("product_id")
+            },
+            enterprise_id,
+        )
+        customers = {
+            c.pk: c
+            for c in Customer.objects.filter(
+                pk__in={d["customer_id"] for d in sales_data if d.get("customer_id")},
+            )
+        }
+
+        results = []
+        seen = set()
+        for d in sales_data:
+            offline_id = d["offline_id"]
+            entry = {"offline_id": str(offline_id)}
+            results.append(entry)
+
+            store = stores.get(d["store_id"])
+            if d["store_id"] not in store_ids:
+                entry.update(status="forbidden", detail="Vous n'avez pas acces a cette boutique.")
+                continue
+            if store is None:
+                entry.update(status="error", detail="Boutique introuvable.")
+                continue
+
+            previous = existing.get(offline_id)
+            if previous is not None or offline_id in seen:
+                if previous is not None and previous["store_id"] not in store_ids:
+                    entry.update(status="forbidden", detail="Vous n'avez pas acces a cette vente.")
+                    continue
+                entry["status"] = "duplicate"
+                if previous is not None:
+                    entry.update(
+                        sale_id=str(previous["id"]),
+                        invoice_number=previous["invoice_number"],
+                        sale_status=previous["status"],
+                    )
+                continue
+            seen.add(offline_id)
+
+            customer = None
+            if d.get("customer_id"):
+                customer = customers.get(d["customer_id"])
+                if customer is None or customer.enterprise_id != store.enterprise_id:
+                    entry.update(status="error", detail="Client introuvable dans cette entreprise.")
+                    continue
+
+            try:
+                with transaction.atomic():
+                    sale, warnings = _create_offline_sale(
+                        d, store=store, customer=customer, products=products, actor=request.user,
+                    )
+            except ValueError as e:
+                entry.update(status="error", detail=str(e))
+                continue
+            except IntegrityError:
+                # Synced by a concurrent retry of the same batch.
+                previous = _synced_offline_sales([offline_id]).get(offline_id)
+                if previous is None:
+                    raise
+                if previous["store_id"] not in store_ids:
+                    entry.update(status="forbidden", detail="Vous n'avez pas acces a cette vente.")
+                    continue
+                entry.update(
+                    status="duplicate",
+                    sale_id=str(previous["id"]),
+                    invoice_number=previous["invoice_number"],
+                    sale_status=previous["status"],
+                )
+                continue
+
+            entry.update(
+                status="created",
+                sale_id=str(sale.pk),
+                invoice_number=sale.invoice_number,
+                sale_status=sale.status,
+                total=str(sale.total),
+            )
+            if warnings:
+                entry["warnings"] = warnings
+
+        summary = {}
+        for entry in results:
+            summary[entry["status"]] = summary.get(entry["status"], 0) + 1
+        return Response({"results": results, "summary": summary}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered sales to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered sales to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset()).select_related('customer', 'seller')
-        columns = [
-            ('invoice_number', 'Reference'),
-            (lambda o: o.created_at.strftime('%d/%m/%Y %H:%M'), 'Date'),
-            (lambda o: o.customer.full_name if o.customer else '', 'Client'),
-            (lambda o: o.seller.get_full_name() if o.seller else '', 'Vendeur'),
-            ('status', 'Statut'),
-            ('total', 'Total'),
-            ('discount_amount', 'Remise'),
-            ('amount_due', 'Net'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'ventes')
+        return export_response(request, qs, 'ventes')
 
 
 # ---------------------------------------------------------------------------
@@ -4037,16 +4013,10 @@ class CustomerAccountViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'], url_path='export-csv')
     def export_csv(self, request):
-        """Export filtered credit accounts to a CSV file."""
-        from core.export import queryset_to_csv_response
+        """Export filtered credit accounts to CSV (or XLSX)."""
+        from core.export import export_response
         qs = self.filter_queryset(self.get_queryset()).select_related('customer')
-        columns = [
-            (lambda o: o.customer.full_name if o.customer else '', 'Client'),
-            ('balance', 'Solde'),
-            ('credit_limit', 'Limite'),
-            (lambda o: o.created_at.strftime('%d/%m/%Y'), 'Date creation'),
-        ]
-        return queryset_to_csv_response(qs, columns, 'credits')
+        return export_response(request, qs, 'credits')
 
 
 # ---------------------------------------------------------------------------
@@ -4519,145 +4489,113 @@ class KPIView(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
-        date_from = request.query_params.get('date_from')
-        date_to = request.query_params.get('date_to')
-
-        # Default to today if no dates provided
-        today = timezone.now().date()
-        if not date_from:
-            date_from = today
-        if not date_to:
-            date_to = today
+        # Default to today (store's business day) if no dates provided
+        tz = store_timezone(store_id)
+        today = local_today(tz)
+        date_from = _parse_iso_date_or_default(request.query_params.get('date_from'), today)
+        date_to = _parse_iso_date_or_default(request.query_params.get('date_to'), today)
 
         user_role = getattr(request.user, "role", None)
         is_sales_user = user_role == "SALES"
 
-        # Try to get a KPI snapshot first
-        snapshot = None
-        if not is_sales_user:
-            snapshot = KPISnapshot.objects.filter(
-                store_id=store_id,
-                date__gte=date_from,
-                date__lte=date_to,
-            ).order_by('-date').first()
-
-        if snapshot:
-            data = {
-                'total_sales': snapshot.total_sales,
-                'total_orders': snapshot.total_orders,
-                'average_basket': snapshot.average_basket,
-                'gross_margin': snapshot.gross_margin,
-                'total_discounts': snapshot.total_discounts,
-                'total_refunds': snapshot.total_refunds,
-                'net_sales': snapshot.net_sales,
-                'credit_outstanding': snapshot.credit_outstanding,
-                'stock_value': snapshot.stock_value,
-            }
+        # Sales figures come from the sales rollups (store or seller grain),
+        # so the cost does not depend on the length of the range.
+        if is_sales_user:
+            rollups = SalesSellerDailyRollup.objects.filter(seller_id=request.user.id)
         else:
-            # Calculate KPIs from raw data
-            sales_qs = Sale.objects.filter(
-                store_id=store_id,
-                status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID],
-                created_at__date__gte=date_from,
-                created_at__date__lte=date_to,
-            )
-            if is_sales_user:
-                sales_qs = sales_qs.filter(seller_id=request.user.id)
-
-            aggregates = sales_qs.aggregate(
-                total_sales=Coalesce(Sum('total'), Decimal('0.00'), output_field=DecimalField()),
-                total_orders=Count('id'),
-                average_basket=Coalesce(Avg('total'), Decimal('0.00'), output_field=DecimalField()),
-                total_discounts=Coalesce(Sum('discount_amount'), Decimal('0.00'), output_field=DecimalField()),
-            )
-
-            # Gross margin from sale items
-            items_qs = SaleItem.objects.filter(
-                sale__store_id=store_id,
-                sale__status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID],
-                sale__created_at__date__gte=date_from,
-                sale__created_at__date__lte=date_to,
-            )
-            if is_sales_user:
-                items_qs = items_qs.filter(sale__seller_id=request.user.id)
-            margin_data = items_qs.aggregate(
-                gross_margin=Coalesce(
-                    Sum(F('line_total') - F('cost_price') * F('quantity')),
-                    Decimal('0.00'),
-                    output_field=DecimalField(),
-                ),
-            )
-
-            # Stock value
-            stock_value = ProductStock.objects.filter(
-                store_id=store_id,
-            ).aggregate(
-                value=Coalesce(
-                    Sum(F('quantity') * F('product__cost_price')),
-                    Decimal('0.00'),
-                    output_field=DecimalField(),
-                ),
-            )['value']
-            credit_outstanding = CustomerAccount.objects.filter(
-                store_id=store_id,
-                balance__gt=0,
-            ).aggregate(
-                total=Coalesce(
-                    Sum('balance'),
-                    Decimal('0.00'),
-                    output_field=DecimalField(),
-                ),
+            rollups = SalesDailyRollup.objects.all()
+        rollups = rollups.filter(store_id=store_id, date__gte=date_from, date__lte=date_to)
+        aggregates = rollups.aggregate(
+            total_sales=Coalesce(Sum('revenue'), Decimal('0.00'), output_field=DecimalField()),
+            total_orders=Coalesce(Sum('orders'), 0),
+            total_discounts=Coalesce(Sum('discounts'), Decimal('0.00'), output_field=DecimalField()),
+            gross_margin=Coalesce(
+                Sum(F('line_revenue') - F('cost')), Decimal('0.00'), output_field=DecimalField(),
+            ),
+        )
+        total_refunds = Decimal('0.00')
+        if not is_sales_user:
+            total_refunds = rollups.aggregate(
+                total=Coalesce(Sum('refunds'), Decimal('0.00'), output_field=DecimalField()),
             )['total']
+        total_orders = aggregates['total_orders']
+        average_basket = (
+            (aggregates['total_sales'] / total_orders).quantize(Decimal('0.01'))
+            if total_orders else Decimal('0.00')
+        )
 
-            data = {
-                'total_sales': aggregates['total_sales'],
-                'total_orders': aggregates['total_orders'],
-                'average_basket': aggregates['average_basket'],
-                'gross_margin': margin_data['gross_margin'],
-                'total_discounts': aggregates['total_discounts'],
-                'total_refunds': Decimal('0.00'),
-                'net_sales': aggregates['total_sales'] - aggregates['total_discounts'],
-                'credit_outstanding': credit_outstanding,
-                'stock_value': stock_value,
-            }
+        # Stock value
+        stock_value = ProductStock.objects.filter(
+            store_id=store_id,
+        ).aggregate(
+            value=Coalesce(
+                Sum(F('quantity') * F('product__cost_price')),
+                Decimal('0.00'),
+                output_field=DecimalField(),
+            ),
+        )['value']
+        credit_outstanding = CustomerAccount.objects.filter(
+            store_id=store_id,
+            balance__gt=0,
+        ).aggregate(
+            total=Coalesce(
+                Sum('balance'),
+                Decimal('0.00'),
+                output_field=DecimalField(),
+            ),
+        )['total']
+
+        data = {
+            'total_sales': aggregates['total_sales'],
+            'total_orders': total_orders,
+            'average_basket': average_basket,
+            'gross_margin': aggregates['gross_margin'],
+            'total_discounts': aggregates['total_discounts'],
+            'total_refunds': total_refunds,
+            'net_sales': aggregates['total_sales'] - aggregates['total_discounts'] - total_refunds,
+            'credit_outstanding': credit_outstanding,
+            'stock_value': stock_value,
+        }
 
-        # Top products
-        top_products_qs = SaleItem.objects.filter(
-            sale__store_id=store_id,
-            sale__status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID],
-            sale__created_at__date__gte=date_from,
-            sale__created_at__date__lte=date_to,
-        )
+        # Top products (no product x seller rollup: sellers read their lines)
         if is_sales_user:
-            top_products_qs = top_products_qs.filter(sale__seller_id=request.user.id)
-        top_products = (
-            top_products_qs
-            .values('product__name')
-            .annotate(
-                total_quantity=Sum('quantity'),
-                total_revenue=Sum('line_total'),
+            top_products = (
+                SaleItem.objects.filter(
+                    sale__store_id=store_id,
+                    sale__seller_id=request.user.id,
+                    sale__status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID],
+                    **date_range_filter('sale__created_at', date_from, date_to, tz=tz),
+                )
+                .values('product__name')
+                .annotate(
+                    total_quantity=Sum('quantity'),
+                    total_revenue=Sum('line_total'),
+                )
             )
-            .order_by('-total_revenue')[:10]
-        )
-        data['top_products'] = list(top_products)
+        else:
+            top_products = (
+                SalesProductDailyRollup.objects.filter(
+                    store_id=store_id,
+                    date__gte=date_from,
+                    date__lte=date_to,
+                )
+                .values('product__name')
+                .annotate(
+                    total_quantity=Sum('quantity'),
+                    total_revenue=Sum('revenue'),
+                )
+            )
+        data['top_products'] = list(top_products.order_by('-total_revenue')[:10])
 
         # Sales trend (daily aggregation)
-        sales_trend_qs = Sale.objects.filter(
-            store_id=store_id,
-            status__in=[Sale.Status.PAID, Sale.Status.PARTIALLY_PAID],
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to,
-        )
-        if is_sales_user:
-            sales_trend_qs = sales_trend_qs.filter(seller_id=request.user.id)
         sales_trend = (
-            sales_trend_qs
-            .annotate(date=TruncDate('created_at'))
+            rollups
             .values('date')
             .annotate(
-                daily_total=Sum('total'),
-                daily_count=Count('id'),
+                daily_total=Sum('revenue'),
+                daily_count=Sum('orders'),
             )
+            .filter(daily_count__gt=0)
             .order_by('date')
         )
         data['sales_trend'] = [
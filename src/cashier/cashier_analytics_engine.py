@@ -2,9 +2,11 @@
 from __future__ import annotations
 
 from decimal import Decimal
-from datetime import datetime, timezone as dt_timezone
 
-from django.db.models import Avg, Count, Sum, F, ExpressionWrapper, DurationField
+from django.db.models import Avg, Count, Sum, F, ExpressionWrapper, DurationField, Q
+from django.utils.functional import cached_property
+
+from core.dates import month_range, store_timezone
 
 
 class CashierAnalyticsEngine:
@@ -13,61 +15,111 @@ class CashierAnalyticsEngine:
     def __init__(self, store_id: str):
         self.store_id = store_id
 
+    @cached_property
+    def tz(self):
+        return store_timezone(self.store_id)
+
     def _period_bounds(self, period: str):
         year, month = int(period[:4]), int(period[5:7])
-        start = datetime(year, month, 1, tzinfo=dt_timezone.utc)
-        if month == 12:
-            end = datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc)
-        else:
-            end = datetime(year, month + 1, 1, tzinfo=dt_timezone.utc)
-        return start, end
+        return month_range(year, month, self.tz)
 
     def _get_shifts(self, cashier_id: str, period: str):
         from cashier.models import CashShift
         start, end = self._period_bounds(period)
         return CashShift.objects.filter(store_id=self.store_id, cashier_id=cashier_id, opened_at__gte=start, opened_at__lt=end)
 
-    def _get_payments(self, cashier_id: str, period: str):
-        from cashier.models import Payment
+    def _team_metrics(self, period: str, cashier_ids=None) -> tuple[dict, dict]:
+        """KPIs and payment-method rows of every cashier, in grouped queries.
+
+        Returns ``(kpis_by_cashier, method_rows_by_cashier)`` keyed by cashier
+        id string; *cashier_ids* restricts the cashiers (default: all).
+        """
+        from cashier.models import CashShift, Payment
         start, end = self._period_bounds(period)
-        return Payment.objects.filter(store_id=self.store_id, cashier_id=cashier_id, created_at__gte=start, created_at__lt=end)
+        shifts = CashShift.objects.filter(store_id=self.store_id, opened_at__gte=start, opened_at__lt=end)
+        payments = Payment.objects.filter(store_id=self.store_id, created_at__gte=start, created_at__lt=end)
+        refunded = Payment.objects.filter(
+            sale__store_id=self.store_id, sale__status='REFUNDED', created_at__gte=start, created_at__lt=end,
+        )
+        if cashier_ids is not None:
+            shifts = shifts.filter(cashier_id__in=cashier_ids)
+            payments = payments.filter(cashier_id__in=cashier_ids)
+            refunded = refunded.filter(cashier_id__in=cashier_ids)
 
-    def compute_kpis(self, cashier_id: str, period: str) -> dict:
-        from sales.models import Sale
-        shifts = self._get_shifts(cashier_id, period)
-        payments = self._get_payments(cashier_id, period)
-        shift_count = shifts.count()
-        closed_shifts = shifts.filter(status='CLOSED')
-        total_collected = payments.aggregate(total=Sum('amount'))['total'] or Decimal('0')
-        transaction_count = payments.count()
-        avg_shift_duration_h = 0.0
-        if closed_shifts.exists():
-            durations = []
-            for s in closed_shifts.exclude(closed_at=None):
-                diff = (s.closed_at - s.opened_at).total_seconds() / 3600
-                durations.append(diff)
-            if durations:
-                avg_shift_duration_h = round(sum(durations) / len(durations), 2)
-        variance_total = closed_shifts.filter(variance__isnull=False).aggregate(v=Sum('variance'))['v'] or Decimal('0')
-        total_expected = closed_shifts.filter(expected_cash__gt=0).aggregate(e=Sum('expected_cash'))['e'] or Decimal('0')
+        closed = Q(status='CLOSED')
+        shift_rows = shifts.values('cashier_id').annotate(
+            shift_count=Count('id'),
+            closed_shifts=Count('id', filter=closed),
+            avg_duration=Avg(
+                ExpressionWrapper(F('closed_at') - F('opened_at'), output_field=DurationField()),
+                filter=closed & Q(closed_at__isnull=False),
+            ),
+            variance_total=Sum('variance', filter=closed & Q(variance__isnull=False)),
+            total_expected=Sum('expected_cash', filter=closed & Q(expected_cash__gt=0)),
+        ).order_by()
+        payment_rows = payments.values('cashier_id').annotate(
+            total_collected=Sum('amount'),
+            transaction_count=Count('id'),
+            avg_delay=Avg(
+                ExpressionWrapper(F('created_at') - F('sale__submitted_at'), output_field=DurationField()),
+                filter=Q(sale__submitted_at__isnull=False, sale__status__in=['PAID', 'PARTIALLY_PAID']),
+            ),
+        ).order_by()
+        method_rows = payments.values('cashier_id', 'method').annotate(amount=Sum('amount'), count=Count('id')).order_by()
+        refund_counts = {
+            str(cashier_id): n
+            for cashier_id, n in refunded.values('cashier_id').annotate(n=Count('sale_id', distinct=True)).order_by().values_list('cashier_id', 'n')
+        }
+        payment_metrics = {str(row['cashier_id']): row for row in payment_rows}
+        methods: dict = {}
+        for row in method_rows:
+            methods.setdefault(str(row['cashier_id']), []).append(row)
+        shift_metrics = {str(row['cashier_id']): row for row in shift_rows}
+
+        kpis = {}
+        # Cashiers with payments but no shift opened in the period still get KPIs.
+        for cashier_id in shift_metrics.keys() | payment_metrics.keys():
+            row = shift_metrics.get(cashier_id, {})
+            paid = payment_metrics.get(cashier_id, {})
+            kpis[cashier_id] = self._kpis_from_metrics(
+                shift_count=row.get('shift_count', 0),
+                closed_shifts=row.get('closed_shifts', 0),
+                avg_duration=row.get('avg_duration'),
+                variance_total=row.get('variance_total') or Decimal('0'),
+                total_expected=row.get('total_expected') or Decimal('0'),
+                total_collected=paid.get('total_collected') or Decimal('0'),
+                transaction_count=paid.get('transaction_count', 0),
+                avg_delay=paid.get('avg_delay'),
+                refund_count=refund_counts.get(cashier_id, 0),
+            )
+        return kpis, methods
+
+    @staticmethod
+    def _kpis_from_metrics(*, shift_count, closed_shifts, avg_duration, variance_total, total_expected,
+                           total_collected, transaction_count, avg_delay, refund_count) -> dict:
+        avg_shift_duration_h = round(avg_duration.total_seconds() / 3600, 2) if avg_duration else 0.0
         variance_rate = float(abs(variance_total) / total_expected * 100) if total_expected else 0.0
-        avg_delay_seconds = 0.0
-        payment_qs = payments.filter(
-            sale__submitted_at__isnull=False,
-            sale__status__in=['PAID', 'PARTIALLY_PAID'],
-        ).annotate(
-            delay=ExpressionWrapper(F('created_at') - F('sale__submitted_at'), output_field=DurationField()),
-        ).aggregate(avg_delay=Avg('delay'))
-        raw_avg = payment_qs['avg_delay']
-        if raw_avg:
-            avg_delay_seconds = raw_avg.total_seconds()
-        refund_count = Sale.objects.filter(
-            store_id=self.store_id, status='REFUNDED',
-            payments__cashier_id=cashier_id,
-            payments__created_at__gte=self._period_bounds(period)[0],
-            payments__created_at__lt=self._period_bounds(period)[1],
-        ).distinct().count()
-        return {'shift_count': shift_count, 'closed_shifts': closed_shifts.count(), 'total_collected': str(total_collected), 'transaction_count': transaction_count, 'avg_shift_duration_h': avg_shift_duration_h, 'variance_total': str(variance_total), 'variance_rate': round(variance_rate, 2), 'avg_delay_seconds': round(avg_delay_seconds, 1), 'avg_delay_minutes': round(avg_delay_seconds / 60, 2), 'refund_count': refund_count}
+        avg_delay_seconds = avg_delay.total_seconds() if avg_delay else 0.0
+        return {'shift_count': shift_count, 'closed_shifts': closed_shifts, 'total_collected': str(total_collected), 'transaction_count': transaction_count, 'avg_shift_duration_h': avg_shift_duration_h, 'variance_total': str(variance_total), 'variance_rate': round(variance_rate, 2), 'avg_delay_seconds': round(avg_delay_seconds, 1), 'avg_delay_minutes': round(avg_delay_seconds / 60, 2), 'refund_count': refund_count}
+
+    @staticmethod
+    def _payment_methods_from_rows(rows: list) -> dict:
+        METHOD_LABELS = {'CASH': 'Espèces', 'MOBILE_MONEY': 'Mobile Money', 'BANK_TRANSFER': 'Virement', 'CREDIT': 'Crédit', 'CHEQUE': 'Chèque'}
+        total = sum((row['amount'] or Decimal('0') for row in rows), Decimal('0'))
+        by_method = []
+        for row in sorted(rows, key=lambda r: r['amount'] or Decimal('0'), reverse=True):
+            method = row['method']
+            amt = row['amount'] or Decimal('0')
+            by_method.append({'method': method, 'label': METHOD_LABELS.get(method, method), 'amount': str(amt), 'count': row['count'], 'percentage': round(float(amt / total * 100), 1) if total else 0.0})
+        return {'total': str(total), 'by_method': by_method}
+
+    def compute_kpis(self, cashier_id: str, period: str) -> dict:
+        kpis, _ = self._team_metrics(period, cashier_ids=[cashier_id])
+        return kpis.get(str(cashier_id)) or self._kpis_from_metrics(
+            shift_count=0, closed_shifts=0, avg_duration=None, variance_total=Decimal('0'),
+            total_expected=Decimal('0'), total_collected=Decimal('0'), transaction_count=0,
+            avg_delay=None, refund_count=0,
+        )
 
     def compute_reliability_score(self, cashier_id: str, period: str, kpis: dict | None = None) -> dict:
         if kpis is None:
@@ -112,59 +164,52 @@ class CashierAnalyticsEngine:
             kpis = self.compute_kpis(cashier_id, period)
         anomalies = []
         if kpis['variance_rate'] > 5.0:
-            anomalies.append()
+            anomalies.append({'type': 'HIGH_VARIANCE', 'label': 'Écarts de caisse élevés', 'value': f"{kpis['variance_rate']:.1f}%", 'threshold': '5%'})
         if 0 < kpis['avg_delay_seconds'] < 30 and kpis['transaction_count'] >= 3:
-            anomalies.append()
+            anomalies.append({'type': 'TOO_FAST', 'label': 'Encaissements anormalement rapides', 'value': f"{kpis['avg_delay_seconds']:.0f} s", 'threshold': '30 s'})
         if kpis['avg_delay_minutes'] > 15 and kpis['transaction_count'] >= 3:
-            anomalies.append()
+            anomalies.append({'type': 'SLOW_PROCESSING', 'label': 'Délai de traitement trop long', 'value': f"{kpis['avg_delay_minutes']:.1f} min", 'threshold': '15 min'})
         if kpis['refund_count'] > 3:
-            anomalies.append()
+            anomalies.append({'type': 'HIGH_REFUNDS', 'label': 'Remboursements fréquents', 'value': str(kpis['refund_count']), 'threshold': '3'})
         if kpis['avg_shift_duration_h'] > 12 and kpis['shift_count'] >= 2:
-            anomalies.append()
+            anomalies.append({'type': 'LONG_SHIFTS', 'label': 'Shifts anormalement longs', 'value': f"{kpis['avg_shift_duration_h']:.1f} h", 'threshold': '12 h'})
         risk_score = len(anomalies) * 20
         return {'risk_score': risk_score, 'anomalies': anomalies}
 
     def compute_payment_methods(self, cashier_id: str, period: str) -> dict:
-        METHOD_LABELS = {'CASH': 'Espèces', 'MOBILE_MONEY': 'Mobile Money', 'BANK_TRANSFER': 'Virement', 'CREDIT': 'Crédit', 'CHEQUE': 'Chèque'}
-        payments = self._get_payments(cashier_id, period)
-        total = payments.aggregate(t=Sum('amount'))['t'] or Decimal('0')
-        by_method = []
-        for row in payments.values('method').annotate(amount=Sum('amount'), count=Count('id')).order_by('-amount'):
-            method = row['method']
-            amt = row['amount'] or Decimal('0')
-            by_method.append({'method': method, 'label': METHOD_LABELS.get(method, method), 'amount': str(amt), 'count': row['count'], 'percentage': round(float(amt / total * 100), 1) if total else 0.0})
-        return {'total': str(total), 'by_method': by_method}
+        _, methods = self._team_metrics(period, cashier_ids=[cashier_id])
+        return self._payment_methods_from_rows(methods.get(str(cashier_id), []))
 
     def compute_shift_history(self, cashier_id: str, period: str) -> list:
-        from cashier.models import Payment
-        shifts = self._get_shifts(cashier_id, period).order_by('-opened_at')
+        shifts = self._get_shifts(cashier_id, period).annotate(
+            total_collected=Sum('payments__amount'),
+            transaction_count=Count('payments'),
+        ).order_by('-opened_at')
         result = []
         for s in shifts:
             duration_h = None
             if s.closed_at:
                 duration_h = round((s.closed_at - s.opened_at).total_seconds() / 3600, 2)
-            total = Payment.objects.filter(shift=s).aggregate(t=Sum('amount'))['t'] or Decimal('0')
-            count = Payment.objects.filter(shift=s).count()
-            result.append({'id': str(s.id), 'opened_at': s.opened_at.isoformat(), 'closed_at': s.closed_at.isoformat() if s.closed_at else None, 'duration_h': duration_h, 'status': s.status, 'total_collected': str(total), 'transaction_count': count, 'expected_cash': str(s.expected_cash), 'closing_cash': str(s.closing_cash) if s.closing_cash is not None else None, 'variance': str(s.variance) if s.variance is not None else None})
+            total = s.total_collected or Decimal('0')
+            result.append({'id': str(s.id), 'opened_at': s.opened_at.isoformat(), 'closed_at': s.closed_at.isoformat() if s.closed_at else None, 'duration_h': duration_h, 'status': s.status, 'total_collected': str(total), 'transaction_count': s.transaction_count, 'expected_cash': str(s.expected_cash), 'closing_cash': str(s.closing_cash) if s.closing_cash is not None else None, 'variance': str(s.variance) if s.variance is not None else None})
         return result
 
     def compute_team_overview(self, period: str) -> list:
-        from cashier.models import CashShift
+        """Scores of every cashier with a shift in *period*, best first.
+
+        A fixed number of grouped queries whatever the team size.
+        """
         from django.contrib.auth import get_user_model
         User = get_user_model()
-        start, end = self._period_bounds(period)
-        cashier_ids = CashShift.objects.filter(store_id=self.store_id, opened_at__gte=start, opened_at__lt=end).values_list('cashier_id', flat=True).distinct()
+        kpis_by_cashier, methods = self._team_metrics(period)
+        cashier_ids = [cashier_id for cashier_id, kpis in kpis_by_cashier.items() if kpis['shift_count']]
+        users = User.objects.in_bulk(cashier_ids)
         team = []
-        for uid in cashier_ids:
-            try:
-                user = User.objects.get(id=uid)
-            except User.DoesNotExist:
-                continue
-            kpis = self.compute_kpis(str(uid), period)
+        for uid, user in users.items():
+            kpis = kpis_by_cashier[str(uid)]
             score = self.compute_reliability_score(str(uid), period, kpis)
             anomalies = self.compute_anomalies(str(uid), period, kpis)
-            methods = self.compute_payment_methods(str(uid), period)
-            team.append({'cashier_id': str(uid), 'cashier_name': user.get_full_name() or user.email, 'kpis': kpis, 'score': score, 'anomalies': anomalies, 'payment_methods': methods})
+            payment_methods = self._payment_methods_from_rows(methods.get(str(uid), []))
+            team.append({'cashier_id': str(uid), 'cashier_name': user.get_full_name() or user.email, 'kpis': kpis, 'score': score, 'anomalies': anomalies, 'payment_methods': payment_methods})
         team.sort(key=lambda x: x['score']['total'], reverse=True)
         return team
-
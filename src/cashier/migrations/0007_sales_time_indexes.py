@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-16 22:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cashier', '0006_add_refund_tracking_fields'),
+        ('sales', '0011_sale_stock_reserved'),
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashshift',
+            index=models.Index(fields=['store', 'opened_at'], name='shift_store_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cashshift',
+            index=models.Index(fields=['store', 'cashier', 'opened_at'], name='shift_store_cashier_opened_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['store', 'created_at'], name='payment_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['store', 'cashier', 'created_at'], name='payment_store_cashier_crt_idx'),
+        ),
+    ]
@@ -150,6 +150,10 @@ class CashShift(TimeStampedModel):
         ordering = ["-opened_at"]
         verbose_name = "Session de caisse"
         verbose_name_plural = "Sessions de caisse"
+        indexes = [
+            models.Index(fields=["store", "opened_at"], name="shift_store_opened_idx"),
+            models.Index(fields=["store", "cashier", "opened_at"], name="shift_store_cashier_opened_idx"),
+        ]
 
     def __str__(self):
         return (
@@ -279,6 +283,10 @@ class Payment(TimeStampedModel):
         ordering = ["-created_at"]
         verbose_name = "Paiement"
         verbose_name_plural = "Paiements"
+        indexes = [
+            models.Index(fields=["store", "created_at"], name="payment_store_created_idx"),
+            models.Index(fields=["store", "cashier", "created_at"], name="payment_store_cashier_crt_idx"),
+        ]
 
     def __str__(self):
         return (
@@ -0,0 +1,55 @@
+"""Outbox handlers for the cashier app (see :mod:`core.outbox`)."""
+from __future__ import annotations
+
+import logging
+
+from core.outbox import outbox_handler
+from stores.services import create_audit_log
+
+logger = logging.getLogger("boutique")
+
+
+def record_self_checkout(sale, cashier, store) -> None:
+    """Audit and raise an alert when *cashier* cashed their own sale."""
+    create_audit_log(
+        actor=cashier,
+        store=store,
+        action="SELF_CHECKOUT",
+        entity_type="Sale",
+        entity_id=str(sale.pk),
+        after={
+            "total": str(sale.total),
+            "cashier": str(cashier.pk),
+            "invoice_number": sale.invoice_number or "",
+        },
+    )
+    try:
+        from alerts.models import Alert
+        Alert.objects.create(
+            store=store,
+            alert_type="SELF_CHECKOUT",
+            severity="MEDIUM",
+            title="Auto-encaissement detecte",
+            message=(
+                f"{cashier.get_full_name()} a encaisse sa propre vente "
+                f"#{sale.invoice_number or sale.pk} "
+                f"({sale.total} {store.currency})."
+            ),
+        )
+    except Exception:
+        logger.warning(
+            "Failed to create SELF_CHECKOUT alert for sale %s",
+            sale.pk, exc_info=True,
+        )
+
+
+@outbox_handler("cashier.self_checkout")
+def handle_self_checkout(payload):
+    from accounts.models import User
+    from sales.models import Sale
+
+    sale = Sale.objects.select_related("store").filter(pk=payload["sale_id"]).first()
+    cashier = User.objects.filter(pk=payload["cashier_id"]).first()
+    if sale is None or cashier is None:
+        return
+    record_self_checkout(sale, cashier, sale.store)
@@ -14,9 +14,12 @@ from django.db import transaction
 from django.db.models import Sum
 from django.utils import timezone
 
+from core.outbox import outbox_enabled_for_store, publish_event
+from reports.rollups import apply_line_changes, line_rollup_values
 from stores.services import create_audit_log
 
 from .models import CashShift, Payment
+from .outbox import record_self_checkout
 
 logger = logging.getLogger("boutique")
 ALLOWED_CASHIER_ROLES = ("CASHIER", "SALES_CASHIER", "MANAGER", "ADMIN")
@@ -423,9 +426,8 @@ def process_payment(
             sale.paid_at = timezone.now()
             sale.save()
 
-            # Keep reserved quantities in sync once the sale leaves partial-paid state.
-            if sale.reserve_stock:
-                _sync_reserved_stock_for_sale_products(sale)
+            # The sale leaves partial-paid state: give back its own reservation.
+            _sync_reserved_stock_for_sale_products(sale)
 
             # Decrement stock for each sale line (skip if already done at validation)
             if not sale.stock_decremented:
@@ -437,16 +439,18 @@ def process_payment(
             sale.status = Sale.Status.PARTIALLY_PAID
             sale.save()
 
-            # Decrement stock on first partial payment (customer takes the goods)
-            if not sale.stock_decremented:
+            if sale.reserve_stock and not sale.stock_decremented:
+                # Layaway: goods stay in store, only this sale's quantities
+                # are reserved (once, on the first partial payment).  Stock
+                # is decremented when the sale is paid; decrementing here
+                # too would count the goods twice in available_qty.
+                _sync_reserved_stock_for_sale_products(sale)
+            elif not sale.stock_decremented:
+                # Decrement stock on first partial payment (customer takes the goods)
                 _decrement_stock_for_sale(sale, cashier)
                 sale.stock_decremented = True
                 sale.save(update_fields=["stock_decremented"])
 
-            # Optionally reserve stock for partially paid sales
-            if sale.reserve_stock:
-                _sync_reserved_stock_for_sale_products(sale)
-
         # ------------------------------------------------------------------
         # Handle credit payments: create credit ledger entry
         # ------------------------------------------------------------------
@@ -484,6 +488,18 @@ def process_payment(
             },
         )
 
+        # Self-checkout audit/alert is delivered through the outbox unless
+        # the store keeps synchronous side effects.
+        self_checkout = str(cashier.pk) == str(sale.seller_id)
+        use_outbox = outbox_enabled_for_store(shift.store)
+        if self_checkout and use_outbox:
+            publish_event(
+                "cashier.self_checkout",
+                aggregate_key=f"sales.Sale:{sale.pk}",
+                payload={"sale_id": str(sale.pk), "cashier_id": str(cashier.pk)},
+                store=shift.store,
+            )
+
     logger.info(
         "Payment processed for sale %s: %s payment(s), total %s",
         sale.pk, len(created_payments), total_payment,
@@ -492,37 +508,8 @@ def process_payment(
     # ------------------------------------------------------------------
     # Anti-fraud: detect self-checkout (seller == cashier)
     # ------------------------------------------------------------------
-    if str(cashier.pk) == str(sale.seller_id):
-        create_audit_log(
-            actor=cashier,
-            store=shift.store,
-            action="SELF_CHECKOUT",
-            entity_type="Sale",
-            entity_id=str(sale.pk),
-            after={
-                "total": str(sale.total),
-                "cashier": str(cashier.pk),
-                "invoice_number": sale.invoice_number or "",
-            },
-        )
-        try:
-            from alerts.models import Alert
-            Alert.objects.create(
-                store=shift.store,
-                alert_type="SELF_CHECKOUT",
-                severity="MEDIUM",
-                title="Auto-encaissement detecte",
-                message=(
-                    f"{cashier.get_full_name()} a encaisse sa propre vente "
-                    f"#{sale.invoice_number or sale.pk} "
-                    f"({sale.total} {shift.store.currency})."
-                ),
-            )
-        except Exception:
-            logger.warning(
-                "Failed to create SELF_CHECKOUT alert for sale %s",
-                sale.pk, exc_info=True,
-            )
+    if self_checkout and not use_outbox:
+        record_self_checkout(sale, cashier, shift.store)
 
     return created_payments
 
@@ -657,33 +644,51 @@ def calculate_shift_totals(shift: CashShift) -> dict[str, Decimal]:
 def _decrement_stock_for_sale(sale, actor):
     """Decrement stock for each line item in a fully paid sale.
 
-    Attempts to use ``stock.services.adjust_stock`` if available;
+    Attempts to use ``stock.services.adjust_stock_many`` if available;
     otherwise falls back to direct model manipulation.
     """
     try:
-        from stock.services import adjust_stock
-        for item in sale.items.select_related("product"):
-            if not bool(getattr(item.product, "track_stock", True)):
-                continue
-            _movement, fifo_details = adjust_stock(
-                store=sale.store,
-                product=item.product,
-                qty_delta=-item.quantity,
-                movement_type="SALE",
-                reason=f"Vente {sale.invoice_number or sale.pk}",
-                actor=actor,
-                reference=str(sale.pk),
-                return_details=True,
-            )
+        from stock.services import adjust_stock_many
+        items = [
+            item for item in sale.items.select_related("product")
+            if bool(getattr(item.product, "track_stock", True))
+        ]
+        results = adjust_stock_many(
+            [
+                {
+                    "store": sale.store,
+                    "product": item.product,
+                    "qty_delta": -item.quantity,
+                    "movement_type": "SALE",
+                    "reason": f"Vente {sale.invoice_number or sale.pk}",
+                    "reference": str(sale.pk),
+                }
+                for item in items
+            ],
+            actor=actor,
+        )
+        costed_items = []
+        cost_changes = []
+        now = timezone.now()
+        for item, (_movement, fifo_details) in zip(items, results):
             fifo_unit_cost = fifo_details.get("applied_unit_cost")
             if fifo_unit_cost is not None:
+                before = line_rollup_values(item)
                 item.cost_price = Decimal(str(fifo_unit_cost)).quantize(Decimal("0.01"))
-                item.save(update_fields=["cost_price", "updated_at"])
+                item.updated_at = now
+                costed_items.append(item)
+                cost_changes.append((before, line_rollup_values(item)))
+        if costed_items:
+            from django.apps import apps
+            SaleItem = apps.get_model("sales", "SaleItem")
+            SaleItem.objects.bulk_update(costed_items, ["cost_price", "updated_at"])
+            # bulk_update sends no signal: report the FIFO costs to the rollups.
+            apply_line_changes(sale, cost_changes)
         _sync_reserved_stock_for_sale_products(sale)
     except ImportError:
         # Fallback: direct stock update
         logger.warning(
-            "stock.services.adjust_stock not available; "
+            "stock.services.adjust_stock_many not available; "
             "using direct ProductStock update."
         )
         try:
@@ -718,58 +723,43 @@ def _decrement_stock_for_sale(sale, actor):
             raise
 
 
-def _sync_reserved_stock_for_sale_products(sale):
-    """Synchronize ProductStock.reserved_qty for products involved in a sale.
+def _sale_holds_reservation(sale) -> bool:
+    """Return True when *sale* should currently count in ``reserved_qty``."""
+    return (
+        sale.status == "PARTIALLY_PAID"
+        and bool(sale.reserve_stock)
+        and not sale.stock_decremented
+    )
+
 
-    We recompute reserved quantities from all partially paid sales with
-    ``reserve_stock=True`` to avoid drift when payments are edited or
-    finalized concurrently.
+def _sync_reserved_stock_for_sale_products(sale):
+    """Apply this sale's reservation delta to ProductStock.reserved_qty.
+
+    ``Sale.stock_reserved`` records whether the sale's quantities are
+    currently counted in ``reserved_qty``.  When the sale enters the
+    reserving state its quantities are added once; when it leaves it
+    (fully paid, cancelled, refunded) they are removed once.  Any other
+    call is a no-op, so a payment only ever costs its own delta.  Drift
+    is repaired by ``stock.services.reconcile_reserved_stock``.
     """
-    try:
-        from django.apps import apps
-        from stock.models import ProductStock
+    should_hold = _sale_holds_reservation(sale)
+    if bool(sale.stock_reserved) == should_hold:
+        return
 
-        SaleItem = apps.get_model("sales", "SaleItem")
-        product_ids = list(
-            sale.items.filter(product__track_stock=True)
-            .values_list("product_id", flat=True)
-            .distinct()
+    try:
+        from stock.services import apply_reserved_qty_deltas
+
+        sign = 1 if should_hold else -1
+        apply_reserved_qty_deltas(
+            sale.store,
+            [
+                (item.product, sign * int(item.quantity))
+                for item in sale.items.select_related("product")
+                if bool(getattr(item.product, "track_stock", True))
+            ],
         )
-
-        if not product_ids:
-            return
-
-        for product_id in product_ids:
-            stock_record, _created = ProductStock.objects.select_for_update().get_or_create(
-                store=sale.store,
-                product_id=product_id,
-                defaults={"quantity": 0, "reserved_qty": 0},
-            )
-
-            reserved_target = (
-                SaleItem.objects.filter(
-                    sale__store=sale.store,
-                    sale__status="PARTIALLY_PAID",
-                    sale__reserve_stock=True,
-                    product_id=product_id,
-                ).aggregate(total=Sum("quantity"))["total"]
-                or 0
-            )
-
-            if stock_record.reserved_qty != reserved_target:
-                stock_record.reserved_qty = reserved_target
-                stock_record.save(update_fields=["reserved_qty", "updated_at"])
-                try:
-                    from alerts.services import create_stock_level_alert_for_product_stock
-
-                    create_stock_level_alert_for_product_stock(stock_record)
-                except Exception:
-                    logger.warning(
-                        "Low-stock alert refresh failed for reserved stock %s/%s",
-                        stock_record.store_id,
-                        stock_record.product_id,
-                        exc_info=True,
-                    )
+        sale.stock_reserved = should_hold
+        sale.save(update_fields=["stock_reserved", "updated_at"])
     except Exception:
         logger.exception(
             "Failed to sync reserved stock for sale %s", sale.pk,
@@ -1,7 +1,15 @@
 """Admin configuration for the catalog app."""
 from django.contrib import admin
 
-from .models import Brand, Category, Product, ProductImage, ProductSpec
+from .models import (
+    Brand,
+    Category,
+    Product,
+    ProductImage,
+    ProductImportErrorRow,
+    ProductImportJob,
+    ProductSpec,
+)
 
 
 # ---------------------------------------------------------------------------
@@ -115,3 +123,32 @@ class ProductSpecAdmin(admin.ModelAdmin):
     list_filter = ("key",)
     readonly_fields = ("id", "created_at", "updated_at")
     list_select_related = ("product",)
+
+
+# ---------------------------------------------------------------------------
+# Product import jobs
+# ---------------------------------------------------------------------------
+
+@admin.register(ProductImportJob)
+class ProductImportJobAdmin(admin.ModelAdmin):
+    list_display = (
+        "created_at",
+        "enterprise",
+        "file_format",
+        "status",
+        "total_rows",
+        "created_rows",
+        "updated_rows",
+        "error_rows",
+    )
+    list_filter = ("status", "file_format", "enterprise")
+    readonly_fields = ("id", "created_at", "updated_at", "started_at", "finished_at")
+    list_select_related = ("enterprise",)
+
+
+@admin.register(ProductImportErrorRow)
+class ProductImportErrorRowAdmin(admin.ModelAdmin):
+    list_display = ("job", "row_number", "error_message")
+    search_fields = ("error_message",)
+    readonly_fields = ("id", "created_at", "updated_at")
+    list_select_related = ("job",)
@@ -0,0 +1,589 @@
+"""Bulk product import from CSV and Excel files.
+
+Rows are read as a stream (``csv`` over the uploaded file, openpyxl
+read-only sheets) and written in chunks of ``IMPORT_CHUNK_SIZE``:
+
+- each row is validated in memory;
+- categories and brands are matched against dicts loaded once per import;
+  the missing ones are created with one ``bulk_create`` per chunk;
+- existing products are fetched with one ``sku__in`` query per chunk, then
+  saved with ``bulk_create`` / ``bulk_update``;
+- slugs are chosen against the set of slugs of the enterprise, loaded once,
+  instead of one query per candidate.
+
+Small files are imported in the request with :func:`import_file`.  Files of
+more than ``PRODUCT_IMPORT_BACKGROUND_THRESHOLD`` rows become a
+:class:`~catalog.models.ProductImportJob`, run by the
+``catalog.tasks.run_product_import_job`` task, which reports its progress
+and keeps every rejected row.
+"""
+from __future__ import annotations
+
+import codecs
+import csv
+import io
+import logging
+import unicodedata
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import Brand, Category, Product
+
+logger = logging.getLogger("boutique")
+
+IMPORT_CHUNK_SIZE = 500
+MAX_REPORTED_ERRORS = 50
+
+# Column order of the Excel import sheet (first row is the header).
+IMPORT_COLUMNS = [
+    "nom",           # A - name
+    "sku",           # B - sku (unique reference)
+    "code_barres",   # C - barcode
+    "categorie",     # D - category name
+    "marque",        # E - brand name
+    "prix_achat",    # F - cost_price
+    "prix_vente",    # G - selling_price
+    "description",   # H - description
+    "actif",         # I - is_active (oui/non or 1/0)
+]
+_XLSX_FIELDS = (
+    "name", "sku", "barcode", "category", "brand",
+    "cost_price", "selling_price", "description", "is_active",
+)
+
+# CSV header aliases, by field.
+CSV_ALIASES = {
+    "name": ("name", "nom", "produit", "product_name"),
+    "sku": ("sku", "reference", "ref", "code"),
+    "selling_price": ("selling_price", "prix_vente", "price", "prix"),
+    "cost_price": ("cost_price", "prix_achat", "purchase_price"),
+    "barcode": ("barcode", "code_barres", "codebarres", "ean"),
+    "description": ("description", "desc"),
+    "is_active": ("is_active", "actif", "active"),
+    "category": ("category", "categorie"),
+    "brand": ("brand", "marque"),
+}
+
+_TRUE_VALUES = {"1", "true", "yes", "oui", "vrai", "on"}
+_FALSE_VALUES = {"0", "false", "no", "non", "faux", "off"}
+_SKU_MAX_LENGTH = Product._meta.get_field("sku").max_length
+_SLUG_BASE_LENGTH = 240
+
+PRODUCT_UPDATE_FIELDS = [
+    "name", "slug", "barcode", "description", "category", "brand",
+    "cost_price", "selling_price", "is_active", "updated_at",
+]
+
+
+class ImportFileError(ValueError):
+    """The file cannot be imported at all (empty, unreadable, no header)."""
+
+
+@dataclass
+class ImportResult:
+    total_rows: int = 0
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error_count: int = 0
+    # First MAX_REPORTED_ERRORS errors, as {"line", "message"}.
+    errors: list = field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Reading
+# ---------------------------------------------------------------------------
+
+def normalize_header(value) -> str:
+    """Normalize a CSV header label (case, accents, separators)."""
+    cleaned = (value or "").strip().lower()
+    cleaned = unicodedata.normalize("NFKD", cleaned)
+    cleaned = "".join(ch for ch in cleaned if not unicodedata.combining(ch))
+    for ch in (" ", "-", "_", "/", "\\", ".", "(", ")", ":"):
+        cleaned = cleaned.replace(ch, "")
+    return cleaned
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        # Numeric Excel cells (SKUs, barcodes, prices) come back as floats.
+        return str(int(value))
+    return str(value).strip()
+
+
+def _detect_encoding(handle) -> str:
+    """UTF-8 (with or without BOM) if the whole file decodes, else latin-1."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        for chunk in iter(lambda: handle.read(64 * 1024), b""):
+            decoder.decode(chunk)
+        decoder.decode(b"", final=True)
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+    handle.seek(0)
+    return encoding
+
+
+def read_csv(handle):
+    """Return an iterator of ``(line, raw row, values)`` over a binary CSV file.
+
+    The header is checked right away (:class:`ImportFileError`); rows are
+    then read lazily.
+    """
+    text = io.TextIOWrapper(handle, encoding=_detect_encoding(handle), newline="")
+    sample = text.read(4096)
+    if not sample.strip():
+        text.detach()
+        raise ImportFileError("Le fichier CSV est vide.")
+    text.seek(0)
+    # The delimiter is the most frequent candidate of the header line: the
+    # csv sniffer is misled by rows with empty trailing cells.
+    header_line = sample.splitlines()[0]
+    delimiter = max(",;|\t", key=header_line.count)
+    reader = csv.DictReader(text, delimiter=delimiter if delimiter in header_line else ",")
+    if not reader.fieldnames:
+        text.detach()
+        raise ImportFileError("En-tetes CSV introuvables.")
+
+    header_map = {
+        normalize_header(col): col
+        for col in reader.fieldnames
+        if col is not None and str(col).strip() != ""
+    }
+    columns = {
+        name: [header_map[key] for key in map(normalize_header, aliases) if key in header_map]
+        for name, aliases in CSV_ALIASES.items()
+    }
+    if not any(columns.values()):
+        text.detach()
+        raise ImportFileError("Le CSV ne contient aucun en-tete exploitable.")
+
+    def _rows():
+        try:
+            for line_no, row in enumerate(reader, start=2):
+                raw = {str(key): _text(value) for key, value in row.items() if key is not None}
+                values = {
+                    name: next((raw[col] for col in cols if raw.get(col)), "")
+                    for name, cols in columns.items()
+                }
+                yield line_no, raw, values
+        finally:
+            text.detach()
+
+    return _rows()
+
+
+def read_xlsx(handle):
+    """Return an iterator of ``(line, raw row, values)`` over an Excel file.
+
+    Columns follow :data:`IMPORT_COLUMNS`; the first row is the header.
+    """
+    import openpyxl
+
+    try:
+        wb = openpyxl.load_workbook(handle, read_only=True, data_only=True)
+    except Exception as exc:
+        raise ImportFileError(f"Fichier Excel illisible : {exc}") from exc
+
+    def _rows():
+        try:
+            for line_no, row in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+                cells = [_text(value) for value in row[:len(IMPORT_COLUMNS)]]
+                cells += [""] * (len(IMPORT_COLUMNS) - len(cells))
+                yield line_no, dict(zip(IMPORT_COLUMNS, cells)), dict(zip(_XLSX_FIELDS, cells))
+        finally:
+            wb.close()
+
+    return _rows()
+
+
+def read_rows(handle, file_format: str):
+    return read_xlsx(handle) if file_format == "xlsx" else read_csv(handle)
+
+
+def count_rows(handle, file_format: str) -> int:
+    """Number of data rows of the file (header excluded), read without parsing."""
+    if file_format == "xlsx":
+        import openpyxl
+
+        try:
+            wb = openpyxl.load_workbook(handle, read_only=True)
+            total = max((wb.active.max_row or 1) - 1, 0)
+            wb.close()
+        except Exception:
+            total = 0
+    else:
+        lines, last = 0, b""
+        for chunk in iter(lambda: handle.read(64 * 1024), b""):
+            lines += chunk.count(b"\n")
+            last = chunk
+        if last and not last.endswith(b"\n"):
+            lines += 1
+        total = max(lines - 1, 0)
+    handle.seek(0)
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Validation
+# ---------------------------------------------------------------------------
+
+def _decimal(value: str, label: str, *, required: bool, allow_zero: bool = True) -> Decimal:
+    if not value:
+        if required:
+            raise ValueError("Le prix de vente est obligatoire.")
+        return Decimal("0.00")
+    try:
+        amount = Decimal(value.replace(" ", "").replace(",", "."))
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"{label} invalide.")
+    if not amount.is_finite():
+        raise ValueError(f"{label} invalide.")
+    if amount < 0:
+        raise ValueError(f"{label} ne peut pas etre negatif.")
+    if not amount and not allow_zero:
+        raise ValueError("Le prix de vente est obligatoire.")
+    return amount
+
+
+def _bool(value: str, default: bool = True) -> bool:
+    """Parse a yes/no cell; empty means active, unknown values give *default*."""
+    value = value.lower()
+    if not value:
+        return True
+    if value in _TRUE_VALUES:
+        return True
+    if value in _FALSE_VALUES:
+        return False
+    return default
+
+
+def clean_row(values: dict, *, require_category: bool = False, strict: bool = False) -> dict:
+    """Validate one row; raises ``ValueError`` with a user-facing message.
+
+    *strict* keeps the rules of the Excel import: a selling price of 0 is
+    rejected and an unrecognised ``actif`` value means inactive (the API
+    import accepts both, an unknown value keeping the product active).
+    """
+    name = values.get("name", "")
+    sku = values.get("sku", "")
+    if not name:
+        raise ValueError("Nom produit manquant.")
+    if not sku:
+        raise ValueError("SKU manquant.")
+    if len(sku) > _SKU_MAX_LENGTH:
+        raise ValueError(f"SKU trop long ({_SKU_MAX_LENGTH} caracteres maximum).")
+    category = values.get("category", "")
+    if require_category and not category:
+        raise ValueError("La categorie est obligatoire.")
+    return {
+        "name": name[:255],
+        "sku": sku,
+        "barcode": values.get("barcode", "")[:100],
+        "category": category[:255],
+        "brand": values.get("brand", "")[:255],
+        "selling_price": _decimal(
+            values.get("selling_price", ""), "prix_vente", required=True, allow_zero=not strict,
+        ),
+        "cost_price": _decimal(values.get("cost_price", ""), "prix_achat", required=False),
+        "description": values.get("description", ""),
+        "is_active": _bool(values.get("is_active", ""), default=not strict),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Import
+# ---------------------------------------------------------------------------
+
+def _free_slug(base: str, fallback: str, taken: set) -> str:
+    base_slug = slugify(base)[:_SLUG_BASE_LENGTH] or fallback
+    slug, counter = base_slug, 1
+    while slug in taken:
+        slug = f"{base_slug}-{counter}"
+        counter += 1
+    taken.add(slug)
+    return slug
+
+
+class ProductImporter:
+    """Create or update the products of one enterprise from validated rows.
+
+    Products are matched by SKU.  Their slug comes from the SKU
+    (``slug_source="sku"``, API import) or the name (``"name"``, Excel
+    import).  *require_category* and *strict* (see :func:`clean_row`) give
+    the validation rules of the Excel import.  *on_errors* receives the rejected rows of each chunk as
+    ``(line, raw row, message)`` tuples.
+    """
+
+    def __init__(
+        self, enterprise_id, *, slug_source="sku", require_category=False, strict=False, on_errors=None,
+    ):
+        self.enterprise_id = enterprise_id
+        self.slug_source = slug_source
+        self.require_category = require_category
+        self.strict = strict
+        self.on_errors = on_errors
+        self.result = ImportResult()
+        self._load()
+
+    def _load(self):
+        scope = {"enterprise_id": self.enterprise_id}
+        self.categories = {c.name.strip().lower(): c for c in Category.objects.filter(**scope)}
+        self.brands = {b.name.strip().lower(): b for b in Brand.objects.filter(**scope)}
+        self.slugs = {
+            model: set(model.objects.filter(**scope).values_list("slug", flat=True))
+            for model in (Category, Brand, Product)
+        }
+
+    def run(self, rows, progress=None) -> ImportResult:
+        """Import *rows* (``(line, raw, values)`` tuples) chunk by chunk."""
+        chunk = []
+        for line_no, raw, values in rows:
+            self.result.total_rows += 1
+            if not any(raw.values()):
+                self.result.skipped += 1
+                continue
+            chunk.append((line_no, raw, values))
+            if len(chunk) >= IMPORT_CHUNK_SIZE:
+                self._import_chunk(chunk)
+                chunk = []
+                if progress is not None:
+                    progress(self.result)
+        if chunk:
+            self._import_chunk(chunk)
+        if progress is not None:
+            progress(self.result)
+        return self.result
+
+    def _report(self, errors):
+        if not errors:
+            return
+        self.result.error_count += len(errors)
+        room = MAX_REPORTED_ERRORS - len(self.result.errors)
+        self.result.errors += [{"line": line, "message": message} for line, _, message in errors[:room]]
+        if self.on_errors is not None:
+            self.on_errors(errors)
+
+    def _import_chunk(self, chunk):
+        records, errors = [], []
+        for line_no, raw, values in chunk:
+            try:
+                records.append((line_no, raw, clean_row(
+                    values, require_category=self.require_category, strict=self.strict,
+                )))
+            except ValueError as exc:
+                errors.append((line_no, raw, str(exc)))
+
+        try:
+            with transaction.atomic():
+                created, updated = self._write(records)
+        except IntegrityError as exc:
+            # Concurrent change of the catalogue: the chunk is rejected and
+            # the lookups are reloaded for the next one.
+            logger.warning("Import produits - lot rejete: %s", exc)
+            errors += [(line_no, raw, f"Erreur d'enregistrement : {exc}") for line_no, raw, _ in records]
+            errors.sort(key=lambda error: error[0])
+            self._load()
+        else:
+            self.result.created += created
+            self.result.updated += updated
+        self._report(errors)
+
+    def _related(self, model, cache: dict, names, fallback: str) -> None:
+        """Create the categories / brands of *names* missing from *cache*."""
+        missing = {}
+        for name in names:
+            key = name.lower()
+            if name and key not in cache and key not in missing:
+                missing[key] = model(
+                    enterprise_id=self.enterprise_id,
+                    name=name,
+                    slug=_free_slug(name, fallback, self.slugs[model]),
+                    is_active=True,
+                )
+        if missing:
+            model.objects.bulk_create(missing.values())
+            cache.update(missing)
+
+    def _write(self, records) -> tuple[int, int]:
+        if not records:
+            return 0, 0
+        self._related(Category, self.categories, [data["category"] for _, _, data in records], "categorie")
+        self._related(Brand, self.brands, [data["brand"] for _, _, data in records], "marque")
+        existing = {
+            product.sku: product
+            for product in Product.objects.filter(
+                enterprise_id=self.enterprise_id,
+                sku__in={data["sku"] for _, _, data in records},
+            )
+        }
+
+        now = timezone.now()
+        to_create, to_update = {}, {}
+        created = updated = 0
+        taken = self.slugs[Product]
+        for _, _, data in records:
+            sku = data["sku"]
+            product = to_create.get(sku) or existing.get(sku)
+            if product is None:
+                product = Product(enterprise_id=self.enterprise_id, sku=sku)
+                to_create[sku] = product
+                created += 1
+            else:
+                if sku not in to_create:
+                    to_update[sku] = product
+                updated += 1
+            # The product's own slug is free for it.
+            taken.discard(product.slug)
+            product.slug = _free_slug(
+                data["sku"] if self.slug_source == "sku" else data["name"], "produit", taken,
+            )
+            product.name = data["name"]
+            product.barcode = data["barcode"]
+            product.description = data["description"]
+            product.category = self.categories.get(data["category"].lower()) if data["category"] else None
+            product.brand = self.brands.get(data["brand"].lower()) if data["brand"] else None
+            product.cost_price = data["cost_price"]
+            product.selling_price = data["selling_price"]
+            product.is_active = data["is_active"]
+            product.updated_at = now
+
+        if to_create:
+            Product.objects.bulk_create(to_create.values())
+        if to_update:
+            Product.objects.bulk_update(to_update.values(), PRODUCT_UPDATE_FIELDS)
+        return created, updated
+
+
+def import_file(handle, enterprise_id, file_format="csv", *, progress=None, on_errors=None, **options) -> ImportResult:
+    """Import a CSV / Excel file in the current process."""
+    rows = read_rows(handle, file_format)
+    importer = ProductImporter(enterprise_id, on_errors=on_errors, **options)
+    result = importer.run(rows, progress=progress)
+    logger.info(
+        "Import produits termine: %d cree(s), %d mis a jour, %d erreur(s).",
+        result.created, result.updated, result.error_count,
+    )
+    return result
+
+
+def result_payload(result: ImportResult) -> dict:
+    return {
+        "detail": "Import CSV termine.",
+        "total_rows": result.total_rows,
+        "created": result.created,
+        "updated": result.updated,
+        "skipped": result.skipped,
+        "error_count": result.error_count,
+        "errors": result.errors,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+def start_import_job(uploaded_file, enterprise_id, file_format="csv", *, user=None, **options):
+    """Store *uploaded_file* in a :class:`ProductImportJob` and queue it once committed."""
+    from .models import ProductImportJob
+
+    job = ProductImportJob(
+        enterprise_id=enterprise_id,
+        started_by=user if getattr(user, "is_authenticated", False) else None,
+        file_format=file_format,
+        slug_source=options.get("slug_source", "sku"),
+        require_category=options.get("require_category", False),
+        strict=options.get("strict", False),
+    )
+    job.source_file.save(f"produits.{file_format}", uploaded_file, save=False)
+    job.save()
+
+    def _queue():
+        from .tasks import run_product_import_job
+
+        try:
+            run_product_import_job.delay(str(job.pk))
+        except Exception:
+            logger.warning("Product import job %s could not be queued, running inline", job.pk, exc_info=True)
+            run_product_import_job(str(job.pk))
+
+    transaction.on_commit(_queue)
+    return job
+
+
+def import_job_status(job) -> dict:
+    from django.urls import reverse
+
+    return {
+        "id": str(job.pk),
+        "format": job.file_format,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "progress": job.progress,
+        "created": job.created_rows,
+        "updated": job.updated_rows,
+        "skipped": job.skipped_rows,
+        "error_count": job.error_rows,
+        "errors": [
+            {"line": row.row_number, "message": row.error_message}
+            for row in job.error_rows_detail.all()[:MAX_REPORTED_ERRORS]
+        ],
+        "status_url": reverse("api:product-import-job-detail", args=[job.pk]),
+        "error_report_url": (
+            reverse("api:product-import-job-errors", args=[job.pk]) if job.error_rows else None
+        ),
+        "error": job.error,
+    }
+
+
+def run_import_job(job) -> ImportResult:
+    """Import the file of *job*, recording progress and rejected rows."""
+    from .models import ProductImportErrorRow, ProductImportJob
+
+    with job.source_file.open("rb") as handle:
+        job.status = ProductImportJob.Status.RUNNING
+        job.started_at = timezone.now()
+        job.total_rows = count_rows(handle, job.file_format)
+        job.save(update_fields=["status", "started_at", "total_rows", "updated_at"])
+
+        def _progress(result):
+            ProductImportJob.objects.filter(pk=job.pk).update(
+                processed_rows=result.total_rows,
+                created_rows=result.created,
+                updated_rows=result.updated,
+                skipped_rows=result.skipped,
+                error_rows=result.error_count,
+                updated_at=timezone.now(),
+            )
+
+        def _store_errors(errors):
+            ProductImportErrorRow.objects.bulk_create([
+                ProductImportErrorRow(job=job, row_number=line, raw_payload=raw, error_message=message)
+                for line, raw, message in errors
+            ])
+
+        result = import_file(
+            handle,
+            job.enterprise_id,
+            job.file_format,
+            progress=_progress,
+            on_errors=_store_errors,
+            slug_source=job.slug_source,
+            require_category=job.require_category,
+            strict=job.strict,
+        )
+
+    job.refresh_from_db()
+    job.status = ProductImportJob.Status.DONE
+    job.total_rows = result.total_rows
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "total_rows", "finished_at", "updated_at"])
+    return result
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:33
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_pricingpolicy_pricingrule_productvariant'),
+        ('stores', '0024_store_receipt_renderer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('source_file', models.FileField(upload_to='imports/products/%Y/%m/', verbose_name='fichier')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=4, verbose_name='format')),
+                ('slug_source', models.CharField(default='sku', max_length=10, verbose_name='source du slug')),
+                ('require_category', models.BooleanField(default=False, verbose_name='categorie obligatoire')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('DONE', 'Termine'), ('FAILED', 'Echec')], default='PENDING', max_length=10, verbose_name='statut')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='lignes')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='lignes traitees')),
+                ('created_rows', models.PositiveIntegerField(default=0, verbose_name='produits crees')),
+                ('updated_rows', models.PositiveIntegerField(default=0, verbose_name='produits mis a jour')),
+                ('skipped_rows', models.PositiveIntegerField(default=0, verbose_name='lignes ignorees')),
+                ('error_rows', models.PositiveIntegerField(default=0, verbose_name='lignes en erreur')),
+                ('error', models.TextField(blank=True, default='', verbose_name='erreur')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='demarre le')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='termine le')),
+                ('enterprise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_import_jobs', to='stores.enterprise', verbose_name='entreprise')),
+                ('started_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='product_import_jobs', to=settings.AUTH_USER_MODEL, verbose_name='lance par')),
+            ],
+            options={
+                'verbose_name': 'Import de produits',
+                'verbose_name_plural': 'Imports de produits',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductImportErrorRow',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('row_number', models.PositiveIntegerField(verbose_name='ligne')),
+                ('raw_payload', models.JSONField(blank=True, default=dict, verbose_name='valeurs')),
+                ('error_message', models.TextField(verbose_name='erreur')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='error_rows_detail', to='catalog.productimportjob', verbose_name='import')),
+            ],
+            options={
+                'verbose_name': "Ligne d'import en erreur",
+                'verbose_name_plural': "Lignes d'import en erreur",
+                'ordering': ['row_number'],
+            },
+        ),
+    ]
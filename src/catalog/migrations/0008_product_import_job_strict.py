@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0007_product_import_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimportjob',
+            name='strict',
+            field=models.BooleanField(default=False, verbose_name="regles de l'import Excel"),
+        ),
+    ]
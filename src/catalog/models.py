@@ -1,6 +1,7 @@
 """Models for the catalog app (products, categories, brands)."""
 from decimal import Decimal
 
+from django.conf import settings
 from django.db import models
 from django.urls import reverse
 from django.utils.text import slugify
@@ -418,3 +419,99 @@ class PricingRule(TimeStampedModel):
     def __str__(self):
         target = str(self.product or self.category or "tous produits")
         return f"{self.get_discount_type_display()} {self.discount_value} sur {target}"
+
+
+# ---------------------------------------------------------------------------
+# Product import jobs
+# ---------------------------------------------------------------------------
+
+class ProductImportJob(TimeStampedModel):
+    """Bulk product import (CSV / Excel) run by a Celery worker.
+
+    Created for files over ``PRODUCT_IMPORT_BACKGROUND_THRESHOLD`` rows (see
+    :mod:`catalog.importer`); rejected rows are kept in
+    :class:`ProductImportErrorRow`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        RUNNING = "RUNNING", "En cours"
+        DONE = "DONE", "Termine"
+        FAILED = "FAILED", "Echec"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        XLSX = "xlsx", "Excel"
+
+    enterprise = models.ForeignKey(
+        "stores.Enterprise",
+        on_delete=models.CASCADE,
+        related_name="product_import_jobs",
+        verbose_name="entreprise",
+    )
+    started_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="product_import_jobs",
+        verbose_name="lance par",
+    )
+    source_file = models.FileField("fichier", upload_to="imports/products/%Y/%m/")
+    file_format = models.CharField("format", max_length=4, choices=Format.choices, default=Format.CSV)
+    slug_source = models.CharField("source du slug", max_length=10, default="sku")
+    require_category = models.BooleanField("categorie obligatoire", default=False)
+    strict = models.BooleanField("regles de l'import Excel", default=False)
+    status = models.CharField(
+        "statut",
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    total_rows = models.PositiveIntegerField("lignes", default=0)
+    processed_rows = models.PositiveIntegerField("lignes traitees", default=0)
+    created_rows = models.PositiveIntegerField("produits crees", default=0)
+    updated_rows = models.PositiveIntegerField("produits mis a jour", default=0)
+    skipped_rows = models.PositiveIntegerField("lignes ignorees", default=0)
+    error_rows = models.PositiveIntegerField("lignes en erreur", default=0)
+    error = models.TextField("erreur", blank=True, default="")
+    started_at = models.DateTimeField("demarre le", null=True, blank=True)
+    finished_at = models.DateTimeField("termine le", null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Import de produits"
+        verbose_name_plural = "Imports de produits"
+
+    def __str__(self):
+        return f"Import produits {self.file_format} [{self.status}]"
+
+    @property
+    def progress(self) -> int:
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.processed_rows * 100 // self.total_rows)
+
+
+class ProductImportErrorRow(TimeStampedModel):
+    """Row rejected by a product import, with its raw values."""
+
+    job = models.ForeignKey(
+        ProductImportJob,
+        on_delete=models.CASCADE,
+        related_name="error_rows_detail",
+        verbose_name="import",
+    )
+    row_number = models.PositiveIntegerField("ligne")
+    raw_payload = models.JSONField("valeurs", default=dict, blank=True)
+    error_message = models.TextField("erreur")
+
+    class Meta:
+        ordering = ["row_number"]
+        verbose_name = "Ligne d'import en erreur"
+        verbose_name_plural = "Lignes d'import en erreur"
+
+    def __str__(self):
+        return f"Ligne {self.row_number}: {self.error_message}"
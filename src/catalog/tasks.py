@@ -0,0 +1,53 @@
+"""Celery tasks for the catalog app."""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger("boutique")
+
+
+@shared_task(name="catalog.tasks.run_product_import_job")
+def run_product_import_job(job_id):
+    """Import the file of a background product import (see :mod:`catalog.importer`)."""
+    from catalog.importer import run_import_job
+    from catalog.models import ProductImportJob
+
+    job = ProductImportJob.objects.filter(pk=job_id, status=ProductImportJob.Status.PENDING).first()
+    if job is None:
+        return {"status": "skipped"}
+    try:
+        result = run_import_job(job)
+    except Exception as exc:
+        logger.exception("Product import job %s failed", job_id)
+        ProductImportJob.objects.filter(pk=job_id).update(
+            status=ProductImportJob.Status.FAILED,
+            error=str(exc)[:500],
+            finished_at=timezone.now(),
+        )
+        return {"status": "error", "message": str(exc)[:500]}
+    return {
+        "status": "ok",
+        "created": result.created,
+        "updated": result.updated,
+        "errors": result.error_count,
+    }
+
+
+@shared_task(name="catalog.tasks.purge_product_import_jobs")
+def purge_product_import_jobs():
+    """Delete product import jobs (and their files) older than ``PRODUCT_IMPORT_RETENTION_DAYS``."""
+    from catalog.models import ProductImportJob
+
+    cutoff = timezone.now() - timedelta(days=settings.PRODUCT_IMPORT_RETENTION_DAYS)
+    deleted = 0
+    for job in ProductImportJob.objects.filter(created_at__lt=cutoff).iterator():
+        if job.source_file:
+            job.source_file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return {"deleted": deleted}
@@ -2,6 +2,7 @@
 import logging
 
 from django import forms as django_forms
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Count, Q, Sum
@@ -19,6 +20,7 @@ from django.views.generic import (
 )
 
 from .forms import ProductFilterForm, ProductForm, ProductImportForm
+from .importer import count_rows, start_import_job
 from .models import Brand, Category, Product
 from .services import IMPORT_COLUMNS, export_products_to_excel, import_products_from_excel
 
@@ -456,6 +458,22 @@ class ProductImportView(LoginRequiredMixin, FormView):
     def form_valid(self, form):
         uploaded_file = form.cleaned_data["file"]
         enterprise = _get_enterprise(self.request)
+        if enterprise and count_rows(uploaded_file, "xlsx") > settings.PRODUCT_IMPORT_BACKGROUND_THRESHOLD:
+            start_import_job(
+                uploaded_file,
+                enterprise.pk,
+                "xlsx",
+                user=self.request.user,
+                slug_source="name",
+                require_category=True,
+                strict=True,
+            )
+            messages.info(
+                self.request,
+                "Fichier volumineux : l'import se poursuit en arriere-plan, "
+                "les produits apparaitront au fur et a mesure.",
+            )
+            return redirect(self.success_url)
         try:
             result = import_products_from_excel(uploaded_file, enterprise=enterprise)
             messages.success(
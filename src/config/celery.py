@@ -38,22 +38,18 @@ app.conf.beat_schedule = {
         "task": "reports.tasks.daily_kpi_snapshot",
         "schedule": crontab(minute=0, hour=1),  # Daily at 1am
     },
-    "analytics-refresh-abc": {
-        "task": "analytics.tasks.refresh_abc_analysis",
-        "schedule": crontab(minute=15, hour=1),  # Daily
+    "analytics-run-full-pipeline": {
+        "task": "analytics.tasks.run_full_pipeline",
+        "schedule": crontab(minute=15, hour=1),  # Daily, fanned out per store
+    },
+    "analytics-sweep-stale-pipeline-runs": {
+        "task": "analytics.tasks.sweep_stale_pipeline_runs",
+        "schedule": crontab(minute=45),  # Hourly (runs whose steps never reported)
     },
     "analytics-refresh-reorder": {
         "task": "analytics.tasks.refresh_dynamic_reorder",
         "schedule": crontab(minute=0, hour="*/2"),  # Every 2 hours
     },
-    "analytics-refresh-credit-scores": {
-        "task": "analytics.tasks.refresh_credit_scores",
-        "schedule": crontab(minute=25, hour=1),  # Daily
-    },
-    "analytics-refresh-forecast": {
-        "task": "analytics.tasks.refresh_sales_forecast",
-        "schedule": crontab(minute=35, hour=1),  # Daily
-    },
     "analytics-detect-fraud": {
         "task": "analytics.tasks.detect_fraud",
         "schedule": crontab(minute="*/30"),  # Every 30 minutes
@@ -62,6 +58,22 @@ app.conf.beat_schedule = {
         "task": "analytics.tasks.refresh_customer_intelligence_store",
         "schedule": crontab(minute=10, hour=2),  # Daily at 02:10
     },
+    "analytics-flush-customer-refreshes": {
+        "task": "analytics.tasks.flush_customer_refreshes",
+        "schedule": crontab(minute="*/5"),  # Every 5 minutes (lost slot flushes)
+    },
+    "analytics-update-cooccurrence-index": {
+        "task": "analytics.tasks.update_cooccurrence_indexes",
+        "schedule": crontab(minute="*/10"),  # Every 10 minutes
+    },
+    "core-purge-export-jobs": {
+        "task": "core.purge_export_jobs",
+        "schedule": crontab(minute=30, hour=3),  # Daily at 03:30
+    },
+    "catalog-purge-product-import-jobs": {
+        "task": "catalog.tasks.purge_product_import_jobs",
+        "schedule": crontab(minute=40, hour=3),  # Daily at 03:40
+    },
     "expenses-generate-recurring": {
         "task": "expenses.tasks.generate_due_recurring_expenses",
         "schedule": crontab(minute=0, hour="*"),  # Every hour
@@ -265,6 +265,18 @@ CELERY_BEAT_SCHEDULE = {
         "task": "stores.tasks.warn_expiring_enterprises",
         "schedule": 86400,  # every 24 h
     },
+    "core-dispatch-outbox": {
+        "task": "core.dispatch_outbox",
+        "schedule": 60,  # every minute (events also kick it on commit)
+    },
+    "core-purge-export-jobs": {
+        "task": "core.purge_export_jobs",
+        "schedule": 86400,  # every 24 h
+    },
+    "catalog-purge-product-import-jobs": {
+        "task": "catalog.tasks.purge_product_import_jobs",
+        "schedule": 86400,  # every 24 h
+    },
     "daily-database-backup": {
         "task": "core.backup_database",
         "schedule": 86400,  # every 24 h
@@ -277,6 +289,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "objectives.tasks.refresh_all_leaderboards",
         "schedule": 3600,  # every hour
     },
+    "objectives-reconcile-stats": {
+        "task": "objectives.tasks.reconcile_seller_stats",
+        "schedule": 21600,  # every 6 h — full recompute behind the deltas
+    },
     "objectives-close-month": {
         "task": "objectives.tasks.close_month_objectives",
         "schedule": 86400,  # every 24 h â€” task guards on day_of_month == 1
@@ -285,6 +301,18 @@ CELERY_BEAT_SCHEDULE = {
         "task": "analytics.tasks.refresh_customer_intelligence_store",
         "schedule": 86400,
     },
+    "analytics-flush-customer-refreshes": {
+        "task": "analytics.tasks.flush_customer_refreshes",
+        "schedule": 300,  # every 5 min
+    },
+    "analytics-update-cooccurrence-index": {
+        "task": "analytics.tasks.update_cooccurrence_indexes",
+        "schedule": 600,  # every 10 min
+    },
+    "analytics-sweep-stale-pipeline-runs": {
+        "task": "analytics.tasks.sweep_stale_pipeline_runs",
+        "schedule": 3600,  # hourly
+    },
     "delivery-check-late": {
         "task": "delivery.tasks.check_late_deliveries",
         "schedule": 1800,  # every 30 min
@@ -293,6 +321,10 @@ CELERY_BEAT_SCHEDULE = {
         "task": "communications.tasks.process_campaign",
         "schedule": 3600,  # every hour (for scheduled campaigns)
     },
+    "stock-reconcile-reserved": {
+        "task": "stock.tasks.reconcile_reserved_stock",
+        "schedule": 86400,  # every 24 h
+    },
     "sav-check-overdue": {
         "task": "alerts.tasks.check_sav_overdue",
         "schedule": 3600,  # every hour
@@ -376,6 +408,63 @@ MAX_DISCOUNT_PERCENT_MANAGER = env.int("MAX_DISCOUNT_PERCENT_MANAGER", default=5
 PENDING_PAYMENT_ALERT_HOURS = env.int("PENDING_PAYMENT_ALERT_HOURS", default=2)
 STOCK_LOW_THRESHOLD_DAYS = env.int("STOCK_LOW_THRESHOLD_DAYS", default=7)
 CREDIT_OVERDUE_GRACE_DAYS = env.int("CREDIT_OVERDUE_GRACE_DAYS", default=3)
+# Numbers reserved per round trip for non-legal documents (quotes, POs...).
+# Invoices (FAC) and credit notes (AVO) always stay gap-free.
+DOCUMENT_NUMBER_BLOCK_SIZE = env.int("DOCUMENT_NUMBER_BLOCK_SIZE", default=10)
+DOCUMENT_NUMBER_SLOW_MS = env.int("DOCUMENT_NUMBER_SLOW_MS", default=200)
+# Lifetime of cached store module matrices (also invalidated on change).
+STORE_MODULE_MATRIX_CACHE_TTL = env.int("STORE_MODULE_MATRIX_CACHE_TTL", default=3600)
+# Lifetime of cached per-user tenancy contexts (also invalidated on change).
+PRINCIPAL_CONTEXT_CACHE_TTL = env.int("PRINCIPAL_CONTEXT_CACHE_TTL", default=300)
+# Lifetime of cached JWT-authenticated user rows (also invalidated on change).
+AUTH_USER_CACHE_TTL = env.int("AUTH_USER_CACHE_TTL", default=60)
+# Transactional outbox for post-commit side effects (accounting entries,
+# objectives, customer intelligence, self-checkout alerts).
+OUTBOX_ENABLED = env.bool("OUTBOX_ENABLED", default=True)
+OUTBOX_BATCH_SIZE = env.int("OUTBOX_BATCH_SIZE", default=200)
+OUTBOX_MAX_ATTEMPTS = env.int("OUTBOX_MAX_ATTEMPTS", default=8)
+# Seconds after which events claimed by a dispatcher that died are retried.
+OUTBOX_PROCESSING_TIMEOUT = env.int("OUTBOX_PROCESSING_TIMEOUT", default=600)
+# Soft time limit (seconds) of one store/stage step of the analytics pipeline.
+ANALYTICS_PIPELINE_STEP_TIME_LIMIT = env.int("ANALYTICS_PIPELINE_STEP_TIME_LIMIT", default=900)
+# Age (seconds) after which a pipeline run still RUNNING is finalized as is.
+ANALYTICS_PIPELINE_RUN_TIMEOUT = env.int("ANALYTICS_PIPELINE_RUN_TIMEOUT", default=21600)
+# Half-life (days) of sales in the product co-occurrence index; changing it
+# requires ``manage.py rebuild_cooccurrence_index``.
+ANALYTICS_COOCCURRENCE_HALF_LIFE_DAYS = env.int("ANALYTICS_COOCCURRENCE_HALF_LIFE_DAYS", default=90)
+# Window (seconds) over which refresh requests for the same customer are
+# merged into one customer-intelligence recompute.
+ANALYTICS_CUSTOMER_REFRESH_DEBOUNCE_SECONDS = env.int("ANALYTICS_CUSTOMER_REFRESH_DEBOUNCE_SECONDS", default=30)
+# Exports (export-csv actions) of more rows than this run as background
+# jobs; their files are purged after EXPORT_RETENTION_DAYS.
+EXPORT_BACKGROUND_THRESHOLD = env.int("EXPORT_BACKGROUND_THRESHOLD", default=20000)
+EXPORT_RETENTION_DAYS = env.int("EXPORT_RETENTION_DAYS", default=7)
+# Rendered PDFs of finished documents (invoices, receipts, quotes, shift
+# reports, credit receipts) cached in the default storage; bump the version
+# to drop every cached render.
+PDF_CACHE_ENABLED = env.bool("PDF_CACHE_ENABLED", default=True)
+PDF_CACHE_VERSION = env.int("PDF_CACHE_VERSION", default=1)
+# Product imports (CSV / Excel) of more rows than this run as background
+# jobs; their files and error reports are purged after
+# PRODUCT_IMPORT_RETENTION_DAYS.
+PRODUCT_IMPORT_BACKGROUND_THRESHOLD = env.int("PRODUCT_IMPORT_BACKGROUND_THRESHOLD", default=2000)
+PRODUCT_IMPORT_MAX_UPLOAD_MB = env.int("PRODUCT_IMPORT_MAX_UPLOAD_MB", default=50)
+PRODUCT_IMPORT_RETENTION_DAYS = env.int("PRODUCT_IMPORT_RETENTION_DAYS", default=7)
+# Database backups (core.backup_database). BACKUP_FORMAT: "plain" (SQL
+# streamed into gzip), "custom" (pg_dump -Fc) or "directory" (pg_dump -Fd,
+# BACKUP_JOBS parallel workers). Retention keeps the BACKUP_KEEP_LAST latest
+# backups plus the newest one of each of the last BACKUP_KEEP_DAILY days,
+# BACKUP_KEEP_WEEKLY weeks and BACKUP_KEEP_MONTHLY months.
+BACKUP_DIR = env("BACKUP_DIR", default=str(PROJECT_DIR / "backups"))
+BACKUP_FORMAT = env("BACKUP_FORMAT", default="plain")
+BACKUP_JOBS = env.int("BACKUP_JOBS", default=2)
+BACKUP_COMPRESSION_LEVEL = env.int("BACKUP_COMPRESSION_LEVEL", default=6)
+BACKUP_TIMEOUT_SECONDS = env.int("BACKUP_TIMEOUT_SECONDS", default=4 * 3600)
+BACKUP_PG_BIN_DIR = env("BACKUP_PG_BIN_DIR", default="")
+BACKUP_KEEP_LAST = env.int("BACKUP_KEEP_LAST", default=7)
+BACKUP_KEEP_DAILY = env.int("BACKUP_KEEP_DAILY", default=7)
+BACKUP_KEEP_WEEKLY = env.int("BACKUP_KEEP_WEEKLY", default=4)
+BACKUP_KEEP_MONTHLY = env.int("BACKUP_KEEP_MONTHLY", default=6)
 
 # Logging
 LOGGING = {
@@ -43,6 +43,16 @@ REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] = {  # noqa: F405
     "document_verify": None,  # keep scope defined but unlimited in tests
 }
 
+# Test transactions never commit, so numbering blocks would never be
+# installed: keep strictly consecutive document numbers.
+DOCUMENT_NUMBER_BLOCK_SIZE = 1
+
+# Run side effects in-request so tests observe them without a dispatcher.
+OUTBOX_ENABLED = False
+
+# No WeasyPrint rendering behind paid sales / sent quotes.
+PDF_CACHE_ENABLED = False
+
 # Email
 EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 
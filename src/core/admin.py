@@ -10,6 +10,8 @@ from django.template.response import TemplateResponse
 from django.urls import path, reverse
 from django.utils import timezone
 
+from core.models import ExportJob, OutboxEvent
+
 
 def _money(value):
     return value or 0
@@ -131,6 +133,42 @@ def admin_system_overview(request):
     return TemplateResponse(request, "admin/system_overview.html", context)
 
 
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    """Read-mostly view of the side-effect outbox."""
+
+    list_display = ("topic", "status", "store", "aggregate_key", "attempts", "created_at", "processed_at")
+    list_filter = ("status", "topic")
+    search_fields = ("aggregate_key", "dedupe_key", "last_error")
+    readonly_fields = ("id", "created_at", "updated_at", "processed_at", "last_error")
+    list_select_related = ("store",)
+    ordering = ["-created_at"]
+    actions = ("retry_selected",)
+
+    @admin.action(description="Relancer les evenements selectionnes")
+    def retry_selected(self, request, queryset):
+        updated = queryset.exclude(
+            status__in=(OutboxEvent.Status.DONE, OutboxEvent.Status.PROCESSING),
+        ).update(
+            status=OutboxEvent.Status.PENDING,
+            attempts=0,
+            available_at=timezone.now(),
+        )
+        self.message_user(request, f"{updated} evenement(s) relance(s).")
+
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    """Background CSV/XLSX exports."""
+
+    list_display = ("export_name", "file_format", "status", "requested_by", "processed_rows", "total_rows", "created_at")
+    list_filter = ("status", "file_format", "export_name")
+    readonly_fields = ("id", "created_at", "updated_at", "finished_at", "error")
+    exclude = ("query",)
+    list_select_related = ("requested_by",)
+    ordering = ["-created_at"]
+
 def _patch_admin_urls():
     base_get_urls = admin.site.get_urls
 
@@ -0,0 +1,10 @@
+"""App config for the core module."""
+from django.apps import AppConfig
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+    verbose_name = "Noyau"
+
+    def ready(self):
+        import core.signals  # noqa: F401
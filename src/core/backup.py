@@ -0,0 +1,489 @@
+"""PostgreSQL backups: streamed dumps, checksums, manifests and retention.
+
+:func:`create_backup` runs ``pg_dump`` without holding the dump in memory,
+in the ``BACKUP_FORMAT`` chosen:
+
+- ``plain``: the SQL output is piped chunk by chunk into a gzip file;
+- ``custom``: pg_dump's own compressed archive (``-Fc``), restorable in
+  parallel with ``pg_restore -j``;
+- ``directory``: one compressed file per table, dumped by ``BACKUP_JOBS``
+  parallel workers (``-Fd -j``).
+
+Artefacts are written under a ``.partial`` name and renamed once pg_dump
+succeeded.  Each one has a ``<name>.manifest.json`` with its format, size,
+SHA-256 (per file for the directory format), duration and table count.
+
+:func:`apply_retention` keeps the ``BACKUP_KEEP_LAST`` latest backups plus
+the newest backup of each of the last ``BACKUP_KEEP_DAILY`` days,
+``BACKUP_KEEP_WEEKLY`` weeks and ``BACKUP_KEEP_MONTHLY`` months that have
+one.  :func:`verify_backup` checks an artefact against its manifest and can
+restore it into a scratch database (``manage.py verify_backup``).
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger("boutique")
+
+BACKUP_PREFIX = "backup_"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+MANIFEST_SUFFIX = ".manifest.json"
+PARTIAL_SUFFIX = ".partial"
+FORMATS = {"plain": ".sql.gz", "custom": ".dump", "directory": ".dir"}
+CHUNK_SIZE = 1024 * 1024
+MANIFEST_VERSION = 1
+
+
+class BackupError(RuntimeError):
+    """A dump, restore or verification step failed."""
+
+
+@dataclass
+class Backup:
+    path: Path
+    created_at: datetime
+    manifest: dict | None = None
+
+    @property
+    def manifest_path(self) -> Path:
+        return self.path.with_name(self.path.name + MANIFEST_SUFFIX)
+
+    @property
+    def format(self) -> str:
+        if self.manifest:
+            return self.manifest["format"]
+        if self.path.is_dir():
+            return "directory"
+        return "plain" if self.path.name.endswith(".gz") else "custom"
+
+
+@dataclass
+class VerificationReport:
+    backup: Backup
+    checks: list = field(default_factory=list)
+    restored_tables: int | None = None
+
+    def ok(self, message: str) -> None:
+        self.checks.append(message)
+
+
+# ---------------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------------
+
+def backup_dir() -> Path:
+    return Path(settings.BACKUP_DIR)
+
+
+def _pg_bin(name: str) -> str:
+    bin_dir = getattr(settings, "BACKUP_PG_BIN_DIR", "")
+    return str(Path(bin_dir) / name) if bin_dir else name
+
+
+def _connection(db: dict) -> tuple[list, dict]:
+    """libpq arguments and environment for the *db* settings dict."""
+    args = [
+        "-h", str(db.get("HOST") or "localhost"),
+        "-p", str(db.get("PORT") or "5432"),
+        "-U", str(db.get("USER") or "postgres"),
+    ]
+    env = {**os.environ, "PGPASSWORD": str(db.get("PASSWORD") or "")}
+    return args, env
+
+
+def _stderr_text(handle) -> str:
+    handle.seek(0)
+    return handle.read().decode("utf-8", "replace").strip()[-2000:]
+
+
+def _run(cmd, env, *, timeout, what: str) -> subprocess.CompletedProcess:
+    try:
+        result = subprocess.run(
+            cmd, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout,
+        )
+    except FileNotFoundError as exc:
+        raise BackupError(f"{what}: {cmd[0]} not found") from exc
+    except subprocess.TimeoutExpired as exc:
+        raise BackupError(f"{what}: timed out after {timeout} s") from exc
+    if result.returncode != 0:
+        raise BackupError(f"{what} failed: {result.stderr.decode('utf-8', 'replace').strip()[-2000:]}")
+    return result
+
+
+class _HashingWriter:
+    """Write-through file wrapper computing the size and SHA-256 written."""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+def _kill_after(proc, timeout: int) -> tuple[threading.Timer, threading.Event]:
+    """Kill *proc* after *timeout* seconds; the event tells whether it fired."""
+    expired = threading.Event()
+
+    def _kill():
+        expired.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, _kill)
+    timer.daemon = True
+    timer.start()
+    return timer, expired
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _directory_files(path: Path) -> dict:
+    return {
+        str(item.relative_to(path)): {"size": item.stat().st_size, "sha256": file_sha256(item)}
+        for item in sorted(path.rglob("*"))
+        if item.is_file()
+    }
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    elif path.exists():
+        path.unlink()
+
+
+def _write_json(path: Path, data: dict) -> None:
+    tmp = path.with_name(path.name + PARTIAL_SUFFIX)
+    tmp.write_text(json.dumps(data, indent=2, sort_keys=True), encoding="utf-8")
+    tmp.replace(path)
+
+
+# ---------------------------------------------------------------------------
+# Dump
+# ---------------------------------------------------------------------------
+
+def _dump_plain(cmd, env, target: Path, *, level: int, timeout: int) -> tuple[str, int]:
+    """Pipe pg_dump's SQL output into a gzip file; returns (sha256, size)."""
+    with tempfile.TemporaryFile() as stderr, open(target, "wb") as raw:
+        writer = _HashingWriter(raw)
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, env=env)
+        except FileNotFoundError as exc:
+            raise BackupError(f"pg_dump: {cmd[0]} not found") from exc
+        timer, expired = _kill_after(proc, timeout)
+        try:
+            # mtime=0 keeps the gzip header reproducible.
+            with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=level, mtime=0) as gz:
+                for chunk in iter(lambda: proc.stdout.read(CHUNK_SIZE), b""):
+                    gz.write(chunk)
+            returncode = proc.wait()
+        except BaseException:
+            proc.kill()
+            proc.wait()
+            raise
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+        if returncode != 0:
+            if expired.is_set():
+                raise BackupError(f"pg_dump: timed out after {timeout} s")
+            raise BackupError(f"pg_dump failed: {_stderr_text(stderr)}")
+    return writer.sha256.hexdigest(), writer.size
+
+
+def _pg_dump_version(env) -> str:
+    try:
+        return _run([_pg_bin("pg_dump"), "--version"], env, timeout=30, what="pg_dump").stdout.decode().strip()
+    except BackupError:
+        return ""
+
+
+def _table_count() -> int | None:
+    from django.db import connection
+
+    try:
+        return len(connection.introspection.table_names())
+    except Exception:
+        logger.warning("Backup: table count unavailable", exc_info=True)
+        return None
+
+
+def create_backup(fmt: str | None = None, *, directory: Path | None = None) -> Backup:
+    """Dump the default database into *directory* (default ``BACKUP_DIR``)."""
+    fmt = fmt or settings.BACKUP_FORMAT
+    if fmt not in FORMATS:
+        raise BackupError(f"Unknown backup format: {fmt}")
+    directory = Path(directory or backup_dir())
+    directory.mkdir(parents=True, exist_ok=True)
+
+    db = settings.DATABASES["default"]
+    args, env = _connection(db)
+    level = settings.BACKUP_COMPRESSION_LEVEL
+    jobs = max(1, settings.BACKUP_JOBS) if fmt == "directory" else 1
+    timeout = settings.BACKUP_TIMEOUT_SECONDS
+
+    created_at = timezone.localtime()
+    final = directory / f"{BACKUP_PREFIX}{created_at.strftime(TIMESTAMP_FORMAT)}{FORMATS[fmt]}"
+    partial = final.with_name(final.name + PARTIAL_SUFFIX)
+    cmd = [_pg_bin("pg_dump"), *args, "-d", str(db.get("NAME") or "boutique_db"), "--no-owner", "--no-acl"]
+
+    started = time.monotonic()
+    try:
+        if fmt == "plain":
+            sha256, size = _dump_plain(cmd, env, partial, level=level, timeout=timeout)
+            checksums = {"sha256": sha256, "size_bytes": size}
+        else:
+            if fmt == "custom":
+                cmd += ["-F", "c"]
+            else:
+                cmd += ["-F", "d", "-j", str(jobs)]
+            _run([*cmd, "-Z", str(level), "-f", str(partial)], env, timeout=timeout, what="pg_dump")
+            if fmt == "custom":
+                checksums = {"sha256": file_sha256(partial), "size_bytes": partial.stat().st_size}
+            else:
+                files = _directory_files(partial)
+                checksums = {"files": files, "size_bytes": sum(f["size"] for f in files.values())}
+        partial.rename(final)
+    except BaseException:
+        _remove(partial)
+        raise
+
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "file": final.name,
+        "format": fmt,
+        "created_at": created_at.isoformat(),
+        "duration_seconds": round(time.monotonic() - started, 1),
+        "database": db.get("NAME"),
+        "host": db.get("HOST") or "localhost",
+        "pg_dump_version": _pg_dump_version(env),
+        "compression_level": level,
+        "jobs": jobs,
+        "tables": _table_count(),
+        **checksums,
+    }
+    backup = Backup(path=final, created_at=created_at.replace(tzinfo=None), manifest=manifest)
+    _write_json(backup.manifest_path, manifest)
+    logger.info(
+        "Database backup created: %s (%s, %.1f MB in %ss)",
+        final, fmt, checksums["size_bytes"] / 1048576, manifest["duration_seconds"],
+    )
+    return backup
+
+
+# ---------------------------------------------------------------------------
+# Listing and retention
+# ---------------------------------------------------------------------------
+
+def list_backups(directory: Path | None = None) -> list[Backup]:
+    """Finished backups of *directory*, newest first (manifest-less legacy files included)."""
+    directory = Path(directory or backup_dir())
+    if not directory.is_dir():
+        return []
+    backups = []
+    for path in directory.iterdir():
+        name = path.name
+        if not name.startswith(BACKUP_PREFIX) or name.endswith((MANIFEST_SUFFIX, PARTIAL_SUFFIX)):
+            continue
+        stamp = name[len(BACKUP_PREFIX):len(BACKUP_PREFIX) + 15]
+        try:
+            created_at = datetime.strptime(stamp, TIMESTAMP_FORMAT)
+        except ValueError:
+            continue
+        backup = Backup(path=path, created_at=created_at)
+        if backup.manifest_path.exists():
+            try:
+                backup.manifest = json.loads(backup.manifest_path.read_text(encoding="utf-8"))
+            except ValueError:
+                logger.warning("Backup manifest unreadable: %s", backup.manifest_path)
+        backups.append(backup)
+    return sorted(backups, key=lambda b: b.created_at, reverse=True)
+
+
+def select_expired(backups, *, keep_last=0, keep_daily=0, keep_weekly=0, keep_monthly=0) -> list[Backup]:
+    """Backups of *backups* (newest first) outside every retention rule."""
+    keep = {b.path for b in backups[:keep_last]}
+    rules = (
+        (keep_daily, lambda d: d.date()),
+        (keep_weekly, lambda d: d.isocalendar()[:2]),
+        (keep_monthly, lambda d: (d.year, d.month)),
+    )
+    for count, period in rules:
+        periods = set()
+        for backup in backups:
+            key = period(backup.created_at)
+            if key in periods:
+                continue
+            if len(periods) >= count:
+                break
+            periods.add(key)
+            keep.add(backup.path)
+    return [b for b in backups if b.path not in keep]
+
+
+def apply_retention(directory: Path | None = None) -> list[Backup]:
+    """Delete the backups no retention rule keeps; returns them."""
+    directory = Path(directory or backup_dir())
+    expired = select_expired(
+        list_backups(directory),
+        keep_last=settings.BACKUP_KEEP_LAST,
+        keep_daily=settings.BACKUP_KEEP_DAILY,
+        keep_weekly=settings.BACKUP_KEEP_WEEKLY,
+        keep_monthly=settings.BACKUP_KEEP_MONTHLY,
+    )
+    for backup in expired:
+        _remove(backup.path)
+        _remove(backup.manifest_path)
+        logger.info("Deleted old backup: %s", backup.path.name)
+    # Leftovers of interrupted dumps.
+    stale = time.time() - 86400
+    for path in directory.glob(f"{BACKUP_PREFIX}*{PARTIAL_SUFFIX}"):
+        if path.stat().st_mtime < stale:
+            _remove(path)
+    return expired
+
+
+# ---------------------------------------------------------------------------
+# Verification
+# ---------------------------------------------------------------------------
+
+def _check_checksums(backup: Backup, report: VerificationReport) -> None:
+    manifest = backup.manifest
+    if not manifest:
+        report.ok("no manifest: checksum not verified")
+        return
+    if backup.format == "directory":
+        actual = _directory_files(backup.path)
+        if actual != manifest["files"]:
+            changed = sorted(
+                name for name in set(actual) | set(manifest["files"])
+                if actual.get(name) != manifest["files"].get(name)
+            )
+            raise BackupError(f"Checksum mismatch for: {', '.join(changed)}")
+        report.ok(f"SHA-256 of {len(actual)} files match the manifest")
+        return
+    digest = file_sha256(backup.path)
+    if digest != manifest["sha256"]:
+        raise BackupError(f"SHA-256 mismatch: {digest} instead of {manifest['sha256']}")
+    report.ok("SHA-256 matches the manifest")
+
+
+def _check_readable(backup: Backup, report: VerificationReport, env) -> None:
+    if backup.format == "plain":
+        size = 0
+        try:
+            with gzip.open(backup.path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+                    size += len(chunk)
+        except (OSError, EOFError) as exc:
+            raise BackupError(f"Corrupt gzip archive: {exc}") from exc
+        report.ok(f"gzip archive readable ({size / 1048576:.1f} MB of SQL)")
+        return
+    result = _run([_pg_bin("pg_restore"), "--list", str(backup.path)], env, timeout=600, what="pg_restore --list")
+    entries = sum(1 for line in result.stdout.splitlines() if line and not line.startswith(b";"))
+    report.ok(f"archive table of contents readable ({entries} entries)")
+
+
+def _restore(backup: Backup, target: str, env, args) -> None:
+    timeout = settings.BACKUP_TIMEOUT_SECONDS
+    if backup.format != "plain":
+        _run(
+            [
+                _pg_bin("pg_restore"), *args, "-d", target, "--no-owner", "--no-acl",
+                "--exit-on-error", "-j", str(max(1, settings.BACKUP_JOBS)), str(backup.path),
+            ],
+            env, timeout=timeout, what="pg_restore",
+        )
+        return
+    cmd = [_pg_bin("psql"), *args, "-d", target, "-q", "-v", "ON_ERROR_STOP=1", "-o", os.devnull]
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr, env=env)
+        except FileNotFoundError as exc:
+            raise BackupError(f"psql: {cmd[0]} not found") from exc
+        timer, expired = _kill_after(proc, timeout)
+        try:
+            with gzip.open(backup.path, "rb") as handle:
+                for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+                    proc.stdin.write(chunk)
+            proc.stdin.close()
+            returncode = proc.wait()
+        except BrokenPipeError:
+            # psql stopped on the first error (ON_ERROR_STOP).
+            returncode = proc.wait()
+        finally:
+            timer.cancel()
+        if expired.is_set():
+            raise BackupError(f"psql: timed out after {timeout} s")
+        if returncode != 0:
+            raise BackupError(f"psql restore failed: {_stderr_text(stderr)}")
+
+
+def verify_backup(backup: Backup, *, restore=False, database: dict | None = None,
+                  target_db: str | None = None, keep=False) -> VerificationReport:
+    """Check *backup*; with *restore*, load it into a scratch database.
+
+    The scratch database is created on the server of *database* (default:
+    the default database) and dropped afterwards unless *keep*.
+    """
+    db = database or settings.DATABASES["default"]
+    args, env = _connection(db)
+    report = VerificationReport(backup=backup)
+    _check_checksums(backup, report)
+    _check_readable(backup, report, env)
+    if not restore:
+        return report
+
+    target = target_db or f"{db.get('NAME') or 'boutique'}_verify_{timezone.localtime().strftime(TIMESTAMP_FORMAT)}"
+    _run([_pg_bin("createdb"), *args, target], env, timeout=120, what="createdb")
+    try:
+        _restore(backup, target, env, args)
+        result = _run(
+            [
+                _pg_bin("psql"), *args, "-d", target, "-At", "-c",
+                "SELECT count(*) FROM information_schema.tables "
+                "WHERE table_schema = 'public' AND table_type = 'BASE TABLE'",
+            ],
+            env, timeout=120, what="psql",
+        )
+        report.restored_tables = int(result.stdout.decode().strip() or 0)
+        expected = (backup.manifest or {}).get("tables")
+        if expected is not None and report.restored_tables != expected:
+            raise BackupError(
+                f"{report.restored_tables} tables restored in {target}, {expected} expected"
+            )
+        report.ok(f"restored in {target} ({report.restored_tables} tables)")
+    finally:
+        if not keep:
+            try:
+                _run([_pg_bin("dropdb"), *args, "--if-exists", target], env, timeout=120, what="dropdb")
+            except BackupError:
+                logger.warning("Scratch database %s could not be dropped", target, exc_info=True)
+    return report
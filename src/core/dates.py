@@ -0,0 +1,108 @@
+"""Business-date helpers for timestamp range filters.
+
+Lookups such as ``created_at__date__gte`` or ``created_at__year`` wrap the
+column in a function, so the database cannot use an index on it.  These
+helpers turn business dates, taken in the enterprise timezone, into
+half-open ``[start, end)`` timestamp ranges that can.
+"""
+from __future__ import annotations
+
+import zoneinfo
+from datetime import date, datetime, time, timedelta, tzinfo
+from functools import lru_cache
+
+from django.utils import timezone
+
+
+@lru_cache(maxsize=64)
+def _zone(name: str) -> tzinfo:
+    return zoneinfo.ZoneInfo(name)
+
+
+def get_timezone(name: str | None = None) -> tzinfo:
+    """Return the timezone called *name*, or the current one if unknown."""
+    if name:
+        try:
+            return _zone(name)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def store_timezone(store) -> tzinfo:
+    """Return the timezone of *store*'s enterprise.
+
+    *store* may be a ``Store`` instance or a primary key.  The result is
+    memoised on instances.
+    """
+    if store is None:
+        return get_timezone()
+
+    enterprise_id = getattr(store, "enterprise_id", None)
+    if enterprise_id is None:
+        from stores.models import Store
+
+        name = (
+            Store.objects.filter(pk=getattr(store, "pk", store))
+            .values_list("enterprise__timezone", flat=True)
+            .first()
+        )
+        return get_timezone(name)
+
+    cached = getattr(store, "_business_tz", None)
+    if cached is None:
+        cached = get_timezone(store.enterprise.timezone)
+        store._business_tz = cached
+    return cached
+
+
+def local_today(tz: tzinfo | None = None) -> date:
+    """Return today's date in *tz* (default: current timezone)."""
+    return timezone.localdate(timezone=tz or get_timezone())
+
+
+def day_start(day: date, tz: tzinfo | None = None) -> datetime:
+    """Return the aware datetime at which local *day* starts in *tz*."""
+    return timezone.make_aware(datetime.combine(day, time.min), tz or get_timezone())
+
+
+def date_range(date_from: date, date_to: date, tz: tzinfo | None = None) -> tuple[datetime, datetime]:
+    """Return ``(start, end)`` covering local days *date_from*..*date_to*.
+
+    Both dates are inclusive; *end* is exclusive (start of the next day).
+    """
+    return day_start(date_from, tz), day_start(date_to + timedelta(days=1), tz)
+
+
+def month_range(year: int, month: int, tz: tzinfo | None = None) -> tuple[datetime, datetime]:
+    """Return ``(start, end)`` covering the local calendar month."""
+    next_month = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return day_start(date(year, month, 1), tz), day_start(next_month, tz)
+
+
+def date_range_filter(
+    field: str,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    *,
+    tz: tzinfo | None = None,
+) -> dict:
+    """Return filter kwargs keeping *field* within local *date_from*..*date_to*.
+
+    Equivalent to ``{field}__date__gte`` / ``{field}__date__lte`` (either
+    bound may be omitted) but index friendly::
+
+        Sale.objects.filter(store=store, **date_range_filter("created_at", d1, d2, tz=tz))
+    """
+    lookups = {}
+    if date_from is not None:
+        lookups[f"{field}__gte"] = day_start(date_from, tz)
+    if date_to is not None:
+        lookups[f"{field}__lt"] = day_start(date_to + timedelta(days=1), tz)
+    return lookups
+
+
+def month_filter(field: str, year: int, month: int, *, tz: tzinfo | None = None) -> dict:
+    """Index-friendly replacement for ``{field}__year`` + ``{field}__month``."""
+    start, end = month_range(year, month, tz)
+    return {f"{field}__gte": start, f"{field}__lt": end}
@@ -1,34 +1,368 @@
-"""CSV export utilities."""
+"""CSV / XLSX export utilities.
+
+Exports never build the whole file in memory:
+
+- CSV rows are generated from the queryset in chunks and sent through a
+  ``StreamingHttpResponse``;
+- XLSX files are written with openpyxl write-only workbooks, spooled to a
+  temporary file and served with a ``FileResponse``.
+
+Columns are ``(field_or_callable, header)`` tuples.  A string is an
+attribute of the object (or a ``__`` lookup); a callable receives the
+object.  When every column is a database field path, rows are read with
+``values_list`` and no model instance is built.
+
+:func:`export_response` is what ``export-csv`` actions call: past
+``EXPORT_BACKGROUND_THRESHOLD`` rows it records an :class:`ExportJob`
+instead, run by the ``core.run_export_job`` task, which writes the file to
+the default storage and reports its progress.  The worker needs the
+columns again, so exports are registered by name with
+:func:`register_export`, in ``<app>/exports.py`` modules (autodiscovered
+like ``outbox.py``).  A job only records the export name, the query
+parameters and its requester: the worker rebuilds the queryset through the
+registered viewset, as the request did.
+"""
+from __future__ import annotations
+
 import csv
-from django.http import HttpResponse
+import io
+import logging
+import tempfile
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files import File
+from django.db import transaction
+from django.http import FileResponse, HttpRequest, JsonResponse, QueryDict, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules, import_string
+
+logger = logging.getLogger("boutique")
+
+EXPORT_CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+FORMATS = ("csv", "xlsx")
+
+# Query parameters of the request that select the file, not the rows.
+_RESPONSE_PARAMS = ("export_format", "background", "format")
+
+_EXPORTS: dict[str, "ExportSpec"] = {}
+_discovered = False
+
+
+# ---------------------------------------------------------------------------
+# Registry
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class ExportSpec:
+    columns: list
+    view: str = ""
+    select_related: tuple = ()
+
+
+def register_export(name: str, columns: list, *, view: str = "", select_related=()) -> list:
+    """Register the *columns* of the export called *name*.
+
+    *view* is the dotted path of the viewset whose ``export-csv`` action
+    serves the export; without it the export is never run in background.
+    *select_related* is applied to the queryset rebuilt by the worker.
+    """
+    _EXPORTS[name] = ExportSpec(list(columns), view, tuple(select_related))
+    return columns
+
+
+def get_export(name: str) -> ExportSpec:
+    global _discovered
+    if name not in _EXPORTS and not _discovered:
+        autodiscover_modules("exports")
+        _discovered = True
+    try:
+        return _EXPORTS[name]
+    except KeyError:
+        raise LookupError(f"Unknown export: {name}") from None
+
+
+def get_export_columns(name: str) -> list:
+    return get_export(name).columns
+
+
+# ---------------------------------------------------------------------------
+# Rows
+# ---------------------------------------------------------------------------
+
+def _is_field_path(model, path: str) -> bool:
+    """True for a concrete, non-relation field, possibly behind ``__`` FK hops.
+
+    A bare foreign key is not one: ``values_list`` would give its pk where
+    the attribute gives ``str(obj)``.
+    """
+    *hops, last = path.split("__")
+    try:
+        for part in hops:
+            field = model._meta.get_field(part)
+            if not (field.many_to_one or field.one_to_one) or field.related_model is None:
+                return False
+            model = field.related_model
+        field = model._meta.get_field(last)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.is_relation
+
+
+def _cell(value) -> str:
+    return "" if value is None else str(value)
+
+
+def iter_rows(queryset, columns):
+    """Yield one list of cell strings per object of *queryset*."""
+    fields = [field for field, _ in columns]
+    if all(isinstance(field, str) and _is_field_path(queryset.model, field) for field in fields):
+        for values in queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield [_cell(value) for value in values]
+        return
+    for obj in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [
+            _cell(field(obj)) if callable(field) else _cell(getattr(obj, field, ""))
+            for field in fields
+        ]
+
+
+def _with_progress(rows, progress):
+    count = 0
+    for row in rows:
+        yield row
+        count += 1
+        if progress is not None and count % EXPORT_CHUNK_SIZE == 0:
+            progress(count)
+    if progress is not None:
+        progress(count)
+
+
+class _Echo:
+    """File-like object whose ``write`` returns the line for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(headers, rows):
+    """Yield CSV lines (BOM first, for Excel) for *headers* and *rows*."""
+    writer = csv.writer(_Echo())
+    yield "\ufeff" + writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(fileobj, headers, rows, *, title="Export", widths=None):
+    """Write *rows* to *fileobj* as a one-sheet write-only workbook."""
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
 
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title[:31])
+    # Write-only sheets need their widths before the first row.
+    for index, header in enumerate(headers, 1):
+        width = (widths or {}).get(index) or min(max(len(str(header)) + 4, 12), 50)
+        ws.column_dimensions[get_column_letter(index)].width = width
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    ws.append(header_cells)
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+# ---------------------------------------------------------------------------
+# Responses
+# ---------------------------------------------------------------------------
 
 def queryset_to_csv_response(queryset, columns, filename):
-    """Convert a queryset to a CSV HttpResponse.
+    """Stream *queryset* as a CSV download.
 
     Args:
         queryset: Django QuerySet
         columns: list of (field_name_or_callable, header_label) tuples.
-            If field_name_or_callable is a string, getattr(obj, field) is used.
-            If it's callable, it's called with the object.
         filename: download filename (without extension)
     """
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
+    headers = [header for _, header in columns]
+    response = StreamingHttpResponse(
+        stream_csv(headers, iter_rows(queryset, columns)),
+        content_type="text/csv; charset=utf-8",
+    )
     response["Content-Disposition"] = f'attachment; filename="{filename}.csv"'
-    # UTF-8 BOM for Excel compatibility
-    response.write("\ufeff")
-
-    writer = csv.writer(response)
-    writer.writerow([col[1] for col in columns])
-
-    for obj in queryset.iterator():
-        row = []
-        for field, _ in columns:
-            if callable(field):
-                row.append(field(obj))
-            else:
-                val = getattr(obj, field, "")
-                row.append(str(val) if val is not None else "")
-        writer.writerow(row)
-
     return response
+
+
+def xlsx_response(headers, rows, filename, *, title="Export", widths=None):
+    """Serve *rows* as an XLSX download written through a temporary file."""
+    spool = tempfile.TemporaryFile()
+    write_xlsx(spool, headers, rows, title=title, widths=widths)
+    spool.seek(0)
+    # FileResponse closes the file once sent.
+    return FileResponse(
+        spool,
+        as_attachment=True,
+        filename=f"{filename}.xlsx",
+        content_type=XLSX_CONTENT_TYPE,
+    )
+
+
+def queryset_to_xlsx_response(queryset, columns, filename):
+    headers = [header for _, header in columns]
+    return xlsx_response(headers, iter_rows(queryset, columns), filename, title=filename)
+
+
+def export_response(request, queryset, name, filename=None):
+    """Answer an ``export-csv`` action for the registered export *name*.
+
+    ``?export_format=xlsx`` selects XLSX.  Exports of more than
+    ``EXPORT_BACKGROUND_THRESHOLD`` rows (or with ``?background=1``) are
+    queued as an :class:`~core.models.ExportJob`; the 202 answer carries
+    its status URL.
+    """
+    spec = get_export(name)
+    columns = spec.columns
+    filename = filename or name
+    export_format = request.GET.get("export_format", "csv").lower()
+    if export_format not in FORMATS:
+        export_format = "csv"
+
+    background = request.GET.get("background") in ("1", "true")
+    if not background:
+        background = queryset.count() > settings.EXPORT_BACKGROUND_THRESHOLD
+    if background and spec.view:
+        params = {
+            key: request.GET.getlist(key) for key in request.GET if key not in _RESPONSE_PARAMS
+        }
+        job = start_export_job(name, filename, export_format, params=params, user=request.user)
+        return JsonResponse(export_job_status(job), status=202)
+
+    if export_format == "xlsx":
+        return queryset_to_xlsx_response(queryset, columns, filename)
+    return queryset_to_csv_response(queryset, columns, filename)
+
+
+# ---------------------------------------------------------------------------
+# Background jobs
+# ---------------------------------------------------------------------------
+
+def start_export_job(name, filename, export_format="csv", *, params=None, user=None):
+    """Record an export job of *name* for the query *params* and queue it once committed.
+
+    *params* maps query parameters to lists of values, as
+    ``QueryDict.getlist`` returns them.
+    """
+    from core.models import ExportJob
+
+    job = ExportJob.objects.create(
+        export_name=name,
+        filename=filename,
+        file_format=export_format,
+        params=params or {},
+        requested_by=user if getattr(user, "is_authenticated", False) else None,
+    )
+
+    def _queue():
+        from core.tasks import run_export_job
+
+        try:
+            run_export_job.delay(str(job.pk))
+        except Exception:
+            logger.warning("Export job %s could not be queued, running inline", job.pk, exc_info=True)
+            run_export_job(str(job.pk))
+
+    transaction.on_commit(_queue)
+    return job
+
+
+def export_job_status(job) -> dict:
+    from django.urls import reverse
+
+    return {
+        "id": str(job.pk),
+        "export": job.export_name,
+        "format": job.file_format,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "processed_rows": job.processed_rows,
+        "progress": job.progress,
+        "status_url": reverse("api:export-job-detail", args=[job.pk]),
+        "download_url": (
+            reverse("api:export-job-download", args=[job.pk])
+            if job.status == job.Status.DONE else None
+        ),
+        "error": job.error,
+    }
+
+
+def export_queryset(job):
+    """Rebuild the queryset of *job* through the viewset of its export.
+
+    The viewset sees a GET request of the job's requester carrying the
+    recorded query parameters, so tenant scoping and filters apply as they
+    did when the export was requested.
+    """
+    from rest_framework.request import Request
+
+    spec = get_export(job.export_name)
+    if not spec.view:
+        raise LookupError(f"Export {job.export_name} cannot run in background")
+    if job.requested_by is None:
+        raise PermissionError("Export job without requester")
+
+    http_request = HttpRequest()
+    http_request.method = "GET"
+    http_request.GET = QueryDict(mutable=True)
+    for key, values in job.params.items():
+        http_request.GET.setlist(key, values)
+    request = Request(http_request)
+    request.user = job.requested_by
+
+    view = import_string(spec.view)(
+        request=request, args=(), kwargs={}, format_kwarg=None, action="export_csv",
+    )
+    queryset = view.filter_queryset(view.get_queryset())
+    if spec.select_related:
+        queryset = queryset.select_related(*spec.select_related)
+    return queryset
+
+
+def run_export(job) -> None:
+    """Write the file of *job* to the default storage."""
+    from core.models import ExportJob
+
+    columns = get_export_columns(job.export_name)
+    queryset = export_queryset(job)
+
+    job.status = ExportJob.Status.RUNNING
+    job.total_rows = queryset.count()
+    job.processed_rows = 0
+    job.save(update_fields=["status", "total_rows", "processed_rows", "updated_at"])
+
+    def _progress(count):
+        ExportJob.objects.filter(pk=job.pk).update(processed_rows=count, updated_at=timezone.now())
+
+    headers = [header for _, header in columns]
+    rows = _with_progress(iter_rows(queryset, columns), _progress)
+    with tempfile.TemporaryFile() as spool:
+        if job.file_format == "xlsx":
+            write_xlsx(spool, headers, rows, title=job.filename)
+        else:
+            text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+            text.writelines(stream_csv(headers, rows))
+            text.flush()
+            text.detach()
+        spool.seek(0)
+        job.file.save(f"{job.filename}.{job.file_format}", File(spool), save=False)
+
+    job.refresh_from_db(fields=["processed_rows"])
+    job.status = ExportJob.Status.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "status", "finished_at", "updated_at"])
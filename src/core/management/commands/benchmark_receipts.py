@@ -0,0 +1,79 @@
+"""Compare receipt rendering times: WeasyPrint vs the fast thermal renderer."""
+
+from __future__ import annotations
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from core.pdf import generate_receipt_escpos, generate_receipt_pdf
+from sales.models import Sale
+
+
+class Command(BaseCommand):
+    help = (
+        "Render the receipt of one sale repeatedly with WeasyPrint (HTML), the "
+        "thermal PDF renderer and ESC/POS, and print the timings. Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sale", default="", help="Sale id (default: latest paid sale).")
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument("--template", default="TICKET", choices=["TICKET", "COMPACT"])
+
+    def handle(self, *args, **options):
+        sales = Sale.objects.select_related("store", "store__enterprise", "seller", "customer")
+        if options["sale"]:
+            sale = sales.filter(pk=options["sale"]).first()
+        else:
+            sale = sales.filter(status=Sale.Status.PAID).order_by("-created_at").first()
+        if sale is None:
+            raise CommandError("No sale to render.")
+        store = sale.store
+        payments = list(sale.payments.order_by("created_at"))
+        iterations = max(1, options["iterations"])
+        receipt = {
+            "sale": sale,
+            "store": store,
+            "payments": payments,
+            "cashier_name": "Benchmark",
+            "template_code": options["template"],
+        }
+
+        def _pdf(renderer):
+            def _render():
+                store.receipt_renderer = renderer
+                return generate_receipt_pdf(**receipt).content
+            return _render
+
+        runs = [
+            ("WeasyPrint (HTML)", _pdf("HTML")),
+            ("Thermique (PDF)", _pdf("THERMAL")),
+            ("Thermique (ESC/POS)", lambda: generate_receipt_escpos(**receipt)),
+        ]
+        results = {}
+        # Cached renders would hide the cost being measured.
+        with override_settings(PDF_CACHE_ENABLED=False):
+            for label, render in runs:
+                try:
+                    size = len(render())  # warm-up (templates, fonts)
+                except RuntimeError as exc:
+                    self.stdout.write(self.style.WARNING(f"{label}: skipped ({exc})"))
+                    continue
+                timings = []
+                for _ in range(iterations):
+                    start = time.perf_counter()
+                    render()
+                    timings.append((time.perf_counter() - start) * 1000)
+                results[label] = statistics.median(timings)
+                self.stdout.write(
+                    f"{label:<22} median {results[label]:8.2f} ms  "
+                    f"max {max(timings):8.2f} ms  {size:>8} bytes"
+                )
+
+        baseline = results.get("WeasyPrint (HTML)")
+        fast = results.get("Thermique (PDF)")
+        if baseline and fast:
+            self.stdout.write(self.style.SUCCESS(f"Thermal PDF is {baseline / fast:.1f}x faster."))
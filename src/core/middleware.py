@@ -38,18 +38,20 @@ class JWTAuthMiddleware:
 
     def _authenticate_jwt(self, request):
         try:
-            from rest_framework_simplejwt.authentication import JWTAuthentication
             from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
 
-            jwt_auth = JWTAuthentication()
+            from api.authentication import CookieJWTAuthentication
+
+            # Results are memoised on the request, so DRF's
+            # CookieJWTAuthentication reuses them instead of re-verifying.
+            jwt_auth = CookieJWTAuthentication()
 
             # 1) Try Authorization header
             header = request.META.get("HTTP_AUTHORIZATION", "")
             if header.startswith("Bearer "):
                 raw_token = header[7:]
                 try:
-                    validated = jwt_auth.get_validated_token(raw_token)
-                    return jwt_auth.get_user(validated)
+                    return jwt_auth.authenticate_token(request, raw_token)[0]
                 except (InvalidToken, TokenError):
                     pass
 
@@ -57,8 +59,7 @@ class JWTAuthMiddleware:
             raw_cookie = request.COOKIES.get(self._cookie_name)
             if raw_cookie:
                 try:
-                    validated = jwt_auth.get_validated_token(raw_cookie)
-                    return jwt_auth.get_user(validated)
+                    return jwt_auth.authenticate_token(request, raw_cookie)[0]
                 except (InvalidToken, TokenError):
                     pass
 
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-16 20:40
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('topic', models.CharField(db_index=True, max_length=100, verbose_name='sujet')),
+                ('aggregate_key', models.CharField(help_text="Evenements d'une meme entite livres dans l'ordre (ex. sales.Sale:<id>).", max_length=150, verbose_name='entite')),
+                ('dedupe_key', models.CharField(blank=True, help_text='Un seul evenement en attente par cle.', max_length=200, null=True, verbose_name='cle de deduplication')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='donnees')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('DONE', 'Traite'), ('FAILED', 'Echec definitif')], default='PENDING', max_length=10, verbose_name='statut')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='tentatives')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='disponible le')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='traite le')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='derniere erreur')),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='outbox_events', to='stores.store', verbose_name='boutique')),
+            ],
+            options={
+                'verbose_name': 'Evenement outbox',
+                'verbose_name_plural': 'Evenements outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='outbox_status_created_idx'), models.Index(fields=['aggregate_key', 'created_at'], name='outbox_aggregate_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('dedupe_key',), name='uniq_outbox_pending_dedupe_key')],
+            },
+        ),
+    ]
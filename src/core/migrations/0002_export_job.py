@@ -0,0 +1,42 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:03
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('export_name', models.CharField(max_length=50, verbose_name='export')),
+                ('filename', models.CharField(max_length=100, verbose_name='nom du fichier')),
+                ('file_format', models.CharField(choices=[('csv', 'CSV'), ('xlsx', 'Excel')], default='csv', max_length=4, verbose_name='format')),
+                ('model_label', models.CharField(max_length=100, verbose_name='modele')),
+                ('query', models.BinaryField(verbose_name='requete')),
+                ('status', models.CharField(choices=[('PENDING', 'En attente'), ('RUNNING', 'En cours'), ('DONE', 'Termine'), ('FAILED', 'Echec')], default='PENDING', max_length=10, verbose_name='statut')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='lignes')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='lignes traitees')),
+                ('file', models.FileField(blank=True, upload_to='exports/%Y/%m/', verbose_name='fichier')),
+                ('error', models.TextField(blank=True, default='', verbose_name='erreur')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='termine le')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='export_jobs', to=settings.AUTH_USER_MODEL, verbose_name='demande par')),
+            ],
+            options={
+                'verbose_name': 'Export',
+                'verbose_name_plural': 'Exports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:16
+
+from django.db import migrations, models
+
+
+def fail_queued_jobs(apps, schema_editor):
+    """Jobs queued with a pickled query cannot be rebuilt from parameters."""
+    ExportJob = apps.get_model("core", "ExportJob")
+    ExportJob.objects.filter(status__in=["PENDING", "RUNNING"]).update(
+        status="FAILED", error="Export interrompu par une mise a jour, relancez-le.",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_export_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_queued_jobs, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='model_label',
+        ),
+        migrations.RemoveField(
+            model_name='exportjob',
+            name='query',
+        ),
+        migrations.AddField(
+            model_name='exportjob',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, verbose_name='parametres'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_export_job_params'),
+        ('stores', '0024_store_receipt_renderer'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxevent',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'En attente'), ('PROCESSING', 'En cours'), ('DONE', 'Traite'), ('FAILED', 'Echec definitif')], default='PENDING', max_length=10, verbose_name='statut'),
+        ),
+        migrations.AddIndex(
+            model_name='outboxevent',
+            index=models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ),
+    ]
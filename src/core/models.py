@@ -1,6 +1,9 @@
 """Base models for the project."""
 import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class TimeStampedModel(models.Model):
@@ -12,3 +15,129 @@ class TimeStampedModel(models.Model):
     class Meta:
         abstract = True
         ordering = ["-created_at"]
+
+
+class OutboxEvent(TimeStampedModel):
+    """Side effect recorded in the business transaction, delivered later.
+
+    Rows are written by :func:`core.outbox.publish_event` inside the same
+    transaction as the sale/payment/refund they describe, then delivered in
+    batches by :func:`core.outbox.dispatch_pending_events`.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        PROCESSING = "PROCESSING", "En cours"
+        DONE = "DONE", "Traite"
+        FAILED = "FAILED", "Echec definitif"
+
+    topic = models.CharField("sujet", max_length=100, db_index=True)
+    aggregate_key = models.CharField(
+        "entite",
+        max_length=150,
+        help_text="Evenements d'une meme entite livres dans l'ordre (ex. sales.Sale:<id>).",
+    )
+    dedupe_key = models.CharField(
+        "cle de deduplication",
+        max_length=200,
+        null=True,
+        blank=True,
+        help_text="Un seul evenement en attente par cle.",
+    )
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="outbox_events",
+        verbose_name="boutique",
+    )
+    payload = models.JSONField("donnees", default=dict, blank=True)
+    status = models.CharField(
+        "statut",
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    attempts = models.PositiveIntegerField("tentatives", default=0)
+    available_at = models.DateTimeField("disponible le", default=timezone.now)
+    processed_at = models.DateTimeField("traite le", null=True, blank=True)
+    last_error = models.TextField("derniere erreur", blank=True, default="")
+
+    class Meta:
+        ordering = ["created_at"]
+        verbose_name = "Evenement outbox"
+        verbose_name_plural = "Evenements outbox"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="outbox_status_created_idx"),
+            models.Index(fields=["status", "available_at"], name="outbox_status_available_idx"),
+            models.Index(fields=["aggregate_key", "created_at"], name="outbox_aggregate_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="PENDING"),
+                name="uniq_outbox_pending_dedupe_key",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} [{self.status}] {self.aggregate_key}"
+
+
+class ExportJob(TimeStampedModel):
+    """CSV/XLSX export too large for a request, written by a Celery worker.
+
+    Created by :func:`core.export.export_response`; the file lands in the
+    default storage and is downloaded through the API by its requester.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "PENDING", "En attente"
+        RUNNING = "RUNNING", "En cours"
+        DONE = "DONE", "Termine"
+        FAILED = "FAILED", "Echec"
+
+    class Format(models.TextChoices):
+        CSV = "csv", "CSV"
+        XLSX = "xlsx", "Excel"
+
+    export_name = models.CharField("export", max_length=50)
+    filename = models.CharField("nom du fichier", max_length=100)
+    file_format = models.CharField("format", max_length=4, choices=Format.choices, default=Format.CSV)
+    params = models.JSONField("parametres", default=dict, blank=True)
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="export_jobs",
+        verbose_name="demande par",
+    )
+    status = models.CharField(
+        "statut",
+        max_length=10,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    total_rows = models.PositiveIntegerField("lignes", default=0)
+    processed_rows = models.PositiveIntegerField("lignes traitees", default=0)
+    file = models.FileField("fichier", upload_to="exports/%Y/%m/", blank=True)
+    error = models.TextField("erreur", blank=True, default="")
+    finished_at = models.DateTimeField("termine le", null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Export"
+        verbose_name_plural = "Exports"
+
+    def __str__(self):
+        return f"{self.export_name}.{self.file_format} [{self.status}]"
+
+    @property
+    def progress(self) -> int:
+        if self.status == self.Status.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, self.processed_rows * 100 // self.total_rows)
@@ -0,0 +1,253 @@
+"""Transactional outbox for post-commit side effects.
+
+Business code (mostly model signals) calls :func:`publish_event` while the
+sale/payment/refund transaction is still open.  The event row is written in
+that same transaction, so it exists if and only if the business change was
+committed.  A dispatcher (:func:`dispatch_pending_events`, run by the
+``core.dispatch_outbox`` Celery task) then delivers events in batches:
+
+- events are processed in creation order, and events sharing the same
+  ``aggregate_key`` are never delivered out of order: once one of them fails
+  or waits for a retry, the later ones wait too;
+- failures are retried with exponential backoff up to
+  ``OUTBOX_MAX_ATTEMPTS`` and then marked FAILED, which releases the
+  entity's later events;
+- dispatchers may run concurrently: each claims its events with
+  ``SELECT ... FOR UPDATE SKIP LOCKED`` and marks them PROCESSING; claims
+  older than ``OUTBOX_PROCESSING_TIMEOUT`` seconds are given back.
+
+Handlers are registered per topic with :func:`outbox_handler` and receive
+the JSON payload.  They must be idempotent and live either in a module
+loaded at startup (app signals) or in an ``<app>/outbox.py`` module, which
+the dispatcher autodiscovers.
+
+Publishers check :func:`outbox_enabled_for_store` first: stores with the
+``sync_side_effects`` feature flag (or every store when
+``settings.OUTBOX_ENABLED`` is False) keep the legacy in-request behaviour.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+logger = logging.getLogger("boutique")
+
+_HANDLERS: dict[str, object] = {}
+
+
+def outbox_handler(topic: str):
+    """Register the decorated function as the handler of *topic*."""
+    def decorator(func):
+        _HANDLERS[topic] = func
+        return func
+    return decorator
+
+
+def outbox_enabled_for_store(store) -> bool:
+    """Return True when side effects of *store* go through the outbox."""
+    if not getattr(settings, "OUTBOX_ENABLED", True):
+        return False
+    checker = getattr(store, "is_feature_enabled", None)
+    if callable(checker) and checker("sync_side_effects"):
+        return False
+    return True
+
+
+def _kick_dispatcher() -> None:
+    try:
+        from core.tasks import dispatch_outbox
+        dispatch_outbox.delay()
+    except Exception:
+        # The periodic beat run will pick the events up.
+        logger.warning("Outbox dispatcher could not be queued", exc_info=True)
+
+
+def publish_event(
+    topic: str,
+    *,
+    aggregate_key: str,
+    payload: dict,
+    store=None,
+    dedupe_key: str | None = None,
+) -> None:
+    """Record a side effect for *topic* in the current transaction.
+
+    Parameters
+    ----------
+    topic : str
+        Registered handler topic (``accounting.payment_created``...).
+    aggregate_key : str
+        Entity the event belongs to; delivery order is guaranteed per key.
+    payload : dict
+        JSON-serializable handler arguments (ids, not model instances).
+    store : stores.models.Store, optional
+        Store the event belongs to (filtering, admin).
+    dedupe_key : str, optional
+        When set, at most one PENDING event exists per key; later
+        publications are dropped until its delivery starts.
+    """
+    from core.models import OutboxEvent
+
+    OutboxEvent.objects.bulk_create(
+        [
+            OutboxEvent(
+                topic=topic,
+                aggregate_key=aggregate_key,
+                dedupe_key=dedupe_key,
+                store=store,
+                payload=payload,
+            )
+        ],
+        ignore_conflicts=bool(dedupe_key),
+    )
+    transaction.on_commit(_kick_dispatcher)
+
+
+def _retry_delay(attempts: int) -> timedelta:
+    return timedelta(seconds=min(2 ** attempts * 5, 3600))
+
+
+def _release_stale_claims(now) -> int:
+    """Give back events left PROCESSING by a dispatcher that died mid-batch."""
+    from core.models import OutboxEvent
+
+    timeout = getattr(settings, "OUTBOX_PROCESSING_TIMEOUT", 600)
+    # The dedupe key is dropped: a newer PENDING event may already hold it.
+    return OutboxEvent.objects.filter(
+        status=OutboxEvent.Status.PROCESSING,
+        updated_at__lt=now - timedelta(seconds=timeout),
+    ).update(status=OutboxEvent.Status.PENDING, dedupe_key=None, updated_at=now)
+
+
+def _claim_batch(batch_size: int, now) -> tuple[list, int]:
+    """Mark the next deliverable events PROCESSING and return them.
+
+    Due PENDING rows are locked with ``SKIP LOCKED``, so concurrent
+    dispatchers share the work without waiting on each other.  An event is
+    left PENDING while an earlier event of its aggregate is still pending
+    (not due, or claimed by another dispatcher) or being processed.
+    Returns ``(events, deferred count)``.
+    """
+    from core.models import OutboxEvent
+
+    Status = OutboxEvent.Status
+    with transaction.atomic():
+        candidates = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=Status.PENDING, available_at__lte=now)
+            .order_by("created_at", "id")[:batch_size]
+        )
+        if not candidates:
+            return [], 0
+
+        candidate_ids = {event.pk for event in candidates}
+        first_open: dict[str, object] = {}
+        open_events = (
+            OutboxEvent.objects.filter(
+                aggregate_key__in={event.aggregate_key for event in candidates},
+                status__in=(Status.PENDING, Status.PROCESSING),
+            )
+            .exclude(pk__in=candidate_ids)
+            .values_list("aggregate_key", "created_at")
+        )
+        for aggregate_key, created_at in open_events:
+            if aggregate_key not in first_open or created_at < first_open[aggregate_key]:
+                first_open[aggregate_key] = created_at
+
+        claimed = [
+            event for event in candidates
+            if event.aggregate_key not in first_open or event.created_at < first_open[event.aggregate_key]
+        ]
+        if claimed:
+            OutboxEvent.objects.filter(pk__in=[event.pk for event in claimed]).update(
+                status=Status.PROCESSING, updated_at=now,
+            )
+    return claimed, len(candidates) - len(claimed)
+
+
+def dispatch_pending_events(batch_size: int | None = None) -> dict:
+    """Deliver one batch of pending outbox events.
+
+    Events are claimed (PROCESSING) before their handler runs and marked
+    DONE one by one, in the handler's transaction.  A publication with the
+    same ``dedupe_key`` during delivery therefore adds a new PENDING event
+    instead of being dropped; events put back to PENDING lose their key.
+
+    Returns a summary dict with ``delivered``, ``retried``, ``failed`` and
+    ``deferred`` counts.
+    """
+    from core.models import OutboxEvent
+
+    autodiscover_modules("outbox")
+    summary = {"delivered": 0, "retried": 0, "failed": 0, "deferred": 0}
+    batch_size = batch_size or getattr(settings, "OUTBOX_BATCH_SIZE", 200)
+    max_attempts = getattr(settings, "OUTBOX_MAX_ATTEMPTS", 8)
+
+    now = timezone.now()
+    _release_stale_claims(now)
+    events, summary["deferred"] = _claim_batch(batch_size, now)
+    blocked: set[str] = set()
+
+    for event in events:
+        if event.aggregate_key in blocked:
+            # An earlier event of the entity failed in this batch.  As in
+            # _release_stale_claims, the dedupe key is dropped.
+            OutboxEvent.objects.filter(pk=event.pk).update(
+                status=OutboxEvent.Status.PENDING, dedupe_key=None, updated_at=timezone.now(),
+            )
+            summary["deferred"] += 1
+            continue
+
+        handler = _HANDLERS.get(event.topic)
+        try:
+            if handler is None:
+                raise LookupError(f"Aucun gestionnaire pour '{event.topic}'.")
+            with transaction.atomic():
+                handler(event.payload)
+                OutboxEvent.objects.filter(pk=event.pk).update(
+                    status=OutboxEvent.Status.DONE,
+                    processed_at=timezone.now(),
+                    dedupe_key=None,
+                    updated_at=timezone.now(),
+                )
+        except Exception as exc:
+            event.attempts += 1
+            event.last_error = f"{type(exc).__name__}: {exc}"[:2000]
+            if event.attempts >= max_attempts:
+                event.status = OutboxEvent.Status.FAILED
+                summary["failed"] += 1
+                logger.error(
+                    "Outbox event %s (%s) failed permanently after %d attempts",
+                    event.pk, event.topic, event.attempts, exc_info=True,
+                )
+            else:
+                # Later events of the same entity wait for the retry.
+                blocked.add(event.aggregate_key)
+                event.status = OutboxEvent.Status.PENDING
+                event.available_at = timezone.now() + _retry_delay(event.attempts)
+                summary["retried"] += 1
+                logger.warning(
+                    "Outbox event %s (%s) failed, retry #%d scheduled",
+                    event.pk, event.topic, event.attempts, exc_info=True,
+                )
+            # A newer publication may hold the key (or take it at any time);
+            # a requeued event never claims it back.
+            event.dedupe_key = None
+            event.save(update_fields=[
+                "attempts", "last_error", "status", "available_at", "dedupe_key", "updated_at",
+            ])
+            continue
+
+        summary["delivered"] += 1
+
+    if summary["delivered"] or summary["retried"] or summary["failed"]:
+        logger.info(
+            "Outbox dispatch: %d delivered, %d retried, %d failed, %d deferred",
+            summary["delivered"], summary["retried"], summary["failed"], summary["deferred"],
+        )
+    return summary
@@ -9,6 +9,8 @@ from django.conf import settings
 from django.http import HttpResponse
 from django.template.loader import render_to_string
 
+from core.pdf_cache import CACHED_QUOTE_STATUSES, CACHED_SALE_STATUSES
+
 logger = logging.getLogger("boutique")
 HEX_COLOR_RE = re.compile(r"^#[0-9A-Fa-f]{6}$")
 
@@ -42,14 +44,52 @@ def render_pdf(template_name, context, filename="document.pdf", disposition="inl
     html_string = render_to_string(template_name, context)
     pdf_file = BytesIO()
     HTML(string=html_string, base_url=str(settings.BASE_DIR)).write_pdf(pdf_file)
-    pdf_file.seek(0)
+    return pdf_response(pdf_file.getvalue(), filename, disposition)
+
 
+def pdf_response(content, filename="document.pdf", disposition="inline"):
+    """Wrap rendered PDF bytes in an HttpResponse."""
     safe_disposition = "attachment" if (disposition or "").strip().lower() == "attachment" else "inline"
-    response = HttpResponse(pdf_file, content_type="application/pdf")
+    response = HttpResponse(content, content_type="application/pdf")
     response["Content-Disposition"] = f'{safe_disposition}; filename="{filename}"'
     return response
 
 
+def _render_cached(kind, object_id, template_name, invoice_config, state, build_context,
+                   filename, disposition="inline"):
+    """Serve a finished document from :mod:`core.pdf_cache`, rendering it on a miss.
+
+    *state* lists what the document shows besides the template and the
+    invoice config; *build_context* is only called on a miss.
+    """
+    from core import pdf_cache
+
+    digest = pdf_cache.document_digest(template_name, invoice_config, state)
+    content = pdf_cache.get_cached(kind, object_id, digest)
+    if content is not None:
+        return pdf_response(content, filename, disposition)
+    response = render_pdf(template_name, build_context(), filename, disposition)
+    pdf_cache.store(kind, object_id, digest, response.content)
+    return response
+
+
+def _sale_state(sale):
+    customer = sale.customer if sale.customer_id else None
+    return [
+        str(sale.pk),
+        sale.updated_at,
+        sale.status,
+        getattr(sale, "payment_status", ""),
+        sale.total,
+        sale.amount_paid,
+        sale.amount_due,
+        getattr(sale, "verification_hash", ""),
+        getattr(customer, "updated_at", None),
+        sale.seller_id,
+        sale.store.updated_at,
+    ]
+
+
 _RECEIPT_TEMPLATE_CODE_TO_PATH = {
     "TICKET": "pdf/receipt_ticket.html",
     "COMPACT": "pdf/receipt_compact.html",
@@ -273,20 +313,28 @@ def generate_invoice_pdf(sale, store, document_kind="invoice"):
         template_name = "pdf/invoice_a4_prestige.html"
     else:
         template_name = "pdf/invoice_a4.html"
-    context = {
-        "sale": sale,
-        "store": store,
-        "invoice_config": invoice_config,
-        "document": document,
-        "payment_status_meta": _build_payment_status_meta(sale),
-        "now": now,
-        **_verification_context(sale),
-    }
+
+    def build_context():
+        return {
+            "sale": sale,
+            "store": store,
+            "invoice_config": invoice_config,
+            "document": document,
+            "payment_status_meta": _build_payment_status_meta(sale),
+            "now": now,
+            **_verification_context(sale),
+        }
+
     filename = _safe_pdf_filename(
         document.get("number") or sale.invoice_number or f"FACTURE-{sale.id}",
         fallback="facture",
     )
-    return render_pdf(template_name, context, filename)
+    if document["kind"] == "invoice" and sale.status in CACHED_SALE_STATUSES:
+        return _render_cached(
+            "invoice", sale.pk, template_name, invoice_config,
+            _sale_state(sale), build_context, filename,
+        )
+    return render_pdf(template_name, build_context(), filename)
 
 
 def generate_receipt_pdf(
@@ -321,24 +369,69 @@ def generate_receipt_pdf(
         receipt_template_code,
         _RECEIPT_TEMPLATE_CODE_TO_PATH["TICKET"],
     )
-    context = {
-        "sale": sale,
-        "store": store,
-        "invoice_config": invoice_config,
-        "receipt_template_code": receipt_template_code,
-        "payments": payments or sale.payments.all(),
-        "change": change,
-        "cashier_name": cashier_name,
-        "now": timezone.now(),
-        **_verification_context(sale),
-    }
+    payments = payments or sale.payments.all()
     sale_ref = sale.invoice_number or str(sale.id).split("-")[0].upper()
     filename = _safe_pdf_filename(f"REC-{sale_ref}", fallback="recu")
-    return render_pdf(
-        template_name,
-        context,
-        filename,
-        disposition="attachment" if as_attachment else "inline",
+    disposition = "attachment" if as_attachment else "inline"
+    if getattr(store, "receipt_renderer", "HTML") == "THERMAL" and receipt_template_code in ("TICKET", "COMPACT"):
+        from core.thermal_receipt import render_receipt_pdf
+
+        content = render_receipt_pdf(
+            sale,
+            store,
+            payments=payments,
+            change=change,
+            cashier_name=cashier_name,
+            template_code=receipt_template_code,
+            invoice_config=invoice_config,
+        )
+        return pdf_response(content, filename, disposition)
+
+    def build_context():
+        return {
+            "sale": sale,
+            "store": store,
+            "invoice_config": invoice_config,
+            "receipt_template_code": receipt_template_code,
+            "payments": payments,
+            "change": change,
+            "cashier_name": cashier_name,
+            "now": timezone.now(),
+            **_verification_context(sale),
+        }
+
+    if sale.status in CACHED_SALE_STATUSES:
+        state = _sale_state(sale) + [
+            receipt_template_code,
+            str(change),
+            cashier_name,
+            [(str(payment.pk), payment.method, payment.amount) for payment in payments],
+        ]
+        return _render_cached(
+            "receipt", sale.pk, template_name, invoice_config,
+            state, build_context, filename, disposition,
+        )
+    return render_pdf(template_name, build_context(), filename, disposition=disposition)
+
+
+def generate_receipt_escpos(sale, store, payments=None, change=0, cashier_name="", template_code=""):
+    """ESC/POS byte stream of the receipt, for thermal printers.
+
+    Always uses the fast renderer (``TICKET`` layout unless ``COMPACT``).
+    """
+    from core.thermal_receipt import render_receipt_escpos
+
+    invoice_config = _build_invoice_config(store)
+    default_template_code = _normalize_receipt_template(invoice_config.get("template"))
+    receipt_template_code = _normalize_receipt_template(template_code, fallback=default_template_code)
+    return render_receipt_escpos(
+        sale,
+        store,
+        payments=payments,
+        change=change,
+        cashier_name=cashier_name,
+        template_code="COMPACT" if receipt_template_code == "COMPACT" else "TICKET",
+        invoice_config=invoice_config,
     )
 
 
@@ -358,15 +451,23 @@ def generate_shift_report_pdf(shift, store):
     for item in payment_by_method:
         item["method_display"] = method_display_map.get(item["method"], item["method"])
 
-    context = {
-        "shift": shift,
-        "store": store,
-        "payment_count": payments.count(),
-        "payment_by_method": payment_by_method,
-        "now": timezone.now(),
-    }
+    def build_context():
+        return {
+            "shift": shift,
+            "store": store,
+            "payment_count": payments.count(),
+            "payment_by_method": payment_by_method,
+            "now": timezone.now(),
+        }
+
     filename = f"shift_{shift.id}.pdf"
-    return render_pdf("pdf/shift_report.html", context, filename)
+    if shift.status == shift.Status.CLOSED:
+        # Closed shifts take no more payments.
+        return _render_cached(
+            "shift_report", shift.pk, "pdf/shift_report.html", {},
+            [str(shift.pk), shift.updated_at, store.updated_at], build_context, filename,
+        )
+    return render_pdf("pdf/shift_report.html", build_context(), filename)
 
 
 def generate_credit_payment_receipt_pdf(account, entry, store):
@@ -390,20 +491,35 @@ def generate_credit_payment_receipt_pdf(account, entry, store):
         for item in history_entries
     ]
 
-    context = {
-        "account": account,
-        "entry": entry,
-        "payment_amount": payment_amount,
-        "balance_before": balance_before,
-        "reimbursement_history": reimbursement_history,
-        "store": store,
-        "invoice_config": _build_invoice_config(store),
-        "now": timezone.now(),
-        **_verification_context(entry),
-    }
+    invoice_config = _build_invoice_config(store)
+
+    def build_context():
+        return {
+            "account": account,
+            "entry": entry,
+            "payment_amount": payment_amount,
+            "balance_before": balance_before,
+            "reimbursement_history": reimbursement_history,
+            "store": store,
+            "invoice_config": invoice_config,
+            "now": timezone.now(),
+            **_verification_context(entry),
+        }
+
     entry_ref = str(entry.pk).split("-")[0].upper()
     filename = _safe_pdf_filename(f"RCR-{entry_ref}", fallback="remboursement-credit")
-    return render_pdf("pdf/credit_payment_receipt.html", context, filename)
+    # Ledger entries are never edited; later reimbursements change the history.
+    state = [
+        str(entry.pk),
+        str(account.pk),
+        getattr(account.customer, "updated_at", None),
+        store.updated_at,
+        [str(item["entry"].pk) for item in reimbursement_history],
+    ]
+    return _render_cached(
+        "credit_receipt", entry.pk, "pdf/credit_payment_receipt.html", invoice_config,
+        state, build_context, filename,
+    )
 
 
 def generate_refund_receipt_pdf(refund, store):
@@ -463,17 +579,34 @@ def generate_quote_pdf(quote, store):
         "valid_until": getattr(quote, "valid_until", None),
     }
 
-    context = {
-        "quote": quote,
-        "store": store,
-        "invoice_config": invoice_config,
-        "document_title": document_title,
-        "document": document,
-        "now": now,
-        **_verification_context(quote),
-    }
+    def build_context():
+        return {
+            "quote": quote,
+            "store": store,
+            "invoice_config": invoice_config,
+            "document_title": document_title,
+            "document": document,
+            "now": now,
+            **_verification_context(quote),
+        }
+
     filename = _safe_pdf_filename(doc_number, fallback="devis")
-    return render_pdf(template_name, context, filename)
+    if quote.status in CACHED_QUOTE_STATUSES:
+        customer = quote.customer if quote.customer_id else None
+        state = [
+            str(quote.pk),
+            quote.updated_at,
+            quote.status,
+            doc_number,
+            getattr(quote, "verification_hash", ""),
+            getattr(customer, "updated_at", None),
+            store.updated_at,
+        ]
+        return _render_cached(
+            "quote", quote.pk, template_name, invoice_config,
+            state, build_context, filename,
+        )
+    return render_pdf(template_name, build_context(), filename)
 
 
 def generate_delivery_label_pdf(delivery, store):
@@ -621,3 +754,34 @@ def generate_cashier_operations_report_pdf(
         fallback="operations-caissiers",
     )
     return render_pdf("pdf/cashier_operations_report.html", context, filename)
+
+
+def prerender_document(kind, object_id):
+    """Render and cache the PDFs printed for a finished sale or quote.
+
+    For a sale: the invoice and the default receipt as printed by the
+    cashier who took the last payment.  Returns the documents rendered.
+    """
+    from sales.models import Quote, Sale
+
+    if kind == "sale":
+        sale = Sale.objects.select_related("store", "store__enterprise", "customer", "seller").filter(pk=object_id).first()
+        if sale is None or sale.status not in CACHED_SALE_STATUSES:
+            return 0
+        generate_invoice_pdf(sale=sale, store=sale.store)
+        payments = list(sale.payments.select_related("cashier").order_by("created_at"))
+        cashier = payments[-1].cashier if payments else None
+        generate_receipt_pdf(
+            sale=sale,
+            store=sale.store,
+            payments=payments,
+            cashier_name=cashier.get_full_name() if cashier else "",
+        )
+        return 2
+    if kind == "quote":
+        quote = Quote.objects.select_related("store", "store__enterprise", "customer").filter(pk=object_id).first()
+        if quote is None or quote.status not in CACHED_QUOTE_STATUSES:
+            return 0
+        generate_quote_pdf(quote, quote.store)
+        return 1
+    raise ValueError(f"Unknown document kind: {kind}")
@@ -0,0 +1,132 @@
+"""Content-addressed cache of rendered PDF documents.
+
+PDFs of finished documents (paid sales, sent quotes, closed shifts, credit
+reimbursements) are kept in the default storage under
+``pdf_cache/<kind>/<object id>/<digest>.pdf``.  The digest covers the
+template sources (with their ``extends`` / ``include`` chain), the store's
+invoice config and the document state, so any change of one of them gives
+a new key; the stale file is removed when the new one is written.
+
+Sales and quotes are pre-rendered by the ``core.prerender_document_pdfs``
+task when they become paid / sent (see :mod:`core.signals`), so prints are
+served from the cache.  Disabled with ``PDF_CACHE_ENABLED = False``.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+
+logger = logging.getLogger("boutique")
+
+CACHE_DIR = "pdf_cache"
+CACHED_SALE_STATUSES = ("PAID", "PARTIALLY_PAID", "REFUNDED")
+CACHED_QUOTE_STATUSES = ("SENT", "ACCEPTED", "REFUSED", "EXPIRED", "CONVERTED")
+_TEMPLATE_REF_RE = re.compile(r"""{%\s*(?:extends|include)\s+["']([^"']+)["']""")
+
+
+def enabled() -> bool:
+    return bool(getattr(settings, "PDF_CACHE_ENABLED", True))
+
+
+@lru_cache(maxsize=None)
+def template_digest(template_name: str) -> str:
+    """Hash of *template_name* and the templates it extends or includes."""
+    digest = hashlib.sha256()
+    seen, pending = set(), [template_name]
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        source = get_template(name).template.source
+        digest.update(name.encode())
+        digest.update(source.encode())
+        pending.extend(_TEMPLATE_REF_RE.findall(source))
+    return digest.hexdigest()
+
+
+def document_digest(template_name: str, invoice_config: dict, state) -> str:
+    payload = json.dumps(
+        [getattr(settings, "PDF_CACHE_VERSION", 1), template_digest(template_name), invoice_config, state],
+        default=str,
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def _folder(kind: str, object_id) -> str:
+    return f"{CACHE_DIR}/{kind}/{object_id}"
+
+
+def get_cached(kind: str, object_id, digest: str) -> bytes | None:
+    if not enabled():
+        return None
+    path = f"{_folder(kind, object_id)}/{digest}.pdf"
+    try:
+        if not default_storage.exists(path):
+            return None
+        with default_storage.open(path, "rb") as handle:
+            return handle.read()
+    except Exception:
+        logger.warning("PDF cache read failed for %s", path, exc_info=True)
+        return None
+
+
+def _clear(folder: str, keep: str | None = None) -> None:
+    try:
+        _, files = default_storage.listdir(folder)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        if name != keep:
+            default_storage.delete(f"{folder}/{name}")
+
+
+def store(kind: str, object_id, digest: str, content: bytes) -> None:
+    """Cache *content* under *digest*, dropping older renders of the document."""
+    if not enabled() or not content:
+        return
+    folder = _folder(kind, object_id)
+    path = f"{folder}/{digest}.pdf"
+    try:
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(content))
+        _clear(folder, keep=f"{digest}.pdf")
+    except Exception:
+        logger.warning("PDF cache write failed for %s", path, exc_info=True)
+
+
+def invalidate(kind: str, object_id) -> None:
+    """Drop the cached renders of one document."""
+    if not enabled():
+        return
+    try:
+        _clear(_folder(kind, object_id))
+    except Exception:
+        logger.warning("PDF cache invalidation failed for %s %s", kind, object_id, exc_info=True)
+
+
+def schedule_prerender(kind: str, object_id) -> None:
+    """Render the PDFs of a finished document once the transaction commits."""
+    if not enabled():
+        return
+    from django.db import transaction
+
+    def _queue():
+        from core.tasks import prerender_document_pdfs
+
+        try:
+            prerender_document_pdfs.delay(kind, str(object_id))
+        except Exception:
+            # The first print renders (and caches) the document.
+            logger.warning("PDF pre-render could not be queued for %s %s", kind, object_id, exc_info=True)
+
+    transaction.on_commit(_queue)
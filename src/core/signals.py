@@ -0,0 +1,42 @@
+"""Signals: keep the PDF cache of sales and quotes warm (see :mod:`core.pdf_cache`)."""
+from __future__ import annotations
+
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core import pdf_cache
+
+# Sale fields that do not appear on invoices and receipts: saving only
+# these never changes the rendered documents.
+_UNRENDERED_SALE_FIELDS = frozenset({"stock_decremented", "stock_reserved", "updated_at"})
+
+
+def _invalidate_on_commit(*documents):
+    def _invalidate():
+        for kind, object_id in documents:
+            pdf_cache.invalidate(kind, object_id)
+
+    transaction.on_commit(_invalidate)
+
+
+@receiver(post_save, sender="sales.Sale")
+def sale_saved(sender, instance, created=False, update_fields=None, **kwargs):
+    if not pdf_cache.enabled():
+        return
+    if update_fields is not None and _UNRENDERED_SALE_FIELDS.issuperset(update_fields):
+        return
+    if instance.status in pdf_cache.CACHED_SALE_STATUSES:
+        pdf_cache.schedule_prerender("sale", instance.pk)
+    elif instance.status == "CANCELLED" and not created:
+        _invalidate_on_commit(("invoice", instance.pk), ("receipt", instance.pk))
+
+
+@receiver(post_save, sender="sales.Quote")
+def quote_saved(sender, instance, created=False, **kwargs):
+    if not pdf_cache.enabled():
+        return
+    if instance.status in pdf_cache.CACHED_QUOTE_STATUSES:
+        pdf_cache.schedule_prerender("quote", instance.pk)
+    elif instance.status == "CANCELLED" and not created:
+        _invalidate_on_commit(("quote", instance.pk))
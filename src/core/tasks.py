@@ -1,68 +1,92 @@
-"""Core Celery tasks — database backup."""
+"""Core Celery tasks — database backup, outbox dispatch, background exports, PDF cache."""
 import logging
-import subprocess
-from datetime import datetime
-from pathlib import Path
 
 from celery import shared_task
 from django.conf import settings
 
 logger = logging.getLogger("boutique")
 
-BACKUP_DIR = Path(settings.PROJECT_DIR) / "backups"
-
 
 @shared_task(name="core.backup_database")
 def backup_database():
-    """Dump the PostgreSQL database to a gzipped SQL file.
+    """Dump the PostgreSQL database (see :mod:`core.backup`) and apply the retention policy."""
+    from core.backup import apply_retention, create_backup
 
-    Keeps the last 7 backups and deletes older ones.
-    """
-    BACKUP_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        backup = create_backup()
+    except Exception as exc:
+        logger.exception("Backup failed")
+        return {"status": "error", "message": str(exc)[:500]}
+    removed = apply_retention()
+    return {
+        "status": "ok",
+        "file": str(backup.path),
+        "format": backup.format,
+        "size_mb": round(backup.manifest["size_bytes"] / 1048576, 2),
+        "sha256": backup.manifest.get("sha256", ""),
+        "removed": [old.path.name for old in removed],
+    }
 
-    db = settings.DATABASES["default"]
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"backup_{timestamp}.sql.gz"
-    filepath = BACKUP_DIR / filename
 
-    env = {
-        "PGPASSWORD": db.get("PASSWORD", ""),
-    }
+@shared_task(name="core.dispatch_outbox")
+def dispatch_outbox():
+    """Deliver pending outbox events (see :mod:`core.outbox`)."""
+    from core.outbox import dispatch_pending_events
+
+    return dispatch_pending_events()
+
 
-    cmd = [
-        "pg_dump",
-        "-h", db.get("HOST", "localhost"),
-        "-p", str(db.get("PORT", "5432")),
-        "-U", db.get("USER", "postgres"),
-        "-d", db.get("NAME", "boutique_db"),
-        "--no-owner",
-        "--no-acl",
-    ]
+@shared_task(name="core.run_export_job")
+def run_export_job(job_id):
+    """Write the file of a background export (see :mod:`core.export`)."""
+    from django.utils import timezone
 
+    from core.export import run_export
+    from core.models import ExportJob
+
+    job = ExportJob.objects.filter(pk=job_id, status=ExportJob.Status.PENDING).first()
+    if job is None:
+        return {"status": "skipped"}
     try:
-        import gzip
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            env={**__import__("os").environ, **env},
-            timeout=600,
+        run_export(job)
+    except Exception as exc:
+        logger.exception("Export job %s failed", job_id)
+        ExportJob.objects.filter(pk=job_id).update(
+            status=ExportJob.Status.FAILED,
+            error=str(exc)[:500],
+            finished_at=timezone.now(),
         )
-        if result.returncode != 0:
-            logger.error("pg_dump failed: %s", result.stderr.decode())
-            return {"status": "error", "message": result.stderr.decode()[:500]}
+        return {"status": "error", "message": str(exc)[:500]}
+    return {"status": "ok", "rows": job.processed_rows}
+
+
+@shared_task(name="core.purge_export_jobs")
+def purge_export_jobs():
+    """Delete export jobs (and their files) older than ``EXPORT_RETENTION_DAYS``."""
+    from datetime import timedelta
 
-        with gzip.open(filepath, "wb") as f:
-            f.write(result.stdout)
+    from django.utils import timezone
 
-        logger.info("Database backup created: %s", filepath)
+    from core.models import ExportJob
 
-        # Cleanup: keep last 7 backups
-        backups = sorted(BACKUP_DIR.glob("backup_*.sql.gz"), reverse=True)
-        for old in backups[7:]:
-            old.unlink()
-            logger.info("Deleted old backup: %s", old.name)
+    cutoff = timezone.now() - timedelta(days=settings.EXPORT_RETENTION_DAYS)
+    deleted = 0
+    for job in ExportJob.objects.filter(created_at__lt=cutoff).iterator():
+        if job.file:
+            job.file.delete(save=False)
+        job.delete()
+        deleted += 1
+    return {"deleted": deleted}
 
-        return {"status": "ok", "file": str(filepath), "size_mb": round(filepath.stat().st_size / 1048576, 2)}
+
+@shared_task(name="core.prerender_document_pdfs")
+def prerender_document_pdfs(kind, object_id):
+    """Fill the PDF cache for a paid sale or a sent quote (see :mod:`core.pdf_cache`)."""
+    from core.pdf import prerender_document
+
+    try:
+        return {"status": "ok", "rendered": prerender_document(kind, object_id)}
     except Exception as exc:
-        logger.exception("Backup failed")
+        # The first print renders the document instead.
+        logger.warning("PDF pre-render failed for %s %s", kind, object_id, exc_info=True)
         return {"status": "error", "message": str(exc)[:500]}
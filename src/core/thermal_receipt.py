@@ -0,0 +1,303 @@
+"""Fast 80 mm receipt renderer (ESC/POS and minimal PDF), without WeasyPrint.
+
+The ``TICKET`` / ``COMPACT`` receipts only need text lines, a few rules and
+the verification QR code.  :func:`build_receipt_layout` turns a sale into
+a list of layout rows once; the rows are then written either as an ESC/POS
+byte stream for thermal printers (:func:`layout_to_escpos`) or as a
+one-page PDF in the standard Courier fonts (:func:`layout_to_pdf`), both
+in a few milliseconds.
+
+Stores opt in with ``Store.receipt_renderer = "THERMAL"``; the content
+follows ``templates/pdf/receipt_ticket.html`` and ``receipt_compact.html``.
+Benchmark against WeasyPrint with ``manage.py benchmark_receipts``.
+"""
+from __future__ import annotations
+
+import textwrap
+import zlib
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.utils import timezone
+
+# Layout rows: (kind, *args)
+#   ("text", text, align, bold, large)   align in "left" / "center" / "right"
+#   ("pair", left, right, bold, large)   left and right aligned on one line
+#   ("rule", char)                       full-width separator
+#   ("qr", data)                         verification QR code
+ESCPOS_COLUMNS = 48  # Font A on 80 mm paper (576 dots)
+PDF_COLUMNS = 44
+
+PAGE_WIDTH = 226.77  # 80 mm in points
+PDF_MARGIN = 14.17  # 5 mm
+FONT_SIZE = 7.5
+LARGE_FONT_SIZE = 10.0
+QR_SIZE = 60.0
+
+
+def _money(value) -> str:
+    try:
+        amount = Decimal(str(value or "0"))
+    except Exception:
+        amount = Decimal("0")
+    return str(amount.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def build_receipt_layout(
+    sale,
+    store,
+    *,
+    payments=None,
+    change=0,
+    cashier_name="",
+    template_code="TICKET",
+    invoice_config=None,
+):
+    """Return the layout rows of the receipt of *sale*."""
+    from core.pdf import _build_invoice_config, _build_payment_status_meta
+    from core.verification import build_verify_url
+
+    compact = template_code == "COMPACT"
+    config = invoice_config or _build_invoice_config(store)
+    status_meta = _build_payment_status_meta(sale)
+    currency = getattr(store, "effective_currency", "") or "FCFA"
+    created = timezone.localtime(sale.created_at)
+    seller_name = sale.seller.get_full_name() if sale.seller_id else ""
+    customer = sale.customer if sale.customer_id else None
+
+    rows = []
+    name = config["business_name"] or ""
+    if config.get("legal_form") and not compact:
+        name = f"{name} {config['legal_form']}"
+    rows.append(("text", name.upper(), "center", True, True))
+    if config.get("share_capital") and not compact:
+        rows.append(("text", f"Capital social : {config['share_capital']}", "center", False, False))
+    for value in (config.get("address"), config.get("phone"), config.get("email")):
+        if value:
+            rows.append(("text", value, "center", False, False))
+    legal = " - ".join(
+        part for part in (
+            f"RCCM : {config['registration_number']}" if config.get("registration_number") else "",
+            f"NIF : {config['tax_id']}" if config.get("tax_id") else "",
+        ) if part
+    )
+    if legal:
+        rows.append(("text", legal, "center", False, False))
+    rows.append(("rule", "="))
+    rows.append(("text", "RECU DE PAIEMENT", "center", True, True))
+    rows.append(("text", status_meta["label"], "center", False, False))
+    rows.append(("rule", "="))
+
+    rows.append(("pair", "N°", sale.invoice_number or "", True, False))
+    rows.append(("pair", "Date", created.strftime("%d/%m/%Y %H:%M"), False, False))
+    if not compact:
+        rows.append(("pair", "Vendeur", seller_name, False, False))
+        if cashier_name and cashier_name != seller_name:
+            rows.append(("pair", "Caissier", cashier_name, False, False))
+    walk_in = "Client comptoir" if compact else "Client Comptant"
+    rows.append(("pair", "Client", customer.full_name if customer else walk_in, False, False))
+    if compact and customer is not None and getattr(customer, "tax_id", ""):
+        rows.append(("pair", "NIF client", customer.tax_id, False, False))
+    rows.append(("rule", "-"))
+
+    for item in sale.items.all():
+        rows.append(("text", item.product_name, "left", True, False))
+        detail = f"  {item.quantity} x {_money(item.unit_price)}" if not compact else f"  x{item.quantity}"
+        rows.append(("pair", detail, _money(item.line_total), False, False))
+    rows.append(("rule", "-"))
+
+    rows.append(("pair", "Sous-total", f"{_money(sale.subtotal)} {currency}", False, False))
+    if sale.coupon_code and not compact:
+        rows.append(("pair", f"Coupon {sale.coupon_code}", "OK", False, False))
+    if sale.discount_amount > 0:
+        label = "Remise"
+        if not compact and sale.discount_percent > 0:
+            label = f"Remise ({sale.discount_percent}%)"
+        rows.append(("pair", label, f"-{_money(sale.discount_amount)} {currency}", False, False))
+    if sale.tax_amount > 0 or not compact:
+        rows.append(("pair", "Taxes" if compact else "TVA", f"{_money(sale.tax_amount)} {currency}", False, False))
+    rows.append(("pair", "TOTAL NET" if not compact else "Total", f"{_money(sale.total)} {currency}", True, True))
+    rows.append(("rule", "-"))
+
+    for payment in payments if payments is not None else sale.payments.all():
+        rows.append(("pair", payment.get_method_display(), f"{_money(payment.amount)} {currency}", False, False))
+    if change and Decimal(str(change)) > 0:
+        rows.append(("pair", "Monnaie rendue", f"{_money(change)} {currency}", False, False))
+
+    token = getattr(sale, "verification_token", None)
+    if token:
+        url = build_verify_url(token)
+        rows.append(("rule", "-"))
+        rows.append(("qr", url))
+        if not compact:
+            rows.append(("text", "Scannez pour verifier ce recu", "center", False, False))
+        if getattr(sale, "verification_hash", ""):
+            rows.append(("text", sale.verification_hash, "center", True, False))
+        rows.append(("text", url, "center", False, False))
+
+    rows.append(("rule", "="))
+    rows.append(("text", config.get("footer") or "Merci pour votre confiance.", "center", True, False))
+    if not compact:
+        rows.append(("text", name, "center", False, False))
+    rows.append(("text", "Piece justificative de caisse - SYSCOHADA", "center", False, False))
+    rows.append(("text", timezone.localtime().strftime("%d/%m/%Y %H:%M"), "center", False, False))
+    return rows
+
+
+def _lines(rows, columns, large_columns):
+    """Yield ``(text, bold, large, align, qr)`` per printed line.
+
+    *large_columns* is the line width in the large font; ``qr`` is set
+    (and ``text`` None) for the QR code row.
+    """
+    for row in rows:
+        kind = row[0]
+        if kind == "rule":
+            yield row[1] * columns, False, False, "left", None
+        elif kind == "qr":
+            yield None, False, False, "center", row[1]
+        elif kind == "text":
+            _, text, align, bold, large = row
+            for line in textwrap.wrap(str(text), large_columns if large else columns) or [""]:
+                yield line, bold, large, align, None
+        else:
+            _, left, right, bold, large = row
+            width = large_columns if large else columns
+            right = str(right)[:width]
+            room = max(1, width - len(right) - 1)
+            left_lines = textwrap.wrap(str(left), room) or [""]
+            for line in left_lines[:-1]:
+                yield line, bold, large, "left", None
+            yield f"{left_lines[-1]:<{room}} {right:>{width - room - 1}}", bold, large, "left", None
+
+
+# ---------------------------------------------------------------------------
+# ESC/POS
+# ---------------------------------------------------------------------------
+
+ESC, GS = b"\x1b", b"\x1d"
+_ALIGN = {"left": 0, "center": 1, "right": 2}
+
+
+def _escpos_qr(data: str) -> bytes:
+    payload = data.encode("ascii", "replace")
+    size = len(payload) + 3
+    return b"".join([
+        GS + b"(k\x04\x00\x31\x41\x32\x00",  # model 2
+        GS + b"(k\x03\x00\x31\x43\x06",  # module size 6 dots
+        GS + b"(k\x03\x00\x31\x45\x31",  # error correction M
+        GS + b"(k" + bytes([size % 256, size // 256]) + b"\x31\x50\x30" + payload,
+        GS + b"(k\x03\x00\x31\x51\x30",  # print
+    ])
+
+
+def layout_to_escpos(rows, columns: int = ESCPOS_COLUMNS) -> bytes:
+    """ESC/POS byte stream (code page 858) for the layout *rows*."""
+    out = [ESC + b"@", ESC + b"t\x13"]
+    # Large text is printed double width.
+    for text, bold, large, align, qr in _lines(rows, columns, columns // 2):
+        out.append(ESC + b"a" + bytes([_ALIGN[align]]))
+        if qr is not None:
+            out.append(_escpos_qr(qr) + b"\n")
+            continue
+        out.append(ESC + b"E" + (b"\x01" if bold else b"\x00"))
+        out.append(GS + b"!" + (b"\x11" if large else b"\x00"))
+        out.append(text.encode("cp858", "replace") + b"\n")
+    out.append(ESC + b"E\x00" + GS + b"!\x00" + ESC + b"a\x00")
+    out.append(ESC + b"d\x04" + GS + b"V\x42\x00")  # feed and partial cut
+    return b"".join(out)
+
+
+# ---------------------------------------------------------------------------
+# PDF
+# ---------------------------------------------------------------------------
+
+def _pdf_text(text: str) -> bytes:
+    raw = text.encode("cp1252", "replace")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _qr_path(data: str, x: float, top: float) -> bytes:
+    import qrcode
+
+    qr = qrcode.QRCode(border=0, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(data)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    module = QR_SIZE / len(matrix)
+    ops = []
+    for row_index, row in enumerate(matrix):
+        y = top - (row_index + 1) * module
+        col = 0
+        while col < len(row):
+            if not row[col]:
+                col += 1
+                continue
+            start = col
+            while col < len(row) and row[col]:
+                col += 1
+            ops.append(f"{x + start * module:.2f} {y:.2f} {(col - start) * module:.2f} {module:.2f} re")
+    return ("\n".join(ops) + "\nf\n").encode()
+
+
+def layout_to_pdf(rows, columns: int = PDF_COLUMNS) -> bytes:
+    """One-page 80 mm PDF (Courier, no embedded font) for the layout *rows*."""
+    lines = list(_lines(rows, columns, int(columns * FONT_SIZE / LARGE_FONT_SIZE)))
+    usable = PAGE_WIDTH - 2 * PDF_MARGIN
+    height = 2 * PDF_MARGIN + sum(
+        QR_SIZE + 4 if qr is not None else (LARGE_FONT_SIZE if large else FONT_SIZE) * 1.3
+        for _, _, large, _, qr in lines
+    )
+
+    stream = []
+    y = height - PDF_MARGIN
+    for text, bold, large, align, qr in lines:
+        if qr is not None:
+            stream.append(_qr_path(qr, PDF_MARGIN + (usable - QR_SIZE) / 2, y - 2))
+            y -= QR_SIZE + 4
+            continue
+        size = LARGE_FONT_SIZE if large else FONT_SIZE
+        y -= size * 1.3
+        advance = len(text) * size * 0.6
+        if align == "center":
+            x = PDF_MARGIN + max(0.0, (usable - advance) / 2)
+        elif align == "right":
+            x = PDF_MARGIN + max(0.0, usable - advance)
+        else:
+            x = PDF_MARGIN
+        font = b"/F2" if bold else b"/F1"
+        stream.append(
+            b"BT " + font + f" {size} Tf {x:.2f} {y + size * 0.25:.2f} Td (".encode()
+            + _pdf_text(text) + b") Tj ET\n"
+        )
+    content = zlib.compress(b"".join(stream))
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH:.2f} {height:.2f}] "
+            "/Resources << /Font << /F1 4 0 R /F2 5 0 R >> >> /Contents 6 0 R >>"
+        ).encode(),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier-Bold /Encoding /WinAnsiEncoding >>",
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
+
+
+def render_receipt_escpos(sale, store, **options) -> bytes:
+    return layout_to_escpos(build_receipt_layout(sale, store, **options))
+
+
+def render_receipt_pdf(sale, store, **options) -> bytes:
+    return layout_to_pdf(build_receipt_layout(sale, store, **options))
@@ -3,7 +3,9 @@
 Core design principles:
 - PostgreSQL advisory locks prevent race conditions (no SELECT FOR UPDATE needed)
 - JSONB tier_snapshot freezes tier data at computation time
-- Incremental computation: queries aggregate from raw Payment records
+- Full computation aggregates raw Payment/Refund/Sale records; business
+  events apply O(1) deltas instead (:meth:`apply_delta`), and a periodic
+  full computation reconciles any drift
 - Projection: daily_rate x remaining_days for next-tier estimate
 """
 from __future__ import annotations
@@ -14,10 +16,14 @@ from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 from typing import TYPE_CHECKING
 
-from django.db.models import Count, Q, Sum
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Greatest
 
 from django.db import connection, transaction
 from django.utils import timezone
+from django.utils.functional import cached_property
+
+from core.dates import date_range_filter, local_today, month_filter, store_timezone
 
 if TYPE_CHECKING:
     from objectives.models import ObjectiveTier, SellerMonthlyStats
@@ -31,6 +37,11 @@ class ObjectiveCalculationEngine:
     def __init__(self, store_id: str) -> None:
         self.store_id = store_id
 
+    @cached_property
+    def tz(self):
+        """Enterprise timezone delimiting the store's business days."""
+        return store_timezone(self.store_id)
+
     # ------------------------------------------------------------------
     # Public API
     # ------------------------------------------------------------------
@@ -48,10 +59,7 @@ class ObjectiveCalculationEngine:
         (another task is already processing the same row).
         """
         # Late imports to avoid circular deps
-        from objectives.models import (
-            SellerMonthlyStats,
-            SellerPenalty,
-        )
+        from objectives.models import SellerMonthlyStats
 
         lock_key = self._make_lock_key(seller_id, period)
 
@@ -78,24 +86,7 @@ class ObjectiveCalculationEngine:
             # Fetch the active rule for this store + period
             rule = self._get_active_rule(period)
             if rule is None:
-                logger.info(
-                    "No active ObjectiveRule for store=%s period=%s — resetting stats",
-                    self.store_id,
-                    period,
-                )
-                # Reset any existing stats so the seller dashboard reflects the deletion.
-                SellerMonthlyStats.objects.filter(
-                    store_id=self.store_id,
-                    seller_id=seller_id,
-                    period=period,
-                ).update(
-                    current_tier_rank=0,
-                    current_tier_name="",
-                    bonus_earned=Decimal("0"),
-                    tier_snapshot=[],
-                    last_trigger=trigger,
-                    computed_at=timezone.now(),
-                )
+                self._reset_standing(seller_id, period, trigger)
                 return None
 
             tiers = list(rule.tiers.order_by("rank"))
@@ -103,85 +94,88 @@ class ObjectiveCalculationEngine:
             # Aggregate raw financials from Payment records
             financials = self._aggregate_financials(seller_id, period)
 
-            gross = financials["gross"]
-            refunds = financials["refunds"]
-            net = gross - refunds
-            sale_count = financials["sale_count"]
-            cancellation_count = financials["cancellation_count"]
-            avg_basket = (net / sale_count) if sale_count > 0 else Decimal("0")
-            credit_recovered = financials["credit_recovered"]
-
-            # Determine tier
-            reached_tier = self._determine_tier(net, tiers)
-
-            # Apply active penalties
             stats_obj, _ = SellerMonthlyStats.objects.get_or_create(
                 store_id=self.store_id,
                 seller_id=seller_id,
                 period=period,
             )
+            stats_obj.gross_amount = financials["gross"]
+            stats_obj.refund_amount = financials["refunds"]
+            stats_obj.sale_count = financials["sale_count"]
+            stats_obj.cancellation_count = financials["cancellation_count"]
+            stats_obj.credit_recovered = financials["credit_recovered"]
+            self._apply_standing(stats_obj, tiers, trigger)
 
-            active_penalties = SellerPenalty.objects.filter(
-                stats=stats_obj,
-                is_void=False,
-            )
-            total_deduction = sum(
-                p.amount for p in active_penalties
-                if p.penalty_type.mode == "DEDUCTION"
-            )
-            hard_cap_ranks = [
-                p.penalty_type.cap_tier_rank
-                for p in active_penalties
-                if p.penalty_type.mode == "HARD_CAP"
-                and p.penalty_type.cap_tier_rank is not None
-            ]
-            if hard_cap_ranks and reached_tier:
-                max_allowed_rank = min(hard_cap_ranks)
-                if reached_tier.rank > max_allowed_rank:
-                    capped_tiers = [t for t in tiers if t.rank == max_allowed_rank]
-                    if capped_tiers:
-                        reached_tier = capped_tiers[0]
-                    else:
-                        logger.warning(
-                            "HARD_CAP penalty references tier rank %s which does not exist "
-                            "in rule for store %s — seller %s bonus set to 0.",
-                            max_allowed_rank, self.store_id, seller_id,
-                        )
-                        reached_tier = None
-
-            # Recompute bonus after HARD_CAP adjustments to keep tier/bonus consistent.
-            bonus = self._compute_bonus(net, reached_tier)
-            final_bonus = max(Decimal("0"), bonus - total_deduction)
-
-            # Build tier snapshot (frozen JSONB)
-            tier_snapshot = [
-                {
-                    "rank": t.rank,
-                    "name": t.name,
-                    "threshold": str(t.threshold),
-                    "bonus_amount": str(t.bonus_amount),
-                    "bonus_rate": str(t.bonus_rate),
-                    "color": t.color,
-                    "icon": t.icon,
-                }
-                for t in tiers
-            ]
-
-            # Persist
-            stats_obj.gross_amount = gross
-            stats_obj.refund_amount = refunds
-            stats_obj.sale_count = sale_count
-            stats_obj.cancellation_count = cancellation_count
-            stats_obj.avg_basket = avg_basket
-            stats_obj.credit_recovered = credit_recovered
-            stats_obj.current_tier_rank = reached_tier.rank if reached_tier else 0
-            stats_obj.current_tier_name = reached_tier.name if reached_tier else ""
-            stats_obj.bonus_earned = final_bonus
-            stats_obj.tier_snapshot = tier_snapshot
-            stats_obj.last_trigger = trigger
-            stats_obj.computed_at = timezone.now()
-            stats_obj.save()
+            return stats_obj
 
+    def apply_delta(
+        self,
+        seller_id: str,
+        period: str,
+        *,
+        gross: Decimal = Decimal("0"),
+        refunds: Decimal = Decimal("0"),
+        credit: Decimal = Decimal("0"),
+        sales: int = 0,
+        cancellations: int = 0,
+    ) -> bool:
+        """
+        Add one business event's contribution to the seller's stats row.
+
+        A single UPDATE, meant to run in the event's own transaction so the
+        delta is applied exactly once.  Tier and bonus are left to
+        :meth:`refresh_standing`.  Returns False when the row does not exist
+        yet (the caller must then run :meth:`compute_for_seller`).
+        """
+        from objectives.models import SellerMonthlyStats
+
+        changes = {}
+        for field, delta in (
+            ("gross_amount", gross),
+            ("refund_amount", refunds),
+            ("credit_recovered", credit),
+        ):
+            if delta:
+                changes[field] = F(field) + Value(Decimal(delta))
+        for field, delta in (("sale_count", sales), ("cancellation_count", cancellations)):
+            if delta:
+                changes[field] = Greatest(F(field) + Value(int(delta)), Value(0))
+
+        stats = SellerMonthlyStats.objects.filter(
+            store_id=self.store_id,
+            seller_id=seller_id,
+            period=period,
+        )
+        if not changes:
+            return stats.exists()
+        return bool(stats.update(**changes, last_trigger="PAYMENT"))
+
+    def refresh_standing(
+        self,
+        seller_id: str,
+        period: str,
+        trigger: str = "PAYMENT",
+    ) -> SellerMonthlyStats | None:
+        """
+        Re-derive basket, tier and bonus from the stored financials.
+
+        No raw-record aggregation: used after :meth:`apply_delta`.
+        """
+        from objectives.models import SellerMonthlyStats
+
+        with transaction.atomic():
+            stats_obj = (
+                SellerMonthlyStats.objects.select_for_update()
+                .filter(store_id=self.store_id, seller_id=seller_id, period=period)
+                .first()
+            )
+            if stats_obj is None:
+                return None
+            rule = self._get_active_rule(period)
+            if rule is None:
+                self._reset_standing(seller_id, period, trigger)
+                return None
+            self._apply_standing(stats_obj, list(rule.tiers.order_by("rank")), trigger)
             return stats_obj
 
     def compute_projection(self, stats: SellerMonthlyStats, period: str) -> dict:
@@ -237,6 +231,96 @@ class ObjectiveCalculationEngine:
     # Internal helpers
     # ------------------------------------------------------------------
 
+    def _reset_standing(self, seller_id: str, period: str, trigger: str) -> None:
+        from objectives.models import SellerMonthlyStats
+
+        logger.info(
+            "No active ObjectiveRule for store=%s period=%s — resetting stats",
+            self.store_id,
+            period,
+        )
+        # Reset any existing stats so the seller dashboard reflects the deletion.
+        SellerMonthlyStats.objects.filter(
+            store_id=self.store_id,
+            seller_id=seller_id,
+            period=period,
+        ).update(
+            current_tier_rank=0,
+            current_tier_name="",
+            bonus_earned=Decimal("0"),
+            tier_snapshot=[],
+            last_trigger=trigger,
+            computed_at=timezone.now(),
+        )
+
+    def _apply_standing(self, stats_obj: SellerMonthlyStats, tiers: list, trigger: str) -> None:
+        """Derive basket, tier, penalties and bonus of *stats_obj*, then save it."""
+        from objectives.models import SellerPenalty
+
+        net = stats_obj.gross_amount - stats_obj.refund_amount
+        sale_count = stats_obj.sale_count
+        avg_basket = (net / sale_count) if sale_count > 0 else Decimal("0")
+
+        # Determine tier
+        reached_tier = self._determine_tier(net, tiers)
+
+        # Apply active penalties
+        active_penalties = SellerPenalty.objects.filter(
+            stats=stats_obj,
+            is_void=False,
+        )
+        total_deduction = sum(
+            p.amount for p in active_penalties
+            if p.penalty_type.mode == "DEDUCTION"
+        )
+        hard_cap_ranks = [
+            p.penalty_type.cap_tier_rank
+            for p in active_penalties
+            if p.penalty_type.mode == "HARD_CAP"
+            and p.penalty_type.cap_tier_rank is not None
+        ]
+        if hard_cap_ranks and reached_tier:
+            max_allowed_rank = min(hard_cap_ranks)
+            if reached_tier.rank > max_allowed_rank:
+                capped_tiers = [t for t in tiers if t.rank == max_allowed_rank]
+                if capped_tiers:
+                    reached_tier = capped_tiers[0]
+                else:
+                    logger.warning(
+                        "HARD_CAP penalty references tier rank %s which does not exist "
+                        "in rule for store %s — seller %s bonus set to 0.",
+                        max_allowed_rank, self.store_id, stats_obj.seller_id,
+                    )
+                    reached_tier = None
+
+        # Recompute bonus after HARD_CAP adjustments to keep tier/bonus consistent.
+        bonus = self._compute_bonus(net, reached_tier)
+        final_bonus = max(Decimal("0"), bonus - total_deduction)
+
+        # Build tier snapshot (frozen JSONB)
+        tier_snapshot = [
+            {
+                "rank": t.rank,
+                "name": t.name,
+                "threshold": str(t.threshold),
+                "bonus_amount": str(t.bonus_amount),
+                "bonus_rate": str(t.bonus_rate),
+                "color": t.color,
+                "icon": t.icon,
+            }
+            for t in tiers
+        ]
+
+        # Persist
+        stats_obj.avg_basket = avg_basket
+        stats_obj.current_tier_rank = reached_tier.rank if reached_tier else 0
+        stats_obj.current_tier_name = reached_tier.name if reached_tier else ""
+        stats_obj.bonus_earned = final_bonus
+        stats_obj.tier_snapshot = tier_snapshot
+        stats_obj.last_trigger = trigger
+        stats_obj.computed_at = timezone.now()
+        stats_obj.save()
+
     def _make_lock_key(self, seller_id: str, period: str) -> int:
         raw = f"{seller_id}:{period}:{self.store_id}"
         hex_digest = hashlib.md5(raw.encode()).hexdigest()[:8]
@@ -275,8 +359,7 @@ class ObjectiveCalculationEngine:
         payments = Payment.objects.filter(
             store_id=self.store_id,
             sale__seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         )
 
         agg = payments.aggregate(total=Sum("amount"))
@@ -286,8 +369,7 @@ class ObjectiveCalculationEngine:
         refund_agg = Refund.objects.filter(
             store_id=self.store_id,
             sale__seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         ).aggregate(total=Sum("amount"))
         refunds = refund_agg["total"] or Decimal("0")
 
@@ -295,8 +377,7 @@ class ObjectiveCalculationEngine:
         sale_agg = Sale.objects.filter(
             store_id=self.store_id,
             seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         ).aggregate(
             completed=Count(
                 "id",
@@ -391,23 +472,20 @@ class ObjectiveCalculationEngine:
         payments = Payment.objects.filter(
             store_id=self.store_id,
             sale__seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         )
         agg = payments.aggregate(total=Sum("amount"))
         gross = float(agg["total"] or 0)
         refund_agg = Refund.objects.filter(
             store_id=self.store_id,
             sale__seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         ).aggregate(total=Sum("amount"))
         refunds = float(refund_agg["total"] or 0)
         sales_qs = Sale.objects.filter(
             store_id=self.store_id,
             seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         )
         from django.db.models import Avg
         discount_agg = sales_qs.exclude(status=Sale.Status.CANCELLED).aggregate(avg_discount=Avg("discount_percent"))
@@ -538,8 +616,7 @@ class ObjectiveCalculationEngine:
             store_id=self.store_id,
             sale__seller_id=seller_id,
             sale__submitted_at__isnull=False,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         ).annotate(
             delay=ExpressionWrapper(
                 F("created_at") - F("sale__submitted_at"),
@@ -558,16 +635,15 @@ class ObjectiveCalculationEngine:
         result = Sale.objects.filter(
             store_id=self.store_id,
             seller_id=seller_id,
-            created_at__year=year,
-            created_at__month=month,
+            **month_filter("created_at", year, month, tz=self.tz),
         ).exclude(status=Sale.Status.CANCELLED).aggregate(avg=Avg("discount_percent"))
         return float(result["avg"] or 0)
 
     def compute_multi_period_ranking(self, period, me_id):
         from cashier.models import Payment
         from django.db.models import Sum, Count
-        from datetime import date, timedelta
-        today = date.today()
+        from datetime import timedelta
+        today = local_today(self.tz)
         week_start = today - timedelta(days=today.weekday())
 
         def _build_ranking(qs_filter):
@@ -593,9 +669,9 @@ class ObjectiveCalculationEngine:
             return result
 
         year, month = int(period[:4]), int(period[5:7])
-        day_ranking = _build_ranking({"created_at__date": today})
-        week_ranking = _build_ranking({"created_at__date__gte": week_start})
-        month_ranking = _build_ranking({"created_at__year": year, "created_at__month": month})
+        day_ranking = _build_ranking(date_range_filter("created_at", today, today, tz=self.tz))
+        week_ranking = _build_ranking(date_range_filter("created_at", week_start, tz=self.tz))
+        month_ranking = _build_ranking(month_filter("created_at", year, month, tz=self.tz))
 
         def _gap_message(ranking):
             my_entry = next((e for e in ranking if e["is_me"]), None)
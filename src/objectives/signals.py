@@ -1,19 +1,37 @@
-"""Signals: trigger objective recomputation on payments/sales/refunds."""
+"""Signals: keep seller objective stats current on payments/sales/refunds.
+
+Each event applies its delta to ``SellerMonthlyStats`` (see
+``ObjectiveCalculationEngine.apply_delta``); full recomputes only build a
+missing row, follow edits, and run in the periodic reconciliation.
+"""
 from __future__ import annotations
 
 import logging
+from decimal import Decimal
+
 from django.db import transaction
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.utils import timezone
 
+from core.dates import store_timezone
+from core.outbox import outbox_enabled_for_store, outbox_handler, publish_event
+
 logger = logging.getLogger(__name__)
 
+# Sale statuses counted in ``SellerMonthlyStats.sale_count``.
+COUNTED_SALE_STATUSES = ("PAID", "PARTIALLY_PAID")
 
-def _get_period(dt) -> str:
+
+def _get_period(dt, store=None) -> str:
+    """Month ``YYYY-MM`` of *dt* in the store's local time, as recomputes count it."""
     if dt is None:
         dt = timezone.now()
-    return dt.strftime("%Y-%m")
+    return timezone.localtime(dt, store_timezone(store)).strftime("%Y-%m")
+
+
+def _sale_store(sale):
+    return getattr(sale, "store", None) if sale else None
 
 
 def _recompute_now(*, store_id, seller_id, period: str) -> None:
@@ -28,64 +46,123 @@ def _recompute_now(*, store_id, seller_id, period: str) -> None:
     )
 
 
-def _queue_recompute(*, store_id, seller_id, period: str, sync_recompute: bool = True) -> None:
-    def _dispatch() -> None:
-        queued = False
+def _queue_recompute(*, store_id, seller_id, period: str) -> None:
+    def _recompute() -> None:
         try:
-            from objectives.tasks import recompute_seller_objective
-
-            recompute_seller_objective.delay(
-                store_id=str(store_id),
-                seller_id=str(seller_id),
+            _recompute_now(
+                store_id=store_id,
+                seller_id=seller_id,
                 period=period,
             )
-            queued = True
         except Exception as exc:
-            logger.warning("objectives async dispatch failed: %s", exc, exc_info=True)
-
-        if sync_recompute:
-            # Keep seller metrics up-to-date even when workers are unavailable.
-            try:
-                _recompute_now(
-                    store_id=store_id,
-                    seller_id=seller_id,
-                    period=period,
-                )
-            except Exception as exc:
-                # Never let a signal crash a business transaction.
-                level = logger.warning if queued else logger.error
-                level("objectives sync recompute failed: %s", exc, exc_info=True)
-
-    # Queue after DB commit so worker reads committed payment/sale state.
-    # Fallback to immediate dispatch in contexts where no DB transaction/
+            # Never let a signal crash a business transaction; the periodic
+            # reconciliation catches up.
+            logger.error("objectives recompute failed: %s", exc, exc_info=True)
+
+    # Recompute after DB commit so it reads committed payment/sale state.
+    # Fallback to immediate run in contexts where no DB transaction/
     # connection is available (e.g. lightweight unit tests).
     try:
-        transaction.on_commit(_dispatch)
+        transaction.on_commit(_recompute)
     except Exception:
-        _dispatch()
+        _recompute()
+
+
+def _refresh_standing_on_commit(*, store_id, seller_id, period: str) -> None:
+    def _refresh() -> None:
+        from objectives.engine import ObjectiveCalculationEngine
+
+        try:
+            ObjectiveCalculationEngine(store_id=str(store_id)).refresh_standing(
+                seller_id=str(seller_id),
+                period=period,
+            )
+        except Exception as exc:
+            logger.warning("objectives standing refresh failed: %s", exc, exc_info=True)
+
+    transaction.on_commit(_refresh)
+
+
+@outbox_handler("objectives.recompute_seller")
+def handle_recompute_seller(payload):
+    _recompute_now(
+        store_id=payload["store_id"],
+        seller_id=payload["seller_id"],
+        period=payload["period"],
+    )
 
 
 def _queue_for_sale(sale, *, period: str) -> None:
+    """Schedule a full recompute of the sale's seller for *period*."""
     if not sale or not getattr(sale, "seller_id", None):
         return
-    sync_recompute = bool(getattr(sale, "pk", None))
+    store = getattr(sale, "store", None)
+    if getattr(sale, "pk", None) and outbox_enabled_for_store(store):
+        # Coalesce: one pending recompute per seller and month.
+        key = f"{sale.store_id}:{sale.seller_id}:{period}"
+        publish_event(
+            "objectives.recompute_seller",
+            aggregate_key=f"objectives.seller:{key}",
+            payload={
+                "store_id": str(sale.store_id),
+                "seller_id": str(sale.seller_id),
+                "period": period,
+            },
+            store=store,
+            dedupe_key=f"objectives.recompute_seller:{key}",
+        )
+        return
     _queue_recompute(
         store_id=sale.store_id,
         seller_id=sale.seller_id,
         period=period,
-        sync_recompute=sync_recompute,
     )
 
 
+def _apply_delta(sale, *, period: str, **changes) -> None:
+    """Add one event's contribution to the seller's stats, in its transaction.
+
+    The UPDATE commits or rolls back with the business change, so each
+    event counts exactly once; tier and bonus are refreshed after commit.
+    When the seller has no stats row for *period* yet, a full recompute
+    builds it instead.
+    """
+    if not sale or not getattr(sale, "seller_id", None):
+        return
+    from objectives.engine import ObjectiveCalculationEngine
+
+    engine = ObjectiveCalculationEngine(store_id=str(sale.store_id))
+    if engine.apply_delta(str(sale.seller_id), period, **changes):
+        _refresh_standing_on_commit(store_id=sale.store_id, seller_id=sale.seller_id, period=period)
+    else:
+        _queue_for_sale(sale, period=period)
+
+
+def _payment_changes(payment, sign: int) -> dict:
+    amount = sign * (payment.amount or Decimal("0"))
+    changes = {"gross": amount}
+    if payment.method == "CREDIT":
+        changes["credit"] = amount
+    return changes
+
+
 @receiver(post_save, sender="cashier.Payment")
-def on_payment_saved(sender, instance, **kwargs):
+def on_payment_saved(sender, instance, created=True, **kwargs):
     # Objectives are anchored on money-in date, not sale creation date.
-    _queue_for_sale(instance.sale, period=_get_period(instance.created_at))
+    period = _get_period(instance.created_at, _sale_store(instance.sale))
+    if created:
+        _apply_delta(instance.sale, period=period, **_payment_changes(instance, 1))
+    else:
+        # Edited payment: the previous amount is unknown, recompute.
+        _queue_for_sale(instance.sale, period=period)
 
 
 @receiver(post_delete, sender="cashier.Payment")
 def on_payment_deleted(sender, instance, **kwargs):
-    _queue_for_sale(instance.sale, period=_get_period(instance.created_at))
+    _apply_delta(
+        instance.sale,
+        period=_get_period(instance.created_at, _sale_store(instance.sale)),
+        **_payment_changes(instance, -1))
 
 
 @receiver(pre_save, sender="sales.Sale")
@@ -100,29 +177,38 @@ def on_sale_pre_save(sender, instance, **kwargs):
 
 @receiver(post_save, sender="sales.Sale")
 def on_sale_saved(sender, instance, created, **kwargs):
-    """Recompute on cancellation, which impacts cancellation_count."""
-    if created:
-        return
-    previous_status = getattr(instance, "_previous_status", None)
+    """Count completed and cancelled sales on status transitions."""
+    previous_status = None if created else getattr(instance, "_previous_status", None)
     if previous_status == instance.status:
         return
-    if instance.status != "CANCELLED":
-        return
-    # Recompute for the current period (when the cancellation actually happens)
-    now_period = _get_period(timezone.now())
-    _queue_for_sale(instance, period=now_period)
-    # Also recompute for the sale's original period if it differs
-    sale_period = _get_period(instance.created_at)
-    if sale_period != now_period:
-        _queue_for_sale(instance, period=sale_period)
+    changes = {}
+    was_counted = previous_status in COUNTED_SALE_STATUSES
+    is_counted = instance.status in COUNTED_SALE_STATUSES
+    if was_counted != is_counted:
+        changes["sales"] = 1 if is_counted else -1
+    was_cancelled = previous_status == "CANCELLED"
+    is_cancelled = instance.status == "CANCELLED"
+    if was_cancelled != is_cancelled:
+        changes["cancellations"] = 1 if is_cancelled else -1
+    if changes:
+        # Sale counts are anchored on the sale creation date.
+        _apply_delta(instance, period=_get_period(instance.created_at, _sale_store(instance)), **changes)
 
 
 @receiver(post_save, sender="sales.Refund")
-def on_refund_saved(sender, instance, **kwargs):
+def on_refund_saved(sender, instance, created=True, **kwargs):
     # Refunds are anchored on refund processing date.
-    _queue_for_sale(instance.sale, period=_get_period(instance.created_at))
+    period = _get_period(instance.created_at, _sale_store(instance.sale))
+    if created:
+        _apply_delta(instance.sale, period=period, refunds=instance.amount or Decimal("0"))
+    else:
+        _queue_for_sale(instance.sale, period=period)
 
 
 @receiver(post_delete, sender="sales.Refund")
 def on_refund_deleted(sender, instance, **kwargs):
-    _queue_for_sale(instance.sale, period=_get_period(instance.created_at))
+    _apply_delta(
+        instance.sale,
+        period=_get_period(instance.created_at, _sale_store(instance.sale)),
+        refunds=-(instance.amount or Decimal("0")),
+    )
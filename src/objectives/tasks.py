@@ -21,8 +21,10 @@ def recompute_seller_objective(self, *, store_id: str, seller_id: str, period: s
             trigger="PAYMENT",
         )
         if result is None:
-            # Lock not acquired — schedule a retry
-            raise self.retry(countdown=5)
+            # Another recompute holds the row (or no active rule): its result
+            # stands, and deltas plus the reconciliation keep it current.
+            logger.debug("Skipped objectives recompute for seller=%s period=%s", seller_id, period)
+            return
         logger.info("Recomputed objectives for seller=%s period=%s", seller_id, period)
     except Exception as exc:
         logger.exception("recompute_seller_objective failed: %s", exc)
@@ -56,6 +58,49 @@ def recompute_store_month(*, store_id: str, period: str):
     )
 
 
+@shared_task
+def reconcile_seller_stats(period: str | None = None):
+    """
+    Scheduled (Celery Beat). Full recompute of open seller stats rows.
+
+    Events keep SellerMonthlyStats current through deltas; this corrects any
+    drift (bulk updates, deleted sales, races with a recompute) for the
+    current and previous month, or for *period* only.
+    """
+    from objectives.engine import ObjectiveCalculationEngine
+    from objectives.models import SellerMonthlyStats
+
+    if period:
+        periods = [period]
+    else:
+        today = date.today()
+        previous = date(today.year - 1, 12, 1) if today.month == 1 else date(today.year, today.month - 1, 1)
+        periods = [f"{today.year}-{today.month:02d}", f"{previous.year}-{previous.month:02d}"]
+
+    fields = ("gross_amount", "refund_amount", "sale_count", "cancellation_count", "credit_recovered")
+    rows = SellerMonthlyStats.objects.filter(period__in=periods, is_final=False).values_list(
+        "store_id", "seller_id", "period", *fields,
+    )
+    engines = {}
+    checked = drifted = 0
+    for store_id, seller_id, row_period, *before in rows:
+        engine = engines.setdefault(store_id, ObjectiveCalculationEngine(store_id=str(store_id)))
+        stats = engine.compute_for_seller(
+            seller_id=str(seller_id),
+            period=row_period,
+            trigger="SCHEDULED",
+        )
+        checked += 1
+        if stats is not None and [getattr(stats, field) for field in fields] != before:
+            drifted += 1
+            logger.warning(
+                "Seller stats drift corrected store=%s seller=%s period=%s",
+                store_id, seller_id, row_period,
+            )
+    logger.info("Reconciled %d seller stats rows (%d drifted)", checked, drifted)
+    return {"checked": checked, "drifted": drifted}
+
+
 @shared_task
 def close_month_objectives():
     """
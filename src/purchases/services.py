@@ -7,8 +7,8 @@ from decimal import Decimal, InvalidOperation
 from django.db import models, transaction
 from django.utils import timezone
 
-from stock.services import adjust_stock
-from stores.models import Sequence
+from stock.services import adjust_stock_many
+from stores.numbering import next_document_number
 from stores.services import create_audit_log
 
 from .models import GoodsReceipt, GoodsReceiptLine, PurchaseOrder, PurchaseOrderLine, Supplier
@@ -25,25 +25,14 @@ def _safe_decimal(value, default: str = "0.00") -> Decimal:
         return Decimal(default)
 
 
-def _get_or_create_sequence(store, prefix: str) -> Sequence:
-    current_year = timezone.now().year
-    sequence, _created = Sequence.objects.get_or_create(
-        store=store,
-        prefix=prefix,
-        year=current_year,
-        defaults={"next_number": 1},
-    )
-    return sequence
-
-
 def generate_purchase_order_number(store) -> str:
     """Generate next purchase order number (PO-STORE-YYYY-000001)."""
-    return _get_or_create_sequence(store, "PO").generate_next()
+    return next_document_number(store, "PO")
 
 
 def generate_goods_receipt_number(store) -> str:
     """Generate next goods receipt number (BR-STORE-YYYY-000001)."""
-    return _get_or_create_sequence(store, "BR").generate_next()
+    return next_document_number(store, "BR")
 
 
 def _validate_order_lines(store, lines: list[dict]) -> list[dict]:
@@ -310,13 +299,21 @@ def receive_goods(
         notes=notes,
     )
 
-    received_lines = 0
+    line_ids = [entry["purchase_order_line_id"] for entry in lines]
+    pols_by_id = {
+        str(pol.pk): pol
+        for pol in purchase_order.lines.select_for_update()
+        .select_related("product")
+        .filter(pk__in=line_ids)
+        .order_by("pk")
+    }
+
+    receipt_lines = []
+    stock_lines = []
     for entry in lines:
-        pol = (
-            purchase_order.lines.select_for_update()
-            .select_related("product")
-            .get(pk=entry["purchase_order_line_id"])
-        )
+        pol = pols_by_id.get(str(entry["purchase_order_line_id"]))
+        if pol is None:
+            raise ValueError("Ligne de bon de commande introuvable.")
 
         qty = int(entry["quantity_received"])
         if qty <= 0:
@@ -325,32 +322,54 @@ def receive_goods(
         if qty > remaining:
             raise ValueError("La quantite recue depasse la quantite restante.")
 
-        GoodsReceiptLine.objects.create(
-            receipt=receipt,
-            purchase_order_line=pol,
-            quantity_received=qty,
+        receipt_lines.append(
+            GoodsReceiptLine(
+                receipt=receipt,
+                purchase_order_line=pol,
+                quantity_received=qty,
+            )
         )
-        received_lines += 1
-
         pol.quantity_received += qty
-        pol.save(update_fields=["quantity_received", "updated_at"])
-
-        adjust_stock(
-            store=purchase_order.store,
-            product=pol.product,
-            qty_delta=qty,
-            movement_type="PURCHASE",
-            reason=f"Reception achat {purchase_order.po_number}",
-            actor=actor,
-            reference=receipt.receipt_number,
-            unit_cost=pol.unit_cost,
+        stock_lines.append(
+            {
+                "store": purchase_order.store,
+                "product": pol.product,
+                "qty_delta": qty,
+                "movement_type": "PURCHASE",
+                "reason": f"Reception achat {purchase_order.po_number}",
+                "reference": receipt.receipt_number,
+                "unit_cost": pol.unit_cost,
+            }
         )
+    received_lines = len(receipt_lines)
+
+    if receipt_lines:
+        now = timezone.now()
+        touched_pols = {str(line.purchase_order_line_id): line.purchase_order_line for line in receipt_lines}
+        for pol in touched_pols.values():
+            pol.updated_at = now
+        GoodsReceiptLine.objects.bulk_create(receipt_lines)
+        PurchaseOrderLine.objects.bulk_update(
+            list(touched_pols.values()),
+            ["quantity_received", "updated_at"],
+        )
+
+        adjust_stock_many(stock_lines, actor=actor)
 
         # Keep the product default cost aligned with latest supplier cost.
-        latest_unit_cost = _safe_decimal(pol.unit_cost).quantize(Decimal("0.01"))
-        if _safe_decimal(pol.product.cost_price) != latest_unit_cost:
-            pol.product.cost_price = latest_unit_cost
-            pol.product.save(update_fields=["cost_price", "updated_at"])
+        repriced_products = {}
+        for pol in touched_pols.values():
+            latest_unit_cost = _safe_decimal(pol.unit_cost).quantize(Decimal("0.01"))
+            if _safe_decimal(pol.product.cost_price) != latest_unit_cost:
+                pol.product.cost_price = latest_unit_cost
+                pol.product.updated_at = now
+                repriced_products[pol.product.pk] = pol.product
+        if repriced_products:
+            from catalog.models import Product
+            Product.objects.bulk_update(
+                list(repriced_products.values()),
+                ["cost_price", "updated_at"],
+            )
 
     if received_lines == 0:
         raise ValueError("Aucune ligne de reception valide.")
@@ -0,0 +1,61 @@
+"""Rebuild sales rollups from raw sales, lines and refunds."""
+
+from __future__ import annotations
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+
+from core.dates import date_range_filter, local_today, store_timezone
+from reports.models import SalesDailyRollup
+from reports.rollups import rebuild_sales_rollups
+from sales.models import Refund, Sale
+from stores.models import Store
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild store x day / product / seller / hour sales rollups. "
+        "Only days with sales, refunds or existing rollup rows are rebuilt."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--store", default="", help="Process only one store id (optional).")
+        parser.add_argument("--date-from", default="", help="First local date (YYYY-MM-DD, optional).")
+        parser.add_argument("--date-to", default="", help="Last local date (YYYY-MM-DD, default: today).")
+
+    def handle(self, *args, **options):
+        try:
+            date_from = date.fromisoformat(options["date_from"]) if options["date_from"] else None
+            date_to = date.fromisoformat(options["date_to"]) if options["date_to"] else None
+        except ValueError as exc:
+            raise CommandError(f"Invalid date: {exc}") from exc
+
+        stores = Store.objects.select_related("enterprise").order_by("name")
+        if options["store"]:
+            stores = stores.filter(pk=options["store"])
+
+        total_days = 0
+        for store in stores:
+            tz = store_timezone(store)
+            last_day = date_to or local_today(tz)
+            days = set(
+                SalesDailyRollup.objects.filter(store=store, date__lte=last_day)
+                .filter(**({"date__gte": date_from} if date_from else {}))
+                .values_list("date", flat=True)
+            )
+            for model in (Sale, Refund):
+                days.update(
+                    model.objects.filter(store=store, **date_range_filter("created_at", date_from, last_day, tz=tz))
+                    .annotate(day=TruncDate("created_at", tzinfo=tz))
+                    .order_by()
+                    .values_list("day", flat=True)
+                    .distinct()
+                )
+            for day in sorted(days):
+                rebuild_sales_rollups(store.pk, day, tz=tz)
+            total_days += len(days)
+            self.stdout.write(f"{store.name}: {len(days)} day(s) rebuilt")
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_days} store-day(s) rebuilt."))
@@ -0,0 +1,104 @@
+# Generated by Django 5.1.15 on 2026-10-16 22:29
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('catalog', '0006_pricingpolicy_pricingrule_productvariant'),
+        ('reports', '0001_initial'),
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='date')),
+                ('orders', models.IntegerField(default=0, verbose_name='nombre de ventes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="chiffre d'affaires")),
+                ('discounts', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='remises')),
+                ('line_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total lignes')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='cout des ventes')),
+                ('items_sold', models.IntegerField(default=0, verbose_name='articles vendus')),
+                ('refunds', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='remboursements')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily_rollups', to='stores.store', verbose_name='boutique')),
+            ],
+            options={
+                'verbose_name': 'Cumul journalier des ventes',
+                'verbose_name_plural': 'Cumuls journaliers des ventes',
+                'ordering': ['-date'],
+                'unique_together': {('store', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesHourlyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='date')),
+                ('hour', models.PositiveSmallIntegerField(verbose_name='heure')),
+                ('orders', models.IntegerField(default=0, verbose_name='nombre de ventes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="chiffre d'affaires")),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_hourly_rollups', to='stores.store', verbose_name='boutique')),
+            ],
+            options={
+                'verbose_name': 'Cumul horaire des ventes',
+                'verbose_name_plural': 'Cumuls horaires des ventes',
+                'ordering': ['-date', 'hour'],
+                'unique_together': {('store', 'date', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesProductDailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='date')),
+                ('product_name', models.CharField(blank=True, default='', max_length=255, verbose_name='nom produit')),
+                ('quantity', models.IntegerField(default=0, verbose_name='quantite')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="chiffre d'affaires")),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='cout des ventes')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='catalog.product', verbose_name='produit')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_product_rollups', to='stores.store', verbose_name='boutique')),
+            ],
+            options={
+                'verbose_name': 'Cumul journalier par produit',
+                'verbose_name_plural': 'Cumuls journaliers par produit',
+                'ordering': ['-date', '-revenue'],
+                'unique_together': {('store', 'date', 'product')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesSellerDailyRollup',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(verbose_name='date')),
+                ('orders', models.IntegerField(default=0, verbose_name='nombre de ventes')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name="chiffre d'affaires")),
+                ('discounts', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='remises')),
+                ('line_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='total lignes')),
+                ('cost', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='cout des ventes')),
+                ('seller', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL, verbose_name='vendeur')),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_seller_rollups', to='stores.store', verbose_name='boutique')),
+            ],
+            options={
+                'verbose_name': 'Cumul journalier par vendeur',
+                'verbose_name_plural': 'Cumuls journaliers par vendeur',
+                'ordering': ['-date', '-revenue'],
+                'unique_together': {('store', 'date', 'seller')},
+            },
+        ),
+    ]
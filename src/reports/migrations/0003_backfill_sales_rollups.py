@@ -0,0 +1,140 @@
+import zoneinfo
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, DecimalField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+
+# Frozen copy of the rules of reports.rollups at the time of this migration.
+PAID_STATUSES = ("PAID", "PARTIALLY_PAID")
+ZERO = 0
+
+
+def _money(expression):
+    return Coalesce(expression, Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _timezone(name):
+    try:
+        return zoneinfo.ZoneInfo(name or settings.TIME_ZONE)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        return zoneinfo.ZoneInfo(settings.TIME_ZONE)
+
+
+def backfill_sales_rollups(apps, schema_editor):
+    """Build the rollups of every existing sale and refund.
+
+    A handful of grouped queries per store, on the historical models; the
+    store's existing rollup rows are replaced.
+    """
+    Refund = apps.get_model("sales", "Refund")
+    Sale = apps.get_model("sales", "Sale")
+    SaleItem = apps.get_model("sales", "SaleItem")
+    Store = apps.get_model("stores", "Store")
+    SalesDailyRollup = apps.get_model("reports", "SalesDailyRollup")
+    SalesHourlyRollup = apps.get_model("reports", "SalesHourlyRollup")
+    SalesProductDailyRollup = apps.get_model("reports", "SalesProductDailyRollup")
+    SalesSellerDailyRollup = apps.get_model("reports", "SalesSellerDailyRollup")
+
+    line_cost = _money(Sum(F("cost_price") * F("quantity")))
+
+    for store in Store.objects.select_related("enterprise").order_by("pk"):
+        tz = _timezone(store.enterprise.timezone)
+        sales = (
+            Sale.objects.filter(store=store, status__in=PAID_STATUSES)
+            .annotate(day=TruncDate("created_at", tzinfo=tz))
+            .order_by()
+        )
+        items = (
+            SaleItem.objects.filter(sale__store=store, sale__status__in=PAID_STATUSES)
+            .annotate(day=TruncDate("sale__created_at", tzinfo=tz))
+            .order_by()
+        )
+
+        daily = {}
+        for row in sales.values("day").annotate(
+            n=Count("id"), amount=_money(Sum("total")), discount=_money(Sum("discount_amount")),
+        ):
+            daily[row["day"]] = {"orders": row["n"], "revenue": row["amount"], "discounts": row["discount"]}
+        for row in items.values("day").annotate(
+            amount=_money(Sum("line_total")), line_cost=line_cost, units=Coalesce(Sum("quantity"), Value(0)),
+        ):
+            daily.setdefault(row["day"], {}).update(
+                line_revenue=row["amount"], cost=row["line_cost"], items_sold=row["units"],
+            )
+        for row in (
+            Refund.objects.filter(store=store)
+            .annotate(day=TruncDate("created_at", tzinfo=tz))
+            .order_by()
+            .values("day")
+            .annotate(amount=_money(Sum("amount")))
+        ):
+            daily.setdefault(row["day"], {})["refunds"] = row["amount"]
+
+        sellers = {}
+        for row in sales.values("day", "seller_id").annotate(
+            n=Count("id"), amount=_money(Sum("total")), discount=_money(Sum("discount_amount")),
+        ):
+            sellers[(row["day"], row["seller_id"])] = {
+                "orders": row["n"], "revenue": row["amount"], "discounts": row["discount"],
+            }
+        for row in items.values("day", "sale__seller_id").annotate(
+            amount=_money(Sum("line_total")), line_cost=line_cost,
+        ):
+            sellers.setdefault((row["day"], row["sale__seller_id"]), {}).update(
+                line_revenue=row["amount"], cost=row["line_cost"],
+            )
+
+        products = [
+            SalesProductDailyRollup(
+                store=store,
+                date=row["day"],
+                product_id=row["product_id"],
+                product_name=row["name"] or "",
+                quantity=row["units"],
+                revenue=row["amount"],
+                cost=row["line_cost"],
+            )
+            for row in items.values("day", "product_id").annotate(
+                name=Max("product_name"),
+                units=Coalesce(Sum("quantity"), Value(0)),
+                amount=_money(Sum("line_total")),
+                line_cost=line_cost,
+            )
+        ]
+        hours = [
+            SalesHourlyRollup(
+                store=store, date=row["day"], hour=row["hour"], orders=row["n"], revenue=row["amount"],
+            )
+            for row in sales.annotate(hour=ExtractHour("created_at", tzinfo=tz)).values("day", "hour").annotate(
+                n=Count("id"), amount=_money(Sum("total")),
+            )
+        ]
+
+        for model in (SalesDailyRollup, SalesSellerDailyRollup, SalesProductDailyRollup, SalesHourlyRollup):
+            model.objects.filter(store=store).delete()
+        SalesDailyRollup.objects.bulk_create(
+            [SalesDailyRollup(store=store, date=day, **values) for day, values in daily.items()],
+            batch_size=500,
+        )
+        SalesSellerDailyRollup.objects.bulk_create(
+            [
+                SalesSellerDailyRollup(store=store, date=day, seller_id=seller_id, **values)
+                for (day, seller_id), values in sellers.items()
+            ],
+            batch_size=500,
+        )
+        SalesProductDailyRollup.objects.bulk_create(products, batch_size=500)
+        SalesHourlyRollup.objects.bulk_create(hours, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reports', '0002_sales_rollups'),
+        ('sales', '0012_sales_time_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sales_rollups, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 """Models for the reports app."""
+from django.conf import settings
 from django.db import models
 
 from core.models import TimeStampedModel
@@ -86,3 +87,131 @@ class KPISnapshot(TimeStampedModel):
 
     def __str__(self):
         return f"KPI {self.store} — {self.date}"
+
+
+# ---------------------------------------------------------------------------
+# Sales rollups (maintained by reports.rollups)
+# ---------------------------------------------------------------------------
+
+def _amount(label):
+    return models.DecimalField(label, max_digits=14, decimal_places=2, default=0)
+
+
+class SalesDailyRollup(TimeStampedModel):
+    """Paid sales of a store on one local business day.
+
+    Sales are bucketed on their creation day, refunds on the day they were
+    processed.  ``reports.rollups`` applies each sale, line or refund
+    event as a delta and rebuilds a (store, day) bucket that has no row yet.
+    """
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="sales_daily_rollups",
+        verbose_name="boutique",
+    )
+    date = models.DateField("date")
+    orders = models.IntegerField("nombre de ventes", default=0)
+    revenue = _amount("chiffre d'affaires")
+    discounts = _amount("remises")
+    line_revenue = _amount("total lignes")
+    cost = _amount("cout des ventes")
+    items_sold = models.IntegerField("articles vendus", default=0)
+    refunds = _amount("remboursements")
+
+    class Meta:
+        verbose_name = "Cumul journalier des ventes"
+        verbose_name_plural = "Cumuls journaliers des ventes"
+        ordering = ["-date"]
+        unique_together = [["store", "date"]]
+
+    def __str__(self):
+        return f"Ventes {self.store} — {self.date}"
+
+
+class SalesProductDailyRollup(TimeStampedModel):
+    """Paid sale lines of one product in a store on one local day."""
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="sales_product_rollups",
+        verbose_name="boutique",
+    )
+    date = models.DateField("date")
+    product = models.ForeignKey(
+        "catalog.Product",
+        on_delete=models.CASCADE,
+        related_name="sales_rollups",
+        verbose_name="produit",
+    )
+    product_name = models.CharField("nom produit", max_length=255, blank=True, default="")
+    quantity = models.IntegerField("quantite", default=0)
+    revenue = _amount("chiffre d'affaires")
+    cost = _amount("cout des ventes")
+
+    class Meta:
+        verbose_name = "Cumul journalier par produit"
+        verbose_name_plural = "Cumuls journaliers par produit"
+        ordering = ["-date", "-revenue"]
+        unique_together = [["store", "date", "product"]]
+
+    def __str__(self):
+        return f"{self.product_name} {self.store} — {self.date}"
+
+
+class SalesSellerDailyRollup(TimeStampedModel):
+    """Paid sales of one seller in a store on one local day."""
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="sales_seller_rollups",
+        verbose_name="boutique",
+    )
+    date = models.DateField("date")
+    seller = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="sales_rollups",
+        verbose_name="vendeur",
+    )
+    orders = models.IntegerField("nombre de ventes", default=0)
+    revenue = _amount("chiffre d'affaires")
+    discounts = _amount("remises")
+    line_revenue = _amount("total lignes")
+    cost = _amount("cout des ventes")
+
+    class Meta:
+        verbose_name = "Cumul journalier par vendeur"
+        verbose_name_plural = "Cumuls journaliers par vendeur"
+        ordering = ["-date", "-revenue"]
+        unique_together = [["store", "date", "seller"]]
+
+    def __str__(self):
+        return f"Ventes {self.seller_id} {self.store} — {self.date}"
+
+
+class SalesHourlyRollup(TimeStampedModel):
+    """Paid sales of a store within one local hour."""
+
+    store = models.ForeignKey(
+        "stores.Store",
+        on_delete=models.CASCADE,
+        related_name="sales_hourly_rollups",
+        verbose_name="boutique",
+    )
+    date = models.DateField("date")
+    hour = models.PositiveSmallIntegerField("heure")
+    orders = models.IntegerField("nombre de ventes", default=0)
+    revenue = _amount("chiffre d'affaires")
+
+    class Meta:
+        verbose_name = "Cumul horaire des ventes"
+        verbose_name_plural = "Cumuls horaires des ventes"
+        ordering = ["-date", "hour"]
+        unique_together = [["store", "date", "hour"]]
+
+    def __str__(self):
+        return f"Ventes {self.store} — {self.date} {self.hour:02d}h"
@@ -0,0 +1,442 @@
+"""Sales rollups at store x day, x product, x seller and x hour grain.
+
+Report and KPI services sum ``reports.models.Sales*Rollup`` rows instead of
+re-aggregating ``Sale``/``SaleItem``/``Refund`` rows, so the cost of a
+dashboard depends on the number of days it covers, not on sales volume.
+
+A rollup bucket is one store and one local business day (enterprise
+timezone, see :mod:`core.dates`).  Rollups are maintained incrementally:
+
+- ``reports.signals`` applies each event's signed delta (a sale entering or
+  leaving the paid statuses, an edit of a paid sale or of one of its lines,
+  a refund) to the bucket rows, in the event's own transaction.
+  ``cashier.services`` reports the FIFO line costs it writes in bulk with
+  :func:`apply_line_changes`.
+- A bucket without its daily row has never been built: the event then
+  schedules :func:`rebuild_sales_rollups`, which recomputes every grain of
+  the bucket from raw rows and is idempotent.  Through the outbox, rebuilds
+  of the same bucket are coalesced and run after commit; stores without the
+  outbox rebuild in-request.
+- ``reports.tasks.daily_kpi_snapshot`` rebuilds yesterday's buckets and
+  ``manage.py backfill_sales_rollups`` rebuilds any range.  Existing history
+  is built by the ``0003`` data migration (a frozen copy of these rules).
+"""
+from __future__ import annotations
+
+import logging
+from collections import Counter, defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, ExtractHour
+from django.utils import timezone
+
+from core.dates import date_range, store_timezone
+from core.outbox import outbox_enabled_for_store, outbox_handler, publish_event
+
+logger = logging.getLogger("boutique")
+
+ZERO = Decimal("0.00")
+
+# Sales counted in rollups.
+PAID_STATUSES = ("PAID", "PARTIALLY_PAID")
+# Statuses whose transitions change rollups (entering or leaving PAID_STATUSES).
+ROLLUP_STATUSES = PAID_STATUSES + ("REFUNDED", "CANCELLED")
+
+
+def _money(expression):
+    return Coalesce(expression, Value(ZERO), output_field=DecimalField(max_digits=14, decimal_places=2))
+
+
+def _line_cost():
+    return _money(Sum(F("cost_price") * F("quantity")))
+
+
+def _upsert(model, rows, key_field, *, store_id, day, update_fields) -> None:
+    """Write *rows* for one bucket and drop the bucket's other rows."""
+    stale = model.objects.filter(store_id=store_id, date=day)
+    if key_field:
+        stale = stale.exclude(**{f"{key_field}__in": [getattr(row, key_field) for row in rows]})
+    elif rows:
+        stale = stale.none()
+    stale.delete()
+    if rows:
+        unique_fields = ["store", "date"] + ([key_field.removesuffix("_id")] if key_field else [])
+        model.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=unique_fields,
+            update_fields=update_fields + ["updated_at"],
+        )
+
+
+def rebuild_sales_rollups(store_id, day: date, *, tz=None) -> None:
+    """Recompute every rollup grain of *store_id* for local *day*."""
+    from reports.models import (
+        SalesDailyRollup,
+        SalesHourlyRollup,
+        SalesProductDailyRollup,
+        SalesSellerDailyRollup,
+    )
+    from sales.models import Refund, Sale, SaleItem
+
+    tz = tz or store_timezone(store_id)
+    start, end = date_range(day, day, tz)
+    sales = Sale.objects.filter(
+        store_id=store_id,
+        status__in=PAID_STATUSES,
+        created_at__gte=start,
+        created_at__lt=end,
+    ).order_by()
+    items = SaleItem.objects.filter(sale__in=sales.values("pk")).order_by()
+
+    totals = sales.aggregate(
+        orders=Count("id"),
+        revenue=_money(Sum("total")),
+        discounts=_money(Sum("discount_amount")),
+    )
+    item_totals = items.aggregate(
+        line_revenue=_money(Sum("line_total")),
+        cost=_line_cost(),
+        items_sold=Coalesce(Sum("quantity"), Value(0)),
+    )
+    refunds = Refund.objects.filter(
+        store_id=store_id, created_at__gte=start, created_at__lt=end,
+    ).aggregate(total=_money(Sum("amount")))["total"]
+
+    item_rows = {
+        row["sale__seller_id"]: row
+        for row in items.values("sale__seller_id").annotate(line_revenue=_money(Sum("line_total")), cost=_line_cost())
+    }
+    seller_rows = [
+        SalesSellerDailyRollup(
+            store_id=store_id,
+            date=day,
+            seller_id=row["seller_id"],
+            orders=row["orders"],
+            revenue=row["revenue"],
+            discounts=row["discounts"],
+            line_revenue=item_rows.get(row["seller_id"], {}).get("line_revenue", ZERO),
+            cost=item_rows.get(row["seller_id"], {}).get("cost", ZERO),
+        )
+        for row in sales.values("seller_id").annotate(
+            orders=Count("id"),
+            revenue=_money(Sum("total")),
+            discounts=_money(Sum("discount_amount")),
+        )
+    ]
+    product_rows = [
+        SalesProductDailyRollup(
+            store_id=store_id,
+            date=day,
+            product_id=row["product_id"],
+            product_name=row["name"] or "",
+            quantity=row["units"],
+            revenue=row["revenue"],
+            cost=row["cost"],
+        )
+        for row in items.values("product_id").annotate(
+            name=Max("product_name"),
+            units=Coalesce(Sum("quantity"), Value(0)),
+            revenue=_money(Sum("line_total")),
+            cost=_line_cost(),
+        )
+    ]
+    hourly_rows = [
+        SalesHourlyRollup(store_id=store_id, date=day, hour=row["hour"], orders=row["orders"], revenue=row["revenue"])
+        for row in sales.annotate(hour=ExtractHour("created_at", tzinfo=tz)).values("hour").annotate(
+            orders=Count("id"), revenue=_money(Sum("total")),
+        )
+    ]
+    daily_rows = []
+    if totals["orders"] or refunds:
+        daily_rows.append(
+            SalesDailyRollup(store_id=store_id, date=day, refunds=refunds, **totals, **item_totals)
+        )
+
+    with transaction.atomic():
+        _upsert(
+            SalesDailyRollup, daily_rows, None, store_id=store_id, day=day,
+            update_fields=["orders", "revenue", "discounts", "line_revenue", "cost", "items_sold", "refunds"],
+        )
+        _upsert(
+            SalesSellerDailyRollup, seller_rows, "seller_id", store_id=store_id, day=day,
+            update_fields=["orders", "revenue", "discounts", "line_revenue", "cost"],
+        )
+        _upsert(
+            SalesProductDailyRollup, product_rows, "product_id", store_id=store_id, day=day,
+            update_fields=["product_name", "quantity", "revenue", "cost"],
+        )
+        _upsert(
+            SalesHourlyRollup, hourly_rows, "hour", store_id=store_id, day=day,
+            update_fields=["orders", "revenue"],
+        )
+
+
+@outbox_handler("reports.refresh_sales_rollups")
+def handle_refresh_sales_rollups(payload):
+    rebuild_sales_rollups(payload["store_id"], date.fromisoformat(payload["day"]))
+
+
+def _refresh_bucket(store, day: date) -> None:
+    """Rebuild the bucket of *store* for local *day* (after commit with the outbox)."""
+    if outbox_enabled_for_store(store):
+        key = f"{store.pk}:{day.isoformat()}"
+        publish_event(
+            "reports.refresh_sales_rollups",
+            aggregate_key=f"reports.rollup:{key}",
+            payload={"store_id": str(store.pk), "day": day.isoformat()},
+            store=store,
+            dedupe_key=f"reports.refresh_sales_rollups:{key}",
+        )
+        return
+
+    try:
+        with transaction.atomic():
+            rebuild_sales_rollups(store.pk, day)
+    except Exception:
+        # Never let a rollup failure break the sale; the nightly rebuild
+        # (or the backfill command) repairs the bucket.
+        logger.warning("Sales rollup refresh failed for %s on %s", store.pk, day, exc_info=True)
+
+
+def schedule_rollup_refresh(store, moment) -> None:
+    """Rebuild the bucket of *store* containing the datetime *moment*."""
+    if store is None or moment is None:
+        return
+    _refresh_bucket(store, timezone.localtime(moment, store_timezone(store)).date())
+
+
+# ---------------------------------------------------------------------------
+# Incremental maintenance
+# ---------------------------------------------------------------------------
+
+def sale_rollup_state(sale) -> dict:
+    """The fields of *sale* that its rollup contribution depends on."""
+    return {
+        "counted": sale.status in PAID_STATUSES,
+        "total": sale.total or ZERO,
+        "discount_amount": sale.discount_amount or ZERO,
+        "seller_id": sale.seller_id,
+        "created_at": sale.created_at,
+    }
+
+
+def line_rollup_values(item) -> dict:
+    """The contribution of one sale line to the line-level rollup fields."""
+    return {
+        "product_id": item.product_id,
+        "product_name": item.product_name or "",
+        "quantity": item.quantity or 0,
+        "line_total": item.line_total or ZERO,
+        "cost": (item.cost_price or ZERO) * (item.quantity or 0),
+    }
+
+
+def _sale_lines(sale_id) -> list[dict]:
+    """:func:`line_rollup_values` of *sale_id*'s lines, one per product."""
+    from sales.models import SaleItem
+
+    return [
+        {
+            "product_id": row["product_id"],
+            "product_name": row["name"] or "",
+            "quantity": row["units"],
+            "line_total": row["revenue"],
+            "cost": row["line_cost"],
+        }
+        for row in SaleItem.objects.filter(sale_id=sale_id).order_by().values("product_id").annotate(
+            name=Max("product_name"),
+            units=Coalesce(Sum("quantity"), Value(0)),
+            revenue=_money(Sum("line_total")),
+            line_cost=_line_cost(),
+        )
+    ]
+
+
+class _BucketDelta:
+    """Signed changes to the rows of one (store, day) bucket."""
+
+    def __init__(self):
+        self.daily = Counter()
+        self.sellers = defaultdict(Counter)
+        self.products = defaultdict(Counter)
+        self.product_names = {}
+        self.hours = defaultdict(Counter)
+        self.shrinks = False
+
+    def add_sale(self, state: dict, sign: int, tz) -> None:
+        """Sale-level fields: orders, revenue and discounts."""
+        self.shrinks |= sign < 0
+        revenue, discounts = sign * state["total"], sign * state["discount_amount"]
+        for row in (self.daily, self.sellers[state["seller_id"]]):
+            row["orders"] += sign
+            row["revenue"] += revenue
+            row["discounts"] += discounts
+        hour = self.hours[timezone.localtime(state["created_at"], tz).hour]
+        hour["orders"] += sign
+        hour["revenue"] += revenue
+
+    def add_lines(self, lines, seller_id, sign: int) -> None:
+        """Line-level fields: line revenue, cost, units and product rows."""
+        self.shrinks |= sign < 0
+        seller = self.sellers[seller_id]
+        for line in lines:
+            line_total, cost = sign * line["line_total"], sign * line["cost"]
+            for row in (self.daily, seller):
+                row["line_revenue"] += line_total
+                row["cost"] += cost
+            self.daily["items_sold"] += sign * line["quantity"]
+            product = self.products[line["product_id"]]
+            product["quantity"] += sign * line["quantity"]
+            product["revenue"] += line_total
+            product["cost"] += cost
+            self.product_names[line["product_id"]] = line["product_name"]
+
+
+def _changes(deltas: Counter) -> dict:
+    return {field: F(field) + Value(delta) for field, delta in deltas.items() if delta}
+
+
+def _add(model, key: dict, deltas: Counter, **defaults) -> None:
+    """Add *deltas* to the row at *key*, creating it first if needed."""
+    changes = _changes(deltas)
+    if not changes:
+        return
+    rows = model.objects.filter(**key)
+    if not rows.update(**changes, updated_at=timezone.now()):
+        model.objects.bulk_create([model(**key, **defaults)], ignore_conflicts=True)
+        rows.update(**changes, updated_at=timezone.now())
+
+
+def _apply(store, day: date, delta: _BucketDelta) -> None:
+    """Apply *delta* to the bucket of *store* for *day*, in the caller's transaction.
+
+    When the bucket has no daily row yet it is rebuilt instead, so that a
+    delta never lands on a partial bucket.
+    """
+    from reports.models import (
+        SalesDailyRollup,
+        SalesHourlyRollup,
+        SalesProductDailyRollup,
+        SalesSellerDailyRollup,
+    )
+
+    daily = SalesDailyRollup.objects.filter(store=store, date=day)
+    changes = _changes(delta.daily)
+    if not (daily.update(**changes, updated_at=timezone.now()) if changes else daily.exists()):
+        _refresh_bucket(store, day)
+        return
+
+    bucket = {"store": store, "date": day}
+    for seller_id, deltas in delta.sellers.items():
+        _add(SalesSellerDailyRollup, {**bucket, "seller_id": seller_id}, deltas)
+    for product_id, deltas in delta.products.items():
+        _add(
+            SalesProductDailyRollup, {**bucket, "product_id": product_id}, deltas,
+            product_name=delta.product_names[product_id],
+        )
+    for hour, deltas in delta.hours.items():
+        _add(SalesHourlyRollup, {**bucket, "hour": hour}, deltas)
+
+    if delta.shrinks:
+        # Drop rows left empty, as a rebuild would.
+        daily.filter(orders__lte=0, refunds__lte=0).delete()
+        SalesSellerDailyRollup.objects.filter(**bucket, orders__lte=0).delete()
+        SalesProductDailyRollup.objects.filter(**bucket, quantity__lte=0).delete()
+        SalesHourlyRollup.objects.filter(**bucket, orders__lte=0).delete()
+
+
+def apply_sale_change(sale, before: dict | None, after: dict | None = None) -> None:
+    """Move *sale*'s contribution from its *before* state to its *after* one.
+
+    States are :func:`sale_rollup_state` values: *before* as it was in the
+    database (None for a new sale), *after* defaults to *sale* itself.  Lines only move when the sale enters or leaves the paid
+    statuses or changes day or seller; line edits go through
+    :func:`apply_line_changes`.
+    """
+    after = after or sale_rollup_state(sale)
+    before = before or {**after, "counted": False}
+    if before == after or not (before["counted"] or after["counted"]):
+        return
+
+    tz = store_timezone(sale.store)
+
+    def day_of(state):
+        return timezone.localtime(state["created_at"], tz).date()
+
+    move_lines = (
+        before["counted"] != after["counted"]
+        or day_of(before) != day_of(after)
+        or before["seller_id"] != after["seller_id"]
+    )
+    lines = _sale_lines(sale.pk) if move_lines else []
+    buckets = defaultdict(_BucketDelta)
+    for state, sign in ((before, -1), (after, 1)):
+        if not state["counted"]:
+            continue
+        delta = buckets[day_of(state)]
+        delta.add_sale(state, sign, tz)
+        if move_lines:
+            delta.add_lines(lines, state["seller_id"], sign)
+    for day, delta in buckets.items():
+        _apply(sale.store, day, delta)
+
+
+def apply_line_changes(sale, changes) -> None:
+    """Apply line edits of *sale*: ``(before, after)`` pairs of :func:`line_rollup_values`.
+
+    ``before`` is None for an added line, ``after`` for a removed one.  Lines
+    of unpaid sales are not counted and are ignored.
+    """
+    if sale.status not in PAID_STATUSES:
+        return
+    delta = _BucketDelta()
+    for before, after in changes:
+        if before == after:
+            continue
+        if before:
+            delta.add_lines([before], sale.seller_id, -1)
+        if after:
+            delta.add_lines([after], sale.seller_id, 1)
+    if delta.products:
+        day = timezone.localtime(sale.created_at, store_timezone(sale.store)).date()
+        _apply(sale.store, day, delta)
+
+
+def apply_refund_change(refund, sign: int) -> None:
+    """Add (``sign=1``) or remove (``sign=-1``) *refund* from its bucket."""
+    delta = _BucketDelta()
+    delta.daily["refunds"] += sign * (refund.amount or ZERO)
+    delta.shrinks = sign < 0
+    day = timezone.localtime(refund.created_at, store_timezone(refund.store)).date()
+    _apply(refund.store, day, delta)
+
+
+def sales_rollup_totals(store, date_from: date, date_to: date) -> dict:
+    """Sum the store x day rollups of *store* over local dates (inclusive).
+
+    Returns ``orders``, ``revenue``, ``discounts``, ``line_revenue``,
+    ``cost``, ``items_sold``, ``refunds``, ``gross_margin`` and
+    ``avg_basket``.
+    """
+    from reports.models import SalesDailyRollup
+
+    totals = SalesDailyRollup.objects.filter(
+        store=store, date__gte=date_from, date__lte=date_to,
+    ).aggregate(
+        orders=Coalesce(Sum("orders"), Value(0)),
+        revenue=_money(Sum("revenue")),
+        discounts=_money(Sum("discounts")),
+        line_revenue=_money(Sum("line_revenue")),
+        cost=_money(Sum("cost")),
+        items_sold=Coalesce(Sum("items_sold"), Value(0)),
+        refunds=_money(Sum("refunds")),
+    )
+    totals["gross_margin"] = totals["line_revenue"] - totals["cost"]
+    totals["avg_basket"] = (
+        (totals["revenue"] / totals["orders"]).quantize(Decimal("0.01")) if totals["orders"] else ZERO
+    )
+    return totals
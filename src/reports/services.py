@@ -9,15 +9,17 @@ from datetime import date, timedelta
 from decimal import Decimal
 
 from django.db.models import (
-    Avg,
     Count,
     F,
     Sum,
     Value,
 )
-from django.db.models.functions import Coalesce, ExtractHour, TruncDate
+from django.db.models.functions import Coalesce
 from django.http import HttpResponse
 
+from core.dates import date_range_filter, local_today, store_timezone
+from reports.rollups import sales_rollup_totals
+
 logger = logging.getLogger("boutique")
 
 
@@ -28,74 +30,39 @@ logger = logging.getLogger("boutique")
 def get_dashboard_kpis(store, date_from=None, date_to=None):
     """Return a dict of key performance indicators for *store*.
 
-    When *date_from* and *date_to* are ``None`` the function calculates
-    today's figures from live data.  When they are supplied it queries
-    the ``KPISnapshot`` table for the given range.
+    Sales, margin, refund and top-product figures are summed from the
+    sales rollups (see ``reports.rollups``) over *date_from*..*date_to*,
+    which default to today.
     """
-    from sales.models import Sale, SaleItem, Refund
+    from reports.models import SalesProductDailyRollup
+    from sales.models import Sale
     from stock.models import ProductStock
 
-    today = date.today()
+    tz = store_timezone(store)
+    today = local_today(tz)
 
     if date_from is None:
         date_from = today
     if date_to is None:
         date_to = today
 
-    # -- Sales for the period --
-    paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
-    sales_qs = Sale.objects.filter(
-        store=store,
-        status__in=paid_statuses,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    )
-
-    sales_agg = sales_qs.aggregate(
-        total_sales=Coalesce(Sum("total"), Value(Decimal("0.00"))),
-        total_orders=Count("id"),
-        avg_basket=Coalesce(Avg("total"), Value(Decimal("0.00"))),
-        total_discounts=Coalesce(Sum("discount_amount"), Value(Decimal("0.00"))),
-    )
-
-    today_sales = sales_agg["total_sales"]
-    today_orders = sales_agg["total_orders"]
-    today_avg_basket = sales_agg["avg_basket"]
-    total_discounts = sales_agg["total_discounts"]
-
-    # -- Gross margin --
-    items_qs = SaleItem.objects.filter(
-        sale__store=store,
-        sale__status__in=paid_statuses,
-        sale__created_at__date__gte=date_from,
-        sale__created_at__date__lte=date_to,
-    )
-    margin_agg = items_qs.aggregate(
-        total_revenue=Coalesce(Sum("line_total"), Value(Decimal("0.00"))),
-        total_cost=Coalesce(
-            Sum(F("cost_price") * F("quantity")),
-            Value(Decimal("0.00")),
-        ),
-    )
-    gross_margin = margin_agg["total_revenue"] - margin_agg["total_cost"]
-
-    # -- Refunds --
-    refunds_agg = Refund.objects.filter(
-        store=store,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    ).aggregate(
-        total_refunds=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
-    )
-    total_refunds = refunds_agg["total_refunds"]
+    # -- Sales, margin and refunds for the period --
+    totals = sales_rollup_totals(store, date_from, date_to)
+    today_sales = totals["revenue"]
+    today_orders = totals["orders"]
+    today_avg_basket = totals["avg_basket"]
+    total_discounts = totals["discounts"]
+    gross_margin = totals["gross_margin"]
+    total_refunds = totals["refunds"]
 
     # -- Top products (by quantity sold) --
     top_products = (
-        items_qs
+        SalesProductDailyRollup.objects
+        .filter(store=store, date__gte=date_from, date__lte=date_to)
         .values("product_id", "product_name")
         .annotate(
             qty_sold=Coalesce(Sum("quantity"), Value(0)),
-            revenue=Coalesce(Sum("line_total"), Value(Decimal("0.00"))),
+            revenue=Coalesce(Sum("revenue"), Value(Decimal("0.00"))),
         )
         .order_by("-qty_sold")[:5]
     )
@@ -172,62 +139,42 @@ def get_sales_report(store, date_from, date_to):
     Returns a dict with:
       total_ca, net_ca, nb_ventes, avg_basket, total_discounts,
       total_refunds, by_category, by_seller, by_payment_method, top_products
+
+    Everything except the payment-method split comes from the sales
+    rollups (see ``reports.rollups``).
     """
-    from sales.models import Sale, SaleItem, Refund
     from cashier.models import Payment
+    from reports.models import SalesProductDailyRollup, SalesSellerDailyRollup
 
-    paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
-
-    sales_qs = Sale.objects.filter(
-        store=store,
-        status__in=paid_statuses,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    )
-
-    agg = sales_qs.aggregate(
-        total_ca=Coalesce(Sum("total"), Value(Decimal("0.00"))),
-        nb_ventes=Count("id"),
-        avg_basket=Coalesce(Avg("total"), Value(Decimal("0.00"))),
-        total_discounts=Coalesce(Sum("discount_amount"), Value(Decimal("0.00"))),
-    )
-
-    refunds_total = Refund.objects.filter(
-        store=store,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    ).aggregate(
-        total=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
-    )["total"]
-
-    items_qs = SaleItem.objects.filter(
-        sale__store=store,
-        sale__status__in=paid_statuses,
-        sale__created_at__date__gte=date_from,
-        sale__created_at__date__lte=date_to,
+    tz = store_timezone(store)
+    totals = sales_rollup_totals(store, date_from, date_to)
+    refunds_total = totals["refunds"]
+    products_qs = SalesProductDailyRollup.objects.filter(
+        store=store, date__gte=date_from, date__lte=date_to,
     )
 
     # By category
     by_category = list(
-        items_qs
+        products_qs
         .values(category_name=F("product__category__name"))
         .annotate(
             qty=Coalesce(Sum("quantity"), Value(0)),
-            revenue=Coalesce(Sum("line_total"), Value(Decimal("0.00"))),
+            revenue=Coalesce(Sum("revenue"), Value(Decimal("0.00"))),
         )
         .order_by("-revenue")
     )
 
     # By seller
     by_seller = list(
-        sales_qs
+        SalesSellerDailyRollup.objects
+        .filter(store=store, date__gte=date_from, date__lte=date_to)
         .values(
             seller_name=F("seller__first_name"),
             seller_last=F("seller__last_name"),
         )
         .annotate(
-            nb=Count("id"),
-            ca=Coalesce(Sum("total"), Value(Decimal("0.00"))),
+            nb=Coalesce(Sum("orders"), Value(0)),
+            ca=Coalesce(Sum("revenue"), Value(Decimal("0.00"))),
         )
         .order_by("-ca")
     )
@@ -237,8 +184,7 @@ def get_sales_report(store, date_from, date_to):
         Payment.objects
         .filter(
             store=store,
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to,
+            **date_range_filter("created_at", date_from, date_to, tz=tz),
         )
         .values("method")
         .annotate(
@@ -250,23 +196,23 @@ def get_sales_report(store, date_from, date_to):
 
     # Top products
     top_products = list(
-        items_qs
+        products_qs
         .values("product_id", "product_name")
         .annotate(
             qty_sold=Coalesce(Sum("quantity"), Value(0)),
-            revenue=Coalesce(Sum("line_total"), Value(Decimal("0.00"))),
+            revenue=Coalesce(Sum("revenue"), Value(Decimal("0.00"))),
         )
         .order_by("-qty_sold")[:10]
     )
 
-    total_ca = agg["total_ca"]
-    total_discounts = agg["total_discounts"]
+    total_ca = totals["revenue"]
+    total_discounts = totals["discounts"]
 
     return {
         "total_ca": total_ca,
         "net_ca": total_ca - total_discounts - refunds_total,
-        "nb_ventes": agg["nb_ventes"],
-        "avg_basket": agg["avg_basket"],
+        "nb_ventes": totals["orders"],
+        "avg_basket": totals["avg_basket"],
         "total_discounts": total_discounts,
         "total_refunds": refunds_total,
         "by_category": by_category,
@@ -285,168 +231,71 @@ def get_daily_statistics(store, date_from, date_to):
 
     Returns today's profit, period summary, daily rows with profit,
     top products by profit, hourly distribution, and payment methods.
+    Everything except payment methods comes from the sales rollups.
     """
-    from sales.models import Sale, SaleItem, Refund
     from cashier.models import Payment
-    from django.db.models import DecimalField
-
-    today = date.today()
-    paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
-
-    # -- Base querysets --
-    sales_qs = Sale.objects.filter(
-        store=store,
-        status__in=paid_statuses,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    )
-    items_qs = SaleItem.objects.filter(
-        sale__store=store,
-        sale__status__in=paid_statuses,
-        sale__created_at__date__gte=date_from,
-        sale__created_at__date__lte=date_to,
-    )
+    from reports.models import SalesDailyRollup, SalesHourlyRollup, SalesProductDailyRollup
 
-    # -- Daily aggregation: Sales level --
-    sales_daily = list(
-        sales_qs
-        .annotate(day=TruncDate('created_at'))
-        .values('day')
-        .annotate(
-            nb_sales=Count('id'),
-            revenue=Coalesce(Sum('total'), Value(Decimal("0.00"))),
-            total_discounts=Coalesce(Sum('discount_amount'), Value(Decimal("0.00"))),
-            avg_basket=Coalesce(Avg('total'), Value(Decimal("0.00"))),
-        )
-        .order_by('day')
-    )
+    tz = store_timezone(store)
+    today = local_today(tz)
 
-    # -- Daily aggregation: Items level (for profit) --
-    items_daily = list(
-        items_qs
-        .annotate(day=TruncDate('sale__created_at'))
-        .values('day')
-        .annotate(
-            total_line_revenue=Coalesce(Sum('line_total'), Value(Decimal("0.00"))),
-            total_cost=Coalesce(
-                Sum(F('cost_price') * F('quantity')),
-                Value(Decimal("0.00")),
-                output_field=DecimalField(),
-            ),
-            total_items=Coalesce(Sum('quantity'), Value(0)),
-        )
-        .order_by('day')
-    )
-    items_by_day = {str(row['day']): row for row in items_daily}
+    def _margin_pct(profit, line_revenue):
+        return (profit / line_revenue * 100) if line_revenue > 0 else Decimal("0.00")
 
-    # -- Merge daily data --
+    # -- Daily rows --
     daily_data = []
-    for row in sales_daily:
-        day_str = str(row['day'])
-        item_row = items_by_day.get(day_str, {})
-        line_rev = item_row.get('total_line_revenue', Decimal("0.00"))
-        total_cost = item_row.get('total_cost', Decimal("0.00"))
-        profit = line_rev - total_cost
-        margin_pct = (profit / line_rev * 100) if line_rev > 0 else Decimal("0.00")
-        total_items = item_row.get('total_items', 0)
-
+    daily_rows = (
+        SalesDailyRollup.objects
+        .filter(store=store, date__gte=date_from, date__lte=date_to, orders__gt=0)
+        .order_by('date')
+    )
+    for row in daily_rows:
+        profit = row.line_revenue - row.cost
         daily_data.append({
-            'date': day_str,
-            'nb_sales': row['nb_sales'],
-            'revenue': str(row['revenue']),
+            'date': str(row.date),
+            'nb_sales': row.orders,
+            'revenue': str(row.revenue),
             'profit': str(profit.quantize(Decimal("0.01"))),
-            'margin_pct': str(round(margin_pct, 1)),
-            'avg_basket': str(row['avg_basket'].quantize(Decimal("0.01")) if isinstance(row['avg_basket'], Decimal) else row['avg_basket']),
-            'total_discounts': str(row['total_discounts']),
-            'total_items': total_items,
+            'margin_pct': str(round(_margin_pct(profit, row.line_revenue), 1)),
+            'avg_basket': str((row.revenue / row.orders).quantize(Decimal("0.01"))),
+            'total_discounts': str(row.discounts),
+            'total_items': row.items_sold,
         })
 
     # -- Period summary --
-    period_agg = sales_qs.aggregate(
-        total_revenue=Coalesce(Sum('total'), Value(Decimal("0.00"))),
-        nb_sales=Count('id'),
-        avg_basket=Coalesce(Avg('total'), Value(Decimal("0.00"))),
-        total_discounts=Coalesce(Sum('discount_amount'), Value(Decimal("0.00"))),
-    )
-    margin_agg = items_qs.aggregate(
-        total_line_revenue=Coalesce(Sum('line_total'), Value(Decimal("0.00"))),
-        total_cost=Coalesce(
-            Sum(F('cost_price') * F('quantity')),
-            Value(Decimal("0.00")),
-            output_field=DecimalField(),
-        ),
-        total_items=Coalesce(Sum('quantity'), Value(0)),
-    )
-    total_profit = margin_agg['total_line_revenue'] - margin_agg['total_cost']
-    total_rev = margin_agg['total_line_revenue']
-    summary_margin_pct = (total_profit / total_rev * 100) if total_rev > 0 else Decimal("0.00")
-
-    refunds_total = Refund.objects.filter(
-        store=store,
-        created_at__date__gte=date_from,
-        created_at__date__lte=date_to,
-    ).aggregate(
-        total=Coalesce(Sum('amount'), Value(Decimal("0.00"))),
-    )['total']
-
+    totals = sales_rollup_totals(store, date_from, date_to)
+    total_profit = totals['gross_margin']
     summary = {
-        'total_revenue': str(period_agg['total_revenue']),
-        'nb_sales': period_agg['nb_sales'],
-        'avg_basket': str(period_agg['avg_basket'].quantize(Decimal("0.01")) if isinstance(period_agg['avg_basket'], Decimal) else period_agg['avg_basket']),
-        'total_discounts': str(period_agg['total_discounts']),
+        'total_revenue': str(totals['revenue']),
+        'nb_sales': totals['orders'],
+        'avg_basket': str(totals['avg_basket']),
+        'total_discounts': str(totals['discounts']),
         'total_profit': str(total_profit.quantize(Decimal("0.01"))),
-        'margin_pct': str(round(summary_margin_pct, 1)),
-        'total_items': margin_agg['total_items'],
-        'total_refunds': str(refunds_total),
+        'margin_pct': str(round(_margin_pct(total_profit, totals['line_revenue']), 1)),
+        'total_items': totals['items_sold'],
+        'total_refunds': str(totals['refunds']),
     }
 
     # -- Today's stats --
-    today_sales_qs = Sale.objects.filter(
-        store=store,
-        status__in=paid_statuses,
-        created_at__date=today,
-    )
-    today_sales_agg = today_sales_qs.aggregate(
-        revenue=Coalesce(Sum('total'), Value(Decimal("0.00"))),
-        nb_sales=Count('id'),
-    )
-    today_items_qs = SaleItem.objects.filter(
-        sale__store=store,
-        sale__status__in=paid_statuses,
-        sale__created_at__date=today,
-    )
-    today_margin = today_items_qs.aggregate(
-        rev=Coalesce(Sum('line_total'), Value(Decimal("0.00"))),
-        cost=Coalesce(
-            Sum(F('cost_price') * F('quantity')),
-            Value(Decimal("0.00")),
-            output_field=DecimalField(),
-        ),
-        total_items=Coalesce(Sum('quantity'), Value(0)),
-    )
-    today_profit = today_margin['rev'] - today_margin['cost']
-    today_margin_pct = (today_profit / today_margin['rev'] * 100) if today_margin['rev'] > 0 else Decimal("0.00")
-
+    today_totals = sales_rollup_totals(store, today, today)
+    today_profit = today_totals['gross_margin']
     today_data = {
-        'revenue': str(today_sales_agg['revenue']),
+        'revenue': str(today_totals['revenue']),
         'profit': str(today_profit.quantize(Decimal("0.01"))),
-        'margin_pct': str(round(today_margin_pct, 1)),
-        'nb_sales': today_sales_agg['nb_sales'],
-        'total_items': today_margin['total_items'],
+        'margin_pct': str(round(_margin_pct(today_profit, today_totals['line_revenue']), 1)),
+        'nb_sales': today_totals['orders'],
+        'total_items': today_totals['items_sold'],
     }
 
     # -- Top 10 products by profit --
     top_products_by_profit = list(
-        items_qs
+        SalesProductDailyRollup.objects
+        .filter(store=store, date__gte=date_from, date__lte=date_to)
         .values('product_name')
         .annotate(
             qty_sold=Coalesce(Sum('quantity'), Value(0)),
-            revenue=Coalesce(Sum('line_total'), Value(Decimal("0.00"))),
-            cost=Coalesce(
-                Sum(F('cost_price') * F('quantity')),
-                Value(Decimal("0.00")),
-                output_field=DecimalField(),
-            ),
+            revenue=Coalesce(Sum('revenue'), Value(Decimal("0.00"))),
+            cost=Coalesce(Sum('cost'), Value(Decimal("0.00"))),
         )
         .order_by()  # clear default ordering
         .annotate(profit=F('revenue') - F('cost'))
@@ -464,12 +313,12 @@ def get_daily_statistics(store, date_from, date_to):
 
     # -- Hourly distribution --
     hourly_distribution = list(
-        sales_qs
-        .annotate(hour=ExtractHour('created_at'))
+        SalesHourlyRollup.objects
+        .filter(store=store, date__gte=date_from, date__lte=date_to)
         .values('hour')
         .annotate(
-            nb_sales=Count('id'),
-            revenue=Coalesce(Sum('total'), Value(Decimal("0.00"))),
+            nb_sales=Coalesce(Sum('orders'), Value(0)),
+            revenue=Coalesce(Sum('revenue'), Value(Decimal("0.00"))),
         )
         .order_by('hour')
     )
@@ -486,8 +335,7 @@ def get_daily_statistics(store, date_from, date_to):
     by_payment_method = list(
         Payment.objects.filter(
             store=store,
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to,
+            **date_range_filter("created_at", date_from, date_to, tz=tz),
         )
         .values('method')
         .annotate(
@@ -571,12 +419,13 @@ def get_stock_report(store):
     )
 
     # Dormant items: products with stock but no sales in last 30 days
-    thirty_days_ago = date.today() - timedelta(days=30)
+    tz = store_timezone(store)
+    thirty_days_ago = local_today(tz) - timedelta(days=30)
     sold_product_ids = (
         SaleItem.objects
         .filter(
             sale__store=store,
-            sale__created_at__date__gte=thirty_days_ago,
+            **date_range_filter("sale__created_at", thirty_days_ago, tz=tz),
         )
         .values_list("product_id", flat=True)
         .distinct()
@@ -594,7 +443,7 @@ def get_stock_report(store):
         SaleItem.objects
         .filter(
             sale__store=store,
-            sale__created_at__date__gte=thirty_days_ago,
+            **date_range_filter("sale__created_at", thirty_days_ago, tz=tz),
         )
         .values("product__name", "product__sku")
         .annotate(qty_sold=Coalesce(Sum("quantity"), Value(0)))
@@ -623,12 +472,12 @@ def get_cashier_report(store, date_from, date_to):
     """
     from cashier.models import CashShift, Payment
 
+    tz = store_timezone(store)
     shifts = list(
         CashShift.objects
         .filter(
             store=store,
-            opened_at__date__gte=date_from,
-            opened_at__date__lte=date_to,
+            **date_range_filter("opened_at", date_from, date_to, tz=tz),
         )
         .select_related("cashier")
         .order_by("-opened_at")
@@ -639,8 +488,7 @@ def get_cashier_report(store, date_from, date_to):
         Payment.objects
         .filter(
             store=store,
-            created_at__date__gte=date_from,
-            created_at__date__lte=date_to,
+            **date_range_filter("created_at", date_from, date_to, tz=tz),
         )
         .values("method")
         .annotate(
@@ -654,8 +502,7 @@ def get_cashier_report(store, date_from, date_to):
     variance_agg = CashShift.objects.filter(
         store=store,
         status=CashShift.Status.CLOSED,
-        opened_at__date__gte=date_from,
-        opened_at__date__lte=date_to,
+        **date_range_filter("opened_at", date_from, date_to, tz=tz),
     ).aggregate(
         total_variance=Coalesce(Sum("variance"), Value(Decimal("0.00"))),
     )
@@ -666,8 +513,7 @@ def get_cashier_report(store, date_from, date_to):
         CashShift.objects
         .filter(
             store=store,
-            opened_at__date__gte=date_from,
-            opened_at__date__lte=date_to,
+            **date_range_filter("opened_at", date_from, date_to, tz=tz),
         )
         .values(
             cashier_name=F("cashier__first_name"),
@@ -842,9 +688,9 @@ def export_to_excel(data, report_type):
         logger.error("openpyxl is not installed -- cannot export to Excel.")
         return _fallback_csv_response(data, report_type)
 
-    wb = Workbook()
-    ws = wb.active
-    ws.title = report_type.capitalize()
+    # Sheets are only appended to: a write-only workbook streams the rows.
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=report_type.capitalize())
 
     # Write data depending on report type
     if report_type == "sales":
@@ -0,0 +1,90 @@
+"""Signals: keep sales rollups in sync with sales, lines and refunds.
+
+Each event applies its delta (see ``reports.rollups``); the previous state
+of an edited sale or line is read in ``pre_save``.
+"""
+from __future__ import annotations
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from reports.rollups import (
+    PAID_STATUSES,
+    apply_line_changes,
+    apply_refund_change,
+    apply_sale_change,
+    line_rollup_values,
+    sale_rollup_state,
+    schedule_rollup_refresh,
+)
+
+# Sale fields feeding rollups (a save touching none of them is ignored).
+_SALE_ROLLUP_FIELDS = {"status", "total", "discount_amount", "seller", "seller_id", "created_at"}
+
+
+def _tracks_rollups(update_fields) -> bool:
+    return update_fields is None or bool(set(update_fields) & _SALE_ROLLUP_FIELDS)
+
+
+@receiver(pre_save, sender="sales.Sale")
+def sale_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._rollup_state = None
+    if not instance.pk or not _tracks_rollups(update_fields):
+        return
+    previous = (
+        sender.objects.filter(pk=instance.pk)
+        .only("status", "total", "discount_amount", "seller_id", "created_at")
+        .first()
+    )
+    if previous is not None:
+        instance._rollup_state = sale_rollup_state(previous)
+
+
+@receiver(post_save, sender="sales.Sale")
+def sale_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not _tracks_rollups(update_fields):
+        return
+    apply_sale_change(instance, None if created else getattr(instance, "_rollup_state", None))
+
+
+@receiver(post_delete, sender="sales.Sale")
+def sale_deleted(sender, instance, **kwargs):
+    # Lines were removed (and subtracted) first by the cascade.
+    state = sale_rollup_state(instance)
+    if state["counted"]:
+        apply_sale_change(instance, state, {**state, "counted": False})
+
+
+@receiver(pre_save, sender="sales.SaleItem")
+def sale_item_pre_save(sender, instance, **kwargs):
+    # Lines are edited while the sale is a draft; only paid sales count.
+    instance._rollup_values = None
+    if instance.pk and instance.sale.status in PAID_STATUSES:
+        previous = sender.objects.filter(pk=instance.pk).first()
+        if previous is not None:
+            instance._rollup_values = line_rollup_values(previous)
+
+
+@receiver(post_save, sender="sales.SaleItem")
+def sale_item_saved(sender, instance, created, **kwargs):
+    before = None if created else getattr(instance, "_rollup_values", None)
+    apply_line_changes(instance.sale, [(before, line_rollup_values(instance))])
+
+
+@receiver(post_delete, sender="sales.SaleItem")
+def sale_item_deleted(sender, instance, **kwargs):
+    apply_line_changes(instance.sale, [(line_rollup_values(instance), None)])
+
+
+@receiver(post_save, sender="sales.Refund")
+def refund_saved(sender, instance, created, **kwargs):
+    if created:
+        apply_refund_change(instance, 1)
+    else:
+        # Edited refund: the previous amount is unknown, rebuild the bucket.
+        schedule_rollup_refresh(instance.store, instance.created_at)
+
+
+@receiver(post_delete, sender="sales.Refund")
+def refund_deleted(sender, instance, **kwargs):
+    apply_refund_change(instance, -1)
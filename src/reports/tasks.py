@@ -1,10 +1,10 @@
 """Celery tasks for the reports app."""
 import logging
-from datetime import date, timedelta
+from datetime import timedelta
 from decimal import Decimal
 
 from celery import shared_task
-from django.db.models import Avg, Count, F, Sum, Value
+from django.db.models import F, Sum, Value
 from django.db.models.functions import Coalesce
 
 logger = logging.getLogger("boutique")
@@ -14,63 +14,36 @@ logger = logging.getLogger("boutique")
 def daily_kpi_snapshot():
     """Calculate and save a KPISnapshot for yesterday for each active store.
 
+    Yesterday's sales rollups are rebuilt first (repairing any missed
+    refresh) and the snapshot's sales figures are read from them.
+
     Runs once per day (see ``config/celery.py`` beat schedule).
     """
     from stores.models import Store
-    from sales.models import Sale, SaleItem, Refund
+    from sales.models import Sale
     from stock.models import ProductStock
     from reports.models import KPISnapshot
+    from reports.rollups import rebuild_sales_rollups, sales_rollup_totals
+    from core.dates import local_today, store_timezone
 
-    yesterday = date.today() - timedelta(days=1)
-    stores = Store.objects.filter(is_active=True)
+    stores = Store.objects.filter(is_active=True).select_related("enterprise")
     created_count = 0
 
     for store in stores:
+        tz = store_timezone(store)
+        yesterday = local_today(tz) - timedelta(days=1)
+        rebuild_sales_rollups(store.pk, yesterday, tz=tz)
+
         # Skip if snapshot already exists
         if KPISnapshot.objects.filter(store=store, date=yesterday).exists():
             logger.debug("KPI snapshot already exists for %s on %s", store, yesterday)
             continue
 
-        paid_statuses = [Sale.Status.PAID, Sale.Status.PARTIALLY_PAID]
-
-        # Sales aggregates
-        sales_qs = Sale.objects.filter(
-            store=store,
-            status__in=paid_statuses,
-            created_at__date=yesterday,
-        )
-        sales_agg = sales_qs.aggregate(
-            total_sales=Coalesce(Sum("total"), Value(Decimal("0.00"))),
-            total_orders=Count("id"),
-            avg_basket=Coalesce(Avg("total"), Value(Decimal("0.00"))),
-            total_discounts=Coalesce(Sum("discount_amount"), Value(Decimal("0.00"))),
-        )
-
-        # Gross margin from sale items
-        items_qs = SaleItem.objects.filter(
-            sale__store=store,
-            sale__status__in=paid_statuses,
-            sale__created_at__date=yesterday,
-        )
-        margin_agg = items_qs.aggregate(
-            total_revenue=Coalesce(Sum("line_total"), Value(Decimal("0.00"))),
-            total_cost=Coalesce(
-                Sum(F("cost_price") * F("quantity")),
-                Value(Decimal("0.00")),
-            ),
-        )
-        gross_margin = margin_agg["total_revenue"] - margin_agg["total_cost"]
-
-        # Refunds
-        total_refunds = Refund.objects.filter(
-            store=store,
-            created_at__date=yesterday,
-        ).aggregate(
-            total=Coalesce(Sum("amount"), Value(Decimal("0.00"))),
-        )["total"]
-
-        total_sales = sales_agg["total_sales"]
-        total_discounts = sales_agg["total_discounts"]
+        totals = sales_rollup_totals(store, yesterday, yesterday)
+        total_sales = totals["revenue"]
+        total_discounts = totals["discounts"]
+        total_refunds = totals["refunds"]
+        gross_margin = totals["gross_margin"]
         net_sales = total_sales - total_discounts - total_refunds
 
         # Credit outstanding (snapshot at end of day)
@@ -106,8 +79,8 @@ def daily_kpi_snapshot():
             store=store,
             date=yesterday,
             total_sales=total_sales,
-            total_orders=sales_agg["total_orders"],
-            average_basket=sales_agg["avg_basket"],
+            total_orders=totals["orders"],
+            average_basket=totals["avg_basket"],
             gross_margin=gross_margin,
             total_discounts=total_discounts,
             total_refunds=total_refunds,
@@ -0,0 +1,28 @@
+"""Track whether a sale currently holds a stock reservation."""
+
+from django.db import migrations, models
+
+
+def mark_open_reservations(apps, schema_editor):
+    Sale = apps.get_model("sales", "Sale")
+    Sale.objects.filter(status="PARTIALLY_PAID", reserve_stock=True).update(stock_reserved=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sales", "0010_sale_offline_id"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sale",
+            name="stock_reserved",
+            field=models.BooleanField(
+                default=False,
+                help_text="True si les quantites de cette vente sont comptees dans le stock reserve.",
+                verbose_name="stock reserve",
+            ),
+        ),
+        migrations.RunPython(mark_open_reservations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.15 on 2026-10-16 22:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0006_customer_last_purchase_at_customer_loyalty_score_and_more'),
+        ('sales', '0011_sale_stock_reserved'),
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='refund',
+            index=models.Index(fields=['store', 'created_at'], name='refund_store_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['store', 'status', 'created_at'], name='sale_store_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['store', 'seller', 'created_at'], name='sale_store_seller_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(condition=models.Q(('status__in', ['PAID', 'PARTIALLY_PAID'])), fields=['store', 'created_at'], name='sale_paid_store_created_idx'),
+        ),
+    ]
@@ -260,6 +260,11 @@ class Sale(TimeStampedModel):
         default=False,
         help_text="True si le stock a deja ete decremente pour cette vente.",
     )
+    stock_reserved = models.BooleanField(
+        "stock reserve",
+        default=False,
+        help_text="True si les quantites de cette vente sont comptees dans le stock reserve.",
+    )
 
     # ------------------------------------------------------------------
     # Offline sync
@@ -303,6 +308,16 @@ class Sale(TimeStampedModel):
                 name="uniq_sale_invoice_per_store",
             ),
         ]
+        # Range scans for reports/analytics/objectives (see core.dates).
+        indexes = [
+            models.Index(fields=["store", "status", "created_at"], name="sale_store_status_created_idx"),
+            models.Index(fields=["store", "seller", "created_at"], name="sale_store_seller_created_idx"),
+            models.Index(
+                fields=["store", "created_at"],
+                condition=Q(status__in=["PAID", "PARTIALLY_PAID"]),
+                name="sale_paid_store_created_idx",
+            ),
+        ]
 
     def __str__(self):
         label = self.invoice_number or f"DRAFT-{str(self.pk)[:8]}"
@@ -609,6 +624,9 @@ class Refund(TimeStampedModel):
         verbose_name = "remboursement"
         verbose_name_plural = "remboursements"
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["store", "created_at"], name="refund_store_created_idx"),
+        ]
 
     def __str__(self):
         return f"Remboursement {self.amount} sur {self.sale}"
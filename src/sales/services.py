@@ -10,6 +10,7 @@ from django.db import models, transaction
 from django.utils import timezone
 
 from sales.models import Quote, QuoteItem, Refund, Sale, SaleItem
+from stores.numbering import next_document_number
 
 User = get_user_model()
 logger = logging.getLogger("boutique")
@@ -135,6 +136,157 @@ def add_item_to_sale(
     return item
 
 
+# ---------------------------------------------------------------------------
+# add_items_to_sale_many
+# ---------------------------------------------------------------------------
+
+@transaction.atomic
+def add_items_to_sale_many(sale: Sale, lines: list[dict], actor=None) -> tuple[list[SaleItem], list[tuple[int, str]]]:
+    """Add several products to a DRAFT sale in one pass.
+
+    Same rules as :func:`add_item_to_sale`, but the sale is locked once,
+    stock is checked with one query for all products, new lines are
+    bulk-inserted and totals are recalculated once.  Invalid lines are
+    skipped and reported instead of aborting the whole batch.
+
+    Parameters
+    ----------
+    sale : Sale
+    lines : list[dict]
+        Each dict has ``product`` and optionally ``qty``, ``discount`` and
+        ``unit_price`` (same meaning as in :func:`add_item_to_sale`).
+    actor : User, optional
+
+    Returns
+    -------
+    tuple[list[SaleItem], list[tuple[int, str]]]
+        Created or updated items, and ``(line_index, message)`` for each
+        skipped line.
+
+    Raises
+    ------
+    ValueError
+        If the sale is not in DRAFT.
+    """
+    sale = Sale.objects.select_for_update().get(pk=sale.pk)
+    if sale.status != Sale.Status.DRAFT:
+        raise ValueError("Impossible d'ajouter un article: la vente n'est plus en brouillon.")
+
+    errors: list[tuple[int, str]] = []
+    merged: dict = {}
+    for idx, line in enumerate(lines):
+        product = line["product"]
+        qty = int(line.get("qty", 1))
+        if not product.is_active:
+            errors.append((idx, f"Le produit '{product.name}' n'est pas actif."))
+            continue
+        if qty < 1:
+            errors.append((idx, "La quantite doit etre d'au moins 1."))
+            continue
+        entry = merged.get(product.pk)
+        if entry is None:
+            merged[product.pk] = {
+                "product": product,
+                "qty": qty,
+                "discount": Decimal(str(line.get("discount", 0))),
+                "unit_price": line.get("unit_price"),
+                "indexes": [idx],
+            }
+        else:
+            entry["qty"] += qty
+            entry["discount"] += Decimal(str(line.get("discount", 0)))
+            entry["indexes"].append(idx)
+
+    if not merged:
+        return [], errors
+
+    existing_items = {
+        item.product_id: item
+        for item in sale.items.select_for_update().filter(product_id__in=list(merged))
+    }
+
+    # One stock query for every product that needs a check.
+    stocks = {}
+    if not getattr(sale.store, "allow_negative_stock", False):
+        tracked = [pid for pid, e in merged.items() if bool(getattr(e["product"], "track_stock", True))]
+        if tracked:
+            from stock.models import ProductStock
+            stocks = {
+                s.product_id: s
+                for s in ProductStock.objects.filter(store=sale.store, product_id__in=tracked)
+            }
+
+        for pid in list(merged):
+            entry = merged[pid]
+            product = entry["product"]
+            if not bool(getattr(product, "track_stock", True)):
+                continue
+            desired_qty = entry["qty"]
+            if pid in existing_items:
+                desired_qty += int(existing_items[pid].quantity)
+            stock = stocks.get(pid)
+            if stock is None:
+                message = (
+                    f"Stock non initialise pour '{product.name}'. "
+                    "Veuillez initialiser le stock avant la vente."
+                )
+            elif stock.available_qty < desired_qty:
+                message = (
+                    f"Stock insuffisant pour '{product.name}'.  "
+                    f"Disponible: {stock.available_qty}, demande: {desired_qty}."
+                )
+            else:
+                continue
+            errors.extend((idx, message) for idx in entry["indexes"])
+            del merged[pid]
+
+    new_items = []
+    updated_items = []
+    for pid, entry in merged.items():
+        product = entry["product"]
+        existing = existing_items.get(pid)
+        if existing is not None:
+            existing.quantity += entry["qty"]
+            existing.discount_amount += entry["discount"]
+            existing.line_total = max(
+                existing.unit_price * existing.quantity - existing.discount_amount,
+                Decimal("0.00"),
+            )
+            updated_items.append(existing)
+            continue
+        unit_price = entry["unit_price"] if entry["unit_price"] is not None else product.selling_price
+        new_items.append(
+            SaleItem(
+                sale=sale,
+                product=product,
+                product_name=product.name,
+                unit_price=unit_price,
+                cost_price=product.cost_price,
+                quantity=entry["qty"],
+                discount_amount=entry["discount"],
+                line_total=max(unit_price * entry["qty"] - entry["discount"], Decimal("0.00")),
+            )
+        )
+
+    if new_items:
+        SaleItem.objects.bulk_create(new_items)
+    if updated_items:
+        now = timezone.now()
+        for item in updated_items:
+            item.updated_at = now
+        SaleItem.objects.bulk_update(
+            updated_items, ["quantity", "discount_amount", "line_total", "updated_at"],
+        )
+    if new_items or updated_items:
+        recalculate_sale(sale)
+
+    logger.info(
+        "Added %d line(s) to sale %s (%d skipped)",
+        len(new_items) + len(updated_items), sale.pk, len(errors),
+    )
+    return new_items + updated_items, sorted(errors)
+
+
 # ---------------------------------------------------------------------------
 # remove_item_from_sale
 # ---------------------------------------------------------------------------
@@ -392,6 +544,9 @@ def cancel_sale(sale: Sale, reason: str, actor) -> Sale:
         "updated_at",
     ])
 
+    # Give back the layaway reservation held by a partially paid sale.
+    _release_stock_reservation(sale)
+
     # Audit log
     _create_audit_log(
         actor=actor,
@@ -448,20 +603,6 @@ def recalculate_sale(sale: Sale) -> None:
 # generate_invoice_number
 # ---------------------------------------------------------------------------
 
-def _get_or_create_sequence(store, prefix: str):
-    """Get or create a year-scoped sequence for the given store and prefix."""
-    from stores.models import Sequence
-
-    current_year = timezone.now().year
-    sequence, _created = Sequence.objects.get_or_create(
-        store=store,
-        prefix=prefix,
-        year=current_year,
-        defaults={"next_number": 1},
-    )
-    return sequence
-
-
 def generate_invoice_number(store) -> str:
     """Generate the next invoice number for *store*.
 
@@ -475,8 +616,7 @@ def generate_invoice_number(store) -> str:
     -------
     str
     """
-    sequence = _get_or_create_sequence(store, "FAC")
-    return sequence.generate_next()
+    return next_document_number(store, "FAC")
 
 
 def generate_quote_number(store) -> str:
@@ -492,8 +632,7 @@ def generate_quote_number(store) -> str:
     -------
     str
     """
-    sequence = _get_or_create_sequence(store, "DEV")
-    return sequence.generate_next()
+    return next_document_number(store, "DEV")
 
 
 def generate_proforma_number(store) -> str:
@@ -501,8 +640,7 @@ def generate_proforma_number(store) -> str:
 
     Uses prefix ``PRO`` with format: ``PRO-STORE-2026-000001``.
     """
-    sequence = _get_or_create_sequence(store, "PRO")
-    return sequence.generate_next()
+    return next_document_number(store, "PRO")
 
 
 def generate_credit_note_number(store) -> str:
@@ -510,8 +648,7 @@ def generate_credit_note_number(store) -> str:
 
     Uses prefix ``AVO`` with format: ``AVO-STORE-2026-000001``.
     """
-    sequence = _get_or_create_sequence(store, "AVO")
-    return sequence.generate_next()
+    return next_document_number(store, "AVO")
 
 
 # ---------------------------------------------------------------------------
@@ -589,30 +726,17 @@ def _create_audit_log(
 
 
 def _sync_objectives_after_refund(refund: Refund) -> None:
-    """Best-effort objective + leaderboard sync after a refund."""
+    """Best-effort leaderboard sync after a refund.
+
+    Seller stats already carry the refund (delta applied by
+    ``objectives.signals``).
+    """
     sale = getattr(refund, "sale", None)
     if sale is None or not getattr(sale, "seller_id", None):
         return
 
     period = (refund.created_at or timezone.now()).strftime("%Y-%m")
 
-    try:
-        from objectives.engine import ObjectiveCalculationEngine
-
-        engine = ObjectiveCalculationEngine(store_id=str(sale.store_id))
-        engine.compute_for_seller(
-            seller_id=str(sale.seller_id),
-            period=period,
-            trigger="MANUAL",
-        )
-    except Exception:
-        logger.debug(
-            "Objectif vendeur non synchronise apres remboursement %s.",
-            refund.pk,
-            exc_info=True,
-        )
-        return
-
     try:
         from objectives.leaderboard import LeaderboardEngine
 
@@ -625,23 +749,34 @@ def _sync_objectives_after_refund(refund: Refund) -> None:
         )
 
 
+def _release_stock_reservation(sale: Sale) -> None:
+    """Release the reservation held by *sale* once it left PARTIALLY_PAID."""
+    if not sale.stock_reserved:
+        return
+    from cashier.services import _sync_reserved_stock_for_sale_products
+    _sync_reserved_stock_for_sale_products(sale)
+
+
 def _reverse_stock_for_sale(sale: Sale, actor) -> None:
     """Re-introduce stock for each line item (used on cancellation or refund)."""
     try:
-        from stock.services import adjust_stock
-        for item in sale.items.select_related("product"):
-            if not bool(getattr(item.product, "track_stock", True)):
-                continue
-            adjust_stock(
-                store=sale.store,
-                product=item.product,
-                qty_delta=int(item.quantity),
-                movement_type="RETURN",
-                reason=f"Annulation vente {sale.invoice_number or sale.pk}",
-                actor=actor,
-                reference=str(sale.pk),
-                unit_cost=item.cost_price,
-            )
+        from stock.services import adjust_stock_many
+        adjust_stock_many(
+            [
+                {
+                    "store": sale.store,
+                    "product": item.product,
+                    "qty_delta": int(item.quantity),
+                    "movement_type": "RETURN",
+                    "reason": f"Annulation vente {sale.invoice_number or sale.pk}",
+                    "reference": str(sale.pk),
+                    "unit_cost": item.cost_price,
+                }
+                for item in sale.items.select_related("product")
+                if bool(getattr(item.product, "track_stock", True))
+            ],
+            actor=actor,
+        )
     except ImportError:
         logger.exception("Stock service indisponible pendant l'annulation %s", sale.pk)
         raise ValueError("Impossible de remettre le stock: service stock indisponible.")
@@ -710,24 +845,29 @@ def create_refund(
     sale.status = Sale.Status.REFUNDED
 
     sale.save(update_fields=["amount_paid", "amount_due", "status", "updated_at"])
+    _release_stock_reservation(sale)
 
     # Restore stock if explicitly requested or if fully refunded
-    if restore_stock or fully_refunded:
+    # (a layaway sale that only held a reservation never left the shelf).
+    if (restore_stock or fully_refunded) and sale.stock_decremented:
         try:
-            from stock.services import adjust_stock
-            for item in sale.items.select_related("product"):
-                if not bool(getattr(item.product, "track_stock", True)):
-                    continue
-                adjust_stock(
-                    store=sale.store,
-                    product=item.product,
-                    qty_delta=int(item.quantity),
-                    movement_type="RETURN",
-                    reason=f"Remboursement vente {sale.invoice_number or sale.pk} (avoir {credit_note_number})",
-                    actor=processed_by or approved_by,
-                    reference=str(refund.pk),
-                    unit_cost=item.cost_price,
-                )
+            from stock.services import adjust_stock_many
+            adjust_stock_many(
+                [
+                    {
+                        "store": sale.store,
+                        "product": item.product,
+                        "qty_delta": int(item.quantity),
+                        "movement_type": "RETURN",
+                        "reason": f"Remboursement vente {sale.invoice_number or sale.pk} (avoir {credit_note_number})",
+                        "reference": str(refund.pk),
+                        "unit_cost": item.cost_price,
+                    }
+                    for item in sale.items.select_related("product")
+                    if bool(getattr(item.product, "track_stock", True))
+                ],
+                actor=processed_by or approved_by,
+            )
         except ImportError:
             logger.exception("Stock service indisponible pendant le remboursement %s", refund.pk)
             raise ValueError("Impossible de remettre le stock: service stock indisponible.")
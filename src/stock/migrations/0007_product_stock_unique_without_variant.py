@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-17 01:10
+
+from django.db import migrations, models
+
+
+def merge_duplicate_stocks(apps, schema_editor):
+    """Fold duplicate product-level rows (no variant) into the oldest one."""
+    ProductStock = apps.get_model("stock", "ProductStock")
+    kept = {}
+    duplicates = []
+    rows = ProductStock.objects.filter(variant__isnull=True).order_by("created_at")
+    for stock in rows.iterator():
+        key = (stock.store_id, stock.product_id)
+        first = kept.get(key)
+        if first is None:
+            kept[key] = stock
+            continue
+        first.quantity += stock.quantity
+        first.reserved_qty += stock.reserved_qty
+        first.min_qty = max(first.min_qty, stock.min_qty)
+        first.save(update_fields=["quantity", "reserved_qty", "min_qty"])
+        duplicates.append(stock.pk)
+    for start in range(0, len(duplicates), 500):
+        ProductStock.objects.filter(pk__in=duplicates[start:start + 500]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stock', '0006_alter_productstock_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stocks, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='productstock',
+            constraint=models.UniqueConstraint(condition=models.Q(('variant__isnull', True)), fields=('store', 'product'), name='uniq_product_stock_without_variant'),
+        ),
+    ]
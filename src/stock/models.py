@@ -44,6 +44,14 @@ class ProductStock(TimeStampedModel):
     class Meta:
         ordering = ["product__name"]
         unique_together = [["store", "product", "variant"]]
+        constraints = [
+            # NULL variants are distinct for unique_together: one product-level row per store.
+            models.UniqueConstraint(
+                fields=["store", "product"],
+                condition=models.Q(variant__isnull=True),
+                name="uniq_product_stock_without_variant",
+            ),
+        ]
         verbose_name = "Stock produit"
         verbose_name_plural = "Stocks produits"
 
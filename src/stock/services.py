@@ -3,7 +3,8 @@ import uuid
 import logging
 from decimal import Decimal, InvalidOperation
 
-from django.db import transaction
+from django.db import connection, transaction
+from django.db.models import Q
 from django.utils import timezone
 
 from .models import (
@@ -54,111 +55,422 @@ def _resolve_lot_source_type(movement_type: str) -> str:
     return mapping.get(movement, StockLot.SourceType.UNKNOWN)
 
 
-def _create_stock_lot(
-    *,
-    store,
-    product,
-    quantity: int,
-    unit_cost: Decimal,
-    movement_type: str,
-    reference: str = "",
-):
-    qty = int(quantity or 0)
-    if qty <= 0:
-        return None
-
-    lot = StockLot.objects.create(
-        store=store,
-        product=product,
-        quantity_initial=qty,
-        quantity_remaining=qty,
-        unit_cost=_safe_decimal(unit_cost).quantize(Decimal("0.01")),
-        source_type=_resolve_lot_source_type(movement_type),
-        source_reference=(reference or "").strip(),
-        received_at=timezone.now(),
+def _empty_consumption(product, requested_qty: int = 0):
+    return {
+        "requested_qty": requested_qty,
+        "consumed_qty": 0,
+        "shortage_qty": 0,
+        "applied_unit_cost": _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01")),
+        "consumed_lots": [],
+    }
+
+
+# One statement per batch: rank every open lot of the requested products by
+# cumulative remaining quantity in FIFO order, then decrement only the lots
+# needed to cover each requested total.  No ``FOR UPDATE`` is needed on the
+# lots: callers already hold the ProductStock row lock of every requested
+# (store, product), which serialises all lot writes for that product.
+_FIFO_CONSUME_SQL = """
+WITH requested (store_id, product_id, qty) AS (
+    VALUES {values}
+),
+ranked AS (
+    SELECT
+        lot.id AS lot_id,
+        requested.qty,
+        lot.quantity_remaining,
+        SUM(lot.quantity_remaining) OVER (
+            PARTITION BY lot.store_id, lot.product_id
+            ORDER BY lot.received_at, lot.created_at, lot.id
+        ) - lot.quantity_remaining AS qty_before
+    FROM {table} AS lot
+    JOIN requested
+      ON requested.store_id = lot.store_id
+     AND requested.product_id = lot.product_id
+    WHERE lot.quantity_remaining > 0
+),
+consumed AS (
+    SELECT lot_id, LEAST(quantity_remaining, qty - qty_before) AS take
+    FROM ranked
+    WHERE qty_before < qty
+)
+UPDATE {table} AS lot
+SET quantity_remaining = lot.quantity_remaining - consumed.take,
+    updated_at = %s
+FROM consumed
+WHERE lot.id = consumed.lot_id
+RETURNING lot.id, lot.store_id, lot.product_id, consumed.take,
+          lot.unit_cost, lot.received_at, lot.created_at
+"""
+
+
+def _take_lots_set_based(totals):
+    """Consume lots with a single UPDATE ... RETURNING (PostgreSQL)."""
+    values = ", ".join(["(%s::uuid, %s::uuid, %s::integer)"] * len(totals))
+    params = []
+    for (store_id, product_id), qty in totals.items():
+        params.extend([store_id, product_id, qty])
+    params.append(timezone.now())
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            _FIFO_CONSUME_SQL.format(values=values, table=StockLot._meta.db_table),
+            params,
+        )
+        rows = cursor.fetchall()
+
+    # RETURNING gives no ordering guarantee: restore FIFO order per product.
+    rows.sort(key=lambda row: (row[5], row[6], str(row[0])))
+    taken = {key: [] for key in totals}
+    for lot_id, store_id, product_id, take, unit_cost, _received_at, _created_at in rows:
+        taken[(str(store_id), str(product_id))].append((str(lot_id), int(take), unit_cost))
+    return taken
+
+
+def _take_lots_in_python(totals):
+    """Consume lots by loading them and writing back with ``bulk_update``.
+
+    Fallback for database backends without ``UPDATE ... FROM ... RETURNING``
+    and window functions in the same statement (SQLite in tests).
+    """
+    lots_by_key = {key: [] for key in totals}
+    lot_filter = Q()
+    for store_id, product_id in sorted(totals):
+        lot_filter |= Q(store_id=store_id, product_id=product_id)
+    lots = (
+        StockLot.objects.select_for_update()
+        .filter(lot_filter, quantity_remaining__gt=0)
+        .order_by("store_id", "product_id", "received_at", "created_at", "id")
     )
-    return lot
+    for lot in lots:
+        lots_by_key[(str(lot.store_id), str(lot.product_id))].append(lot)
+
+    now = timezone.now()
+    taken = {key: [] for key in totals}
+    touched_lots = []
+    for key, qty in totals.items():
+        remaining = qty
+        for lot in lots_by_key[key]:
+            if remaining <= 0:
+                break
+            take = min(int(lot.quantity_remaining), remaining)
+            lot.quantity_remaining -= take
+            lot.updated_at = now
+            touched_lots.append(lot)
+            remaining -= take
+            taken[key].append((str(lot.pk), take, lot.unit_cost))
+
+    if touched_lots:
+        StockLot.objects.bulk_update(touched_lots, ["quantity_remaining", "updated_at"])
+    return taken
+
+
+def _consume_stock_lots_fifo_many(requests):
+    """Consume lots in FIFO order for several (store, product, quantity) requests.
+
+    Requested quantities are summed per product and consumed with one
+    set-based statement (constant query count however fragmented the lots
+    are), then split back across the requests in input order.  Returns one
+    valuation dict per request, in input order.
+    """
+    results = [None] * len(requests)
+    pending = []
+    totals = {}
+    for index, (store, product, quantity) in enumerate(requests):
+        requested_qty = max(int(quantity or 0), 0)
+        if requested_qty == 0:
+            results[index] = _empty_consumption(product)
+            continue
+        key = (str(store.pk), str(product.pk))
+        totals[key] = totals.get(key, 0) + requested_qty
+        pending.append((index, key, product, requested_qty))
+
+    if not pending:
+        return results
+
+    if connection.vendor == "postgresql":
+        taken = _take_lots_set_based(totals)
+    else:
+        taken = _take_lots_in_python(totals)
+
+    # Per-product position in the consumed lots: [lot index, qty left in lot].
+    positions = {key: [0, taken[key][0][1] if taken[key] else 0] for key in taken}
+    for index, key, product, requested_qty in pending:
+        remaining = requested_qty
+        consumed_lots = []
+        total_cost = Decimal("0.00")
+        total_qty = 0
+
+        lots = taken[key]
+        position = positions[key]
+        while remaining > 0 and position[0] < len(lots):
+            lot_id, _lot_take, unit_cost = lots[position[0]]
+            take = min(position[1], remaining)
+            lot_cost = _safe_decimal(unit_cost)
+            total_cost += Decimal(str(take)) * lot_cost
+            total_qty += take
+            remaining -= take
+            consumed_lots.append(
+                {
+                    "lot_id": lot_id,
+                    "qty": take,
+                    "unit_cost": lot_cost.quantize(Decimal("0.01")),
+                }
+            )
+            position[1] -= take
+            if position[1] <= 0:
+                position[0] += 1
+                position[1] = lots[position[0]][1] if position[0] < len(lots) else 0
+
+        shortage_qty = max(remaining, 0)
+        if shortage_qty > 0:
+            # Backward compatibility: existing stock may predate FIFO lots.
+            fallback_cost = _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01"))
+            shortage_dec = Decimal(str(shortage_qty))
+            total_cost += shortage_dec * fallback_cost
+            total_qty += shortage_qty
+            consumed_lots.append(
+                {
+                    "lot_id": "LEGACY",
+                    "qty": shortage_qty,
+                    "unit_cost": fallback_cost,
+                }
+            )
+
+        if total_qty > 0:
+            applied_unit_cost = (total_cost / Decimal(str(total_qty))).quantize(Decimal("0.01"))
+        else:
+            applied_unit_cost = _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01"))
+
+        results[index] = {
+            "requested_qty": requested_qty,
+            "consumed_qty": total_qty,
+            "shortage_qty": shortage_qty,
+            "applied_unit_cost": applied_unit_cost,
+            "consumed_lots": consumed_lots,
+        }
+
+    return results
 
 
 def _consume_stock_lots_fifo(*, store, product, quantity: int, allow_negative: bool):
     """Consume product lots in FIFO order and return valuation details."""
-    requested_qty = max(int(quantity or 0), 0)
-    if requested_qty == 0:
-        return {
-            "requested_qty": 0,
-            "consumed_qty": 0,
-            "shortage_qty": 0,
-            "applied_unit_cost": _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01")),
-            "consumed_lots": [],
-        }
+    return _consume_stock_lots_fifo_many([(store, product, quantity)])[0]
 
-    lots = list(
-        StockLot.objects.select_for_update()
-        .filter(
-            store=store,
-            product=product,
-            quantity_remaining__gt=0,
-        )
-        .order_by("received_at", "created_at")
+
+def _lock_product_stocks(pairs):
+    """Lock (and create when missing) the ProductStock rows for *pairs*.
+
+    *pairs* is an iterable of ``(store, product)``; only product-level rows
+    (no variant) are concerned.  Missing rows are created first, then every
+    row is locked with one ``SELECT ... FOR UPDATE`` ordered by
+    ``(store_id, product_id)`` so that concurrent batches touching
+    overlapping products always acquire their locks in the same order.
+    Returns a dict keyed by ``(store_id, product_id)``.
+    """
+    objects_by_key = {}
+    for store, product in pairs:
+        objects_by_key[(str(store.pk), str(product.pk))] = (store, product)
+    if not objects_by_key:
+        return {}
+
+    # Two IN lists instead of one OR per pair; the cross product is narrowed below.
+    rows = ProductStock.objects.filter(
+        store_id__in={store_id for store_id, _ in objects_by_key},
+        product_id__in={product_id for _, product_id in objects_by_key},
+        variant__isnull=True,
     )
 
-    remaining = requested_qty
-    consumed_lots = []
-    total_cost = Decimal("0.00")
-    total_qty = 0
+    existing = {
+        (str(store_id), str(product_id))
+        for store_id, product_id in rows.values_list("store_id", "product_id")
+    }
+    missing = [key for key in objects_by_key if key not in existing]
+    if missing:
+        # Conflicts are caught by uniq_product_stock_without_variant.
+        ProductStock.objects.bulk_create(
+            [
+                ProductStock(
+                    store=objects_by_key[key][0],
+                    product=objects_by_key[key][1],
+                    quantity=0,
+                )
+                for key in sorted(missing)
+            ],
+            ignore_conflicts=True,
+        )
 
-    for lot in lots:
-        if remaining <= 0:
-            break
-        take = min(int(lot.quantity_remaining), remaining)
-        if take <= 0:
+    stocks = {}
+    for stock in rows.select_for_update().order_by("store_id", "product_id"):
+        key = (str(stock.store_id), str(stock.product_id))
+        if key not in objects_by_key:
             continue
-        lot.quantity_remaining -= take
-        lot.save(update_fields=["quantity_remaining", "updated_at"])
-
-        take_dec = Decimal(str(take))
-        lot_cost = _safe_decimal(lot.unit_cost)
-        total_cost += take_dec * lot_cost
-        total_qty += take
-        remaining -= take
-        consumed_lots.append(
-            {
-                "lot_id": str(lot.pk),
-                "qty": take,
-                "unit_cost": lot_cost.quantize(Decimal("0.01")),
-            }
-        )
+        # Reuse the caller's instances so alerts/logging do not refetch them.
+        stock.store, stock.product = objects_by_key[key]
+        stocks[key] = stock
+    return stocks
 
-    shortage_qty = max(remaining, 0)
-    if shortage_qty > 0:
-        # Backward compatibility: existing stock may predate FIFO lots.
-        fallback_cost = _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01"))
-        shortage_dec = Decimal(str(shortage_qty))
-        total_cost += shortage_dec * fallback_cost
-        total_qty += shortage_qty
-        consumed_lots.append(
-            {
-                "lot_id": "LEGACY",
-                "qty": shortage_qty,
-                "unit_cost": fallback_cost,
-            }
+
+def _refresh_low_stock_alerts_for_stocks(stocks):
+    """Create low-stock/out-of-stock alerts for several ProductStock rows."""
+    try:
+        from alerts.services import refresh_stock_level_alerts
+        refresh_stock_level_alerts(stocks)
+    except Exception:
+        logger.warning(
+            "Low-stock alert refresh failed for %d stock row(s)",
+            len(stocks),
+            exc_info=True,
         )
 
-    if total_qty > 0:
-        applied_unit_cost = (total_cost / Decimal(str(total_qty))).quantize(Decimal("0.01"))
-    else:
-        applied_unit_cost = _safe_decimal(getattr(product, "cost_price", Decimal("0.00"))).quantize(Decimal("0.01"))
 
-    return {
-        "requested_qty": requested_qty,
-        "consumed_qty": total_qty,
-        "shortage_qty": shortage_qty,
-        "applied_unit_cost": applied_unit_cost,
-        "consumed_lots": consumed_lots,
-    }
+@transaction.atomic
+def adjust_stock_many(lines, *, actor, batch_id=None):
+    """
+    Apply several stock adjustments in one batch.
+
+    This is the multi-line counterpart of :func:`adjust_stock`.  All the
+    affected ProductStock rows are locked in one query, in a deterministic
+    ``(store, product)`` order, FIFO lots are consumed for every outgoing
+    line together, incoming lots and InventoryMovement rows are
+    bulk-created and low-stock alerts are refreshed once per stock row.
+
+    Args:
+        lines: Iterable of dicts with keys ``store``, ``product``,
+            ``qty_delta``, ``movement_type``, ``reason`` and optionally
+            ``reference`` and ``unit_cost`` (same meaning as the
+            :func:`adjust_stock` arguments).  Several lines may target the
+            same product; they are applied in input order.
+        actor: The User performing the action.
+        batch_id: Optional UUID shared by all created movements.
+
+    Returns:
+        A list of ``(movement, fifo_details)`` tuples, in input order.
+
+    Raises:
+        ValueError: If a product does not track stock, or if an OUT-type
+            movement would result in insufficient stock.
+    """
+    lines = [
+        {
+            "store": line["store"],
+            "product": line["product"],
+            "qty_delta": int(line["qty_delta"]),
+            "movement_type": line["movement_type"],
+            "reason": line.get("reason", ""),
+            "reference": line.get("reference", "") or "",
+            "unit_cost": line.get("unit_cost"),
+        }
+        for line in lines
+    ]
+    if not lines:
+        return []
+
+    for line in lines:
+        if not bool(getattr(line["product"], "track_stock", True)):
+            raise ValueError(
+                f"Le produit '{line['product']}' est un service et ne suit pas le stock."
+            )
+
+    stocks = _lock_product_stocks((line["store"], line["product"]) for line in lines)
+
+    # Validate availability line by line, as sequential adjust_stock calls would.
+    for line in lines:
+        store, product, qty_delta = line["store"], line["product"], line["qty_delta"]
+        stock = stocks[(str(store.pk), str(product.pk))]
+        allow_negative = bool(getattr(store, "allow_negative_stock", False))
+        if qty_delta < 0 and (stock.available_qty + qty_delta) < 0:
+            if not allow_negative:
+                raise ValueError(
+                    f"Stock insuffisant pour {product} dans {store}. "
+                    f"Disponible: {stock.available_qty}, demande: {abs(qty_delta)}."
+                )
+        stock.quantity += qty_delta
+
+    outgoing = [index for index, line in enumerate(lines) if line["qty_delta"] < 0]
+    consumptions = _consume_stock_lots_fifo_many(
+        [
+            (lines[index]["store"], lines[index]["product"], abs(lines[index]["qty_delta"]))
+            for index in outgoing
+        ]
+    )
+    consumption_by_index = dict(zip(outgoing, consumptions))
+
+    now = timezone.now()
+    fifo_details_list = []
+    new_lots = []
+    new_lot_indexes = []
+    for index, line in enumerate(lines):
+        fifo_details = {
+            "applied_unit_cost": None,
+            "consumed_lots": [],
+            "shortage_qty": 0,
+            "created_lot_id": "",
+        }
+        if line["qty_delta"] > 0:
+            applied_in_cost = _safe_decimal(
+                line["unit_cost"]
+                if line["unit_cost"] is not None
+                else getattr(line["product"], "cost_price", Decimal("0.00"))
+            ).quantize(Decimal("0.01"))
+            fifo_details["applied_unit_cost"] = applied_in_cost
+            new_lots.append(
+                StockLot(
+                    store=line["store"],
+                    product=line["product"],
+                    quantity_initial=line["qty_delta"],
+                    quantity_remaining=line["qty_delta"],
+                    unit_cost=applied_in_cost,
+                    source_type=_resolve_lot_source_type(line["movement_type"]),
+                    source_reference=line["reference"].strip(),
+                    received_at=now,
+                )
+            )
+            new_lot_indexes.append(index)
+        elif line["qty_delta"] < 0:
+            consumption = consumption_by_index[index]
+            fifo_details["applied_unit_cost"] = consumption["applied_unit_cost"]
+            fifo_details["consumed_lots"] = consumption["consumed_lots"]
+            fifo_details["shortage_qty"] = int(consumption["shortage_qty"])
+        fifo_details_list.append(fifo_details)
+
+    if new_lots:
+        StockLot.objects.bulk_create(new_lots)
+        for index, lot in zip(new_lot_indexes, new_lots):
+            fifo_details_list[index]["created_lot_id"] = str(lot.pk)
+
+    changed_stocks = list(stocks.values())
+    for stock in changed_stocks:
+        stock.updated_at = now
+    ProductStock.objects.bulk_update(changed_stocks, ["quantity", "updated_at"])
+    _refresh_low_stock_alerts_for_stocks(changed_stocks)
+
+    movements = InventoryMovement.objects.bulk_create(
+        [
+            InventoryMovement(
+                store=line["store"],
+                product=line["product"],
+                movement_type=line["movement_type"],
+                quantity=line["qty_delta"],
+                reference=line["reference"],
+                reason=line["reason"],
+                actor=actor,
+                batch_id=batch_id,
+            )
+            for line in lines
+        ]
+    )
+
+    for line in lines:
+        logger.info(
+            "Stock adjusted: %s %+d @ %s by %s (type=%s, ref=%s)",
+            line["product"], line["qty_delta"], line["store"], actor,
+            line["movement_type"], line["reference"],
+        )
+
+    return list(zip(movements, fifo_details_list))
 
 
-@transaction.atomic
 def adjust_stock(
     store,
     product,
@@ -176,6 +488,7 @@ def adjust_stock(
 
     Uses ``select_for_update`` on the ProductStock row to prevent race
     conditions.  Creates an InventoryMovement record for traceability.
+    Single-line shortcut for :func:`adjust_stock_many`.
 
     Args:
         store: The Store instance.
@@ -192,77 +505,22 @@ def adjust_stock(
     Raises:
         ValueError: If an OUT-type movement would result in insufficient stock.
     """
-    if not bool(getattr(product, "track_stock", True)):
-        raise ValueError(
-            f"Le produit '{product}' est un service et ne suit pas le stock."
-        )
-
-    stock, _created = ProductStock.objects.select_for_update().get_or_create(
-        store=store,
-        product=product,
-        defaults={"quantity": 0},
-    )
-    allow_negative = bool(getattr(store, "allow_negative_stock", False))
-
-    # For outgoing movements, verify sufficient available stock (respects reservations)
-    if qty_delta < 0 and (stock.available_qty + qty_delta) < 0:
-        if not allow_negative:
-            raise ValueError(
-                f"Stock insuffisant pour {product} dans {store}. "
-                f"Disponible: {stock.available_qty}, demande: {abs(qty_delta)}."
-            )
-
-    fifo_details = {
-        "applied_unit_cost": None,
-        "consumed_lots": [],
-        "shortage_qty": 0,
-        "created_lot_id": "",
-    }
-    if qty_delta > 0:
-        applied_in_cost = _safe_decimal(
-            unit_cost if unit_cost is not None else getattr(product, "cost_price", Decimal("0.00"))
-        ).quantize(Decimal("0.01"))
-        created_lot = _create_stock_lot(
-            store=store,
-            product=product,
-            quantity=int(qty_delta),
-            unit_cost=applied_in_cost,
-            movement_type=movement_type,
-            reference=reference,
-        )
-        fifo_details["applied_unit_cost"] = applied_in_cost
-        fifo_details["created_lot_id"] = str(created_lot.pk) if created_lot else ""
-    elif qty_delta < 0:
-        consumption = _consume_stock_lots_fifo(
-            store=store,
-            product=product,
-            quantity=abs(int(qty_delta)),
-            allow_negative=allow_negative,
-        )
-        fifo_details["applied_unit_cost"] = consumption["applied_unit_cost"]
-        fifo_details["consumed_lots"] = consumption["consumed_lots"]
-        fifo_details["shortage_qty"] = int(consumption["shortage_qty"])
-
-    stock.quantity += qty_delta
-    stock.save(update_fields=["quantity", "updated_at"])
-    _refresh_low_stock_alert_for_stock(stock)
-
-    movement = InventoryMovement.objects.create(
-        store=store,
-        product=product,
-        movement_type=movement_type,
-        quantity=qty_delta,
-        reference=reference,
-        reason=reason,
+    [(movement, fifo_details)] = adjust_stock_many(
+        [
+            {
+                "store": store,
+                "product": product,
+                "qty_delta": qty_delta,
+                "movement_type": movement_type,
+                "reason": reason,
+                "reference": reference,
+                "unit_cost": unit_cost,
+            }
+        ],
         actor=actor,
         batch_id=batch_id,
     )
 
-    logger.info(
-        "Stock adjusted: %s %+d @ %s by %s (type=%s, ref=%s)",
-        product, qty_delta, store, actor, movement_type, reference,
-    )
-
     if return_details:
         return movement, fifo_details
     return movement
@@ -350,6 +608,132 @@ def release_stock(store, product, qty, actor, reference=""):
     )
 
 
+@transaction.atomic
+def apply_reserved_qty_deltas(store, deltas):
+    """
+    Apply reserved-quantity deltas to several products of one store.
+
+    Used when a reserving sale enters or leaves the PARTIALLY_PAID state:
+    only that sale's own quantities are added or removed, instead of
+    re-aggregating every open reservation of the store.  Rows are locked in
+    the same deterministic order as :func:`adjust_stock_many`.  A release
+    never takes ``reserved_qty`` below zero; such drift is logged and left
+    to :func:`reconcile_reserved_stock`.
+
+    Args:
+        store: The Store instance.
+        deltas: Iterable of ``(product, delta)`` tuples; several entries for
+            the same product are summed.
+    """
+    totals = {}
+    products = {}
+    for product, delta in deltas:
+        key = str(product.pk)
+        totals[key] = totals.get(key, 0) + int(delta)
+        products[key] = product
+    totals = {key: delta for key, delta in totals.items() if delta}
+    if not totals:
+        return
+
+    stocks = _lock_product_stocks((store, products[key]) for key in totals)
+    now = timezone.now()
+    changed = []
+    for key, delta in totals.items():
+        stock = stocks[(str(store.pk), key)]
+        target = stock.reserved_qty + delta
+        if target < 0:
+            logger.warning(
+                "Reserved stock drift for %s @ %s: reserved=%d, release=%d",
+                stock.product, store, stock.reserved_qty, -delta,
+            )
+            target = 0
+        stock.reserved_qty = target
+        stock.updated_at = now
+        changed.append(stock)
+
+    ProductStock.objects.bulk_update(changed, ["reserved_qty", "updated_at"])
+    _refresh_low_stock_alerts_for_stocks(changed)
+
+
+def reconcile_reserved_stock(store=None):
+    """
+    Detect and repair drift between ``reserved_qty`` and open reservations.
+
+    The expected value for each product-level ProductStock row (the one
+    :func:`apply_reserved_qty_deltas` maintains) is the quantity of its
+    product across PARTIALLY_PAID sales that currently hold a reservation
+    (``stock_reserved=True``).  Each store is handled in its own
+    transaction: its rows are locked first, in the order used by
+    :func:`_lock_product_stocks`, and only then are the reservations
+    aggregated, so a layaway payment committed meanwhile is never undone.
+    Drifted rows are fixed with one ``bulk_update``.
+
+    Args:
+        store: Optional Store to restrict the reconciliation to.
+
+    Returns:
+        The number of ProductStock rows that were repaired.
+    """
+    from django.apps import apps
+    from django.db.models import Sum
+
+    SaleItem = apps.get_model("sales", "SaleItem")
+
+    reservations = SaleItem.objects.filter(
+        sale__status="PARTIALLY_PAID",
+        sale__reserve_stock=True,
+        sale__stock_reserved=True,
+        product__track_stock=True,
+    ).order_by()
+    stocks = ProductStock.objects.filter(variant__isnull=True).order_by()
+    if store is not None:
+        store_ids = {store.pk}
+    else:
+        store_ids = set(stocks.filter(reserved_qty__gt=0).values_list("store_id", flat=True))
+        store_ids.update(reservations.values_list("sale__store_id", flat=True).distinct())
+
+    repaired = 0
+    for store_id in sorted(store_ids, key=str):
+        store_reservations = reservations.filter(sale__store_id=store_id)
+        product_ids = set(
+            stocks.filter(store_id=store_id, reserved_qty__gt=0).values_list("product_id", flat=True)
+        )
+        product_ids.update(store_reservations.values_list("product_id", flat=True).distinct())
+        if not product_ids:
+            continue
+
+        with transaction.atomic():
+            locked = list(
+                stocks.filter(store_id=store_id, product_id__in=product_ids)
+                .select_for_update()
+                .order_by("store_id", "product_id")
+            )
+            expected = {
+                str(product_id): int(total or 0)
+                for product_id, total in store_reservations.filter(product_id__in=product_ids)
+                .values("product_id")
+                .annotate(total=Sum("quantity"))
+                .values_list("product_id", "total")
+            }
+            changed = []
+            now = timezone.now()
+            for stock in locked:
+                target = expected.get(str(stock.product_id), 0)
+                if stock.reserved_qty != target:
+                    logger.warning(
+                        "Reserved stock repaired for %s/%s: %d -> %d",
+                        stock.store_id, stock.product_id, stock.reserved_qty, target,
+                    )
+                    stock.reserved_qty = target
+                    stock.updated_at = now
+                    changed.append(stock)
+            if changed:
+                ProductStock.objects.bulk_update(changed, ["reserved_qty", "updated_at"])
+        repaired += len(changed)
+
+    return repaired
+
+
 @transaction.atomic
 def process_transfer(transfer, actor):
     """
@@ -370,35 +754,50 @@ def process_transfer(transfer, actor):
         raise ValueError("Le transfert doit etre approuve avant d'etre traite.")
 
     batch_id = uuid.uuid4()
-    lines = transfer.lines.select_related("product").all()
+    lines = list(transfer.lines.select_related("product"))
 
-    if not lines.exists():
+    if not lines:
         raise ValueError("Le transfert ne contient aucune ligne.")
 
-    for line in lines:
-        # Transfer-out consumes source lots in FIFO; incoming lot keeps moved unit cost.
-        _out_movement, out_details = adjust_stock(
-            store=transfer.from_store,
-            product=line.product,
-            qty_delta=-int(line.quantity),
-            movement_type=InventoryMovement.MovementType.TRANSFER_OUT,
-            reason=f"Transfert vers {transfer.to_store}",
-            actor=actor,
-            reference=str(transfer.pk),
-            batch_id=batch_id,
-            return_details=True,
-        )
-        adjust_stock(
-            store=transfer.to_store,
-            product=line.product,
-            qty_delta=int(line.quantity),
-            movement_type=InventoryMovement.MovementType.TRANSFER_IN,
-            reason=f"Transfert depuis {transfer.from_store}",
-            actor=actor,
-            reference=str(transfer.pk),
-            batch_id=batch_id,
-            unit_cost=out_details.get("applied_unit_cost"),
-        )
+    # Lock both sides up front so opposite transfers between the same two
+    # stores cannot acquire their row locks in reverse order.
+    _lock_product_stocks(
+        [(transfer.from_store, line.product) for line in lines]
+        + [(transfer.to_store, line.product) for line in lines]
+    )
+
+    # Transfer-out consumes source lots in FIFO; incoming lots keep moved unit cost.
+    out_results = adjust_stock_many(
+        [
+            {
+                "store": transfer.from_store,
+                "product": line.product,
+                "qty_delta": -int(line.quantity),
+                "movement_type": InventoryMovement.MovementType.TRANSFER_OUT,
+                "reason": f"Transfert vers {transfer.to_store}",
+                "reference": str(transfer.pk),
+            }
+            for line in lines
+        ],
+        actor=actor,
+        batch_id=batch_id,
+    )
+    adjust_stock_many(
+        [
+            {
+                "store": transfer.to_store,
+                "product": line.product,
+                "qty_delta": int(line.quantity),
+                "movement_type": InventoryMovement.MovementType.TRANSFER_IN,
+                "reason": f"Transfert depuis {transfer.from_store}",
+                "reference": str(transfer.pk),
+                "unit_cost": out_details.get("applied_unit_cost"),
+            }
+            for line, (_out_movement, out_details) in zip(lines, out_results)
+        ],
+        actor=actor,
+        batch_id=batch_id,
+    )
 
     # Mark transfer as in-transit
     transfer.status = StockTransfer.Status.IN_TRANSIT
@@ -406,7 +805,7 @@ def process_transfer(transfer, actor):
 
     logger.info(
         "Transfer processed: %s -> %s (%d lines, batch=%s) by %s",
-        transfer.from_store, transfer.to_store, lines.count(), batch_id, actor,
+        transfer.from_store, transfer.to_store, len(lines), batch_id, actor,
     )
 
 
@@ -439,24 +838,26 @@ def complete_stock_count(stock_count, actor=None):
             f"{uncounted.count()} ligne(s) n'ont pas encore ete comptee(s)."
         )
 
+    lines = list(lines)
     batch_id = uuid.uuid4()
 
-    for line in lines:
-        variance = line.variance
-        if variance == 0:
-            continue
-
-        adjust_stock(
-            store=stock_count.store,
-            product=line.product,
-            qty_delta=variance,
-            movement_type=InventoryMovement.MovementType.ADJUST,
-            reference=str(stock_count.pk),
-            reason=f"Ajustement inventaire (systeme={line.system_qty}, compte={line.counted_qty})",
-            actor=actor,
-            batch_id=batch_id,
-            unit_cost=getattr(line.product, "cost_price", Decimal("0.00")),
-        )
+    adjust_stock_many(
+        [
+            {
+                "store": stock_count.store,
+                "product": line.product,
+                "qty_delta": line.variance,
+                "movement_type": InventoryMovement.MovementType.ADJUST,
+                "reference": str(stock_count.pk),
+                "reason": f"Ajustement inventaire (systeme={line.system_qty}, compte={line.counted_qty})",
+                "unit_cost": getattr(line.product, "cost_price", Decimal("0.00")),
+            }
+            for line in lines
+            if line.variance != 0
+        ],
+        actor=actor,
+        batch_id=batch_id,
+    )
 
     stock_count.status = StockCount.Status.COMPLETED
     stock_count.completed_at = timezone.now()
@@ -464,5 +865,5 @@ def complete_stock_count(stock_count, actor=None):
 
     logger.info(
         "Stock count completed: %s (%d lines, batch=%s) by %s",
-        stock_count, lines.count(), batch_id, actor,
+        stock_count, len(lines), batch_id, actor,
     )
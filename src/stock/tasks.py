@@ -0,0 +1,22 @@
+"""Celery tasks for the stock app."""
+import logging
+
+from celery import shared_task
+
+logger = logging.getLogger("boutique")
+
+
+@shared_task(name="stock.tasks.reconcile_reserved_stock")
+def reconcile_reserved_stock():
+    """Repair drift between ProductStock.reserved_qty and open layaway sales.
+
+    Reservations are maintained incrementally on sale status changes; this
+    periodic pass recomputes the expected values and fixes any row that
+    diverged (manual edits, interrupted transactions, legacy data).
+    """
+    from stock.services import reconcile_reserved_stock as _reconcile
+
+    repaired = _reconcile()
+    if repaired:
+        logger.warning("reconcile_reserved_stock repaired %d stock row(s).", repaired)
+    return f"{repaired} stock row(s) repaired"
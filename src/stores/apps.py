@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class StoresConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "stores"
+
+    def ready(self):
+        # Keep cached module matrices in sync with their source rows.
+        from stores import signals  # noqa: F401
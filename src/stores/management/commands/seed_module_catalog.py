@@ -16,6 +16,7 @@ from stores.models import (
     MODULE_CODE_LABELS,
     MODULE_DEFAULT_ORDER,
 )
+from stores.services import bump_module_matrix_version
 
 
 MODULE_DESCRIPTIONS = {
@@ -253,6 +254,7 @@ class Command(BaseCommand):
                 continue
             if force:
                 active_qs.update(status=EnterprisePlanAssignment.Status.CANCELED)
+                bump_module_matrix_version(enterprise_id=enterprise.pk)
 
             EnterprisePlanAssignment.objects.create(
                 enterprise=enterprise,
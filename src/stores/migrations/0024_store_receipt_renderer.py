@@ -0,0 +1,18 @@
+# Generated by Django 5.1.15 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0023_store_receipt_custom_footer_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='receipt_renderer',
+            field=models.CharField(choices=[('HTML', 'Mise en page HTML (WeasyPrint)'), ('THERMAL', 'Ticket thermique rapide')], default='HTML', help_text='Ticket thermique rapide: tickets TICKET/COMPACT generes sans WeasyPrint (PDF 80 mm ou ESC/POS).', max_length=10, verbose_name='rendu des tickets'),
+        ),
+    ]
@@ -1,14 +1,11 @@
 """Models for the stores app."""
-import re
 import uuid
 from decimal import Decimal
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models, transaction
-from django.db.models import F
+from django.db import models
 from django.utils import timezone
-from django.utils.text import slugify
 
 from core.models import TimeStampedModel
 
@@ -53,6 +50,7 @@ FEATURE_FLAG_LABELS = {
   "fraud_detection": "Detection fraude/anomalies",
   "advanced_permissions": "Permissions avancees (capacites)",
   "accounting": "Comptabilite SYSCOHADA",
+  "sync_side_effects": "Effets post-paiement synchrones (sans file outbox)",
 }
 
 FEATURE_FLAG_DEFAULTS = {
@@ -82,6 +80,7 @@ FEATURE_FLAG_DEFAULTS = {
   "fraud_detection": True,
   "advanced_permissions": True,
   "accounting": False,
+  "sync_side_effects": False,
   "delivery_management": False,
   "communication_management": False,
   "planning_management": False,
@@ -710,6 +709,18 @@ class Store(TimeStampedModel):
         help_text="Jusqu'a 3 lignes libres affichees en bas du ticket.",
     )
 
+    class ReceiptRenderer(models.TextChoices):
+        HTML = "HTML", "Mise en page HTML (WeasyPrint)"
+        THERMAL = "THERMAL", "Ticket thermique rapide"
+
+    receipt_renderer = models.CharField(
+        "rendu des tickets",
+        max_length=10,
+        choices=ReceiptRenderer.choices,
+        default=ReceiptRenderer.HTML,
+        help_text="Ticket thermique rapide: tickets TICKET/COMPACT generes sans WeasyPrint (PDF 80 mm ou ESC/POS).",
+    )
+
     class Meta:
         ordering = ["name"]
         verbose_name = "Boutique"
@@ -867,20 +878,16 @@ class Sequence(models.Model):
     def generate_next(self):
         """Atomically increment and return the next formatted number.
 
-        Returns a string like ``FAC-BQC-2026-000001``.  Uses an ``UPDATE ... SET
-        next_number = next_number + 1`` query so that concurrent callers
-        never receive the same number.
+        Returns a string like ``FAC-BQC-2026-000001``.  Uses a single
+        ``UPDATE ... RETURNING`` (see :mod:`stores.numbering`) so that
+        concurrent callers never receive the same number.
         """
-        # Lock row, read current value, increment, then return locked value.
-        with transaction.atomic():
-            locked = Sequence.objects.select_for_update().get(pk=self.pk)
-            current = locked.next_number
-            Sequence.objects.filter(pk=locked.pk).update(next_number=F("next_number") + 1)
-            # Keep the in-memory object synchronized with DB.
-            self.next_number = current + 1
-        raw_code = slugify((self.store.code or "")).upper()
-        store_code = re.sub(r"[^A-Z0-9]", "", raw_code)[:10] or "STORE"
-        return f"{self.prefix}-{store_code}-{self.year}-{current:06d}"
+        from stores.numbering import allocate_numbers, format_document_number
+
+        current = allocate_numbers(self.store, self.prefix, self.year)
+        # Keep the in-memory object synchronized with DB.
+        self.next_number = current + 1
+        return format_document_number(self.prefix, self.store.code, self.year, current)
 
 
 class AuditLog(models.Model):
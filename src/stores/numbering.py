@@ -0,0 +1,225 @@
+"""Document numbering service (invoices, quotes, credit notes, POs...).
+
+Numbers come from the per-store/prefix/year :class:`stores.models.Sequence`
+rows and are formatted as ``PREFIX-STORECODE-YYYY-000001``.
+
+Two allocation strategies are used:
+
+- **Gap-free prefixes** (``FAC`` invoices and ``AVO`` credit notes, which are
+  legal documents) take one number with a single atomic
+  ``UPDATE ... RETURNING`` inside the caller's transaction.  The row lock is
+  held until the caller commits, so a rolled-back document gives its number
+  back and numbering stays contiguous.
+- **Other prefixes** (quotes, proformas, POs, goods receipts) reserve a block
+  of ``DOCUMENT_NUMBER_BLOCK_SIZE`` numbers in one statement and hand the
+  rest out from process memory.  The block only becomes usable once the
+  reserving transaction commits, so a rollback can never lead to duplicate
+  numbers; unused numbers of a block are simply skipped (gaps are allowed
+  for these documents).
+
+Per-prefix contention metrics (allocations, database round trips, time
+spent waiting on the sequence row) are kept in process memory and can be
+read with :func:`get_numbering_metrics`.
+"""
+from __future__ import annotations
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.text import slugify
+
+logger = logging.getLogger("boutique")
+
+GAPLESS_PREFIXES = frozenset({"FAC", "AVO"})
+
+_blocks: dict[tuple[str, str, int], deque] = {}
+_metrics: dict[str, dict] = {}
+_lock = threading.Lock()
+
+
+@lru_cache(maxsize=2048)
+def format_store_code(code: str) -> str:
+    """Return the normalized store-code segment used in document numbers."""
+    raw_code = slugify(code or "").upper()
+    return re.sub(r"[^A-Z0-9]", "", raw_code)[:10] or "STORE"
+
+
+def format_document_number(prefix: str, store_code: str, year: int, number: int) -> str:
+    """Format a document number like ``FAC-BQC-2026-000001``."""
+    return f"{prefix}-{format_store_code(store_code)}-{year}-{number:06d}"
+
+
+def _block_size(prefix: str) -> int:
+    if prefix in GAPLESS_PREFIXES:
+        return 1
+    return max(int(getattr(settings, "DOCUMENT_NUMBER_BLOCK_SIZE", 1) or 1), 1)
+
+
+def _record_metrics(prefix: str, *, wait_seconds: float | None = None, from_block: bool = False) -> None:
+    with _lock:
+        stats = _metrics.setdefault(
+            prefix,
+            {
+                "allocations": 0,
+                "block_hits": 0,
+                "db_round_trips": 0,
+                "total_wait_ms": 0.0,
+                "max_wait_ms": 0.0,
+            },
+        )
+        stats["allocations"] += 1
+        if from_block:
+            stats["block_hits"] += 1
+        if wait_seconds is not None:
+            wait_ms = wait_seconds * 1000
+            stats["db_round_trips"] += 1
+            stats["total_wait_ms"] += wait_ms
+            stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+
+    slow_ms = getattr(settings, "DOCUMENT_NUMBER_SLOW_MS", 200)
+    if wait_seconds is not None and wait_seconds * 1000 >= slow_ms:
+        logger.warning(
+            "Document numbering contention on prefix %s: waited %.1f ms for the sequence row",
+            prefix, wait_seconds * 1000,
+        )
+
+
+def get_numbering_metrics() -> dict[str, dict]:
+    """Return a snapshot of per-prefix numbering metrics for this process."""
+    with _lock:
+        snapshot = {prefix: dict(stats) for prefix, stats in _metrics.items()}
+    for stats in snapshot.values():
+        trips = stats["db_round_trips"]
+        stats["avg_wait_ms"] = round(stats["total_wait_ms"] / trips, 2) if trips else 0.0
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 2)
+        stats["max_wait_ms"] = round(stats["max_wait_ms"], 2)
+    return snapshot
+
+
+def reset_numbering_state() -> None:
+    """Forget reserved blocks and metrics (tests, worker recycling)."""
+    with _lock:
+        _blocks.clear()
+        _metrics.clear()
+
+
+def _increment(store_id, prefix: str, year: int, count: int) -> int | None:
+    """Advance a sequence by *count* and return the first allocated number.
+
+    Returns ``None`` when the sequence row does not exist yet.
+    """
+    from stores.models import Sequence
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {Sequence._meta.db_table} "
+                "SET next_number = next_number + %s "
+                "WHERE store_id = %s AND prefix = %s AND year = %s "
+                "RETURNING next_number",
+                [count, store_id, prefix, year],
+            )
+            row = cursor.fetchone()
+        return (row[0] - count) if row else None
+
+    # Other engines (sqlite in local tests): lock, read, then increment.
+    current = (
+        Sequence.objects.select_for_update()
+        .filter(store_id=store_id, prefix=prefix, year=year)
+        .values_list("next_number", flat=True)
+        .first()
+    )
+    if current is None:
+        return None
+    Sequence.objects.filter(store_id=store_id, prefix=prefix, year=year).update(
+        next_number=F("next_number") + count,
+    )
+    return current
+
+
+def allocate_numbers(store, prefix: str, year: int, count: int = 1) -> int:
+    """Reserve *count* consecutive numbers and return the first one.
+
+    Runs in (or joins) a transaction: the reservation is undone if the
+    surrounding transaction rolls back.
+    """
+    from stores.models import Sequence
+
+    started = time.monotonic()
+    with transaction.atomic():
+        first = _increment(store.pk, prefix, year, count)
+        if first is None:
+            Sequence.objects.get_or_create(
+                store=store,
+                prefix=prefix,
+                year=year,
+                defaults={"next_number": 1},
+            )
+            first = _increment(store.pk, prefix, year, count)
+    _record_metrics(prefix, wait_seconds=time.monotonic() - started)
+    return first
+
+
+def _take_from_block(key) -> int | None:
+    with _lock:
+        ranges = _blocks.get(key)
+        while ranges:
+            current = ranges[0]
+            if current[0] < current[1]:
+                number = current[0]
+                current[0] += 1
+                return number
+            ranges.popleft()
+    return None
+
+
+def _install_block(key, start: int, end: int) -> None:
+    if start >= end:
+        return
+    with _lock:
+        _blocks.setdefault(key, deque()).append([start, end])
+
+
+def next_document_number(store, prefix: str, *, year: int | None = None) -> str:
+    """Return the next formatted document number for *store* and *prefix*.
+
+    Parameters
+    ----------
+    store : stores.models.Store
+    prefix : str
+        Document prefix (``FAC``, ``AVO``, ``DEV``, ``PRO``, ``PO``, ``BR``...).
+    year : int, optional
+        Numbering year; defaults to the current year.
+
+    Returns
+    -------
+    str
+    """
+    year = year or timezone.now().year
+    size = _block_size(prefix)
+
+    if size > 1:
+        key = (str(store.pk), prefix, year)
+        number = _take_from_block(key)
+        if number is not None:
+            _record_metrics(prefix, from_block=True)
+            return format_document_number(prefix, store.code, year, number)
+
+        number = allocate_numbers(store, prefix, year, count=size)
+        # The rest of the block is only safe to hand out once the
+        # reservation is durable.
+        transaction.on_commit(
+            lambda: _install_block(key, number + 1, number + size)
+        )
+        return format_document_number(prefix, store.code, year, number)
+
+    number = allocate_numbers(store, prefix, year, count=1)
+    return format_document_number(prefix, store.code, year, number)
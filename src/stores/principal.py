@@ -0,0 +1,175 @@
+"""Per-user tenancy context (enterprise, accessible stores, capabilities).
+
+API helpers and permissions used to resolve the same ``StoreUser``/``Store``
+rows several times per request.  :func:`get_principal_context` resolves them
+once, keeps the result on the user instance for the rest of the request and
+in the shared cache for ``PRINCIPAL_CONTEXT_CACHE_TTL`` seconds.
+
+Cached contexts are keyed by two version tokens: one per user (store links,
+role, custom role assignment) and one global (store activation, enterprise
+activation, custom role definitions).  ``stores.signals`` replaces them
+when those rows change.
+"""
+from __future__ import annotations
+
+import logging
+import uuid
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger("boutique")
+
+_GLOBAL_VERSION_KEY = "stores:principal:ver:global"
+
+
+@dataclass(frozen=True)
+class PrincipalContext:
+    """Tenancy facts about one user, resolved once."""
+
+    user_id: str
+    role: str | None
+    is_superuser: bool
+    # Enterprise of the default active link (active enterprise only).
+    link_enterprise_id: uuid.UUID | None
+    # Link enterprise, else the custom role's enterprise.
+    tenant_enterprise_id: uuid.UUID | None
+    # Tenant enterprise, else (superusers) the first active enterprise.
+    enterprise_id: uuid.UUID | None
+    # Stores the user may access (superuser: all, ADMIN: whole enterprise).
+    store_ids: tuple = ()
+    # Active stores explicitly linked through StoreUser, default first.
+    linked_store_ids: tuple = ()
+    # Effective capabilities per linked store id.
+    capabilities: dict = field(default_factory=dict)
+
+    def has_store(self, store_id) -> bool:
+        return str(store_id) in {str(sid) for sid in self.store_ids}
+
+    def store_capabilities(self, store_id) -> tuple | None:
+        """Return effective capabilities on a linked store, or None."""
+        return self.capabilities.get(str(store_id))
+
+
+def _user_version_key(user_id) -> str:
+    return f"stores:principal:ver:user:{user_id}"
+
+
+def invalidate_principal_context(*, user_ids=(), everything: bool = False) -> None:
+    """Drop cached contexts of *user_ids* (or of every user).
+
+    Applied immediately and again after commit, like the module matrix
+    versions.
+    """
+    keys = [_user_version_key(user_id) for user_id in user_ids if user_id]
+    if everything:
+        keys.append(_GLOBAL_VERSION_KEY)
+    if not keys:
+        return
+
+    def _bump():
+        try:
+            cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        except Exception:
+            logger.warning("Principal context cache invalidation failed", exc_info=True)
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _current_versions(user_id) -> tuple[str, str]:
+    keys = [_GLOBAL_VERSION_KEY, _user_version_key(user_id)]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            if not cache.add(key, token, timeout=None):
+                token = cache.get(key, token)
+            versions[key] = token
+    return versions[keys[0]], versions[keys[1]]
+
+
+def _build_context(user) -> PrincipalContext:
+    from stores.capabilities import ROLE_CAPABILITY_MAP
+    from stores.models import Enterprise, Store, StoreUser
+
+    role = getattr(user, "role", None)
+    is_superuser = bool(getattr(user, "is_superuser", False))
+
+    links = list(
+        StoreUser.objects
+        .filter(user=user, store__is_active=True)
+        .select_related("store__enterprise")
+        .order_by("-is_default", "store_id")
+    )
+    linked_store_ids = tuple(link.store_id for link in links)
+    default_caps = list(ROLE_CAPABILITY_MAP.get(role, []))
+    capabilities = {
+        str(link.store_id): tuple(link.capabilities or default_caps)
+        for link in links
+    }
+
+    link_enterprise_id = next(
+        (
+            link.store.enterprise_id
+            for link in links
+            if link.store.enterprise_id and link.store.enterprise.is_active
+        ),
+        None,
+    )
+    tenant_enterprise_id = link_enterprise_id or getattr(
+        getattr(user, "custom_role", None), "enterprise_id", None,
+    )
+    enterprise_id = tenant_enterprise_id
+    if enterprise_id is None and is_superuser:
+        enterprise_id = (
+            Enterprise.objects.filter(is_active=True)
+            .order_by("created_at")
+            .values_list("id", flat=True)
+            .first()
+        )
+
+    if is_superuser:
+        store_ids = tuple(Store.objects.filter(is_active=True).values_list("id", flat=True))
+    elif role == "ADMIN" and enterprise_id is not None:
+        store_ids = tuple(
+            Store.objects.filter(enterprise_id=enterprise_id, is_active=True)
+            .values_list("id", flat=True)
+        )
+    else:
+        store_ids = linked_store_ids
+
+    return PrincipalContext(
+        user_id=str(user.pk),
+        role=role,
+        is_superuser=is_superuser,
+        link_enterprise_id=link_enterprise_id,
+        tenant_enterprise_id=tenant_enterprise_id,
+        enterprise_id=enterprise_id,
+        store_ids=store_ids,
+        linked_store_ids=linked_store_ids,
+        capabilities=capabilities,
+    )
+
+
+def get_principal_context(user) -> PrincipalContext:
+    """Return the tenancy context of *user* (cached, see module docstring)."""
+    try:
+        versions = _current_versions(user.pk)
+    except Exception:
+        logger.warning("Principal context cache unavailable", exc_info=True)
+        return _build_context(user)
+
+    memo = getattr(user, "_principal_context", None)
+    if memo is not None and memo[0] == versions:
+        return memo[1]
+
+    cache_key = "stores:principal:{}:{}:{}".format(user.pk, *versions)
+    context = cache.get(cache_key)
+    if context is None:
+        context = _build_context(user)
+        cache.set(cache_key, context, timeout=getattr(settings, "PRINCIPAL_CONTEXT_CACHE_TTL", 300))
+    user._principal_context = (versions, context)
+    return context
@@ -1,11 +1,18 @@
 """Service / helper functions for the stores app."""
 from __future__ import annotations
 
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from typing import Any
-from datetime import date
+from datetime import date, datetime, time as dt_time, timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.cache import cache
+from django.db import models, transaction
 from django.http import HttpRequest
 from django.utils import timezone
 
@@ -21,6 +28,7 @@ from stores.models import (
 )
 
 User = get_user_model()
+logger = logging.getLogger("boutique")
 
 MODULE_DEPENDENCIES = {
     "SELL": ("CORE",),
@@ -211,9 +219,7 @@ def _apply_store_module_overrides(*, store: Store, modules: dict[str, bool]) ->
     return resolved
 
 
-def resolve_store_module_matrix(*, store: Store | None, as_of: date | None = None) -> dict:
-    """Return module activation matrix for one store and one date."""
-    as_of_date = as_of or timezone.localdate()
+def _compute_store_module_matrix(*, store: Store | None, as_of_date: date) -> dict:
     feature_modules = _derive_module_matrix_from_feature_flags(store)
     modules = dict(feature_modules)
     source = "feature_flags"
@@ -240,3 +246,114 @@ def resolve_store_module_matrix(*, store: Store | None, as_of: date | None = Non
         "plan_code": plan_code,
         "modules": modules,
     }
+
+
+# ---------------------------------------------------------------------------
+# Module matrix cache
+# ---------------------------------------------------------------------------
+# Resolved matrices are cached in the shared cache and in a small per-process
+# LRU.  Keys embed the resolution date (so plan start/end dates take effect
+# at midnight without any invalidation) and three version tokens -- global
+# (plan/module catalog), enterprise (plan assignment, enterprise flags) and
+# store (overrides, store flags) -- that are replaced whenever a source row
+# changes (see ``stores.signals``).
+
+_MATRIX_LRU_SIZE = 2048
+_matrix_lru: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+_matrix_lru_lock = threading.Lock()
+
+
+def _matrix_version_keys(store: Store) -> list[str]:
+    return [
+        "stores:modmatrix:ver:global",
+        f"stores:modmatrix:ver:ent:{store.enterprise_id}",
+        f"stores:modmatrix:ver:store:{store.pk}",
+    ]
+
+
+def bump_module_matrix_version(*, store_id=None, enterprise_id=None, everything: bool = False) -> None:
+    """Invalidate cached module matrices for a store, an enterprise or all.
+
+    The bump is applied immediately and again after commit, so matrices
+    cached from uncommitted or pre-commit data are discarded as well.
+    """
+    keys = []
+    if everything:
+        keys.append("stores:modmatrix:ver:global")
+    if enterprise_id:
+        keys.append(f"stores:modmatrix:ver:ent:{enterprise_id}")
+    if store_id:
+        keys.append(f"stores:modmatrix:ver:store:{store_id}")
+    if not keys:
+        return
+
+    def _bump():
+        try:
+            cache.set_many({key: uuid.uuid4().hex for key in keys}, timeout=None)
+        except Exception:
+            logger.warning("Module matrix cache version bump failed", exc_info=True)
+        with _matrix_lru_lock:
+            _matrix_lru.clear()
+
+    _bump()
+    transaction.on_commit(_bump)
+
+
+def _matrix_cache_timeout(as_of_date: date) -> int:
+    ttl = int(getattr(settings, "STORE_MODULE_MATRIX_CACHE_TTL", 3600))
+    tomorrow = datetime.combine(as_of_date + timedelta(days=1), dt_time.min)
+    until_midnight = (timezone.make_aware(tomorrow) - timezone.now()).total_seconds()
+    return max(1, min(ttl, int(until_midnight)))
+
+
+def _cached_store_module_matrix(store: Store, as_of_date: date) -> dict:
+    version_keys = _matrix_version_keys(store)
+    versions = cache.get_many(version_keys)
+    for key in version_keys:
+        if key not in versions:
+            token = uuid.uuid4().hex
+            if not cache.add(key, token, timeout=None):
+                token = cache.get(key, token)
+            versions[key] = token
+    matrix_key = "stores:modmatrix:{}:{}:{}".format(
+        store.pk, as_of_date.isoformat(), ":".join(str(versions[k]) for k in version_keys),
+    )
+
+    now = time.monotonic()
+    with _matrix_lru_lock:
+        hit = _matrix_lru.get(matrix_key)
+        if hit is not None and hit[0] > now:
+            _matrix_lru.move_to_end(matrix_key)
+            return hit[1]
+
+    timeout = _matrix_cache_timeout(as_of_date)
+    matrix = cache.get(matrix_key)
+    if matrix is None:
+        matrix = _compute_store_module_matrix(store=store, as_of_date=as_of_date)
+        cache.set(matrix_key, matrix, timeout=timeout)
+
+    with _matrix_lru_lock:
+        _matrix_lru[matrix_key] = (now + min(timeout, 60), matrix)
+        _matrix_lru.move_to_end(matrix_key)
+        while len(_matrix_lru) > _MATRIX_LRU_SIZE:
+            _matrix_lru.popitem(last=False)
+    return matrix
+
+
+def resolve_store_module_matrix(*, store: Store | None, as_of: date | None = None) -> dict:
+    """Return module activation matrix for one store and one date.
+
+    Results for a persisted store are served from cache (see
+    :func:`bump_module_matrix_version`); the returned dict is a copy that
+    callers may modify.
+    """
+    as_of_date = as_of or timezone.localdate()
+    if store is None or not store.pk:
+        return _compute_store_module_matrix(store=store, as_of_date=as_of_date)
+
+    try:
+        matrix = _cached_store_module_matrix(store, as_of_date)
+    except Exception:
+        logger.warning("Module matrix cache unavailable, resolving from database", exc_info=True)
+        matrix = _compute_store_module_matrix(store=store, as_of_date=as_of_date)
+    return {**matrix, "modules": dict(matrix["modules"])}
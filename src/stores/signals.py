@@ -0,0 +1,83 @@
+"""Signals: invalidate cached module matrices and principal contexts."""
+from __future__ import annotations
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import CustomRole
+
+from stores.models import (
+    BillingModule,
+    BillingPlan,
+    BillingPlanModule,
+    Enterprise,
+    EnterprisePlanAssignment,
+    Store,
+    StoreModuleEntitlement,
+    StoreUser,
+)
+from stores.principal import invalidate_principal_context
+from stores.services import bump_module_matrix_version
+
+_PRINCIPAL_USER_FIELDS = {"role", "custom_role", "custom_role_id", "is_superuser", "is_active"}
+
+
+def _touches(update_fields, fields) -> bool:
+    return update_fields is None or bool(set(update_fields) & set(fields))
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def store_changed(sender, instance, **kwargs):
+    bump_module_matrix_version(store_id=instance.pk)
+    if kwargs.get("created") or _touches(kwargs.get("update_fields"), {"is_active", "enterprise"}):
+        invalidate_principal_context(everything=True)
+
+
+@receiver(post_save, sender=Enterprise)
+@receiver(post_delete, sender=Enterprise)
+def enterprise_changed(sender, instance, **kwargs):
+    bump_module_matrix_version(enterprise_id=instance.pk)
+    if _touches(kwargs.get("update_fields"), {"is_active"}):
+        invalidate_principal_context(everything=True)
+
+
+@receiver(post_save, sender=StoreUser)
+@receiver(post_delete, sender=StoreUser)
+def store_user_changed(sender, instance, **kwargs):
+    invalidate_principal_context(user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=CustomRole)
+@receiver(post_delete, sender=CustomRole)
+def custom_role_changed(sender, instance, **kwargs):
+    invalidate_principal_context(everything=True)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    if not created and _touches(update_fields, _PRINCIPAL_USER_FIELDS):
+        invalidate_principal_context(user_ids=[instance.pk])
+
+
+@receiver(post_save, sender=EnterprisePlanAssignment)
+@receiver(post_delete, sender=EnterprisePlanAssignment)
+def plan_assignment_changed(sender, instance, **kwargs):
+    bump_module_matrix_version(enterprise_id=instance.enterprise_id)
+
+
+@receiver(post_save, sender=StoreModuleEntitlement)
+@receiver(post_delete, sender=StoreModuleEntitlement)
+def store_entitlement_changed(sender, instance, **kwargs):
+    bump_module_matrix_version(store_id=instance.store_id)
+
+
+@receiver(post_save, sender=BillingPlanModule)
+@receiver(post_delete, sender=BillingPlanModule)
+@receiver(post_save, sender=BillingPlan)
+@receiver(post_delete, sender=BillingPlan)
+@receiver(post_save, sender=BillingModule)
+@receiver(post_delete, sender=BillingModule)
+def plan_catalog_changed(sender, instance, **kwargs):
+    bump_module_matrix_version(everything=True)
@@ -713,7 +713,7 @@ class TestExpenseExportCSV:
         )
         resp = admin_client.get("/api/v1/expenses/export-csv/")
         assert resp.status_code == 200
-        content = resp.content.decode("utf-8")
+        content = b"".join(resp.streaming_content).decode("utf-8")
         assert "Numero" in content
         assert "Achat papeterie" in content
 
@@ -721,7 +721,7 @@ class TestExpenseExportCSV:
     def test_export_csv_empty_when_no_expenses(self, admin_client, store):
         resp = admin_client.get("/api/v1/expenses/export-csv/")
         assert resp.status_code == 200
-        content = resp.content.decode("utf-8")
+        content = b"".join(resp.streaming_content).decode("utf-8")
         # Header row should still be present
         assert "Numero" in content
         # Count lines: header + possibly BOM, but no data rows
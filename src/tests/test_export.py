@@ -1,10 +1,18 @@
 """Tests for CSV export utility and endpoints."""
-from django.http import HttpResponse
+from io import BytesIO
+
+import openpyxl
+from django.http import StreamingHttpResponse
 
 from core.export import queryset_to_csv_response
+from core.models import ExportJob
 from stores.models import Enterprise
 
 
+def _body(resp):
+    return b"".join(resp.streaming_content)
+
+
 class TestCsvExportUtil:
     def test_basic_export(self, enterprise):
         qs = Enterprise.objects.filter(pk=enterprise.pk)
@@ -14,10 +22,10 @@ class TestCsvExportUtil:
             ("currency", "Devise"),
         ]
         resp = queryset_to_csv_response(qs, columns, "test")
-        assert isinstance(resp, HttpResponse)
+        assert isinstance(resp, StreamingHttpResponse)
         assert resp["Content-Type"] == "text/csv; charset=utf-8"
         assert "test.csv" in resp["Content-Disposition"]
-        content = resp.content.decode("utf-8-sig")
+        content = _body(resp).decode("utf-8-sig")
         assert "Nom,Code,Devise" in content
         assert "Test Enterprise" in content
 
@@ -27,14 +35,22 @@ class TestCsvExportUtil:
             (lambda o: o.name.upper(), "NOM MAJUSCULE"),
         ]
         resp = queryset_to_csv_response(qs, columns, "test2")
-        content = resp.content.decode("utf-8-sig")
+        content = _body(resp).decode("utf-8-sig")
         assert "TEST ENTERPRISE" in content
 
+    def test_foreign_key_column_exports_the_related_object(self, store):
+        from stores.models import Store
+
+        qs = Store.objects.filter(pk=store.pk)
+        resp = queryset_to_csv_response(qs, [("name", "Nom"), ("enterprise", "Entreprise")], "stores")
+        content = _body(resp).decode("utf-8-sig")
+        assert f"{store.name},{store.enterprise}" in content
+
     def test_empty_queryset(self, db):
         qs = Enterprise.objects.none()
         columns = [("name", "Nom")]
         resp = queryset_to_csv_response(qs, columns, "empty")
-        content = resp.content.decode("utf-8-sig")
+        content = _body(resp).decode("utf-8-sig")
         lines = content.strip().split("\n")
         assert len(lines) == 1  # header only
 
@@ -53,5 +69,46 @@ class TestExportEndpoints:
         resp = admin_client.get("/api/v1/customers/export-csv/")
         assert resp.status_code == 200
         assert "text/csv" in resp["Content-Type"]
-        content = resp.content.decode("utf-8-sig")
+        content = _body(resp).decode("utf-8-sig")
         assert "Jean" in content or "Dupont" in content
+
+    def test_customer_export_xlsx(self, admin_client, enterprise):
+        from customers.models import Customer
+        Customer.objects.create(enterprise=enterprise, first_name="Jean", last_name="Dupont", phone="691234567")
+        resp = admin_client.get("/api/v1/customers/export-csv/?export_format=xlsx")
+        assert resp.status_code == 200
+        assert 'filename="clients.xlsx"' in resp["Content-Disposition"]
+        ws = openpyxl.load_workbook(BytesIO(_body(resp))).active
+        assert [c.value for c in ws[1]][:3] == ["Prenom", "Nom", "Email"]
+        assert ws.cell(row=2, column=1).value == "Jean"
+
+    def test_large_export_runs_in_background(
+        self, admin_client, api_client, sales_user, enterprise, settings, tmp_path,
+        django_capture_on_commit_callbacks,
+    ):
+        from customers.models import Customer
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.EXPORT_BACKGROUND_THRESHOLD = 2
+        for i in range(3):
+            Customer.objects.create(enterprise=enterprise, first_name=f"Client{i}", last_name="Export", phone=f"69000000{i}")
+        Customer.objects.create(enterprise=enterprise, first_name="Autre", last_name="Client", phone="690000009")
+
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = admin_client.get("/api/v1/customers/export-csv/?search=Export")
+        assert resp.status_code == 202
+        job = ExportJob.objects.get(pk=resp.json()["id"])
+        assert job.params == {"search": ["Export"]}
+        assert job.status == ExportJob.Status.DONE
+        assert (job.total_rows, job.processed_rows) == (3, 3)
+
+        status = admin_client.get(resp.json()["status_url"]).json()
+        assert status["progress"] == 100
+        download = admin_client.get(status["download_url"])
+        assert download.status_code == 200
+        content = _body(download).decode("utf-8-sig")
+        assert content.count("Export") == 3
+        assert "Autre" not in content
+
+        # Only the requester sees the job.
+        api_client.force_authenticate(user=sales_user)
+        assert api_client.get(status["download_url"]).status_code == 404
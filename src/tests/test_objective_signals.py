@@ -1,23 +1,24 @@
 """Regression tests for objectives signal dispatching."""
 from datetime import datetime, timezone
+from decimal import Decimal
 from types import SimpleNamespace
 
-import objectives.tasks as objective_tasks
+import objectives.signals as objective_signals
 from objectives.signals import on_payment_saved, on_refund_saved, on_sale_saved
 
 
-def _capture_delay(monkeypatch):
+def _capture_deltas(monkeypatch):
     calls = []
 
-    def fake_delay(**kwargs):
-        calls.append(kwargs)
+    def fake_apply_delta(sale, *, period, **changes):
+        calls.append({"store_id": sale.store_id, "seller_id": sale.seller_id, "period": period, **changes})
 
-    monkeypatch.setattr(objective_tasks.recompute_seller_objective, "delay", fake_delay)
+    monkeypatch.setattr(objective_signals, "_apply_delta", fake_apply_delta)
     return calls
 
 
 def test_payment_signal_uses_payment_month(monkeypatch):
-    calls = _capture_delay(monkeypatch)
+    calls = _capture_deltas(monkeypatch)
     sale = SimpleNamespace(
         store_id="store-1",
         seller_id="seller-1",
@@ -25,41 +26,41 @@ def test_payment_signal_uses_payment_month(monkeypatch):
     )
     payment = SimpleNamespace(
         sale=sale,
+        amount=Decimal("15000.00"),
+        method="CREDIT",
         created_at=datetime(2026, 2, 1, 9, 0, tzinfo=timezone.utc),
     )
 
-    on_payment_saved(sender=None, instance=payment)
+    on_payment_saved(sender=None, instance=payment, created=True)
 
     assert len(calls) == 1
     assert calls[0]["period"] == "2026-02"
     assert calls[0]["store_id"] == "store-1"
     assert calls[0]["seller_id"] == "seller-1"
+    assert calls[0]["gross"] == Decimal("15000.00")
+    assert calls[0]["credit"] == Decimal("15000.00")
 
 
-def test_sale_cancel_signal_triggers_recompute(monkeypatch):
-    calls = _capture_delay(monkeypatch)
-    # Use current month so only one recompute is triggered (sale period == now period)
-    now = datetime.now(tz=timezone.utc)
+def test_sale_cancel_signal_counts_cancellation(monkeypatch):
+    calls = _capture_deltas(monkeypatch)
     sale = SimpleNamespace(
         store_id="store-2",
         seller_id="seller-2",
-        created_at=now,
+        created_at=datetime(2026, 1, 20, 10, 0, tzinfo=timezone.utc),
         status="CANCELLED",
-        _previous_status="PENDING_PAYMENT",
+        _previous_status="PAID",
     )
 
     on_sale_saved(sender=None, instance=sale, created=False)
 
-    # Only 1 call because sale period == current period
-    assert len(calls) == 1
-    expected_period = f"{now.year}-{now.month:02d}"
-    assert calls[0]["period"] == expected_period
-    assert calls[0]["store_id"] == "store-2"
-    assert calls[0]["seller_id"] == "seller-2"
+    # One delta, anchored on the sale creation month.
+    assert calls == [
+        {"store_id": "store-2", "seller_id": "seller-2", "period": "2026-01", "sales": -1, "cancellations": 1},
+    ]
 
 
 def test_refund_signal_uses_refund_month(monkeypatch):
-    calls = _capture_delay(monkeypatch)
+    calls = _capture_deltas(monkeypatch)
     sale = SimpleNamespace(
         store_id="store-3",
         seller_id="seller-3",
@@ -67,12 +68,34 @@ def test_refund_signal_uses_refund_month(monkeypatch):
     )
     refund = SimpleNamespace(
         sale=sale,
+        amount=Decimal("5000.00"),
         created_at=datetime(2026, 2, 24, 8, 30, tzinfo=timezone.utc),
     )
 
-    on_refund_saved(sender=None, instance=refund)
+    on_refund_saved(sender=None, instance=refund, created=True)
 
     assert len(calls) == 1
     assert calls[0]["period"] == "2026-02"
     assert calls[0]["store_id"] == "store-3"
     assert calls[0]["seller_id"] == "seller-3"
+    assert calls[0]["refunds"] == Decimal("5000.00")
+
+
+def test_payment_period_is_the_store_local_month(monkeypatch):
+    from zoneinfo import ZoneInfo
+
+    calls = _capture_deltas(monkeypatch)
+    tz = ZoneInfo("America/Montreal")
+    store = SimpleNamespace(enterprise_id="ent-1", _business_tz=tz)
+    sale = SimpleNamespace(store=store, store_id="store-4", seller_id="seller-4")
+    # 23:30 on January 31st locally is already February in UTC.
+    payment = SimpleNamespace(
+        sale=sale,
+        amount=Decimal("2000.00"),
+        method="CASH",
+        created_at=datetime(2026, 1, 31, 23, 30, tzinfo=tz).astimezone(timezone.utc),
+    )
+
+    on_payment_saved(sender=None, instance=payment, created=True)
+
+    assert calls[0]["period"] == "2026-01"
@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+import pytest
+
+from core import pdf as pdf_module
+from sales.models import Sale
+
+
+@pytest.fixture
+def pdf_cache_on(settings, tmp_path, monkeypatch):
+    settings.PDF_CACHE_ENABLED = True
+    settings.MEDIA_ROOT = str(tmp_path)
+    renders = []
+
+    def fake_render_pdf(template_name, context, filename="document.pdf", disposition="inline"):
+        renders.append(template_name)
+        return pdf_module.pdf_response(f"%PDF-{len(renders)}".encode(), filename, disposition)
+
+    monkeypatch.setattr(pdf_module, "render_pdf", fake_render_pdf)
+    monkeypatch.setattr(pdf_module, "_verification_context", lambda _obj: {})
+    return tmp_path, renders
+
+
+def _sale(store, seller, status=Sale.Status.PAID, number="FAC-CACHE-001"):
+    return Sale.objects.create(
+        store=store,
+        seller=seller,
+        invoice_number=number,
+        status=status,
+        total=Decimal("10000.00"),
+        amount_paid=Decimal("10000.00"),
+        amount_due=Decimal("0.00"),
+    )
+
+
+@pytest.mark.django_db
+def test_finished_invoice_is_served_from_cache_until_it_changes(pdf_cache_on, store, admin_user):
+    media, renders = pdf_cache_on
+    sale = _sale(store, admin_user)
+
+    first = pdf_module.generate_invoice_pdf(sale=sale, store=store)
+    again = pdf_module.generate_invoice_pdf(sale=sale, store=store)
+    assert len(renders) == 1
+    assert again.content == first.content == b"%PDF-1"
+
+    sale.status = Sale.Status.REFUNDED
+    sale.save(update_fields=["status", "updated_at"])
+    changed = pdf_module.generate_invoice_pdf(sale=sale, store=store)
+    assert changed.content == b"%PDF-2"
+    # The stale render was replaced, not kept next to the new one.
+    assert len(list((media / "pdf_cache" / "invoice" / str(sale.pk)).iterdir())) == 1
+
+
+@pytest.mark.django_db
+def test_draft_and_proforma_are_not_cached(pdf_cache_on, store, admin_user):
+    _, renders = pdf_cache_on
+    draft = _sale(store, admin_user, status=Sale.Status.DRAFT, number="FAC-CACHE-002")
+    pdf_module.generate_invoice_pdf(sale=draft, store=store)
+    pdf_module.generate_invoice_pdf(sale=draft, store=store)
+    paid = _sale(store, admin_user)
+    pdf_module.generate_invoice_pdf(sale=paid, store=store, document_kind="proforma")
+    pdf_module.generate_invoice_pdf(sale=paid, store=store, document_kind="proforma")
+    assert len(renders) == 4
+
+
+@pytest.mark.django_db
+def test_paid_sale_is_prerendered(pdf_cache_on, store, admin_user, django_capture_on_commit_callbacks):
+    _, renders = pdf_cache_on
+    sale = _sale(store, admin_user, status=Sale.Status.PENDING_PAYMENT)
+    with django_capture_on_commit_callbacks(execute=True):
+        sale.status = Sale.Status.PAID
+        sale.save(update_fields=["status", "updated_at"])
+    assert len(renders) == 2  # invoice + receipt
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        sale.stock_decremented = True
+        sale.save(update_fields=["stock_decremented"])
+    assert callbacks == []
+
+    sale.refresh_from_db()
+    pdf_module.generate_invoice_pdf(sale=sale, store=store)
+    pdf_module.generate_receipt_pdf(sale=sale, store=store, payments=sale.payments.all().order_by("created_at"))
+    assert len(renders) == 2
@@ -0,0 +1,126 @@
+"""Tests for the batched product import (catalog.importer) and its API."""
+from decimal import Decimal
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from catalog import importer
+from catalog.models import Brand, Category, Product, ProductImportErrorRow, ProductImportJob
+
+HEADER = "nom;sku;prix_vente;prix_achat;categorie;marque;actif\n"
+
+
+def _csv_file(lines, name="produits.csv"):
+    content = HEADER + "".join(f"{line}\n" for line in lines)
+    return SimpleUploadedFile(name, content.encode("utf-8"), content_type="text/csv")
+
+
+def _catalogue(count, category="Reseau"):
+    return [f"Produit {i};SKU-{i:05d};{1000 + i};800;{category};Marque {i % 3}" for i in range(count)]
+
+
+@pytest.mark.django_db
+class TestProductImportAPI:
+    URL = "/api/v1/products/import-csv/"
+
+    def test_import_creates_and_updates_in_batches(self, admin_client, enterprise, django_assert_max_num_queries):
+        Product.objects.create(
+            enterprise=enterprise, name="Ancien", slug="sku-00001", sku="SKU-00001",
+            selling_price="10.00",
+        )
+
+        with django_assert_max_num_queries(40):
+            resp = admin_client.post(self.URL, {"file": _csv_file(_catalogue(120))}, format="multipart")
+
+        assert resp.status_code == 200
+        assert resp.data["total_rows"] == 120
+        assert resp.data["created"] == 119
+        assert resp.data["updated"] == 1
+        assert resp.data["error_count"] == 0
+        assert Category.objects.filter(enterprise=enterprise).count() == 1
+        assert Brand.objects.filter(enterprise=enterprise).count() == 3
+        updated = Product.objects.get(enterprise=enterprise, sku="SKU-00001")
+        assert updated.name == "Produit 1"
+        assert updated.slug == "sku-00001"
+        assert updated.selling_price == Decimal("1001.00")
+
+    def test_invalid_rows_are_reported_with_their_line(self, admin_client, enterprise):
+        lines = [
+            "Routeur;R-1;15000;;;;",
+            ";R-2;15000;;;;",
+            "Switch;S-1;abc;;;;",
+            ";;;;;;",
+            "Routeur bis;R-1;16000;;;;non",
+        ]
+        resp = admin_client.post(self.URL, {"file": _csv_file(lines)}, format="multipart")
+
+        assert resp.status_code == 200
+        assert resp.data["created"] == 1
+        assert resp.data["updated"] == 1
+        assert resp.data["skipped"] == 1
+        assert resp.data["errors"] == [
+            {"line": 3, "message": "Nom produit manquant."},
+            {"line": 4, "message": "prix_vente invalide."},
+        ]
+        product = Product.objects.get(enterprise=enterprise, sku="R-1")
+        assert product.name == "Routeur bis"
+        assert product.is_active is False
+
+    def test_api_import_accepts_zero_price_and_keeps_unknown_actif_active(self, admin_client, enterprise):
+        resp = admin_client.post(self.URL, {"file": _csv_file(["Offert;GIFT-1;0;;;;peut-etre"])}, format="multipart")
+
+        assert resp.data["created"] == 1
+        product = Product.objects.get(enterprise=enterprise, sku="GIFT-1")
+        assert product.selling_price == Decimal("0.00")
+        assert product.is_active is True
+
+    def test_slugs_stay_unique_across_chunks(self, admin_client, enterprise, monkeypatch):
+        monkeypatch.setattr(importer, "IMPORT_CHUNK_SIZE", 2)
+        lines = ["A;ab;10;;;;", "B;AB;10;;;;", "C;a-b;10;;;;", "D;Ab;10;;;;"]
+
+        resp = admin_client.post(self.URL, {"file": _csv_file(lines)}, format="multipart")
+
+        assert resp.data["created"] == 4
+        slugs = set(Product.objects.filter(enterprise=enterprise).values_list("slug", flat=True))
+        assert slugs == {"ab", "ab-1", "a-b", "ab-2"}
+
+    def test_large_file_runs_as_background_job(
+        self, admin_client, admin_user, enterprise, settings, tmp_path, django_capture_on_commit_callbacks,
+    ):
+        settings.MEDIA_ROOT = str(tmp_path)
+        settings.PRODUCT_IMPORT_BACKGROUND_THRESHOLD = 10
+        lines = _catalogue(14) + ["Sans prix;NOPRICE;;;;"]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            resp = admin_client.post(self.URL, {"file": _csv_file(lines)}, format="multipart")
+
+        assert resp.status_code == 202
+        job = ProductImportJob.objects.get(pk=resp.data["id"])
+        assert job.started_by == admin_user
+        assert job.status == ProductImportJob.Status.DONE
+        assert job.total_rows == 15
+        assert (job.created_rows, job.error_rows) == (14, 1)
+        error = ProductImportErrorRow.objects.get(job=job)
+        assert error.row_number == 16
+        assert error.raw_payload["sku"] == "NOPRICE"
+
+        status_resp = admin_client.get(resp.data["status_url"])
+        assert status_resp.status_code == 200
+        assert status_resp.data["progress"] == 100
+        assert status_resp.data["errors"] == [{"line": 16, "message": "Le prix de vente est obligatoire."}]
+
+        report = admin_client.get(status_resp.data["error_report_url"])
+        content = b"".join(report.streaming_content).decode("utf-8")
+        assert "16,Le prix de vente est obligatoire." in content
+
+    def test_job_is_private_to_its_requester(self, api_client, manager_user, admin_user, enterprise):
+        job = ProductImportJob.objects.create(
+            enterprise=enterprise,
+            started_by=admin_user,
+            source_file="imports/products/x.csv",
+        )
+        api_client.force_authenticate(user=manager_user)
+
+        resp = api_client.get(f"/api/v1/products/import-jobs/{job.pk}/")
+
+        assert resp.status_code == 404
@@ -0,0 +1,73 @@
+import zlib
+from decimal import Decimal
+
+import pytest
+
+from cashier.models import CashShift, Payment
+from core import pdf as pdf_module
+from core.thermal_receipt import build_receipt_layout, layout_to_escpos, layout_to_pdf
+from sales.models import Sale
+
+
+@pytest.fixture
+def paid_sale(store, admin_user):
+    sale = Sale.objects.create(
+        store=store,
+        seller=admin_user,
+        invoice_number="FAC-THERM-001",
+        status=Sale.Status.PAID,
+        subtotal=Decimal("12500.00"),
+        total=Decimal("12500.00"),
+        amount_paid=Decimal("12500.00"),
+        amount_due=Decimal("0.00"),
+    )
+    shift = CashShift.objects.create(store=store, cashier=admin_user, opening_float=Decimal("0.00"))
+    Payment.objects.create(
+        sale=sale, store=store, cashier=admin_user, shift=shift,
+        method=Payment.Method.CASH, amount=Decimal("12500.00"),
+    )
+    return sale
+
+
+@pytest.mark.django_db
+def test_layout_follows_ticket_template(paid_sale, store):
+    rows = build_receipt_layout(paid_sale, store, cashier_name="Awa Caisse", change=Decimal("500"))
+    texts = [str(value) for row in rows for value in row[1:3]]
+
+    assert "RECU DE PAIEMENT" in texts
+    assert "PAYEE" in texts
+    assert "FAC-THERM-001" in texts
+    assert "Awa Caisse" in texts
+    assert "12500 FCFA" in texts
+    assert "500 FCFA" in texts  # change
+    if paid_sale.verification_token:
+        assert any(row[0] == "qr" for row in rows)
+
+
+@pytest.mark.django_db
+def test_escpos_and_pdf_outputs(paid_sale, store):
+    rows = build_receipt_layout(paid_sale, store, template_code="COMPACT")
+
+    escpos = layout_to_escpos(rows)
+    assert escpos.startswith(b"\x1b@")
+    assert b"FAC-THERM-001" in escpos
+    assert escpos.endswith(b"\x1dV\x42\x00")
+
+    pdf = layout_to_pdf(rows)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    stream = pdf.split(b"stream\n", 1)[1].rsplit(b"\nendstream", 1)[0]
+    assert b"(RECU DE PAIEMENT) Tj" in zlib.decompress(stream)
+
+
+@pytest.mark.django_db
+def test_store_can_select_thermal_renderer(paid_sale, store, monkeypatch):
+    def fail_render_pdf(*args, **kwargs):
+        raise AssertionError("WeasyPrint path used")
+
+    monkeypatch.setattr(pdf_module, "render_pdf", fail_render_pdf)
+    store.receipt_renderer = store.ReceiptRenderer.THERMAL
+    store.save(update_fields=["receipt_renderer"])
+
+    response = pdf_module.generate_receipt_pdf(sale=paid_sale, store=store, template_code="ticket")
+    assert response["Content-Type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
@@ -0,0 +1,120 @@
+from decimal import Decimal
+
+import pytest
+from django.urls import reverse
+
+from analytics.cooccurrence import (
+    popular_products,
+    rebuild_cooccurrence_index,
+    related_products,
+    update_cooccurrence_index,
+)
+from analytics.models import CooccurrenceIndex, ProductCooccurrence, ProductOccurrence
+from catalog.models import Product
+from sales.models import Sale, SaleItem
+from stores.models import StoreUser
+
+
+@pytest.fixture
+def catalog(store, product):
+    extras = [
+        Product.objects.create(
+            enterprise=store.enterprise,
+            category=product.category,
+            brand=product.brand,
+            name=f"Accessoire {i}",
+            slug=f"accessoire-cooc-{i}",
+            sku=f"TST-COOC-{i}",
+            selling_price=Decimal("10000.00"),
+            cost_price=Decimal("6000.00"),
+        )
+        for i in range(3)
+    ]
+    return [product, *extras]
+
+
+@pytest.fixture
+def sell(store, manager_user):
+    def _sell(*products, status=Sale.Status.PAID):
+        sale = Sale.objects.create(
+            store=store,
+            seller=manager_user,
+            status=status,
+            subtotal=Decimal("10000.00"),
+            total=Decimal("10000.00"),
+        )
+        for item in products:
+            SaleItem.objects.create(
+                sale=sale,
+                product=item,
+                product_name=item.name,
+                unit_price=Decimal("10000.00"),
+                cost_price=Decimal("6000.00"),
+                quantity=1,
+                line_total=Decimal("10000.00"),
+            )
+        return sale
+
+    return _sell
+
+
+@pytest.mark.django_db
+def test_index_counts_pairs_once_and_ranks_by_lift(store, catalog, sell):
+    phone, case, charger, cable = catalog
+    for _ in range(3):
+        sell(phone, case)
+    sell(phone, charger)
+    sell(charger, cable)
+    sell(charger, cable)
+    sell(cable, status=Sale.Status.DRAFT)
+
+    assert update_cooccurrence_index(store) == 6
+    assert update_cooccurrence_index(store) == 0
+
+    index = CooccurrenceIndex.objects.get(store=store)
+    assert index.order_count == 6
+    assert ProductOccurrence.objects.get(store=store, product=cable).order_count == 2
+    a, b = sorted([phone.pk, case.pk])
+    assert ProductCooccurrence.objects.get(store=store, product_a_id=a, product_b_id=b).order_count == 3
+
+    rows = related_products(store, [phone.pk])
+    assert [row["product_id"] for row in rows] == [case.pk, charger.pk]
+    assert rows[0]["orders"] == 3
+    # 3 co-purchases * 6 orders / (4 phone orders * 3 case orders)
+    assert rows[0]["lift"] == pytest.approx(1.5, rel=1e-3)
+
+    assert related_products(store, [phone.pk], exclude=[case.pk])[0]["product_id"] == charger.pk
+    assert popular_products(store, exclude=[phone.pk, case.pk])[0]["product_id"] == charger.pk
+
+
+@pytest.mark.django_db
+def test_index_folds_new_sales_incrementally(store, catalog, sell):
+    phone, case, charger, _ = catalog
+    sell(phone, case)
+    update_cooccurrence_index(store)
+    sell(phone, charger)
+    sell(phone, charger)
+
+    assert update_cooccurrence_index(store) == 2
+    assert related_products(store, [phone.pk])[0]["product_id"] == charger.pk
+    incremental = sorted(ProductCooccurrence.objects.filter(store=store).values_list("order_count", flat=True))
+
+    assert rebuild_cooccurrence_index(store) == 3
+    rebuilt = sorted(ProductCooccurrence.objects.filter(store=store).values_list("order_count", flat=True))
+    assert rebuilt == incremental == [1, 2]
+
+
+@pytest.mark.django_db
+def test_related_products_api(client, store, manager_user, catalog, sell):
+    StoreUser.objects.get_or_create(store=store, user=manager_user, defaults={"is_default": True})
+    phone, case, _, _ = catalog
+    sell(phone, case)
+    update_cooccurrence_index(store)
+
+    client.force_login(manager_user)
+    response = client.get(
+        reverse("api:analytics-products-related"),
+        {"store": str(store.id), "product_ids": str(phone.pk)},
+    )
+    assert response.status_code == 200
+    assert [item["sku"] for item in response.json()["items"]] == [case.sku]
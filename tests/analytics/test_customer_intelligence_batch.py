@@ -0,0 +1,163 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from analytics.customer_intelligence import (
+    compute_credit_risk_for_customer,
+    compute_customer_score,
+    predict_next_order_for_customer,
+)
+from analytics.customer_intelligence_batch import refresh_store_customer_intelligence
+from analytics.models import (
+    CustomerIntelligenceAlert,
+    CustomerMetricDaily,
+    CustomerScoreSnapshot,
+    CustomerSegmentSnapshot,
+)
+from cashier.models import CashShift, Payment
+from credits.models import PaymentSchedule
+from customers.models import Customer
+from sales.models import Refund, Sale
+
+
+@pytest.fixture
+def shift(store, cashier_user):
+    return CashShift.objects.create(
+        store=store,
+        cashier=cashier_user,
+        status=CashShift.Status.OPEN,
+        opening_float=Decimal("10000.00"),
+    )
+
+
+@pytest.fixture
+def buy(store, manager_user, cashier_user, shift):
+    def _buy(customer, amount, days_ago, discount="0.00"):
+        moment = timezone.now() - timedelta(days=days_ago)
+        sale = Sale.objects.create(
+            store=store,
+            seller=manager_user,
+            customer=customer,
+            status=Sale.Status.PAID,
+            subtotal=Decimal(amount) + Decimal(discount),
+            discount_amount=Decimal(discount),
+            total=Decimal(amount),
+        )
+        payment = Payment.objects.create(
+            sale=sale,
+            store=store,
+            cashier=cashier_user,
+            shift=shift,
+            method=Payment.Method.CASH,
+            amount=Decimal(amount),
+        )
+        Sale.objects.filter(pk=sale.pk).update(created_at=moment)
+        Payment.objects.filter(pk=payment.pk).update(created_at=moment)
+        return sale
+
+    return _buy
+
+
+def _customers(enterprise, count, start=0):
+    return [
+        Customer.objects.create(
+            enterprise=enterprise,
+            first_name=f"Client{i}",
+            last_name="Batch",
+            phone=f"+2376000000{i:02d}",
+        )
+        for i in range(start, start + count)
+    ]
+
+
+@pytest.mark.django_db
+def test_batch_matches_per_customer_functions(store, enterprise, customer_account, buy, manager_user):
+    regular, promo, lapsed = _customers(enterprise, 3)
+    debtor = customer_account.customer
+    for days_ago in (2, 9, 16, 23, 30):
+        buy(regular, "40000.00", days_ago)
+    buy(promo, "60000.00", 3, discount="30000.00")
+    refunded = buy(promo, "20000.00", 1)
+    Refund.objects.create(sale=refunded, store=store, amount=Decimal("5000.00"), reason="Defaut", approved_by=manager_user)
+    buy(lapsed, "150000.00", 55)
+    buy(lapsed, "150000.00", 50)
+    buy(lapsed, "20000.00", 4)
+    buy(debtor, "90000.00", 70)
+    customer_account.balance = Decimal("300000.00")
+    customer_account.save(update_fields=["balance", "updated_at"])
+    PaymentSchedule.objects.create(
+        account=customer_account,
+        due_date=date.today() - timedelta(days=40),
+        amount_due=Decimal("300000.00"),
+        amount_paid=Decimal("50000.00"),
+        status=PaymentSchedule.Status.OVERDUE,
+    )
+
+    result = refresh_store_customer_intelligence(store, as_of=date.today())
+
+    assert result.customers == 4
+    batch = {
+        snap.customer_id: (snap.score_total, snap.segment, snap.features, snap.explain)
+        for snap in CustomerScoreSnapshot.objects.filter(store=store)
+    }
+    for customer in (regular, promo, lapsed, debtor):
+        payload = compute_customer_score(store=store, customer=customer, as_of=date.today())
+        expected = (payload["score_total"], payload["segment"], payload["features"], payload["explain"])
+        assert batch[customer.pk] == expected
+    assert CustomerSegmentSnapshot.objects.filter(store=store).count() == 4
+    assert "CHASSEUR_PROMO" in CustomerSegmentSnapshot.objects.get(customer=promo).tags
+
+    credit_alert = CustomerIntelligenceAlert.objects.get(
+        customer=debtor, alert_type=CustomerIntelligenceAlert.AlertType.CREDIT_RISK,
+    )
+    risk = compute_credit_risk_for_customer(store=store, customer=debtor, as_of=date.today())
+    assert credit_alert.context["credit_risk_score"] == risk["credit_risk_score"]
+    assert credit_alert.context["features"] == risk["features"]
+
+    next_order = CustomerIntelligenceAlert.objects.get(
+        customer=regular, alert_type=CustomerIntelligenceAlert.AlertType.NEXT_ORDER,
+    )
+    prediction = predict_next_order_for_customer(store=store, customer=regular, as_of=date.today())
+    assert next_order.context["predicted_next_purchase_date"] == prediction["predicted_next_purchase_date"]
+
+    assert CustomerIntelligenceAlert.objects.filter(
+        customer=lapsed, alert_type=CustomerIntelligenceAlert.AlertType.CHURN,
+    ).exists()
+    assert CustomerIntelligenceAlert.objects.filter(
+        customer=debtor, alert_type=CustomerIntelligenceAlert.AlertType.DORMANT,
+    ).exists()
+    # The on-demand calls above refreshed the same alerts, never duplicated them.
+    open_alerts = CustomerIntelligenceAlert.objects.filter(status=CustomerIntelligenceAlert.Status.OPEN)
+    assert open_alerts.count() == open_alerts.values("customer", "alert_type").distinct().count()
+
+
+@pytest.mark.django_db
+def test_batch_writes_daily_metrics_and_is_idempotent(store, enterprise, customer, buy, manager_user):
+    sale = buy(customer, "50000.00", 0, discount="5000.00")
+    Refund.objects.create(sale=sale, store=store, amount=Decimal("10000.00"), reason="Retour", approved_by=manager_user)
+
+    first = refresh_store_customer_intelligence(store, as_of=date.today())
+    metric = CustomerMetricDaily.objects.get(store=store, customer=customer, metric_date=date.today())
+    assert metric.paid_amount == Decimal("40000.00")
+    assert metric.refund_amount == Decimal("10000.00")
+    assert metric.discount_amount == Decimal("5000.00")
+    assert metric.paid_orders_count == 1
+
+    second = refresh_store_customer_intelligence(store, as_of=date.today())
+    assert first.snapshot_rows_changed == 3
+    assert second.snapshot_rows_changed == 0
+
+
+@pytest.mark.django_db
+def test_batch_query_count_does_not_grow_with_customers(store, enterprise, buy, django_assert_max_num_queries):
+    for index, customer in enumerate(_customers(enterprise, 3)):
+        buy(customer, "10000.00", index + 1)
+    refresh_store_customer_intelligence(store, as_of=date.today())
+    for index, customer in enumerate(_customers(enterprise, 9, start=3)):
+        buy(customer, "10000.00", index + 1)
+
+    with django_assert_max_num_queries(30):
+        result = refresh_store_customer_intelligence(store, as_of=date.today())
+    assert result.customers == 12
@@ -0,0 +1,72 @@
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+
+from analytics.forecasting import _croston, forecast_demand, load_demand_matrix
+from analytics.models import ReorderRecommendation, SalesForecast
+from analytics.services import compute_dynamic_reorder
+
+
+def test_load_demand_matrix_fills_days_and_keeps_unsold_products():
+    start = date(2026, 3, 1)
+    rows = [("a", date(2026, 3, 1), 2), ("b", date(2026, 3, 3), 5), ("a", date(2026, 3, 3), 1)]
+
+    product_ids, matrix = load_demand_matrix(rows, ["c"], start, 4)
+
+    assert product_ids == ["c", "a", "b"]
+    assert matrix.tolist() == [[0, 0, 0, 0], [2, 0, 1, 0], [0, 0, 5, 0]]
+
+
+def test_croston_estimates_rate_of_intermittent_demand():
+    slow = np.zeros(84)
+    slow[::9] = 3  # three units every nine days
+
+    assert _croston(slow[None, :])[0] == pytest.approx(3 / 9, rel=0.05)
+
+
+def test_weekly_pattern_selects_seasonal_model():
+    first_day = date(2026, 1, 5)  # a Monday
+    weekly = np.tile([1, 1, 1, 1, 10, 10, 1], 12).astype(float)
+    flat = np.full(84, 2.0)
+
+    result = forecast_demand(["weekly", "flat"], np.stack([weekly, flat]), first_day, 7)
+
+    assert result.methods[0] == "SEASONAL"
+    # The first forecast day is a Monday, the fifth a Friday.
+    assert result.predictions[0].tolist() == pytest.approx([1, 1, 1, 1, 10, 10, 1])
+    assert result.predictions[1].tolist() == pytest.approx([2] * 7)
+    assert result.confidence.tolist() == pytest.approx([1, 1])
+
+
+def test_forecast_handles_twenty_thousand_products_quickly():
+    history = np.random.default_rng(0).poisson(0.5, size=(20_000, 60)).astype(float)
+
+    started = time.monotonic()
+    result = forecast_demand(list(range(20_000)), history, date(2026, 1, 1), 14)
+
+    assert result.predictions.shape == (20_000, 14)
+    assert time.monotonic() - started < 5
+
+
+@pytest.mark.django_db
+def test_dynamic_reorder_uses_forecast_demand(store, product_stock):
+    as_of = date.today()
+    SalesForecast.objects.bulk_create([
+        SalesForecast(
+            store=store,
+            product=product_stock.product,
+            forecast_date=as_of + timedelta(days=i),
+            method=SalesForecast.Method.CROSTON,
+            predicted_qty=Decimal("2.00"),
+        )
+        for i in range(1, 15)
+    ])
+
+    compute_dynamic_reorder(store, as_of=as_of)
+
+    row = ReorderRecommendation.objects.get(store=store, product=product_stock.product)
+    assert row.avg_daily_sales == Decimal("2.0000")
+    assert row.reorder_point == Decimal("20.00")
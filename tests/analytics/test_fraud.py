@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from analytics.fraud import detect_fraud_signals, outlier_threshold
+from analytics.models import FraudEvent
+from cashier.models import CashShift, Payment
+from core.dates import local_today, store_timezone
+from sales.models import Refund, Sale
+
+
+def _sale(store, seller, total, **kwargs):
+    return Sale.objects.create(
+        store=store, seller=seller, status=Sale.Status.PAID, subtotal=total, total=total, **kwargs,
+    )
+
+
+@pytest.mark.django_db
+def test_batch_detection_is_idempotent(store, sales_user):
+    _sale(store, sales_user, Decimal("1000.00"), discount_percent=Decimal("80"))
+    today = local_today(store_timezone(store))
+
+    assert detect_fraud_signals(store, today, today) == 1
+    assert detect_fraud_signals(store, today, today) == 0
+    assert FraudEvent.objects.get(store=store).rule_code == "HIGH_DISCOUNT_THRESHOLD"
+
+
+@pytest.mark.django_db
+def test_outlier_threshold_is_computed_in_sql(store, sales_user):
+    today = local_today(store_timezone(store))
+    yesterday = timezone.make_aware(datetime.combine(today - timedelta(days=1), datetime.min.time()))
+    for total in (900, 1100) * 5:
+        sale = _sale(store, sales_user, Decimal(total))
+        Sale.objects.filter(pk=sale.pk).update(created_at=yesterday + timedelta(hours=10))
+
+    # Mean 1000, population standard deviation 100.
+    assert outlier_threshold(store, today) == Decimal("1300.00")
+
+
+@pytest.mark.django_db
+def test_committed_payment_and_refund_are_scored_in_real_time(
+    store, sales_user, cashier_user, django_capture_on_commit_callbacks,
+):
+    sale = _sale(store, sales_user, Decimal("1000.00"), discount_percent=Decimal("80"))
+    shift = CashShift.objects.create(
+        store=store, cashier=cashier_user, status=CashShift.Status.OPEN, opening_float=Decimal("0.00"),
+    )
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Payment.objects.create(
+            sale=sale, store=store, cashier=cashier_user, shift=shift,
+            method=Payment.Method.CASH, amount=Decimal("1000.00"),
+        )
+    assert list(FraudEvent.objects.values_list("rule_code", flat=True)) == ["HIGH_DISCOUNT_THRESHOLD"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Refund.objects.create(
+            sale=sale, store=store, amount=Decimal("900.00"), reason="Retour", processed_by=cashier_user,
+        )
+    assert set(FraudEvent.objects.values_list("rule_code", flat=True)) == {
+        "HIGH_DISCOUNT_THRESHOLD",
+        "QUICK_HIGH_REFUND",
+    }
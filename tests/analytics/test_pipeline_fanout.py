@@ -0,0 +1,96 @@
+from datetime import date
+from unittest import mock
+
+import pytest
+
+from analytics import tasks
+from analytics.models import AnalyticsPipelineRun, AnalyticsPipelineStep
+from stores.models import Store
+
+
+@pytest.mark.django_db
+def test_full_pipeline_runs_every_store_and_stage(store):
+    run_id = tasks.run_full_pipeline(as_of="2026-03-10")
+
+    run = AnalyticsPipelineRun.objects.get(pk=run_id)
+    assert run.status == AnalyticsPipelineRun.Status.SUCCESS
+    assert run.as_of == date(2026, 3, 10)
+    assert run.total_steps == run.completed_steps == len(tasks.PIPELINE_STAGES)
+    assert run.progress == 100
+    assert set(run.summary["stages"]) == set(tasks.PIPELINE_STAGES)
+
+
+@pytest.mark.django_db
+def test_failing_store_does_not_abort_other_stores(store, enterprise):
+    other = Store.objects.create(enterprise=enterprise, name="Boutique 2", code="BT-002")
+    real_abc = tasks.PIPELINE_STAGES["abc"]
+
+    def flaky_abc(target, as_of):
+        if target.pk == store.pk:
+            raise RuntimeError("boom")
+        return real_abc(target, as_of)
+
+    with mock.patch.dict(tasks.PIPELINE_STAGES, {"abc": flaky_abc}):
+        run_id = tasks.run_full_pipeline()
+
+    run = AnalyticsPipelineRun.objects.get(pk=run_id)
+    assert run.status == AnalyticsPipelineRun.Status.PARTIAL
+    assert run.failed_steps == 1
+    assert run.completed_steps == run.total_steps - 1
+    assert run.summary["failures"] == [
+        {"store": str(store.pk), "stage": "abc", "status": "FAILED", "error": "RuntimeError: boom"},
+    ]
+    # Later stages of the failing store and every stage of the other store ran.
+    assert AnalyticsPipelineStep.objects.filter(
+        run=run, store=store, stage="fraud", status=AnalyticsPipelineStep.Status.SUCCESS,
+    ).exists()
+    assert AnalyticsPipelineStep.objects.filter(
+        run=run, store=other, status=AnalyticsPipelineStep.Status.SUCCESS,
+    ).count() == len(tasks.PIPELINE_STAGES)
+
+
+@pytest.mark.django_db
+def test_killed_step_is_recorded_and_the_store_chain_goes_on(store, monkeypatch):
+    from billiard.exceptions import TimeLimitExceeded
+
+    real_run = tasks.run_pipeline_step.run
+
+    def dying_step(step_id):
+        if AnalyticsPipelineStep.objects.get(pk=step_id).stage == "forecast":
+            # What the worker sees when the hard time limit kills the task.
+            raise TimeLimitExceeded(960)
+        return real_run(step_id)
+
+    monkeypatch.setattr(tasks.run_pipeline_step, "run", dying_step)
+    # Let the eager worker record the failure and call errbacks, as a real
+    # one does; the eager chain still re-raises the failed result.
+    conf = tasks.run_pipeline_step.app.conf
+    conf.update(CELERY_TASK_EAGER_PROPAGATES=False)
+    try:
+        with pytest.raises(TimeLimitExceeded):
+            tasks.run_full_pipeline()
+    finally:
+        conf.update(CELERY_TASK_EAGER_PROPAGATES=True)
+
+    run = AnalyticsPipelineRun.objects.get()
+    assert run.status == AnalyticsPipelineRun.Status.PARTIAL
+    assert run.finished_at is not None
+    assert (run.completed_steps, run.failed_steps) == (run.total_steps - 1, 1)
+    forecast = AnalyticsPipelineStep.objects.get(run=run, stage="forecast")
+    assert forecast.status == AnalyticsPipelineStep.Status.TIMEOUT
+    assert AnalyticsPipelineStep.objects.filter(
+        run=run, stage__in=["reorder", "credit_scores", "fraud"], status=AnalyticsPipelineStep.Status.SUCCESS,
+    ).count() == 3
+
+
+@pytest.mark.django_db
+def test_stale_running_run_is_swept(store, settings):
+    settings.ANALYTICS_PIPELINE_RUN_TIMEOUT = 0
+    run = AnalyticsPipelineRun.objects.create(as_of=date(2026, 3, 10), stages=["abc"], store_count=1, total_steps=1)
+    AnalyticsPipelineStep.objects.create(run=run, store=store, stage="abc")
+
+    tasks.sweep_stale_pipeline_runs()
+
+    run.refresh_from_db()
+    assert run.status == AnalyticsPipelineRun.Status.FAILED
+    assert run.summary["failures"][0]["status"] == AnalyticsPipelineStep.Status.TIMEOUT
@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+from django.core.cache import cache
+
+from analytics import refresh_queue
+from analytics.models import CustomerScoreSnapshot
+from credits.models import PaymentSchedule
+
+
+@pytest.fixture
+def scheduled_slots(monkeypatch, settings):
+    settings.ANALYTICS_CUSTOMER_REFRESH_DEBOUNCE_SECONDS = 3600
+    cache.clear()
+    slots = []
+    monkeypatch.setattr(refresh_queue, "_schedule_flush", lambda slot, countdown: slots.append(slot))
+    return slots
+
+
+@pytest.mark.django_db
+def test_requests_for_same_customer_are_merged(store, customer, scheduled_slots):
+    queued = [refresh_queue.request_customer_refresh(store.pk, customer.pk) for _ in range(5)]
+
+    assert queued == [True, False, False, False, False]
+    assert len(scheduled_slots) == 1
+
+    result = refresh_queue.flush_pending_refreshes(scheduled_slots[0])
+    assert (result.customers, result.stores, result.merged) == (1, 1, 4)
+    assert CustomerScoreSnapshot.objects.filter(store=store, customer=customer).exists()
+
+    # Flushed slots are not replayed; later requests are queued again.
+    assert refresh_queue.flush_pending_refreshes(scheduled_slots[0]).customers == 0
+    assert refresh_queue.request_customer_refresh(store.pk, customer.pk) is True
+
+
+@pytest.mark.django_db
+def test_schedule_batch_triggers_one_refresh(customer_account, scheduled_slots, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        for months in range(1, 4):
+            PaymentSchedule.objects.create(
+                account=customer_account,
+                due_date=date.today() + timedelta(days=30 * months),
+                amount_due=Decimal("10000.00"),
+            )
+
+    result = refresh_queue.flush_pending_refreshes(scheduled_slots[0])
+    assert (result.customers, result.merged) == (1, 2)
@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+from analytics.models import ABCAnalysis, SalesForecast
+from analytics.services import compute_sales_forecast
+from analytics.snapshots import write_snapshot
+
+
+def _abc(store, product, revenue, abc_class="A"):
+    return ABCAnalysis(
+        store=store,
+        product=product,
+        period_start=date(2026, 3, 1),
+        period_end=date(2026, 3, 31),
+        revenue=Decimal(revenue),
+        abc_class=abc_class,
+    )
+
+
+def _write(store, rows):
+    return write_snapshot(
+        ABCAnalysis.objects.filter(store=store, period_start=date(2026, 3, 1), period_end=date(2026, 3, 31)),
+        rows,
+        key_fields=("store_id", "product_id", "period_start", "period_end"),
+        value_fields=("revenue", "abc_class"),
+    )
+
+
+@pytest.mark.django_db
+def test_write_snapshot_only_touches_changed_rows(store, product, django_assert_max_num_queries):
+    first = _write(store, [_abc(store, product, "100.00")])
+    assert (first.created, first.changed) == (1, 1)
+    row_id = ABCAnalysis.objects.get(store=store).pk
+
+    with django_assert_max_num_queries(3):
+        unchanged = _write(store, [_abc(store, product, "100.00")])
+    assert (unchanged.unchanged, unchanged.changed) == (1, 0)
+
+    updated = _write(store, [_abc(store, product, "150.00", "B")])
+    assert updated.updated == 1
+    row = ABCAnalysis.objects.get(store=store)
+    assert (row.pk, row.revenue, row.abc_class) == (row_id, Decimal("150.00"), "B")
+
+    emptied = _write(store, [])
+    assert emptied.deleted == 1
+    assert not ABCAnalysis.objects.filter(store=store).exists()
+
+
+@pytest.mark.django_db
+def test_forecast_refresh_keeps_unchanged_rows(store, product_stock):
+    as_of = date.today()
+    compute_sales_forecast(store, as_of=as_of, horizon_days=7)
+    before = dict(SalesForecast.objects.filter(store=store).values_list("forecast_date", "pk"))
+
+    # Next day: six of the seven dates overlap and keep their rows.
+    compute_sales_forecast(store, as_of=as_of + timedelta(days=1), horizon_days=7)
+    after = dict(SalesForecast.objects.filter(store=store).values_list("forecast_date", "pk"))
+
+    shared = {as_of + timedelta(days=i) for i in range(2, 8)}
+    assert shared <= set(before) & set(after)
+    assert all(before[day] == after[day] for day in shared)
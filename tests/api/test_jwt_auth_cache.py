@@ -0,0 +1,77 @@
+from unittest import mock
+
+import pytest
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.auth_cache import get_cached_user
+from api.authentication import CookieJWTAuthentication
+
+
+def _bearer(user):
+    return {"HTTP_AUTHORIZATION": f"Bearer {AccessToken.for_user(user)}"}
+
+
+@pytest.mark.django_db
+def test_token_is_verified_once_per_request(admin_user):
+    client = Client()
+    original = CookieJWTAuthentication.get_validated_token
+
+    with mock.patch.object(
+        CookieJWTAuthentication, "get_validated_token", autospec=True, side_effect=original,
+    ) as validate:
+        response = client.get("/api/v1/auth/me/", **_bearer(admin_user))
+
+    assert response.status_code == 200
+    assert response.json()["email"] == admin_user.email
+    assert validate.call_count == 1
+
+
+@pytest.mark.django_db
+def test_cached_user_skips_query(admin_user, django_assert_num_queries):
+    get_cached_user(str(admin_user.pk))
+
+    with django_assert_num_queries(0):
+        assert get_cached_user(str(admin_user.pk)).pk == admin_user.pk
+
+
+@pytest.mark.django_db
+def test_deactivation_and_role_change_invalidate_cached_user(admin_user):
+    client = Client()
+    headers = _bearer(admin_user)
+    assert client.get("/api/v1/auth/me/", **headers).status_code == 200
+
+    admin_user.role = admin_user.Role.MANAGER
+    admin_user.save(update_fields=["role"])
+    assert get_cached_user(str(admin_user.pk)).role == admin_user.Role.MANAGER
+
+    admin_user.is_active = False
+    admin_user.save(update_fields=["is_active"])
+    assert client.get("/api/v1/auth/me/", **headers).status_code == 401
+
+
+@pytest.mark.django_db
+def test_password_change_invalidates_cached_user(admin_user):
+    get_cached_user(str(admin_user.pk))
+
+    admin_user.set_password("Newpass123!")
+    admin_user.save(update_fields=["password"])
+
+    assert get_cached_user(str(admin_user.pk)).check_password("Newpass123!")
+
+
+@pytest.mark.django_db
+def test_password_hash_is_not_cached(admin_user, django_assert_num_queries):
+    from django.core.cache import cache
+
+    from accounts import auth_cache
+
+    get_cached_user(str(admin_user.pk))
+    version = auth_cache._current_version(str(admin_user.pk))
+    cached = cache.get(f"accounts:auth_user:{admin_user.pk}:{version}")
+    assert admin_user.password not in cached
+
+    user = get_cached_user(str(admin_user.pk))
+    # Loaded from the database on access only.
+    with django_assert_num_queries(1):
+        assert user.password == admin_user.password
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.utils import timezone
+
+from accounts.models import User
+from cashier.cashier_analytics_engine import CashierAnalyticsEngine
+from cashier.models import CashShift, Payment
+from sales.models import Sale
+
+
+def _period():
+    today = timezone.localdate()
+    return f"{today.year}-{today.month:02d}"
+
+
+def _cashier(index):
+    return User.objects.create_user(
+        email=f"team-cashier-{index}@test.com",
+        password="testpass123",
+        first_name="Caissier",
+        last_name=str(index),
+        role=User.Role.CASHIER,
+    )
+
+
+def _pay(store, shift, seller, amount, method=Payment.Method.CASH, status=Sale.Status.PAID):
+    sale = Sale.objects.create(
+        store=store,
+        seller=seller,
+        status=status,
+        subtotal=Decimal(amount),
+        total=Decimal(amount),
+        submitted_at=timezone.now() - timedelta(minutes=4),
+    )
+    return Payment.objects.create(
+        sale=sale,
+        store=store,
+        cashier=shift.cashier,
+        shift=shift,
+        method=method,
+        amount=Decimal(amount),
+    )
+
+
+@pytest.mark.django_db
+def test_team_overview_matches_single_cashier_payload(store, sales_user):
+    cashiers = [_cashier(i) for i in range(3)]
+    for index, cashier in enumerate(cashiers):
+        shift = CashShift.objects.create(store=store, cashier=cashier, opening_float=Decimal("10000.00"))
+        _pay(store, shift, sales_user, "20000.00")
+        _pay(store, shift, sales_user, "5000.00", method=Payment.Method.MOBILE_MONEY)
+        if index == 0:
+            _pay(store, shift, sales_user, "7000.00", status=Sale.Status.REFUNDED)
+            CashShift.objects.filter(pk=shift.pk).update(
+                status=CashShift.Status.CLOSED,
+                closed_at=shift.opened_at + timedelta(hours=8),
+                expected_cash=Decimal("37000.00"),
+                variance=Decimal("-3000.00"),
+            )
+
+    engine = CashierAnalyticsEngine(store_id=str(store.id))
+    team = engine.compute_team_overview(_period())
+
+    assert len(team) == 3
+    for member in team:
+        kpis = engine.compute_kpis(member["cashier_id"], _period())
+        assert member["kpis"] == kpis
+        assert member["payment_methods"] == engine.compute_payment_methods(member["cashier_id"], _period())
+        assert member["score"] == engine.compute_reliability_score(member["cashier_id"], _period(), kpis)
+    first = next(m for m in team if m["cashier_id"] == str(cashiers[0].id))
+    assert Decimal(first["kpis"]["total_collected"]) == Decimal("32000.00")
+    assert first["kpis"]["refund_count"] == 1
+    assert first["kpis"]["avg_shift_duration_h"] == 8.0
+    assert first["kpis"]["variance_rate"] == pytest.approx(8.11, abs=0.01)
+    assert first["anomalies"]["anomalies"][0]["type"] == "HIGH_VARIANCE"
+    assert [m["method"] for m in first["payment_methods"]["by_method"]] == ["CASH", "MOBILE_MONEY"]
+
+
+@pytest.mark.django_db
+def test_team_overview_query_count_is_constant(store, sales_user, django_assert_max_num_queries):
+    for index in range(8):
+        shift = CashShift.objects.create(store=store, cashier=_cashier(index), opening_float=Decimal("0.00"))
+        _pay(store, shift, sales_user, "1000.00")
+
+    engine = CashierAnalyticsEngine(store_id=str(store.id))
+    with django_assert_max_num_queries(7):
+        team = engine.compute_team_overview(_period())
+    assert len(team) == 8
@@ -163,7 +163,7 @@ class TestCatalogServices:
         product.save(update_fields=["created_at"])
 
         response = export_products_to_excel(Product.objects.filter(pk=product.pk))
-        wb = openpyxl.load_workbook(BytesIO(response.content), data_only=True)
+        wb = openpyxl.load_workbook(BytesIO(b"".join(response.streaming_content)), data_only=True)
         ws = wb.active
 
         assert (
@@ -200,3 +200,19 @@ class TestCatalogServices:
 
         assert slug == "item"
         assert next_slug == "item-1"
+
+    def test_import_keeps_excel_rules_for_zero_price_and_unknown_actif(self, enterprise):
+        file = _build_excel_file(
+            [
+                ("Cable RJ45", "RJ45-1", "", "Cables", "", "100", "0", "", "oui"),
+                ("Cable HDMI", "HDMI-1", "", "Cables", "", "500", "900", "", "peut-etre"),
+            ]
+        )
+
+        result = import_products_from_excel(file, enterprise=enterprise)
+
+        assert result["created"] == 1
+        assert result["errors"] == 1
+        assert "Ligne 2" in result["error_details"][0]
+        assert "prix de vente est obligatoire" in result["error_details"][0].lower()
+        assert Product.objects.get(enterprise=enterprise, sku="HDMI-1").is_active is False
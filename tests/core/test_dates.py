@@ -0,0 +1,48 @@
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from core.dates import date_range_filter, month_filter, store_timezone
+from reports.services import get_sales_report
+from sales.models import Sale
+
+
+def test_date_range_filter_uses_half_open_local_days():
+    from zoneinfo import ZoneInfo
+
+    lookups = date_range_filter("created_at", date(2026, 3, 1), date(2026, 3, 31), tz=ZoneInfo("Europe/Paris"))
+
+    assert lookups["created_at__gte"] == datetime(2026, 2, 28, 23, 0, tzinfo=dt_timezone.utc)
+    # DST starts on 2026-03-29: April 1st begins at 22:00 UTC.
+    assert lookups["created_at__lt"] == datetime(2026, 3, 31, 22, 0, tzinfo=dt_timezone.utc)
+    assert month_filter("created_at", 2026, 3, tz=ZoneInfo("Europe/Paris")) == lookups
+
+
+def test_open_bounds_are_omitted():
+    assert set(date_range_filter("opened_at", date(2026, 1, 1))) == {"opened_at__gte"}
+    assert date_range_filter("opened_at") == {}
+
+
+@pytest.mark.django_db
+def test_store_timezone_follows_enterprise(store, enterprise):
+    enterprise.timezone = "Asia/Tokyo"
+    enterprise.save(update_fields=["timezone"])
+
+    assert str(store_timezone(store.pk)) == "Asia/Tokyo"
+
+
+@pytest.mark.django_db
+def test_sales_report_counts_sales_on_local_business_day(store, enterprise, sales_user):
+    enterprise.timezone = "Asia/Tokyo"
+    enterprise.save(update_fields=["timezone"])
+    sale = Sale.objects.create(store=store, seller=sales_user, status=Sale.Status.PAID, total=Decimal("1000"))
+    # 16:00 UTC on March 9th is already March 10th in Tokyo.
+    Sale.objects.filter(pk=sale.pk).update(created_at=datetime(2026, 3, 9, 16, 0, tzinfo=dt_timezone.utc))
+    # Bulk updates bypass the rollup signals.
+    call_command("backfill_sales_rollups", store=str(store.pk), stdout=StringIO())
+
+    assert get_sales_report(store, date(2026, 3, 10), date(2026, 3, 10))["nb_ventes"] == 1
+    assert get_sales_report(store, date(2026, 3, 9), date(2026, 3, 9))["nb_ventes"] == 0
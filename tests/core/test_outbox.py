@@ -0,0 +1,174 @@
+from decimal import Decimal
+
+import pytest
+from django.test import override_settings
+
+from alerts.models import Alert
+from cashier.services import open_shift, process_payment
+from core.models import OutboxEvent
+from core.outbox import _HANDLERS, dispatch_pending_events, outbox_handler, publish_event
+from sales.services import add_item_to_sale, create_sale, recalculate_sale, submit_sale_to_cashier
+
+
+@pytest.fixture
+def recorded():
+    calls = []
+
+    @outbox_handler("tests.record")
+    def _record(payload):
+        if payload.get("fail"):
+            raise RuntimeError("boom")
+        calls.append(payload["n"])
+
+    yield calls
+    _HANDLERS.pop("tests.record", None)
+
+
+def _self_checkout_sale(store, cashier_user, customer, product):
+    sale = create_sale(store=store, seller=cashier_user, customer=customer)
+    add_item_to_sale(sale=sale, product=product, qty=1, actor=cashier_user)
+    recalculate_sale(sale)
+    submit_sale_to_cashier(sale=sale, actor=cashier_user)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+    process_payment(
+        sale=sale,
+        payments_data=[{"method": "CASH", "amount": str(sale.amount_due), "reference": ""}],
+        cashier=cashier_user,
+        shift=shift,
+    )
+    return sale
+
+
+@pytest.mark.django_db
+@override_settings(OUTBOX_ENABLED=True)
+def test_self_checkout_alert_is_delivered_by_dispatcher(
+    store, cashier_user, customer, product, product_stock,
+):
+    sale = _self_checkout_sale(store, cashier_user, customer, product)
+
+    assert not Alert.objects.filter(store=store, alert_type="SELF_CHECKOUT").exists()
+    event = OutboxEvent.objects.get(topic="cashier.self_checkout")
+    assert event.aggregate_key == f"sales.Sale:{sale.pk}"
+
+    summary = dispatch_pending_events()
+
+    assert summary["delivered"] >= 1
+    assert Alert.objects.filter(store=store, alert_type="SELF_CHECKOUT").count() == 1
+    event.refresh_from_db()
+    assert event.status == OutboxEvent.Status.DONE
+
+
+@pytest.mark.django_db
+@override_settings(OUTBOX_ENABLED=True)
+def test_store_can_keep_synchronous_side_effects(
+    store, cashier_user, customer, product, product_stock,
+):
+    store.analytics_feature_overrides = {"sync_side_effects": True}
+    store.save(update_fields=["analytics_feature_overrides"])
+
+    _self_checkout_sale(store, cashier_user, customer, product)
+
+    assert Alert.objects.filter(store=store, alert_type="SELF_CHECKOUT").count() == 1
+    assert not OutboxEvent.objects.exists()
+
+
+@pytest.mark.django_db
+@override_settings(OUTBOX_MAX_ATTEMPTS=2)
+def test_failed_event_blocks_its_aggregate_until_given_up(recorded):
+    publish_event("tests.record", aggregate_key="a", payload={"n": 1, "fail": True})
+    publish_event("tests.record", aggregate_key="a", payload={"n": 2})
+    publish_event("tests.record", aggregate_key="b", payload={"n": 3})
+
+    summary = dispatch_pending_events()
+    assert recorded == [3]
+    assert summary["retried"] == 1
+    assert summary["deferred"] == 1
+
+    OutboxEvent.objects.filter(status=OutboxEvent.Status.PENDING).update(available_at="2000-01-01T00:00Z")
+    summary = dispatch_pending_events()
+
+    assert summary["failed"] == 1
+    assert recorded == [3, 2]
+    assert OutboxEvent.objects.get(payload__n=1).status == OutboxEvent.Status.FAILED
+
+
+@pytest.mark.django_db
+def test_pending_events_are_deduplicated(recorded):
+    for n in range(3):
+        publish_event("tests.record", aggregate_key="a", payload={"n": n}, dedupe_key="same")
+
+    assert OutboxEvent.objects.count() == 1
+    dispatch_pending_events()
+    publish_event("tests.record", aggregate_key="a", payload={"n": 9}, dedupe_key="same")
+    assert OutboxEvent.objects.filter(status=OutboxEvent.Status.PENDING).count() == 1
+
+
+@pytest.mark.django_db
+def test_publication_during_delivery_is_kept(recorded):
+    @outbox_handler("tests.refresh")
+    def _refresh(payload):
+        recorded.append(payload["n"])
+        if payload["n"] == 1:
+            # The entity changed again while its refresh was running.
+            publish_event("tests.refresh", aggregate_key="a", payload={"n": 2}, dedupe_key="refresh")
+
+    try:
+        publish_event("tests.refresh", aggregate_key="a", payload={"n": 1}, dedupe_key="refresh")
+        dispatch_pending_events()
+        assert OutboxEvent.objects.get(status=OutboxEvent.Status.PENDING).payload == {"n": 2}
+
+        dispatch_pending_events()
+        assert recorded == [1, 2]
+    finally:
+        _HANDLERS.pop("tests.refresh", None)
+
+
+@pytest.mark.django_db
+def test_events_not_yet_due_do_not_fill_the_batch(recorded):
+    for n in range(3):
+        publish_event("tests.record", aggregate_key=f"later-{n}", payload={"n": n})
+    OutboxEvent.objects.update(available_at="2999-01-01T00:00Z")
+    publish_event("tests.record", aggregate_key="now", payload={"n": 9})
+
+    summary = dispatch_pending_events(batch_size=2)
+
+    assert summary["delivered"] == 1
+    assert recorded == [9]
+
+
+@pytest.mark.django_db
+def test_stale_claims_are_released(recorded):
+    publish_event("tests.record", aggregate_key="a", payload={"n": 1})
+    OutboxEvent.objects.update(status=OutboxEvent.Status.PROCESSING, updated_at="2000-01-01T00:00Z")
+
+    dispatch_pending_events()
+
+    assert recorded == [1]
+    assert OutboxEvent.objects.get().status == OutboxEvent.Status.DONE
+
+
+@pytest.mark.django_db
+def test_duplicate_publication_while_aggregate_fails(recorded, monkeypatch):
+    from core import outbox
+
+    claim_batch = outbox._claim_batch
+
+    def _claim_then_publish(*args):
+        claimed = claim_batch(*args)
+        # Published while the claimed events are PROCESSING.
+        publish_event("tests.record", aggregate_key="a", payload={"n": 3}, dedupe_key="k")
+        publish_event("tests.record", aggregate_key="a", payload={"n": 4}, dedupe_key="f")
+        return claimed
+
+    monkeypatch.setattr(outbox, "_claim_batch", _claim_then_publish)
+    publish_event("tests.record", aggregate_key="a", payload={"n": 1, "fail": True}, dedupe_key="f")
+    publish_event("tests.record", aggregate_key="a", payload={"n": 2}, dedupe_key="k")
+    publish_event("tests.record", aggregate_key="b", payload={"n": 5})
+
+    summary = dispatch_pending_events()
+
+    assert (summary["retried"], summary["deferred"], summary["delivered"]) == (1, 1, 1)
+    assert recorded == [5]
+    assert not OutboxEvent.objects.filter(status=OutboxEvent.Status.PROCESSING).exists()
+    pending = OutboxEvent.objects.filter(status=OutboxEvent.Status.PENDING)
+    assert sorted(pending.values_list("dedupe_key", flat=True), key=str) == [None, None, "f", "k"]
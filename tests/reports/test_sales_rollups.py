@@ -0,0 +1,170 @@
+import importlib
+from datetime import timedelta
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+
+from cashier.services import open_shift, process_payment
+from core.dates import local_today, store_timezone
+from reports import rollups
+from reports.models import (
+    SalesDailyRollup,
+    SalesHourlyRollup,
+    SalesProductDailyRollup,
+    SalesSellerDailyRollup,
+)
+from reports.rollups import sales_rollup_totals
+from reports.services import get_sales_report
+from sales.models import Refund, Sale, SaleItem
+from sales.services import add_item_to_sale, create_sale, recalculate_sale, submit_sale_to_cashier
+from stock.services import adjust_stock
+
+
+def _paid_sale(store, seller, product, quantity=2):
+    sale = Sale.objects.create(store=store, seller=seller)
+    SaleItem.objects.create(
+        sale=sale,
+        product=product,
+        product_name=product.name,
+        unit_price=Decimal("500.00"),
+        cost_price=Decimal("300.00"),
+        quantity=quantity,
+    )
+    sale.refresh_from_db()
+    sale.status = Sale.Status.PAID
+    sale.save(update_fields=["status"])
+    return sale
+
+
+@pytest.mark.django_db
+def test_paying_a_sale_updates_every_grain(store, sales_user, product):
+    sale = _paid_sale(store, sales_user, product)
+    today = local_today(store_timezone(store))
+
+    daily = SalesDailyRollup.objects.get(store=store, date=today)
+    assert (daily.orders, daily.revenue, daily.cost, daily.items_sold) == (
+        1, sale.total, Decimal("600.00"), 2,
+    )
+    assert SalesProductDailyRollup.objects.get(store=store, date=today, product=product).quantity == 2
+    assert SalesSellerDailyRollup.objects.get(store=store, date=today, seller=sales_user).orders == 1
+
+
+@pytest.mark.django_db
+def test_cancelling_and_refunding_update_rollups(store, sales_user, admin_user, product):
+    kept = _paid_sale(store, sales_user, product)
+    cancelled = _paid_sale(store, sales_user, product, quantity=1)
+    today = local_today(store_timezone(store))
+
+    cancelled.status = Sale.Status.CANCELLED
+    cancelled.save(update_fields=["status"])
+    Refund.objects.create(
+        sale=kept, store=store, amount=Decimal("100.00"), reason="Retour", processed_by=admin_user,
+    )
+
+    totals = sales_rollup_totals(store, today, today)
+    assert totals["orders"] == 1
+    assert totals["refunds"] == Decimal("100.00")
+    assert totals["gross_margin"] == Decimal("400.00")
+
+
+@pytest.mark.django_db
+def test_sales_report_sums_rollups_over_range(store, sales_user, product):
+    _paid_sale(store, sales_user, product)
+    today = local_today(store_timezone(store))
+
+    report = get_sales_report(store, today - timedelta(days=7), today)
+
+    assert report["nb_ventes"] == 1
+    assert report["top_products"][0]["qty_sold"] == 2
+    assert report["by_seller"][0]["nb"] == 1
+    assert SalesDailyRollup.objects.filter(store=store, date__lt=today).count() == 0
+
+
+@pytest.mark.django_db
+def test_events_apply_deltas_once_the_bucket_exists(store, sales_user, admin_user, product, monkeypatch):
+    first = _paid_sale(store, sales_user, product)
+    today = local_today(store_timezone(store))
+    rebuilds = []
+    monkeypatch.setattr(rollups, "rebuild_sales_rollups", lambda *args, **kwargs: rebuilds.append(args))
+
+    second = _paid_sale(store, admin_user, product, quantity=1)
+    line = second.items.get()
+    line.quantity = 3
+    line.save()
+    Refund.objects.create(
+        sale=first, store=store, amount=Decimal("50.00"), reason="Retour", processed_by=admin_user,
+    )
+
+    assert rebuilds == []
+    second.refresh_from_db()
+    daily = SalesDailyRollup.objects.get(store=store, date=today)
+    assert (daily.orders, daily.revenue, daily.items_sold, daily.cost, daily.refunds) == (
+        2, first.total + second.total, 5, Decimal("1500.00"), Decimal("50.00"),
+    )
+    assert SalesSellerDailyRollup.objects.get(store=store, date=today, seller=admin_user).cost == Decimal("900.00")
+    assert SalesProductDailyRollup.objects.get(store=store, date=today, product=product).quantity == 5
+    assert SalesHourlyRollup.objects.get(store=store, date=today).orders == 2
+
+    second.status = Sale.Status.CANCELLED
+    second.save(update_fields=["status"])
+
+    assert rebuilds == []
+    assert not SalesSellerDailyRollup.objects.filter(store=store, date=today, seller=admin_user).exists()
+    totals = sales_rollup_totals(store, today, today)
+    assert (totals["orders"], totals["items_sold"], totals["revenue"]) == (1, 2, first.total)
+
+
+@pytest.mark.django_db
+def test_cost_and_margin_include_fifo_cost_right_after_payment(
+    settings, store, sales_user, cashier_user, customer, product, product_stock,
+):
+    settings.OUTBOX_ENABLED = False
+    product_stock.quantity = 0
+    product_stock.save(update_fields=["quantity", "updated_at"])
+    for unit_cost in ("100.00", "200.00"):
+        adjust_stock(
+            store=store, product=product, qty_delta=3, movement_type="IN", reason="Lot",
+            actor=sales_user, unit_cost=Decimal(unit_cost),
+        )
+    sale = create_sale(store=store, seller=sales_user, customer=customer)
+    item = add_item_to_sale(sale=sale, product=product, qty=4, actor=sales_user)
+    recalculate_sale(sale)
+    submit_sale_to_cashier(sale=sale, actor=sales_user)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("50000"))
+
+    process_payment(
+        sale=sale,
+        payments_data=[{"method": "CASH", "amount": float(sale.total), "reference": ""}],
+        cashier=cashier_user,
+        shift=shift,
+    )
+
+    item.refresh_from_db()
+    today = local_today(store_timezone(store))
+    totals = sales_rollup_totals(store, today, today)
+    assert totals["cost"] == Decimal("500.00")
+    assert totals["gross_margin"] == item.line_total - Decimal("500.00")
+    assert SalesProductDailyRollup.objects.get(store=store, date=today, product=product).cost == Decimal("500.00")
+
+
+@pytest.mark.django_db
+def test_backfill_migration_builds_rollups_of_existing_sales(store, sales_user, admin_user, product):
+    sale = _paid_sale(store, sales_user, product)
+    Refund.objects.create(
+        sale=sale, store=store, amount=Decimal("100.00"), reason="Retour", processed_by=admin_user,
+    )
+    for model in (SalesDailyRollup, SalesSellerDailyRollup, SalesProductDailyRollup, SalesHourlyRollup):
+        model.objects.all().delete()
+    migration = importlib.import_module("reports.migrations.0003_backfill_sales_rollups")
+
+    migration.backfill_sales_rollups(MigrationLoader(connection).project_state().apps, None)
+
+    today = local_today(store_timezone(store))
+    totals = sales_rollup_totals(store, today, today)
+    assert (totals["orders"], totals["revenue"], totals["refunds"]) == (1, sale.total, Decimal("100.00"))
+    assert totals["gross_margin"] == Decimal("400.00")
+    assert SalesProductDailyRollup.objects.get(store=store, date=today, product=product).quantity == 2
+    assert SalesSellerDailyRollup.objects.get(store=store, date=today, seller=sales_user).orders == 1
+    assert SalesHourlyRollup.objects.get(store=store, date=today).revenue == sale.total
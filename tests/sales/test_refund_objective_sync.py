@@ -81,3 +81,62 @@ def test_refund_updates_seller_objective_stats_immediately(
     assert stats.gross_amount == Decimal("100000.00")
     assert stats.refund_amount == Decimal("30000.00")
     assert stats.net_amount == Decimal("70000.00")
+
+
+@pytest.mark.django_db
+def test_payment_delta_matches_full_recompute_and_reconciles(
+    store,
+    sales_user,
+    cashier_user,
+    customer,
+    product,
+    product_stock,
+    django_capture_on_commit_callbacks,
+):
+    from objectives.tasks import reconcile_seller_stats
+
+    today = timezone.localdate()
+    period = f"{today.year}-{today.month:02d}"
+    rule = ObjectiveRule.objects.create(
+        store=store,
+        name="Regle test deltas",
+        is_active=True,
+        valid_from=date(today.year, 1, 1),
+        version=1,
+    )
+    ObjectiveTier.objects.create(
+        rule=rule,
+        name="Argent",
+        rank=1,
+        threshold=Decimal("50000.00"),
+        bonus_amount=Decimal("5000.00"),
+        bonus_rate=Decimal("0.00"),
+    )
+    engine = ObjectiveCalculationEngine(store_id=str(store.id))
+    engine.compute_for_seller(seller_id=str(sales_user.id), period=period, trigger="MANUAL")
+
+    sale = create_sale(store=store, seller=sales_user, customer=customer)
+    add_item_to_sale(sale=sale, product=product, qty=2, actor=sales_user)
+    recalculate_sale(sale)
+    submit_sale_to_cashier(sale=sale, actor=sales_user)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("50000.00"))
+    with django_capture_on_commit_callbacks(execute=True):
+        process_payment(
+            sale=sale,
+            payments_data=[{"method": "CASH", "amount": float(sale.total), "reference": ""}],
+            cashier=cashier_user,
+            shift=shift,
+        )
+
+    stats = SellerMonthlyStats.objects.get(store=store, seller=sales_user, period=period)
+    assert stats.gross_amount == Decimal("100000.00")
+    assert stats.sale_count == 1
+    assert stats.current_tier_name == "Argent"
+    assert stats.bonus_earned == Decimal("5000.00")
+    delta_values = (stats.gross_amount, stats.refund_amount, stats.sale_count, stats.cancellation_count)
+    assert reconcile_seller_stats(period=period) == {"checked": 1, "drifted": 0}
+
+    SellerMonthlyStats.objects.filter(pk=stats.pk).update(gross_amount=Decimal("1.00"), sale_count=0)
+    assert reconcile_seller_stats(period=period) == {"checked": 1, "drifted": 1}
+    stats.refresh_from_db()
+    assert (stats.gross_amount, stats.refund_amount, stats.sale_count, stats.cancellation_count) == delta_values
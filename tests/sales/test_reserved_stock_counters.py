@@ -0,0 +1,142 @@
+from decimal import Decimal
+
+import pytest
+
+from cashier.services import open_shift, process_payment
+from catalog.models import ProductVariant
+from sales.services import (
+    add_item_to_sale,
+    cancel_sale,
+    create_sale,
+    recalculate_sale,
+    submit_sale_to_cashier,
+)
+from stock.models import ProductStock
+from stock.services import reconcile_reserved_stock
+
+
+def _layaway_sale(store, seller, customer, product, qty):
+    sale = create_sale(store=store, seller=seller, customer=customer)
+    add_item_to_sale(sale=sale, product=product, qty=qty, actor=seller)
+    recalculate_sale(sale)
+    sale.reserve_stock = True
+    sale.save(update_fields=["reserve_stock", "updated_at"])
+    submit_sale_to_cashier(sale=sale, actor=seller)
+    return sale
+
+
+def _pay(sale, cashier, shift, amount):
+    process_payment(
+        sale=sale,
+        payments_data=[{"method": "CASH", "amount": str(amount), "reference": ""}],
+        cashier=cashier,
+        shift=shift,
+    )
+    sale.refresh_from_db()
+
+
+@pytest.mark.django_db
+def test_layaway_sale_reserves_until_paid_then_decrements_once(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    # A layaway sale (reserve_stock) keeps its goods in store while it is
+    # partially paid: they are reserved, not taken out of the stock, as
+    # tests/sales/test_sale_flow.py expects.  Decrementing as well would
+    # count them twice in available_qty.
+    sale = _layaway_sale(store, sales_user, customer, product, qty=4)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+
+    stock = ProductStock.objects.get(pk=product_stock.pk)
+    assert (sale.stock_decremented, sale.stock_reserved) == (False, True)
+    assert (stock.quantity, stock.reserved_qty, stock.available_qty) == (100, 4, 96)
+
+    _pay(sale, cashier_user, shift, sale.amount_due)
+
+    stock.refresh_from_db()
+    assert sale.status == "PAID"
+    assert (sale.stock_decremented, sale.stock_reserved) == (True, False)
+    assert (stock.quantity, stock.reserved_qty) == (96, 0)
+
+
+@pytest.mark.django_db
+def test_partial_payment_without_reservation_still_decrements(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    sale = create_sale(store=store, seller=sales_user, customer=customer)
+    add_item_to_sale(sale=sale, product=product, qty=4, actor=sales_user)
+    recalculate_sale(sale)
+    submit_sale_to_cashier(sale=sale, actor=sales_user)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+
+    stock = ProductStock.objects.get(pk=product_stock.pk)
+    assert (sale.stock_decremented, sale.stock_reserved) == (True, False)
+    assert (stock.quantity, stock.reserved_qty) == (96, 0)
+
+
+@pytest.mark.django_db
+def test_second_partial_payment_does_not_touch_reserved_counter(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    sale = _layaway_sale(store, sales_user, customer, product, qty=4)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+    assert sale.stock_reserved is True
+    assert ProductStock.objects.get(pk=product_stock.pk).reserved_qty == 4
+
+    # Simulate an external change: a second partial payment must not recompute.
+    ProductStock.objects.filter(pk=product_stock.pk).update(reserved_qty=7)
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+    assert ProductStock.objects.get(pk=product_stock.pk).reserved_qty == 7
+
+
+@pytest.mark.django_db
+def test_cancelling_layaway_sale_releases_its_reservation(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    sale = _layaway_sale(store, sales_user, customer, product, qty=3)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+
+    cancel_sale(sale, reason="Client absent", actor=sales_user)
+
+    sale.refresh_from_db()
+    stock = ProductStock.objects.get(pk=product_stock.pk)
+    assert sale.stock_reserved is False
+    assert stock.reserved_qty == 0
+    assert stock.quantity == 100
+
+
+@pytest.mark.django_db
+def test_reconcile_reserved_stock_repairs_drift(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    sale = _layaway_sale(store, sales_user, customer, product, qty=2)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+
+    ProductStock.objects.filter(pk=product_stock.pk).update(reserved_qty=9)
+
+    assert reconcile_reserved_stock(store=store) == 1
+    assert ProductStock.objects.get(pk=product_stock.pk).reserved_qty == 2
+    assert reconcile_reserved_stock(store=store) == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_reserved_stock_leaves_variant_rows_alone(
+    store, sales_user, cashier_user, customer, product, product_stock,
+):
+    variant = ProductVariant.objects.create(product=product, name="Rouge", sku="VAR-ROUGE")
+    variant_stock = ProductStock.objects.create(store=store, product=product, variant=variant, quantity=5)
+    sale = _layaway_sale(store, sales_user, customer, product, qty=2)
+    shift = open_shift(store=store, cashier=cashier_user, opening_float=Decimal("0"))
+    _pay(sale, cashier_user, shift, Decimal("1000"))
+    ProductStock.objects.filter(pk=product_stock.pk).update(reserved_qty=0)
+
+    assert reconcile_reserved_stock() == 1
+    assert ProductStock.objects.get(pk=product_stock.pk).reserved_qty == 2
+    assert ProductStock.objects.get(pk=variant_stock.pk).reserved_qty == 0
@@ -0,0 +1,142 @@
+import uuid
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from catalog.models import Product, ProductVariant
+from stock.models import InventoryMovement, ProductStock, StockLot
+from stock.services import adjust_stock, adjust_stock_many
+
+
+def _make_products(category, count):
+    return [
+        Product.objects.create(
+            enterprise=category.enterprise,
+            category=category,
+            name=f"Cable {idx}",
+            slug=f"cable-{idx}",
+            sku=f"CBL-{idx:03d}",
+            selling_price=Decimal("1000.00"),
+            cost_price=Decimal("500.00"),
+        )
+        for idx in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_adjust_stock_many_applies_lines_in_order_with_fifo_details(store, admin_user, product):
+    adjust_stock(store, product, 3, "IN", "Lot 1", admin_user, unit_cost=Decimal("100.00"))
+    adjust_stock(store, product, 3, "IN", "Lot 2", admin_user, unit_cost=Decimal("200.00"))
+    batch_id = uuid.uuid4()
+
+    results = adjust_stock_many(
+        [
+            {"store": store, "product": product, "qty_delta": -2, "movement_type": "SALE", "reason": "L1"},
+            {"store": store, "product": product, "qty_delta": -2, "movement_type": "SALE", "reason": "L2"},
+        ],
+        actor=admin_user,
+        batch_id=batch_id,
+    )
+
+    assert [details["applied_unit_cost"] for _movement, details in results] == [
+        Decimal("100.00"),
+        Decimal("150.00"),
+    ]
+    assert [movement.quantity for movement, _details in results] == [-2, -2]
+    assert InventoryMovement.objects.filter(batch_id=batch_id).count() == 2
+    assert ProductStock.objects.get(store=store, product=product).quantity == 2
+    remaining = list(
+        StockLot.objects.filter(store=store, product=product)
+        .order_by("unit_cost")
+        .values_list("quantity_remaining", flat=True)
+    )
+    assert remaining == [0, 2]
+
+
+@pytest.mark.django_db
+def test_adjust_stock_many_uses_the_product_level_row_only(store, admin_user, product):
+    variant = ProductVariant.objects.create(product=product, name="Rouge", sku="VAR-ROUGE")
+    ProductStock.objects.create(store=store, product=product, variant=variant, quantity=7)
+    line = {"store": store, "product": product, "qty_delta": 4, "movement_type": "IN", "reason": "Entree"}
+
+    adjust_stock_many([line], actor=admin_user)
+    adjust_stock_many([line], actor=admin_user)
+
+    assert ProductStock.objects.get(store=store, product=product, variant__isnull=True).quantity == 8
+    assert ProductStock.objects.get(variant=variant).quantity == 7
+
+
+@pytest.mark.django_db
+def test_adjust_stock_many_rolls_back_whole_batch_on_shortage(store, admin_user, category):
+    first, second = _make_products(category, 2)
+    adjust_stock(store, first, 5, "IN", "Init", admin_user)
+    adjust_stock(store, second, 1, "IN", "Init", admin_user)
+
+    with pytest.raises(ValueError, match="Stock insuffisant"):
+        adjust_stock_many(
+            [
+                {"store": store, "product": first, "qty_delta": -5, "movement_type": "SALE", "reason": ""},
+                {"store": store, "product": second, "qty_delta": -2, "movement_type": "SALE", "reason": ""},
+            ],
+            actor=admin_user,
+        )
+
+    assert ProductStock.objects.get(store=store, product=first).quantity == 5
+    assert ProductStock.objects.get(store=store, product=second).quantity == 1
+
+
+@pytest.mark.django_db
+def test_adjust_stock_many_query_count_does_not_grow_with_lines(store, admin_user, category):
+    products = _make_products(category, 30)
+    adjust_stock_many(
+        [
+            {"store": store, "product": p, "qty_delta": 50, "movement_type": "IN", "reason": "Init"}
+            for p in products
+        ],
+        actor=admin_user,
+    )
+
+    def _run(batch):
+        with CaptureQueriesContext(connection) as ctx:
+            adjust_stock_many(
+                [
+                    {"store": store, "product": p, "qty_delta": -1, "movement_type": "SALE", "reason": ""}
+                    for p in batch
+                ],
+                actor=admin_user,
+            )
+        return len(ctx.captured_queries)
+
+    assert _run(products[:30]) == _run(products[:3])
+
+
+@pytest.mark.django_db
+def test_fifo_consumption_query_count_does_not_grow_with_lot_fragmentation(store, admin_user, category):
+    fragmented, compact = _make_products(category, 2)
+    adjust_stock_many(
+        [
+            {"store": store, "product": fragmented, "qty_delta": 1, "movement_type": "IN", "reason": "Lot"}
+            for _ in range(40)
+        ]
+        + [{"store": store, "product": compact, "qty_delta": 40, "movement_type": "IN", "reason": "Lot"}],
+        actor=admin_user,
+    )
+
+    def _sell(product):
+        with CaptureQueriesContext(connection) as ctx:
+            [(_movement, details)] = adjust_stock_many(
+                [{"store": store, "product": product, "qty_delta": -30, "movement_type": "SALE", "reason": ""}],
+                actor=admin_user,
+            )
+        return len(ctx.captured_queries), details
+
+    fragmented_queries, fragmented_details = _sell(fragmented)
+    compact_queries, compact_details = _sell(compact)
+
+    assert fragmented_queries == compact_queries
+    assert len(fragmented_details["consumed_lots"]) == 30
+    assert sum(lot["qty"] for lot in fragmented_details["consumed_lots"]) == 30
+    assert compact_details["consumed_lots"][0]["qty"] == 30
+    assert StockLot.objects.filter(store=store, product=fragmented, quantity_remaining__gt=0).count() == 10
@@ -0,0 +1,66 @@
+import pytest
+from django.test import override_settings
+
+from stores.models import Sequence
+from stores.numbering import (
+    format_store_code,
+    get_numbering_metrics,
+    next_document_number,
+    reset_numbering_state,
+)
+
+
+@pytest.fixture(autouse=True)
+def _clean_numbering_state():
+    reset_numbering_state()
+    yield
+    reset_numbering_state()
+
+
+@pytest.mark.django_db
+@override_settings(DOCUMENT_NUMBER_BLOCK_SIZE=5)
+def test_invoice_numbers_stay_gap_free_even_with_blocks_enabled(store):
+    numbers = [next_document_number(store, "FAC", year=2026) for _ in range(3)]
+
+    assert numbers == [
+        "FAC-BT001-2026-000001",
+        "FAC-BT001-2026-000002",
+        "FAC-BT001-2026-000003",
+    ]
+    assert Sequence.objects.get(store=store, prefix="FAC", year=2026).next_number == 4
+
+
+@pytest.mark.django_db
+@override_settings(DOCUMENT_NUMBER_BLOCK_SIZE=5)
+def test_quote_numbers_are_served_from_reserved_block(store, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        first = next_document_number(store, "DEV", year=2026)
+    others = [next_document_number(store, "DEV", year=2026) for _ in range(4)]
+
+    assert first == "DEV-BT001-2026-000001"
+    assert others[-1] == "DEV-BT001-2026-000005"
+    # One round trip reserved the whole block.
+    assert Sequence.objects.get(store=store, prefix="DEV", year=2026).next_number == 6
+    metrics = get_numbering_metrics()["DEV"]
+    assert metrics["allocations"] == 5
+    assert metrics["db_round_trips"] == 1
+    assert metrics["block_hits"] == 4
+
+
+@pytest.mark.django_db
+@override_settings(DOCUMENT_NUMBER_BLOCK_SIZE=5)
+def test_uncommitted_block_is_never_handed_out(store, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=False):
+        first = next_document_number(store, "PO", year=2026)
+    second = next_document_number(store, "PO", year=2026)
+
+    assert first == "PO-BT001-2026-000001"
+    assert second == "PO-BT001-2026-000006"
+
+
+def test_store_code_segment_is_cached():
+    format_store_code.cache_clear()
+    assert format_store_code("bq-centre ville") == "BQCENTREVI"
+    assert format_store_code("bq-centre ville") == "BQCENTREVI"
+    assert format_store_code.cache_info().hits == 1
+    assert format_store_code("") == "STORE"
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from stores.models import (
+    BillingModule,
+    BillingPlan,
+    BillingPlanModule,
+    EnterprisePlanAssignment,
+    Store,
+    StoreModuleEntitlement,
+)
+from stores.services import resolve_store_module_matrix
+
+
+@pytest.mark.django_db
+def test_cached_matrix_costs_no_queries(store, django_assert_num_queries):
+    store = Store.objects.get(pk=store.pk)
+    first = resolve_store_module_matrix(store=store)
+
+    with django_assert_num_queries(0):
+        second = resolve_store_module_matrix(store=store)
+
+    assert second == first
+    second["modules"]["SELL"] = False
+    assert resolve_store_module_matrix(store=store)["modules"]["SELL"] is True
+
+
+@pytest.mark.django_db
+def test_store_override_invalidates_cached_matrix(store):
+    assert resolve_store_module_matrix(store=store)["modules"]["STOCK"] is True
+    module = BillingModule.objects.create(code="STOCK", name="Stock")
+
+    entitlement = StoreModuleEntitlement.objects.create(
+        store=store, module=module, state=StoreModuleEntitlement.State.DISABLED,
+    )
+    assert resolve_store_module_matrix(store=store)["modules"]["STOCK"] is False
+
+    entitlement.delete()
+    assert resolve_store_module_matrix(store=store)["modules"]["STOCK"] is True
+
+
+@pytest.mark.django_db
+def test_feature_flag_change_invalidates_cached_matrix(store):
+    assert resolve_store_module_matrix(store=store)["modules"]["ACCOUNTING"] is False
+
+    store.analytics_feature_overrides = {"accounting": True}
+    store.save(update_fields=["analytics_feature_overrides"])
+
+    assert resolve_store_module_matrix(store=store)["modules"]["ACCOUNTING"] is True
+
+
+@pytest.mark.django_db
+def test_plan_assignment_and_plan_modules_invalidate_cached_matrix(store, enterprise):
+    today = timezone.localdate()
+    assert resolve_store_module_matrix(store=store)["source"] == "feature_flags"
+
+    plan = BillingPlan.objects.create(code="STARTER", name="Starter")
+    core = BillingModule.objects.create(code="CORE", name="Base")
+    BillingPlanModule.objects.create(plan=plan, module=core)
+    EnterprisePlanAssignment.objects.create(
+        enterprise=enterprise,
+        plan=plan,
+        status=EnterprisePlanAssignment.Status.ACTIVE,
+        starts_on=today - timedelta(days=1),
+    )
+
+    matrix = resolve_store_module_matrix(store=store)
+    assert matrix["source"] == "plan"
+    assert matrix["modules"]["CORE"] is True
+    assert matrix["modules"]["STOCK"] is False
+
+    stock = BillingModule.objects.create(code="STOCK", name="Stock")
+    BillingPlanModule.objects.create(plan=plan, module=stock)
+    assert resolve_store_module_matrix(store=store)["modules"]["STOCK"] is True
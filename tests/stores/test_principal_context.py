@@ -0,0 +1,53 @@
+import pytest
+
+from accounts.models import User
+from api.v1.permissions import _user_has_store_access
+from api.v1.views import _user_enterprise_id, _user_store_ids
+from stores.models import Store, StoreUser
+from stores.principal import get_principal_context
+
+
+@pytest.fixture
+def linked_sales_user(sales_user, store):
+    StoreUser.objects.create(store=store, user=sales_user, is_default=True, capabilities=["CAN_SELL"])
+    return User.objects.get(pk=sales_user.pk)
+
+
+@pytest.mark.django_db
+def test_tenancy_helpers_share_one_resolution(linked_sales_user, store, enterprise, django_assert_num_queries):
+    get_principal_context(linked_sales_user)
+
+    with django_assert_num_queries(0):
+        assert _user_store_ids(linked_sales_user) == [store.pk]
+        assert _user_enterprise_id(linked_sales_user) == enterprise.pk
+        assert _user_has_store_access(linked_sales_user, str(store.pk))
+
+    # A fresh instance (next request) is served from the shared cache.
+    fresh_user = User.objects.get(pk=linked_sales_user.pk)
+    with django_assert_num_queries(0):
+        context = get_principal_context(fresh_user)
+    assert context.store_capabilities(store.pk) == ("CAN_SELL",)
+
+
+@pytest.mark.django_db
+def test_store_link_and_store_activation_invalidate_context(linked_sales_user, store, enterprise):
+    other = Store.objects.create(enterprise=enterprise, name="Annexe", code="BT-002")
+    assert not _user_has_store_access(linked_sales_user, str(other.pk))
+
+    StoreUser.objects.create(store=other, user=linked_sales_user)
+    assert set(_user_store_ids(linked_sales_user)) == {store.pk, other.pk}
+
+    other.is_active = False
+    other.save(update_fields=["is_active"])
+    assert _user_store_ids(linked_sales_user) == [store.pk]
+
+
+@pytest.mark.django_db
+def test_role_change_invalidates_context(linked_sales_user, store, enterprise):
+    other = Store.objects.create(enterprise=enterprise, name="Annexe", code="BT-002")
+    assert _user_store_ids(linked_sales_user) == [store.pk]
+
+    linked_sales_user.role = User.Role.ADMIN
+    linked_sales_user.save(update_fields=["role"])
+
+    assert set(_user_store_ids(linked_sales_user)) == {store.pk, other.pk}
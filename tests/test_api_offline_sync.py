@@ -301,3 +301,109 @@ class TestSaleOfflineIdField:
             store=store, seller=sales_user, offline_id=None,
         )
         assert sale.offline_id is None
+
+
+# ── Batch endpoint ───────────────────────────────────────────────────────
+
+
+BATCH_URL = "/api/v1/sales/offline-sync-batch/"
+
+
+@pytest.mark.django_db
+class TestOfflineSyncBatch:
+    """POST /api/v1/sales/offline-sync-batch/ — flush a backlog at once."""
+
+    def _sale(self, store, *items, **extra):
+        return {
+            "offline_id": str(uuid.uuid4()),
+            "store_id": str(store.pk),
+            "items": list(items),
+            **extra,
+        }
+
+    def test_creates_each_sale_and_reports_status(self, sales_client, store, product_a, product_b, customer):
+        good = self._sale(
+            store,
+            {"product_id": str(product_a.pk), "quantity": 2},
+            {"product_id": str(product_a.pk), "quantity": 1},
+            {"product_id": str(product_b.pk), "quantity": 1, "discount_amount": "500"},
+            customer_id=str(customer.pk),
+        )
+        bad = self._sale(store, {"product_id": str(uuid.uuid4()), "quantity": 1})
+
+        response = sales_client.post(BATCH_URL, {"sales": [good, bad]}, format="json")
+
+        assert response.status_code == 200, response.data
+        first, second = response.data["results"]
+        assert first["status"] == "created"
+        assert second["status"] == "error"
+        assert response.data["summary"] == {"created": 1, "error": 1}
+
+        sale = Sale.objects.get(offline_id=good["offline_id"])
+        assert sale.status == Sale.Status.PENDING_PAYMENT
+        assert sale.customer == customer
+        assert first["invoice_number"] == sale.invoice_number
+        assert sale.items.get(product=product_a).quantity == 3
+        assert sale.total == Decimal("17500.00")
+        assert not Sale.objects.filter(offline_id=bad["offline_id"]).exists()
+
+    def test_duplicates_are_not_recreated(self, sales_client, store, product_a):
+        payload = self._sale(store, {"product_id": str(product_a.pk), "quantity": 1})
+        sales_client.post(URL, payload, format="json")
+
+        response = sales_client.post(BATCH_URL, {"sales": [payload, payload]}, format="json")
+
+        assert [r["status"] for r in response.data["results"]] == ["duplicate", "duplicate"]
+        assert Sale.objects.filter(offline_id=payload["offline_id"]).count() == 1
+
+    def test_query_count_does_not_grow_per_line(self, sales_client, store, product_a, product_b):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        def _run(lines):
+            item = [{"product_id": str(p.pk), "quantity": 1} for p in lines]
+            with CaptureQueriesContext(connection) as ctx:
+                response = sales_client.post(BATCH_URL, {"sales": [self._sale(store, *item)]}, format="json")
+            assert response.data["results"][0]["status"] == "created"
+            return len(ctx.captured_queries)
+
+        _run([product_a])  # warm up default customer / sequences
+        assert _run([product_a, product_b]) == _run([product_a])
+
+    def test_cross_store_entries_are_forbidden(self, sales_client, enterprise, store, product_a):
+        from stores.models import Store
+
+        other_store = Store.objects.create(enterprise=enterprise, name="Other Store", code="OTHER-01")
+        payload = self._sale(other_store, {"product_id": str(product_a.pk), "quantity": 1})
+
+        response = sales_client.post(BATCH_URL, {"sales": [payload]}, format="json")
+
+        assert response.data["results"][0]["status"] == "forbidden"
+        assert not Sale.objects.filter(offline_id=payload["offline_id"]).exists()
+
+    def test_concurrent_retry_is_reported_as_duplicate(self, sales_client, store, product_a, monkeypatch):
+        from api.v1 import views
+
+        payload = self._sale(store, {"product_id": str(product_a.pk), "quantity": 1})
+        sales_client.post(URL, payload, format="json")
+        synced = views._synced_offline_sales
+        calls = []
+
+        def _synced_after_lookup(offline_ids):
+            # The other request commits between the lookup and the insert.
+            calls.append(offline_ids)
+            return {} if len(calls) == 1 else synced(offline_ids)
+
+        monkeypatch.setattr(views, "_synced_offline_sales", _synced_after_lookup)
+        response = sales_client.post(BATCH_URL, {"sales": [payload]}, format="json")
+
+        assert response.status_code == 200
+        result = response.data["results"][0]
+        assert result["status"] == "duplicate"
+        assert result["sale_id"] == str(Sale.objects.get(offline_id=payload["offline_id"]).pk)
+
+    def test_batch_runs_outside_the_request_transaction(self):
+        from django.urls import resolve
+
+        assert "default" in resolve(BATCH_URL).func._non_atomic_requests
+        assert not hasattr(resolve(URL).func, "_non_atomic_requests")